@@ -0,0 +1,32 @@
+"""Add analysis_runs.priority and queue_position for the scheduler
+
+Revision ID: c4e1a9d27f53
+Revises: 0b31c48f1b8f
+Create Date: 2026-10-19 10:12:31.482215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1a9d27f53'
+down_revision: Union[str, None] = '0b31c48f1b8f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('analysis_runs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('priority', sa.String(length=20), server_default='interactive', nullable=False))
+        batch_op.add_column(sa.Column('queue_position', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('analysis_runs', schema=None) as batch_op:
+        batch_op.drop_column('queue_position')
+        batch_op.drop_column('priority')
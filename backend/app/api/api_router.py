@@ -8,7 +8,8 @@ from app.api.endpoints.core import (
     project_router,
     dataset_router,
     analysis_run_router,
-    file_router
+    file_router,
+    health_router
 )
 from app.api.endpoints.tools.bulk_rna_seq import (
     volcano_plot_router,
@@ -18,6 +19,8 @@ from app.api.endpoints.tools.bulk_rna_seq import (
 # --- NEW: Import the imaging routers ---
 from app.api.endpoints.tools.imaging.filters import gaussian_blur_router
 from app.api.endpoints.tools.imaging.segmentation import auto_threshold_router
+from app.api.endpoints.tools.imaging import batch_router as imaging_batch_router
+from app.api.endpoints.tools.imaging import pipeline_router as imaging_pipeline_router
 
 
 api_router = APIRouter()
@@ -28,6 +31,7 @@ api_router.include_router(project_router.router, prefix="/projects", tags=["Proj
 api_router.include_router(dataset_router.router, prefix="/datasets", tags=["Datasets"])
 api_router.include_router(analysis_run_router.router, prefix="/analysis-runs", tags=["Analysis Runs"])
 api_router.include_router(file_router.router, prefix="/files", tags=["Files"])
+api_router.include_router(health_router.router, prefix="/health", tags=["Health"])
 
 
 # --- Include the tool-specific submission endpoints ---
@@ -62,6 +66,16 @@ api_router.include_router(
     prefix="/analyses/imaging/segmentation/auto-threshold",
     tags=["Analyses - Imaging"]
 )
+api_router.include_router(
+    imaging_batch_router.router,
+    prefix="/analyses/imaging/batch",
+    tags=["Analyses - Imaging"]
+)
+api_router.include_router(
+    imaging_pipeline_router.router,
+    prefix="/analyses/imaging/pipeline",
+    tags=["Analyses - Imaging"]
+)
 # --- End of Imaging ---
 
 # Example for the future: When we add a plot tool, its router will be added here.
@@ -3,4 +3,5 @@ from . import dataset_router
 from . import file_router
 from . import project_router
 from . import user_router
-from . import analysis_run_router
\ No newline at end of file
+from . import analysis_run_router
+from . import health_router
\ No newline at end of file
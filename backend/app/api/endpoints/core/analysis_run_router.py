@@ -1,4 +1,5 @@
 # backend/app/api/endpoints/analysis_run_router.py
+import logging
 import uuid
 from typing import List, Any
 
@@ -7,10 +8,14 @@ from sqlalchemy.orm import Session
 
 from app import crud, models, schemas # Uses __init__.py for cleaner imports
 from app.db.session import get_db
+from app.services import progress, run_control, scheduler
+from app.tasks import dispatch  # Revoke by task id; keeps worker-only libraries out of the API
 
 # Import the placeholder for current user (replace with actual auth later)
 from app.api.endpoints.core.project_router import get_current_active_user_placeholder
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -64,8 +69,93 @@ def read_analysis_run_by_id(
     # else: # Should not happen if FK is enforced and project loaded
     #     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Analysis run is not associated with a project.")
 
+    # A waiting run's place in the scheduler queue moves as other runs finish; report the
+    # live value (for this response only, nothing is written back). Runs of a parameter
+    # sweep wait together, under the sweep's id.
+    if analysis_run.status == models.AnalysisStatus.PENDING:
+        scheduler_job_id = (analysis_run.parameters or {}).get("sweep_id") or str(analysis_run.id)
+        try:
+            analysis_run.queue_position = scheduler.queue_position(scheduler_job_id)
+        except Exception as e:
+            logger.warning(f"Could not read the queue position of run {analysis_run.id}: {e}")
+
     return analysis_run
 
+@router.get("/{analysis_run_id}/progress", response_model=schemas.AnalysisRunProgress)
+def read_analysis_run_progress(
+    analysis_run_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user_placeholder), # Auth placeholder
+) -> Any:
+    """
+    Get the live progress of an analysis run: its current stage, loop progress within the
+    stage, and how long each stage took so far. Cheap enough to poll: workers publish it
+    to Redis, and the database holds only the final stage timings.
+    """
+    analysis_run = crud.get_analysis_run(db, analysis_run_id=analysis_run_id)
+    if not analysis_run:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analysis run not found")
+
+    snapshot = None
+    try:
+        snapshot = progress.get_progress(str(analysis_run.id))
+    except Exception as e:
+        logger.warning(f"Could not read the progress of run {analysis_run.id}: {e}")
+
+    # No snapshot (not started yet, Redis unavailable, or expired): fall back to the database
+    if snapshot is None:
+        stages = (analysis_run.output_artifacts or {}).get("stage_timings") or []
+        snapshot = {"state": analysis_run.status.value, "stages": stages}
+    # The database is authoritative once the run has finished (e.g. cancelled while queued)
+    elif analysis_run.status not in (models.AnalysisStatus.PENDING, models.AnalysisStatus.RUNNING):
+        snapshot["state"] = analysis_run.status.value
+
+    return {"analysis_run_id": analysis_run.id, **snapshot}
+
+@router.post("/{analysis_run_id}/cancel", response_model=schemas.AnalysisRunRead)
+def cancel_analysis_run(
+    analysis_run_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user_placeholder), # Auth placeholder
+) -> Any:
+    """
+    Cancel a pending or running analysis run.
+    A run still waiting in the scheduler is simply dropped. A run already handed to Celery
+    is revoked (so a worker never starts it) and flagged in Redis, so a running task stops
+    at its next checkpoint between processing stages and frees its worker.
+    """
+    db_run = crud.get_analysis_run(db, analysis_run_id=analysis_run_id)
+    if not db_run:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analysis run not found")
+
+    if db_run.created_by_user_id != current_user.id and not (current_user.role == "admin"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions to cancel this analysis run")
+
+    if db_run.status not in (models.AnalysisStatus.PENDING, models.AnalysisStatus.RUNNING):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Analysis run is already {db_run.status.value} and cannot be cancelled."
+        )
+
+    run_id = str(db_run.id)
+    try:
+        # 1. Still waiting in the scheduler: nothing has reached Celery yet
+        if not scheduler.remove(run_id):
+            # 2. Handed to Celery: flag it first, so a task that starts in between stops at once
+            run_control.request_cancel(run_id)
+            dispatch.revoke_analysis(run_id)
+    except Exception as e:
+        logger.error(f"Could not cancel analysis run {run_id}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not reach the processing queue to cancel this run."
+        )
+
+    # 3. A running task also records CANCELLED when it reaches its checkpoint
+    return crud.update_analysis_run_status(
+        db, db_run=db_run, status=models.AnalysisStatus.CANCELLED, error_message="Cancelled by user."
+    )
+
 # Note:
 # - Creation of AnalysisRun records will typically happen as part of submitting a specific analysis job
 #   (e.g., via a POST /api/analyses/volcano_plot/submit endpoint).
@@ -0,0 +1,49 @@
+# backend/app/api/endpoints/core/health_router.py
+
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, status
+from pydantic import BaseModel
+
+from app.services import worker_health
+
+router = APIRouter()
+
+
+class ImagingProcessStatus(BaseModel):
+    hostname: str
+    pid: int
+    initialized: bool
+    warmed_up: bool
+    version: Optional[str] = None
+    init_seconds: Optional[float] = None
+    warmup_seconds: Optional[float] = None
+    jvm_max_heap: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ImagingWorkerHealth(BaseModel):
+    ready: bool
+    ready_processes: int
+    total_processes: int
+    processes: List[ImagingProcessStatus]
+
+
+@router.get("/imaging-workers", response_model=ImagingWorkerHealth)
+def get_imaging_worker_health():
+    """
+    Report ImageJ gateway readiness for every Celery worker process.
+    `ready` is true once at least one process has a started and warmed gateway.
+    """
+    try:
+        processes = [ImagingProcessStatus(**entry) for entry in worker_health.list_imaging_status()]
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail=f"Could not read worker health: {e}")
+    ready_processes = sum(1 for p in processes if p.initialized and p.warmed_up)
+    return ImagingWorkerHealth(
+        ready=ready_processes > 0,
+        ready_processes=ready_processes,
+        total_processes=len(processes),
+        processes=processes,
+    )
@@ -1,6 +1,6 @@
 # backend/app/api/endpoints/tools/bulk_rna_seq/heatmap_router.py
 import uuid
-from typing import Any, Optional, List
+from typing import Any, Dict, Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
@@ -8,8 +8,9 @@ from pydantic import BaseModel, Field
 
 from app import crud, models, schemas
 from app.db.session import get_db
-# --- NEW: Import the new Celery task for Heatmap ---
-from app.tasks.heatmap_task import run_heatmap_analysis as run_heatmap_task
+from app.services import scheduler  # Fair-share queue in front of Celery
+from app.tasks import dispatch  # Enqueue by task name; keeps worker-only libraries out of the API
+from app.api.endpoints.tools import sweep
 from app.api.endpoints.core.project_router import get_current_active_user_placeholder
 
 router = APIRouter()
@@ -35,6 +36,16 @@ class HeatmapSubmit(BaseModel):
     distance_metric: str = Field("euclidean", description="Clustering distance metric.")
 
 
+class HeatmapSweep(HeatmapSubmit):
+    # Every combination of these values becomes one run, e.g.
+    # {"clustering_method": ["average", "complete", "ward"], "distance_metric": ["euclidean", "correlation"]}
+    sweep: Dict[str, List[Any]]
+
+
+def _tool_parameters(submission_data: HeatmapSubmit) -> Dict[str, Any]:
+    return submission_data.model_dump(exclude={"project_id", "primary_input_dataset_id"})
+
+
 @router.post("/submit", response_model=schemas.AnalysisRunRead, status_code=status.HTTP_202_ACCEPTED)
 async def submit_heatmap_job(
     *,
@@ -51,7 +62,7 @@ async def submit_heatmap_job(
     if dataset.project_id != submission_data.project_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Dataset does not belong to project.")
 
-    tool_parameters = submission_data.model_dump(exclude={"project_id", "primary_input_dataset_id"})
+    tool_parameters = _tool_parameters(submission_data)
     
     analysis_run_in = schemas.AnalysisRunCreate(
         name=submission_data.analysis_name,
@@ -65,10 +76,13 @@ async def submit_heatmap_job(
     db_analysis_run = crud.create_analysis_run(db=db, run_in=analysis_run_in, created_by_user_id=current_user.id)
 
     try:
-        run_heatmap_task.delay(
+        queue_position = scheduler.submit(
+            dispatch.HEATMAP_TASK,
             analysis_run_id=str(db_analysis_run.id),
+            project_id=str(db_analysis_run.project_id),
             dataset_s3_path=dataset.file_path_s3,
             parameters=tool_parameters,
+            priority=db_analysis_run.priority,
         )
     except Exception as e:
         crud.update_analysis_run_status(
@@ -77,4 +91,36 @@ async def submit_heatmap_job(
         )
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to enqueue analysis task.")
 
-    return db_analysis_run
\ No newline at end of file
+    # Record where the run waits in the scheduler queue (None if it was dispatched at once)
+    crud.update_analysis_run_queue_position(db, db_run=db_analysis_run, queue_position=queue_position)
+
+    return db_analysis_run
+
+
+@router.post("/sweep", response_model=List[schemas.AnalysisRunRead], status_code=status.HTTP_202_ACCEPTED)
+async def submit_heatmap_sweep(
+    *,
+    db: Session = Depends(get_db),
+    submission_data: HeatmapSweep,
+    current_user: models.User = Depends(get_current_active_user_placeholder),
+) -> Any:
+    """
+    Submit a Heatmap parameter sweep (e.g. clustering_method x distance_metric): one
+    AnalysisRun per combination, all evaluated by one Celery task that parses the table once.
+    """
+    dataset = crud.get_dataset(db, dataset_id=submission_data.primary_input_dataset_id)
+    if not dataset:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Input dataset not found.")
+    if dataset.project_id != submission_data.project_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Dataset does not belong to project.")
+
+    combinations = sweep.expand_sweep(submission_data, HeatmapSubmit)
+    return sweep.submit_sweep(
+        db,
+        current_user=current_user,
+        combinations=combinations,
+        dataset=dataset,
+        task_name=dispatch.HEATMAP_SWEEP_TASK,
+        tool_id="benchmate_heatmap_v1",
+        tool_parameters=_tool_parameters,
+    )
@@ -1,15 +1,20 @@
 # backend/app/api/endpoints/tools/bulk_rna_seq/pca_plot_router.py
 import uuid
-from typing import Any, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 
 from app import crud, models, schemas
 from app.db.session import get_db
-from app.tasks.pca_task import run_pca_plot_analysis as run_pca_task
+from app.services import scheduler  # Fair-share queue in front of Celery
+from app.tasks import dispatch  # Enqueue by task name; keeps worker-only libraries out of the API
+from app.api.endpoints.tools import sweep
 from app.core.config import settings
+from app.services.s3_service import s3_service
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import pca_artifact
 from app.api.endpoints.core.project_router import get_current_active_user_placeholder
 
 router = APIRouter()
@@ -26,6 +31,45 @@ class PCASubmit(BaseModel):
     pc_x_axis: int = Field(1, description="Which principal component to plot on the X-axis.")
     pc_y_axis: int = Field(2, description="Which principal component to plot on the Y-axis.")
     scale_data: bool = Field(True, description="Whether to scale data before PCA.")
+    remove_constant_genes: bool = Field(True, description="Drop all-zero and constant genes before PCA.")
+    top_variable_genes: Optional[int] = Field(None, gt=0, description="If set, keep only this many most variable genes.")
+    svd_solver: str = Field("auto", description="SVD solver: 'auto', 'full', 'randomized', 'arpack' or 'incremental'.")
+
+
+class PCASweep(PCASubmit):
+    # Every combination of these values becomes one run, e.g.
+    # {"top_variable_genes": [500, 1000, 5000], "scale_data": [true, false]}
+    sweep: Dict[str, List[Any]]
+
+
+def _tool_parameters(submission_data: PCASubmit) -> Dict[str, Any]:
+    tool_parameters = {
+        "grouping_column": submission_data.grouping_column,
+        "pc_x_axis": submission_data.pc_x_axis,
+        "pc_y_axis": submission_data.pc_y_axis,
+        "scale_data": submission_data.scale_data,
+        "remove_constant_genes": submission_data.remove_constant_genes,
+        "top_variable_genes": submission_data.top_variable_genes,
+        "svd_solver": submission_data.svd_solver,
+        "analysis_name": submission_data.analysis_name,
+    }
+    return {k: v for k, v in tool_parameters.items() if v is not None}
+
+
+class PCAComponentsResponse(BaseModel):
+    """Scatter payload for an arbitrary pair of PCs, served from the stored decomposition."""
+    pc_x_axis: int
+    pc_y_axis: int
+    x_axis_label: str
+    y_axis_label: str
+    explained_variance_ratio: List[float]
+    plot_data: List[Dict[str, Any]]
+
+
+class PCALoadingsResponse(BaseModel):
+    """Genes with the largest absolute loadings on one principal component."""
+    component: int
+    genes: List[Dict[str, Any]]
 
 
 @router.post("/submit", response_model=schemas.AnalysisRunRead, status_code=status.HTTP_202_ACCEPTED)
@@ -53,14 +97,7 @@ async def submit_pca_plot_job(
         )
 
     # 2. Prepare parameters for the AnalysisRun record and the Celery task
-    tool_parameters = {
-        "grouping_column": submission_data.grouping_column,
-        "pc_x_axis": submission_data.pc_x_axis,
-        "pc_y_axis": submission_data.pc_y_axis,
-        "scale_data": submission_data.scale_data,
-        "analysis_name": submission_data.analysis_name,
-    }
-    tool_parameters_cleaned = {k: v for k, v in tool_parameters.items() if v is not None}
+    tool_parameters_cleaned = _tool_parameters(submission_data)
 
     # 3. Create the AnalysisRun record in the database
     analysis_run_in = schemas.AnalysisRunCreate(
@@ -81,10 +118,13 @@ async def submit_pca_plot_job(
 
     # 4. Enqueue the Celery task
     try:
-        run_pca_task.delay(
+        queue_position = scheduler.submit(
+            dispatch.PCA_PLOT_TASK,
             analysis_run_id=str(db_analysis_run.id),
+            project_id=str(db_analysis_run.project_id),
             dataset_s3_path=dataset.file_path_s3,
             parameters=tool_parameters_cleaned,
+            priority=db_analysis_run.priority,
         )
     except Exception as e:
         crud.update_analysis_run_status(
@@ -98,4 +138,116 @@ async def submit_pca_plot_job(
             detail=f"Failed to enqueue analysis task: {str(e)}"
         )
 
-    return db_analysis_run
\ No newline at end of file
+    # 5. Record where the run waits in the scheduler queue (None if it was dispatched at once)
+    crud.update_analysis_run_queue_position(db, db_run=db_analysis_run, queue_position=queue_position)
+
+    return db_analysis_run
+
+
+@router.post("/sweep", response_model=List[schemas.AnalysisRunRead], status_code=status.HTTP_202_ACCEPTED)
+async def submit_pca_plot_sweep(
+    *,
+    db: Session = Depends(get_db),
+    submission_data: PCASweep,
+    current_user: models.User = Depends(get_current_active_user_placeholder),
+) -> Any:
+    """
+    Submit a PCA parameter sweep: one AnalysisRun per combination of the `sweep` values,
+    all created together and evaluated by one Celery task that parses the table once.
+    """
+    # 1. Validate input dataset
+    dataset = crud.get_dataset(db, dataset_id=submission_data.primary_input_dataset_id)
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Input dataset with ID {submission_data.primary_input_dataset_id} not found."
+        )
+    if dataset.project_id != submission_data.project_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Input dataset does not belong to the specified project."
+        )
+
+    # 2. Expand the grid, then create and enqueue all runs at once
+    combinations = sweep.expand_sweep(submission_data, PCASubmit)
+    return sweep.submit_sweep(
+        db,
+        current_user=current_user,
+        combinations=combinations,
+        dataset=dataset,
+        task_name=dispatch.PCA_SWEEP_TASK,
+        tool_id="benchmate_pca_plot_v1",
+        tool_parameters=_tool_parameters,
+    )
+
+
+# --- Cached decomposition endpoints ---
+# Completed PCA runs store their full decomposition (see pca_artifact); these endpoints
+# read it back so changing axes or inspecting loadings never needs a new Celery job.
+
+@lru_cache(maxsize=32)
+def _load_cached_decomposition(decomposition_s3_path: str) -> Dict[str, Any]:
+    """Download and parse a run's decomposition once per API process. Artifacts are immutable."""
+    s3_object_key = decomposition_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_RESULTS}/", "", 1)
+    buffer = s3_service.download_file_to_buffer(
+        bucket_name=settings.S3_BUCKET_NAME_RESULTS,
+        object_key=s3_object_key
+    )
+    if not buffer:
+        raise FileNotFoundError(f"Could not download PCA decomposition from {decomposition_s3_path}")
+    return pca_artifact.load_decomposition(buffer)
+
+
+def _get_decomposition(db: Session, analysis_run_id: uuid.UUID) -> Dict[str, Any]:
+    db_run = crud.get_analysis_run(db, analysis_run_id=analysis_run_id)
+    if not db_run or db_run.tool_id != "benchmate_pca_plot_v1":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PCA analysis run not found.")
+
+    decomposition_s3_path = (db_run.output_artifacts or {}).get("decomposition_s3_path")
+    if db_run.status != models.AnalysisStatus.COMPLETED or not decomposition_s3_path:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This PCA run has no stored decomposition. It may still be running or predate decomposition storage."
+        )
+
+    try:
+        return _load_cached_decomposition(decomposition_s3_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get("/{analysis_run_id}/components", response_model=PCAComponentsResponse)
+def read_pca_components(
+    analysis_run_id: uuid.UUID,
+    pc_x: int = Query(1, ge=1, description="Principal component for the X-axis."),
+    pc_y: int = Query(2, ge=1, description="Principal component for the Y-axis."),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user_placeholder),
+) -> Any:
+    """
+    Return sample scores for any pair of principal components of a completed PCA run.
+    """
+    decomposition = _get_decomposition(db, analysis_run_id)
+    try:
+        return pca_artifact.select_components(decomposition, pc_x, pc_y)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+
+
+@router.get("/{analysis_run_id}/loadings", response_model=PCALoadingsResponse)
+def read_pca_loadings(
+    analysis_run_id: uuid.UUID,
+    component: int = Query(1, ge=1, description="Principal component to inspect."),
+    top_n: int = Query(20, ge=1, le=1000, description="Number of top-loading genes to return."),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user_placeholder),
+) -> Any:
+    """
+    Return the genes with the largest absolute loadings on one principal component.
+    """
+    decomposition = _get_decomposition(db, analysis_run_id)
+    try:
+        genes = pca_artifact.top_loading_genes(decomposition, component, top_n)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    return {"component": component, "genes": genes}
@@ -1,15 +1,22 @@
 # backend/app/api/endpoints/volcano_plot_tool_router.py
+import os
+import threading
 import uuid
-from typing import Any, Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Body
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from app import crud, models, schemas
 from app.db.session import get_db
-from app.tasks.volcano_task import run_volcano_plot_analysis as run_volcano_task # Import Celery task
+from app.services import scheduler  # Fair-share queue in front of Celery
+from app.tasks import dispatch  # Enqueue by task name; keeps worker-only libraries out of the API
+from app.api.endpoints.tools import sweep
 from app.core.config import settings
+from app.services.s3_service import s3_service
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import volcano_artifact
 
 # Import the placeholder for current user (replace with actual auth later)
 from app.api.endpoints.core.project_router import get_current_active_user_placeholder
@@ -31,7 +38,57 @@ class VolcanoPlotSubmit(BaseModel):
     pvalue_col: Optional[str] = None
     fold_change_threshold: Optional[float] = 1.0 # Default from your volcano.yaml
     p_value_threshold: Optional[float] = 0.05    # Default from your volcano.yaml
-    # label_top_n: Optional[int] = 0 # Add if you use this
+    label_top_n: Optional[int] = Field(None, ge=0) # Genes to label per side; defaults to the tool config
+    multi_contrast: Optional[bool] = None # Compare '<contrast>_logFC'/'<contrast>_PValue' column pairs of a wide table
+    contrasts: Optional[List[str]] = None # Contrasts to compare in multi-contrast mode (default: all found)
+    render_mode: Optional[Literal["auto", "points", "density"]] = None # 'density' bins neutral genes (large tables)
+    density_bins: Optional[int] = Field(None, ge=10, le=1000) # Grid resolution per axis in density mode
+    streaming: Optional[bool] = None # Read the table in chunks (CSV/TSV); default: only above the config's size threshold
+
+
+class VolcanoPlotSweep(VolcanoPlotSubmit):
+    # Every combination of these values becomes one run, e.g.
+    # {"fold_change_threshold": [0.5, 1, 2], "p_value_threshold": [0.01, 0.05]}
+    sweep: Dict[str, List[Any]]
+
+
+class VolcanoClassificationResponse(BaseModel):
+    """
+    A completed run under new thresholds: counts, the genes whose label changed and, for
+    density-mode runs, the re-binned plot.
+    """
+    fold_change_threshold: float
+    p_value_threshold: float
+    summary_stats: Dict[str, int]
+    # Stored-column positions whose label differs from the run's own, keyed by the new label
+    # ('up', 'down', 'neutral'); unchanged genes are not sent
+    changed: Dict[str, List[int]]
+    render_mode: str # The run's own: 'points' or 'density'
+    # Density-mode runs only: the newly neutral genes re-binned, and the newly significant
+    # genes as plot points ('_row' is their stored-column position)
+    density: Optional[Dict[str, Any]] = None
+    points: Optional[List[Dict[str, Any]]] = None
+    # Positions of the best-scoring up/down genes, best first: in the stored columns for
+    # point-mode runs, in `points` for density-mode runs
+    top_labels: Dict[str, List[int]]
+
+
+def _tool_parameters(submission_data: VolcanoPlotSubmit) -> Dict[str, Any]:
+    tool_parameters = {
+        "gene_col": submission_data.gene_col,
+        "log2fc_col": submission_data.log2fc_col,
+        "pvalue_col": submission_data.pvalue_col,
+        "fold_change_threshold": submission_data.fold_change_threshold,
+        "p_value_threshold": submission_data.p_value_threshold,
+        "label_top_n": submission_data.label_top_n,
+        "multi_contrast": submission_data.multi_contrast,
+        "contrasts": submission_data.contrasts,
+        "render_mode": submission_data.render_mode,
+        "density_bins": submission_data.density_bins,
+        "streaming": submission_data.streaming,
+    }
+    # Filter out None values from parameters if your processor prefers that
+    return {k: v for k, v in tool_parameters.items() if v is not None}
 
 
 @router.post("/submit", response_model=schemas.AnalysisRunRead, status_code=status.HTTP_202_ACCEPTED)
@@ -60,16 +117,7 @@ async def submit_volcano_plot_job(
     # Add further authorization checks for project access by current_user if needed
 
     # 2. Prepare parameters for AnalysisRun and Celery task
-    tool_parameters = {
-        "gene_col": submission_data.gene_col,
-        "log2fc_col": submission_data.log2fc_col,
-        "pvalue_col": submission_data.pvalue_col,
-        "fold_change_threshold": submission_data.fold_change_threshold,
-        "p_value_threshold": submission_data.p_value_threshold,
-        # "label_top_n": submission_data.label_top_n,
-    }
-    # Filter out None values from parameters if your processor prefers that
-    tool_parameters_cleaned = {k: v for k, v in tool_parameters.items() if v is not None}
+    tool_parameters_cleaned = _tool_parameters(submission_data)
 
     # 3. Create AnalysisRun Pydantic model for DB creation
     analysis_run_in = schemas.AnalysisRunCreate(
@@ -93,10 +141,13 @@ async def submit_volcano_plot_job(
     # 5. Enqueue Celery task
     # Pass necessary information for the task to execute
     try:
-        run_volcano_task.delay(
+        queue_position = scheduler.submit(
+            dispatch.VOLCANO_PLOT_TASK,
             analysis_run_id=str(db_analysis_run.id), # Pass ID as string
+            project_id=str(db_analysis_run.project_id),
             dataset_s3_path=dataset.file_path_s3, # Get S3 path from Dataset model
             parameters=tool_parameters_cleaned,
+            priority=db_analysis_run.priority,
             # You might also need to pass user_id if tasks need to impersonate or log as user
         )
     except Exception as e:
@@ -114,4 +165,145 @@ async def submit_volcano_plot_job(
             detail=f"Failed to enqueue analysis task: {str(e)}"
         )
 
-    return db_analysis_run # Return the created AnalysisRun record (status: PENDING)
\ No newline at end of file
+    # 6. Record where the run waits in the scheduler queue (None if it was dispatched at once)
+    crud.update_analysis_run_queue_position(db, db_run=db_analysis_run, queue_position=queue_position)
+
+    return db_analysis_run # Return the created AnalysisRun record (status: PENDING)
+
+
+@router.post("/sweep", response_model=List[schemas.AnalysisRunRead], status_code=status.HTTP_202_ACCEPTED)
+async def submit_volcano_plot_sweep(
+    *,
+    db: Session = Depends(get_db),
+    submission_data: VolcanoPlotSweep,
+    current_user: models.User = Depends(get_current_active_user_placeholder),
+) -> Any:
+    """
+    Submit a Volcano Plot parameter sweep: one AnalysisRun per combination of the `sweep`
+    values, all created together and evaluated by one Celery task that loads the table once.
+    """
+    # 1. Validate input dataset exists and belongs to the project
+    dataset = crud.get_dataset(db, dataset_id=submission_data.primary_input_dataset_id)
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Input dataset with ID {submission_data.primary_input_dataset_id} not found."
+        )
+    if dataset.project_id != submission_data.project_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Input dataset does not belong to the specified project."
+        )
+
+    # 2. Expand the grid, then create and enqueue all runs at once
+    combinations = sweep.expand_sweep(submission_data, VolcanoPlotSubmit)
+    return sweep.submit_sweep(
+        db,
+        current_user=current_user,
+        combinations=combinations,
+        dataset=dataset,
+        task_name=dispatch.VOLCANO_SWEEP_TASK,
+        tool_id="benchmate_volcano_plot_v1",
+        tool_parameters=_tool_parameters,
+    )
+
+
+# --- Reclassification endpoint ---
+# Completed volcano runs store their classified columns (see volcano_artifact); thresholds
+# only change the labels, so new thresholds are applied here without a Celery job.
+
+# Parsed columns are kept per API process up to COLUMNS_CACHE_MAX_BYTES (least recently
+# used first out); artifacts larger than COLUMNS_MAX_BYTES are refused rather than loaded.
+COLUMNS_CACHE_MAX_BYTES = int(os.getenv("VOLCANO_COLUMNS_CACHE_MB", "512")) * 1024 ** 2
+COLUMNS_MAX_BYTES = int(os.getenv("VOLCANO_COLUMNS_MAX_MB", "256")) * 1024 ** 2
+
+_columns_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_columns_cache_lock = threading.Lock()
+
+
+def _cache_columns(columns_s3_path: str, columns: Dict[str, Any]) -> None:
+    if volcano_artifact.columns_nbytes(columns) > COLUMNS_CACHE_MAX_BYTES:
+        return
+    with _columns_cache_lock:
+        _columns_cache[columns_s3_path] = columns
+        _columns_cache.move_to_end(columns_s3_path)
+        while sum(volcano_artifact.columns_nbytes(c) for c in _columns_cache.values()) > COLUMNS_CACHE_MAX_BYTES:
+            _columns_cache.popitem(last=False)
+
+
+def _load_cached_columns(columns_s3_path: str) -> Dict[str, Any]:
+    """Download and parse a run's columns, reusing them while they stay cached. Artifacts are immutable."""
+    with _columns_cache_lock:
+        columns = _columns_cache.get(columns_s3_path)
+        if columns is not None:
+            _columns_cache.move_to_end(columns_s3_path)
+            return columns
+
+    s3_object_key = columns_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_RESULTS}/", "", 1)
+    size = s3_service.get_object_size(settings.S3_BUCKET_NAME_RESULTS, s3_object_key)
+    if size is None:
+        raise FileNotFoundError(f"Could not read volcano columns from {columns_s3_path}")
+    if size > COLUMNS_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"This run's stored columns ({size // 1024 ** 2} MB) are too large to reclassify here; "
+                   f"submit a new run with the new thresholds instead."
+        )
+    buffer = s3_service.download_file_to_buffer(
+        bucket_name=settings.S3_BUCKET_NAME_RESULTS,
+        object_key=s3_object_key
+    )
+    if not buffer:
+        raise FileNotFoundError(f"Could not download volcano columns from {columns_s3_path}")
+    columns = volcano_artifact.load_columns(buffer)
+    _cache_columns(columns_s3_path, columns)
+    return columns
+
+
+def _get_columns(db: Session, analysis_run_id: uuid.UUID) -> Tuple[models.AnalysisRun, Dict[str, Any]]:
+    db_run = crud.get_analysis_run(db, analysis_run_id=analysis_run_id)
+    if not db_run or db_run.tool_id != "benchmate_volcano_plot_v1":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Volcano plot analysis run not found.")
+
+    columns_s3_path = (db_run.output_artifacts or {}).get("columns_s3_path")
+    if db_run.status != models.AnalysisStatus.COMPLETED or not columns_s3_path:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This volcano run has no stored columns. It may still be running or predate column storage."
+        )
+
+    try:
+        return db_run, _load_cached_columns(columns_s3_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.get("/{analysis_run_id}/classification", response_model=VolcanoClassificationResponse)
+def read_volcano_classification(
+    analysis_run_id: uuid.UUID,
+    fold_change_threshold: float = Query(1.0, ge=0, description="Absolute log2FC threshold."),
+    p_value_threshold: float = Query(0.05, gt=0, le=1, description="P-value cut-off."),
+    label_top_n: int = Query(10, ge=0, le=1000, description="Up and down genes to pick for labels."),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user_placeholder),
+) -> Any:
+    """
+    Reclassify a completed volcano run under new thresholds and return the new counts and
+    the genes whose label changed from the run's own (positions in plot_data order for
+    point-mode runs). The plotted values never change, but a density-mode run only plots
+    its significant genes, so its response also carries the new neutral grid and points.
+    """
+    db_run, columns = _get_columns(db, analysis_run_id)
+    run_parameters = db_run.parameters or {}
+    baseline_thresholds = (run_parameters.get("fold_change_threshold", 1.0), run_parameters.get("p_value_threshold", 0.05))
+    output_artifacts = db_run.output_artifacts or {}
+    # Runs stored before render_mode was recorded: only streamed runs were density plots for sure
+    streamed = (output_artifacts.get("summary_stats") or {}).get("streamed")
+    render_mode = output_artifacts.get("render_mode") or ("density" if streamed else "points")
+    return volcano_artifact.reclassify(
+        columns, fold_change_threshold, p_value_threshold, label_top_n,
+        baseline_thresholds=baseline_thresholds,
+        render_mode=render_mode,
+        density_bins=output_artifacts.get("density_bins") or run_parameters.get("density_bins") or 100,
+        max_points=output_artifacts.get("max_points"),
+    )
@@ -0,0 +1,119 @@
+# backend/app/api/endpoints/tools/imaging/batch_router.py
+
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.api.endpoints.core.project_router import get_current_active_user_placeholder
+from app.core.config import settings
+from app.db.session import get_db
+from app.schemas.benchtop.biology.imaging.batch_schema import BATCH_TOOL_PARAMS, ImagingBatchParams
+from app.services import scheduler  # Fair-share queue in front of Celery
+from app.tasks import dispatch  # Enqueue by task name; keeps worker-only libraries out of the API
+from app.utils.config_loader import load_yaml_config
+
+router = APIRouter()
+
+# --- Pydantic model for submission ---
+class ImagingBatchSubmit(BaseModel):
+    """Defines the request body for submitting an imaging batch (one tool, many images)."""
+    project_id: uuid.UUID
+    analysis_name: Optional[str] = Field("Imaging Batch", description="A custom name for this analysis run.")
+
+    tool: str = Field(..., description=f"Tool applied to every image: one of {list(BATCH_TOOL_PARAMS)}.")
+    tool_parameters: Dict[str, Any] = Field(default_factory=dict, description="Parameters for the tool, e.g. {'sigma': 2.0}.")
+
+    # Exactly one of these selects the images
+    dataset_ids: Optional[List[uuid.UUID]] = Field(None, description="Datasets (images) to process.")
+    s3_prefix: Optional[str] = Field(None, description="Process every image under this prefix of the project's datasets.")
+
+@router.post("/submit", response_model=schemas.AnalysisRunRead)
+def submit_imaging_batch_analysis(
+    *,
+    db: Session = Depends(get_db),
+    submission_data: ImagingBatchSubmit,
+    current_user: models.User = Depends(get_current_active_user_placeholder),
+):
+    """
+    Submit one imaging tool over many images as a single analysis run.
+    A single Celery task processes all images and writes a per-image manifest.
+    """
+    # 1. Validate the tool and its parameters up front, so bad requests fail here
+    if (submission_data.dataset_ids is None) == (submission_data.s3_prefix is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide exactly one of 'dataset_ids' or 's3_prefix'.")
+    try:
+        batch_params = ImagingBatchParams(tool=submission_data.tool, tool_parameters=submission_data.tool_parameters)
+        batch_params.tool_params()
+    except (ValidationError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    # 2. Resolve the inputs: datasets must exist and belong to the project; a prefix
+    # is confined to the project's area of the datasets bucket and listed by the worker,
+    # which also enforces max_images for it.
+    prefix_s3_path = None
+    primary_input_dataset_id = None
+    if submission_data.dataset_ids is not None:
+        if not submission_data.dataset_ids:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'dataset_ids' is empty.")
+        max_images = load_yaml_config("benchtop/biology/imaging/batch.yaml")['parameters']['max_images']
+        if len(submission_data.dataset_ids) > max_images:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"The batch has {len(submission_data.dataset_ids)} images; at most {max_images} are allowed per run."
+            )
+        inputs = []
+        for dataset_id in submission_data.dataset_ids:
+            dataset = crud.get_dataset(db, dataset_id=dataset_id)
+            if not dataset or dataset.project_id != submission_data.project_id:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Input dataset {dataset_id} not found in this project.")
+            inputs.append({"s3_path": dataset.file_path_s3, "dataset_id": str(dataset.id)})
+        batch_params.inputs = inputs
+        primary_input_dataset_id = submission_data.dataset_ids[0]
+    else:
+        bucket_prefix = f"s3://{settings.S3_BUCKET_NAME_DATASETS}/"
+        object_prefix = submission_data.s3_prefix.removeprefix(bucket_prefix).lstrip("/")
+        project_prefix = f"projects/{submission_data.project_id}/"
+        if not object_prefix.startswith(project_prefix):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"'s3_prefix' must lie under '{project_prefix}'.")
+        prefix_s3_path = bucket_prefix + object_prefix
+
+    # 3. Create AnalysisRun record in the database
+    tool_parameters = batch_params.model_dump()
+    analysis_run_in = schemas.AnalysisRunCreate(
+        name=submission_data.analysis_name,
+        project_id=submission_data.project_id,
+        tool_id="benchmate_imaging_batch_v1", # From our YAML config
+        tool_version="1.0.0",
+        parameters={**tool_parameters, "s3_prefix": prefix_s3_path},
+        primary_input_dataset_id=primary_input_dataset_id,
+        priority="batch", # Many images in one run: queued behind interactive runs
+    )
+    db_analysis_run = crud.create_analysis_run(
+        db=db, run_in=analysis_run_in, created_by_user_id=current_user.id
+    )
+
+    # 4. Enqueue the Celery task (the prefix, if any, travels as the dataset path)
+    try:
+        queue_position = scheduler.submit(
+            dispatch.IMAGE_BATCH_TASK,
+            analysis_run_id=str(db_analysis_run.id),
+            project_id=str(db_analysis_run.project_id),
+            dataset_s3_path=prefix_s3_path,
+            parameters=tool_parameters,
+            priority=db_analysis_run.priority,
+        )
+    except Exception as e:
+        crud.update_analysis_run_status(db, db_run=db_analysis_run, status=models.AnalysisStatus.FAILED, error_message=f"Failed to enqueue Celery task: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to submit analysis job to the processing queue."
+        )
+
+    # 5. Record where the run waits in the scheduler queue (None if it was dispatched at once)
+    crud.update_analysis_run_queue_position(db, db_run=db_analysis_run, queue_position=queue_position)
+
+    return db_analysis_run
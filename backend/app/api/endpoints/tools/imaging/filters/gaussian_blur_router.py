@@ -10,7 +10,8 @@ from sqlalchemy.orm import Session
 from app import crud, models, schemas
 from app.api.endpoints.core.project_router import get_current_active_user_placeholder
 from app.db.session import get_db
-from app.tasks.imaging_task import run_image_filter_analysis
+from app.services import scheduler  # Fair-share queue in front of Celery
+from app.tasks import dispatch  # Enqueue by task name; keeps worker-only libraries out of the API
 
 router = APIRouter()
 
@@ -23,6 +24,8 @@ class GaussianBlurSubmit(BaseModel):
     
     # Tool-specific parameters
     sigma: float = Field(..., gt=0, description="Sigma for the Gaussian kernel. Must be positive.")
+    backend: str = Field("auto", description="Processing backend: 'auto', 'native' (no JVM) or 'imagej'.")
+    output_format: Optional[str] = Field(None, description="Result encoding (e.g. 'png', 'webp', 'npy'); defaults to the tool's configured format.")
 
 @router.post("/submit", response_model=schemas.AnalysisRunRead)
 def submit_gaussian_blur_analysis(
@@ -43,7 +46,9 @@ def submit_gaussian_blur_analysis(
     # TODO: Add more robust authorization to check if user is member of dataset.project_id
 
     # 2. Prepare parameters for AnalysisRun and Celery task
-    tool_parameters = {"sigma": submission_data.sigma}
+    tool_parameters = {"sigma": submission_data.sigma, "backend": submission_data.backend}
+    if submission_data.output_format:
+        tool_parameters["output_format"] = submission_data.output_format
 
     # 3. Create AnalysisRun record in the database
     analysis_run_in = schemas.AnalysisRunCreate(
@@ -60,17 +65,23 @@ def submit_gaussian_blur_analysis(
 
     # 4. Enqueue the Celery task
     try:
-        run_image_filter_analysis.delay(
+        queue_position = scheduler.submit(
+            dispatch.IMAGE_FILTER_TASK,
             analysis_run_id=str(db_analysis_run.id),
+            project_id=str(db_analysis_run.project_id),
             dataset_s3_path=dataset.file_path_s3,
             parameters=tool_parameters,
+            priority=db_analysis_run.priority,
         )
     except Exception as e:
         # If enqueuing fails, mark the run as FAILED immediately.
-        crud.update_analysis_run_status(db, db_run=db_analysis_run, status=AnalysisStatus.FAILED, error_message=f"Failed to enqueue Celery task: {e}")
+        crud.update_analysis_run_status(db, db_run=db_analysis_run, status=models.AnalysisStatus.FAILED, error_message=f"Failed to enqueue Celery task: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to submit analysis job to the processing queue."
         )
 
+    # 5. Record where the run waits in the scheduler queue (None if it was dispatched at once)
+    crud.update_analysis_run_queue_position(db, db_run=db_analysis_run, queue_position=queue_position)
+
     return db_analysis_run
\ No newline at end of file
@@ -0,0 +1,86 @@
+# backend/app/api/endpoints/tools/imaging/pipeline_router.py
+
+import uuid
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.api.endpoints.core.project_router import get_current_active_user_placeholder
+from app.db.session import get_db
+from app.schemas.benchtop.biology.imaging.pipeline_schema import ImagingPipelineParams, PipelineStep
+from app.services import scheduler  # Fair-share queue in front of Celery
+from app.tasks import dispatch  # Enqueue by task name; keeps worker-only libraries out of the API
+
+router = APIRouter()
+
+# --- Pydantic model for submission ---
+class ImagingPipelineSubmit(BaseModel):
+    """Defines the request body for submitting a chained imaging pipeline."""
+    project_id: uuid.UUID
+    primary_input_dataset_id: uuid.UUID
+    analysis_name: Optional[str] = Field("Imaging Pipeline", description="A custom name for this analysis run.")
+
+    # Tool-specific parameters
+    steps: List[PipelineStep] = Field(..., description="Ops in execution order, e.g. [{'op': 'gaussian_blur', 'parameters': {'sigma': 2}}, {'op': 'auto_threshold', 'parameters': {'method': 'Otsu'}}].")
+    output_format: Optional[str] = Field(None, description="Encoding of the final output; defaults to the pipeline's configured format.")
+
+@router.post("/submit", response_model=schemas.AnalysisRunRead)
+def submit_imaging_pipeline_analysis(
+    *,
+    db: Session = Depends(get_db),
+    submission_data: ImagingPipelineSubmit,
+    current_user: models.User = Depends(get_current_active_user_placeholder),
+):
+    """
+    Submit an ordered chain of imaging ops to run on one image in a single job.
+    This creates an AnalysisRun record and enqueues a Celery task.
+    """
+    # 1. Validate input dataset exists
+    dataset = crud.get_dataset(db, dataset_id=submission_data.primary_input_dataset_id)
+    if not dataset:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Input dataset not found.")
+
+    # 2. Validate every step's parameters up front, so bad requests fail here
+    try:
+        pipeline_params = ImagingPipelineParams(steps=submission_data.steps, output_format=submission_data.output_format)
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    tool_parameters = pipeline_params.model_dump(exclude_none=True)
+
+    # 3. Create AnalysisRun record in the database
+    analysis_run_in = schemas.AnalysisRunCreate(
+        name=submission_data.analysis_name,
+        project_id=submission_data.project_id,
+        tool_id="benchmate_imaging_pipeline_v1", # From our YAML config
+        tool_version="1.0.0",
+        parameters=tool_parameters,
+        primary_input_dataset_id=submission_data.primary_input_dataset_id,
+    )
+    db_analysis_run = crud.create_analysis_run(
+        db=db, run_in=analysis_run_in, created_by_user_id=current_user.id
+    )
+
+    # 4. Enqueue the Celery task
+    try:
+        queue_position = scheduler.submit(
+            dispatch.IMAGE_PIPELINE_TASK,
+            analysis_run_id=str(db_analysis_run.id),
+            project_id=str(db_analysis_run.project_id),
+            dataset_s3_path=dataset.file_path_s3,
+            parameters=tool_parameters,
+            priority=db_analysis_run.priority,
+        )
+    except Exception as e:
+        crud.update_analysis_run_status(db, db_run=db_analysis_run, status=models.AnalysisStatus.FAILED, error_message=f"Failed to enqueue Celery task: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to submit analysis job to the processing queue."
+        )
+
+    # 5. Record where the run waits in the scheduler queue (None if it was dispatched at once)
+    crud.update_analysis_run_queue_position(db, db_run=db_analysis_run, queue_position=queue_position)
+
+    return db_analysis_run
@@ -10,7 +10,8 @@ from sqlalchemy.orm import Session
 from app import crud, models, schemas
 from app.api.endpoints.core.project_router import get_current_active_user_placeholder
 from app.db.session import get_db
-from app.tasks.imaging_task import run_image_segmentation_analysis
+from app.services import scheduler  # Fair-share queue in front of Celery
+from app.tasks import dispatch  # Enqueue by task name; keeps worker-only libraries out of the API
 
 router = APIRouter()
 
@@ -23,6 +24,8 @@ class AutoThresholdSubmit(BaseModel):
     
     # Tool-specific parameters
     method: str = Field(..., description="The thresholding algorithm to use (e.g., 'Otsu').")
+    backend: str = Field("auto", description="Processing backend: 'auto', 'native' (no JVM) or 'imagej'.")
+    output_format: Optional[str] = Field(None, description="Result encoding (e.g. 'png', 'webp', 'npy'); defaults to the tool's configured format.")
 
 @router.post("/submit", response_model=schemas.AnalysisRunRead)
 def submit_auto_threshold_analysis(
@@ -41,7 +44,9 @@ def submit_auto_threshold_analysis(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Input dataset not found.")
     
     # 2. Prepare parameters for AnalysisRun and Celery task
-    tool_parameters = {"method": submission_data.method}
+    tool_parameters = {"method": submission_data.method, "backend": submission_data.backend}
+    if submission_data.output_format:
+        tool_parameters["output_format"] = submission_data.output_format
 
     # 3. Create AnalysisRun record in the database
     analysis_run_in = schemas.AnalysisRunCreate(
@@ -58,10 +63,13 @@ def submit_auto_threshold_analysis(
 
     # 4. Enqueue the Celery task
     try:
-        run_image_segmentation_analysis.delay(
+        queue_position = scheduler.submit(
+            dispatch.IMAGE_SEGMENTATION_TASK,
             analysis_run_id=str(db_analysis_run.id),
+            project_id=str(db_analysis_run.project_id),
             dataset_s3_path=dataset.file_path_s3,
             parameters=tool_parameters,
+            priority=db_analysis_run.priority,
         )
     except Exception as e:
         crud.update_analysis_run_status(db, db_run=db_analysis_run, status=models.AnalysisStatus.FAILED, error_message=f"Failed to enqueue Celery task: {e}")
@@ -70,4 +78,7 @@ def submit_auto_threshold_analysis(
             detail="Failed to submit analysis job to the processing queue."
         )
 
+    # 5. Record where the run waits in the scheduler queue (None if it was dispatched at once)
+    crud.update_analysis_run_queue_position(db, db_run=db_analysis_run, queue_position=queue_position)
+
     return db_analysis_run
\ No newline at end of file
@@ -0,0 +1,124 @@
+# backend/app/api/endpoints/tools/sweep.py
+import itertools
+import uuid
+from typing import Any, Callable, Dict, List, Type
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.core.config import settings
+from app.services import scheduler  # Fair-share queue in front of Celery
+
+# Parameter sweeps for the tool routers. A sweep request is a tool's normal submission body
+# plus `sweep`, a map from parameter name to the values to try; every combination becomes
+# one analysis run. All runs are created in one transaction and handed to the scheduler as
+# ONE grouped task (see app.tasks.sweep) that loads the dataset once for the whole sweep.
+
+# Fields that identify the input or the run rather than tool parameters
+NON_SWEEPABLE_FIELDS = {"project_id", "primary_input_dataset_id", "analysis_name", "description", "sweep"}
+
+
+# --- Helper Functions ---
+def expand_sweep(submission_data: BaseModel, submit_model: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """
+    Expand a sweep request into one validated submission per parameter combination.
+    Returns [{"submission": <submit_model>, "varied": {name: value}}], in grid order.
+    """
+    grid: Dict[str, List[Any]] = submission_data.sweep
+    if not grid:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'sweep' is empty.")
+    for name, values in grid.items():
+        if name in NON_SWEEPABLE_FIELDS or name not in submit_model.model_fields:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"'{name}' is not a sweepable parameter.")
+        if not values:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"No values given for '{name}'.")
+
+    n_runs = 1
+    for values in grid.values():
+        n_runs *= len(values)
+    if n_runs > settings.SWEEP_MAX_RUNS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The sweep expands to {n_runs} runs; at most {settings.SWEEP_MAX_RUNS} are allowed."
+        )
+
+    base = submission_data.model_dump(exclude={"sweep"})
+    names = list(grid)
+    combinations = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        varied = dict(zip(names, values))
+        try:
+            combinations.append({"submission": submit_model(**{**base, **varied}), "varied": varied})
+        except ValidationError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    return combinations
+
+
+# --- Main Sweep Logic ---
+def submit_sweep(
+    db: Session,
+    *,
+    current_user: models.User,
+    combinations: List[Dict[str, Any]],
+    dataset: models.Dataset,
+    task_name: str,
+    tool_id: str,
+    tool_parameters: Callable[[Any], Dict[str, Any]],
+) -> List[models.AnalysisRun]:
+    """
+    Create one analysis run per combination and dispatch them as a single grouped task.
+    `tool_parameters(submission)` builds a run's task parameters, as the tool's /submit does.
+    Runs are batch priority and record the sweep's id in their parameters.
+    """
+    # 1. Build the runs; each is named after the values it varies
+    sweep_id = str(uuid.uuid4())
+    runs_parameters = [tool_parameters(combination["submission"]) for combination in combinations]
+    runs_in = []
+    for combination, run_parameters in zip(combinations, runs_parameters):
+        submission = combination["submission"]
+        varied = ", ".join(f"{name}={value}" for name, value in combination["varied"].items())
+        runs_in.append(schemas.AnalysisRunCreate(
+            name=f"{submission.analysis_name or tool_id} ({varied})",
+            description=getattr(submission, "description", None),
+            project_id=submission.project_id,
+            tool_id=tool_id,
+            tool_version="1.0.0",
+            parameters={**run_parameters, "sweep_id": sweep_id},
+            primary_input_dataset_id=submission.primary_input_dataset_id,
+            priority="batch", # Many runs from one request: queued behind interactive runs
+        ))
+
+    # 2. Create every AnalysisRun record in one transaction
+    try:
+        db_runs = crud.create_analysis_runs(db=db, runs_in=runs_in, created_by_user_id=current_user.id)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+
+    # 3. Enqueue one task for the whole sweep; the scheduler knows it by the sweep's id
+    try:
+        queue_position = scheduler.submit(
+            task_name,
+            analysis_run_id=sweep_id,
+            project_id=str(submission.project_id),
+            dataset_s3_path=dataset.file_path_s3,
+            parameters={"runs": [
+                {"analysis_run_id": str(db_run.id), "parameters": run_parameters}
+                for db_run, run_parameters in zip(db_runs, runs_parameters)
+            ]},
+            priority="batch",
+        )
+    except Exception as e:
+        for db_run in db_runs:
+            crud.update_analysis_run_status(
+                db=db, db_run=db_run, status=models.AnalysisStatus.FAILED,
+                error_message=f"Failed to enqueue Celery task: {str(e)}"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to enqueue analysis task: {str(e)}"
+        )
+
+    # 4. Record where the sweep waits in the scheduler queue (None if it was dispatched at once)
+    return crud.update_analysis_runs_queue_position(db, db_runs=db_runs, queue_position=queue_position)
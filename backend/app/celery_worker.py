@@ -2,6 +2,8 @@
 import os
 from celery import Celery
 
+from app.core.config import settings
+
 # --- Celery app initialization ---
 # This file now only defines and configures the Celery application instance.
 # The actual task logic is moved to the `app/tasks/` directory.
@@ -21,7 +23,10 @@ celery_app = Celery(
         "app.tasks.volcano_task",
         "app.tasks.pca_task",
         "app.tasks.heatmap_task",
-        "app.tasks.imaging_task"
+        "app.tasks.imaging_task",
+        "app.tasks.imaging_batch_task",
+        # Worker process lifecycle hooks (ImageJ gateway warm-up, health reporting)
+        "app.tasks.worker_lifecycle",
         # To add a new tool, you would just add
         # "app.tasks.***_task" to this list.
     ]
@@ -34,6 +39,17 @@ celery_app.conf.result_serializer = 'json'
 celery_app.conf.accept_content = ['json']
 celery_app.conf.timezone = 'UTC'
 celery_app.conf.enable_utc = True
+# Children start and warm a JVM in worker_process_init (app.tasks.worker_lifecycle), which
+# takes far longer than Celery's default 4s allowance before it considers a child dead.
+celery_app.conf.worker_proc_alive_timeout = float(os.getenv("CELERY_WORKER_PROC_ALIVE_TIMEOUT", "180"))
+
+# --- Queue routing ---
+# Each workload class (light omics, heavy omics, imaging) has its own queue, consumed by
+# its own worker pool (app.tasks.worker_pools). The router is given by import path so
+# it is only loaded on first send, after the task names in app.tasks.dispatch exist.
+celery_app.conf.task_routes = ("app.tasks.dispatch.route_task",)
+# Anything unrouted goes to the light pool rather than a queue no worker consumes
+celery_app.conf.task_default_queue = settings.CELERY_QUEUE_OMICS_LIGHT
 
 # The 'debug_task' is no longer here. If needed for testing, it could be
 # moved to its own file in `app/tasks/debug_task.py`. For now, we will
@@ -26,6 +26,71 @@ class Settings(BaseSettings):
         
     REDIS_HOSTNAME: str = "redis"
     REDIS_PORT: int = 6379
+    # Application state (worker health, run control) lives in its own DB, apart from the
+    # Celery broker (0) and result backend (1).
+    REDIS_STATE_DB: int = 2
+
+    # --- ImageJ / JVM Settings (used by Celery imaging workers) ---
+    IMAGEJ_JVM_MAX_HEAP: Optional[str] = None  # e.g. "6g"; passed to the JVM as -Xmx
+    IMAGEJ_JVM_OPTIONS: str = ""  # Extra space-separated JVM options, e.g. "-XX:+UseG1GC"
+    IMAGEJ_WARMUP_ON_WORKER_START: bool = True  # Start and warm the gateway in each worker child
+    # Comma-separated process roles ("api", "worker") that start the imaging runtime (JVM).
+    # The API never runs ImageJ ops, so by default only Celery workers pay for a JVM.
+    IMAGING_RUNTIME_ROLES: str = "worker"
+
+    # --- Celery queues and worker pools (one per workload class) ---
+    # Light omics (volcano) are short, memory-light jobs; heavy omics (PCA, heatmap
+    # clustering) hold whole matrices in memory; imaging children each carry a JVM.
+    CELERY_QUEUE_OMICS_LIGHT: str = "omics_light"
+    CELERY_QUEUE_OMICS_HEAVY: str = "omics_heavy"
+    CELERY_QUEUE_IMAGING: str = "imaging"
+
+    OMICS_LIGHT_WORKER_POOL: str = "prefork"
+    OMICS_LIGHT_WORKER_CONCURRENCY: int = 4
+    OMICS_LIGHT_WORKER_PREFETCH_MULTIPLIER: int = 4
+    OMICS_LIGHT_WORKER_MAX_MEMORY_PER_CHILD_KB: int = 1_000_000  # 0 disables recycling
+
+    OMICS_HEAVY_WORKER_POOL: str = "prefork"
+    OMICS_HEAVY_WORKER_CONCURRENCY: int = 2
+    OMICS_HEAVY_WORKER_PREFETCH_MULTIPLIER: int = 1
+    OMICS_HEAVY_WORKER_MAX_MEMORY_PER_CHILD_KB: int = 4_000_000
+
+    IMAGING_WORKER_POOL: str = "prefork"
+    IMAGING_WORKER_CONCURRENCY: int = 1
+    IMAGING_WORKER_PREFETCH_MULTIPLIER: int = 1
+    # Off by default: recycling a child throws away its warmed JVM
+    IMAGING_WORKER_MAX_MEMORY_PER_CHILD_KB: int = 0
+
+    # --- Analysis scheduler (app.services.scheduler) ---
+    # Runs wait in Redis and are handed to Celery fair-share between projects, so a
+    # project's large batch cannot starve other users' interactive runs.
+    SCHEDULER_ENABLED: bool = True
+    # Runs per workload class handed to Celery at once; keep it at or a little above
+    # that class's total worker concurrency so the broker queue stays short.
+    SCHEDULER_MAX_INFLIGHT_PER_WORKLOAD: int = 8
+    SCHEDULER_MAX_RUNNING_PER_PROJECT: int = 4
+    # A run that never reports back (worker killed) frees its slot after this long
+    SCHEDULER_INFLIGHT_TIMEOUT_SECONDS: int = 6 * 60 * 60
+
+    # --- Parameter sweeps ---
+    # Most parameter combinations one sweep submission may expand to
+    SWEEP_MAX_RUNS: int = 100
+
+    def imaging_runtime_enabled(self, role: str) -> bool:
+        return role in {r.strip().lower() for r in self.IMAGING_RUNTIME_ROLES.split(',') if r.strip()}
+
+    def worker_queue(self, workload: str) -> str:
+        return getattr(self, f"CELERY_QUEUE_{workload.upper()}")
+
+    def worker_pool(self, workload: str) -> dict:
+        prefix = f"{workload.upper()}_WORKER_"
+        return {
+            "queue": self.worker_queue(workload),
+            "pool": getattr(self, prefix + "POOL"),
+            "concurrency": getattr(self, prefix + "CONCURRENCY"),
+            "prefetch_multiplier": getattr(self, prefix + "PREFETCH_MULTIPLIER"),
+            "max_memory_per_child_kb": getattr(self, prefix + "MAX_MEMORY_PER_CHILD_KB"),
+        }
 
     model_config = SettingsConfigDict(
         env_file= BACKEND_ROOT_DIR / ".env",
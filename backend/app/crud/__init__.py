@@ -36,7 +36,10 @@ from .crud_analysis_run import (
     get_analysis_runs_by_project,
     get_analysis_runs_by_user,
     create_analysis_run,
+    create_analysis_runs,
     update_analysis_run_status,
+    update_analysis_run_queue_position,
+    update_analysis_runs_queue_position,
     update_analysis_run_outputs,
     update_analysis_run_internal,
     remove_analysis_run
@@ -95,6 +95,52 @@ def create_analysis_run(
     db.refresh(db_run)
     return db_run
 
+def create_analysis_runs(
+    db: Session, *, runs_in: List[AnalysisRunCreate], created_by_user_id: uuid.UUID
+) -> List[AnalysisRun]:
+    """
+    Create several analysis run records (e.g. a parameter sweep) in one transaction.
+    Projects, the creator and input datasets are checked once each, not once per run.
+    """
+    from app.models.dataset import Dataset # Local import to avoid circularity if needed
+
+    for project_id in {run_in.project_id for run_in in runs_in}:
+        if not db.query(Project.id).filter(Project.id == project_id).first():
+            raise ValueError(f"Project with id {project_id} not found.")
+
+    if not db.query(User.id).filter(User.id == created_by_user_id).first():
+        raise ValueError(f"User with id {created_by_user_id} not found.")
+
+    for dataset_id in {run_in.primary_input_dataset_id for run_in in runs_in if run_in.primary_input_dataset_id}:
+        if not db.query(Dataset.id).filter(Dataset.id == dataset_id).first():
+            raise ValueError(f"Primary input dataset with id {dataset_id} not found.")
+
+    queued_at = datetime.utcnow()
+    db_runs = [
+        AnalysisRun(
+            **run_in.model_dump(exclude_unset=True),
+            created_by_user_id=created_by_user_id,
+            status=AnalysisStatus.PENDING,
+            queued_at=queued_at
+        )
+        for run_in in runs_in
+    ]
+
+    db.add_all(db_runs)
+    db.commit()
+    for db_run in db_runs:
+        db.refresh(db_run)
+    return db_runs
+
+def _was_cancelled(db: Session, db_run: AnalysisRun) -> bool:
+    """
+    Re-read the stored status, locking the row until the caller commits. The cancel
+    endpoint writes CANCELLED from its own session, so a worker's copy of the run may be
+    stale; a CANCELLED run is never moved to another status.
+    """
+    db.refresh(db_run, attribute_names=["status"], with_for_update=True)
+    return db_run.status == AnalysisStatus.CANCELLED
+
 def update_analysis_run_status( # A specific update function for status
     db: Session,
     *,
@@ -105,8 +151,14 @@ def update_analysis_run_status( # A specific update function for status
 ) -> AnalysisRun:
     """
     Update the status of an analysis run. Also updates timestamps.
+    A run cancelled in the meantime stays CANCELLED.
     """
+    if status != AnalysisStatus.CANCELLED and _was_cancelled(db, db_run):
+        db.commit() # Release the row lock
+        return db_run
     db_run.status = status
+    if status != AnalysisStatus.PENDING:
+        db_run.queue_position = None # No longer waiting in the scheduler queue
     if status == AnalysisStatus.RUNNING and not db_run.started_at:
         db_run.started_at = datetime.utcnow()
     elif status in [AnalysisStatus.COMPLETED, AnalysisStatus.FAILED, AnalysisStatus.CANCELLED] and not db_run.completed_at:
@@ -123,6 +175,38 @@ def update_analysis_run_status( # A specific update function for status
     db.refresh(db_run)
     return db_run
 
+def update_analysis_run_queue_position(
+    db: Session,
+    *,
+    db_run: AnalysisRun,
+    queue_position: Optional[int]
+) -> AnalysisRun:
+    """
+    Record the run's estimated place in the scheduler queue (None once dispatched).
+    """
+    db_run.queue_position = queue_position
+    db.add(db_run)
+    db.commit()
+    db.refresh(db_run)
+    return db_run
+
+def update_analysis_runs_queue_position(
+    db: Session,
+    *,
+    db_runs: List[AnalysisRun],
+    queue_position: Optional[int]
+) -> List[AnalysisRun]:
+    """
+    Record one queue position for runs dispatched together (a sweep), in one commit.
+    """
+    for db_run in db_runs:
+        db_run.queue_position = queue_position
+    db.add_all(db_runs)
+    db.commit()
+    for db_run in db_runs:
+        db.refresh(db_run)
+    return db_runs
+
 def update_analysis_run_outputs( # A specific update function for outputs
     db: Session,
     *,
@@ -132,9 +216,10 @@ def update_analysis_run_outputs( # A specific update function for outputs
     """
     Update the output artifacts of a completed analysis run.
     """
+    cancelled = _was_cancelled(db, db_run)
     db_run.output_artifacts = output_artifacts
-    # Optionally update status if not already completed
-    if db_run.status != AnalysisStatus.COMPLETED and db_run.status != AnalysisStatus.FAILED:
+    # Optionally update status if not already completed (or cancelled)
+    if not cancelled and db_run.status != AnalysisStatus.COMPLETED and db_run.status != AnalysisStatus.FAILED:
          db_run.status = AnalysisStatus.COMPLETED # Assuming successful if outputs are set
          if not db_run.completed_at:
              db_run.completed_at = datetime.utcnow()
@@ -153,18 +238,25 @@ def update_analysis_run_internal( # More generic internal update
 ) -> AnalysisRun:
     """
     Generic update for an analysis run by internal processes (e.g., Celery worker).
+    A run cancelled in the meantime keeps its CANCELLED status and message; the other
+    fields (e.g. stage timings) are still recorded.
     """
     if isinstance(run_in, dict):
         update_data = run_in
     else:
         update_data = run_in.model_dump(exclude_unset=True)
 
+    if update_data.get("status", AnalysisStatus.CANCELLED) != AnalysisStatus.CANCELLED and _was_cancelled(db, db_run):
+        update_data = {k: v for k, v in update_data.items() if k not in ("status", "error_message")}
+
     for field, value in update_data.items():
         setattr(db_run, field, value)
 
     # Handle timestamp updates based on status changes if status is in update_data
     if "status" in update_data:
         new_status = update_data["status"]
+        if new_status != AnalysisStatus.PENDING:
+            db_run.queue_position = None
         if new_status == AnalysisStatus.RUNNING and not db_run.started_at:
             db_run.started_at = datetime.utcnow()
         elif new_status in [AnalysisStatus.COMPLETED, AnalysisStatus.FAILED, AnalysisStatus.CANCELLED] and not db_run.completed_at:
@@ -3,7 +3,7 @@ import uuid
 from datetime import datetime
 from typing import TYPE_CHECKING, Optional, Dict, Any, List
 
-from sqlalchemy import String, DateTime, func, ForeignKey, Text, JSON, Enum as SAEnum
+from sqlalchemy import String, DateTime, Integer, func, ForeignKey, Text, JSON, Enum as SAEnum
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 import enum # For Python Enum
@@ -47,6 +47,14 @@ class AnalysisRun(Base):
         index=True
     )
 
+    # Scheduling (see app.services.scheduler): 'interactive' runs are dispatched before
+    # 'batch' runs. queue_position is the run's estimated place in the scheduler queue
+    # while it waits, and None once it has been handed to a worker.
+    priority: Mapped[str] = mapped_column(
+        String(20), default="interactive", server_default="interactive", nullable=False
+    )
+    queue_position: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
     # Input Datasets (Many-to-Many relationship via an association table)
     # We'll define the association table 'analysis_input_datasets' later if needed for rich M2M.
     # For a simpler start, if an analysis run has one primary input dataset:
@@ -26,7 +26,9 @@ from .analysis_run_schema import (
     AnalysisRunCreate,
     AnalysisRunUpdateInternal,
     AnalysisRunUserUpdate,
-    AnalysisRunRead
+    AnalysisRunRead,
+    AnalysisRunStageTiming,
+    AnalysisRunProgress
 )
 from app.models.analysis_run import AnalysisStatus # to expose Enum easily
 
@@ -29,6 +29,7 @@ class AnalysisRunCreate(AnalysisRunBase):
     project_id: uuid.UUID
     primary_input_dataset_id: Optional[uuid.UUID] = None # Or a list if supporting multiple
     # parameters will be passed, specific to the tool
+    priority: str = Field("interactive", pattern="^(interactive|batch)$") # Scheduler priority
 
     # Name can be auto-generated or user-provided
     name: Optional[str] = Field(None, max_length=255)
@@ -69,6 +70,9 @@ class AnalysisRunRead(AnalysisRunBase):
     primary_input_dataset_id: Optional[uuid.UUID] = None
     # primary_input_dataset: Optional[DatasetReadMinimal] = None # Nested info
 
+    priority: str = "interactive"
+    queue_position: Optional[int] = None # Estimated place in the scheduler queue while pending
+
     output_artifacts: Optional[Dict[str, Any]] = None
     run_log: Optional[str] = None # Might return a snippet or URL to full log
     error_message: Optional[str] = None
@@ -80,4 +84,23 @@ class AnalysisRunRead(AnalysisRunBase):
     updated_at: datetime # Record update time
 
     # creator: Optional[UserRead] = None # Nested creator info
-    # project_name: Optional[str] = None # Could be denormalized or joined
\ No newline at end of file
+    # project_name: Optional[str] = None # Could be denormalized or joined
+
+# --- AnalysisRun Progress Schema ---
+# Live progress of a run, as published by its worker (see app.services.progress)
+class AnalysisRunStageTiming(BaseModel):
+    stage: str
+    started_seconds: float # Offset from the start of the task to the stage's first entry
+    seconds: Optional[float] = None # Total over all entries; None until the first entry ends
+    entries: int = 1 # Times the stage was entered (e.g. steps repeated for each plane)
+
+
+class AnalysisRunProgress(BaseModel):
+    analysis_run_id: uuid.UUID
+    state: str # "pending", "running", or the final status once the task has finished
+    stage: Optional[str] = None
+    done: Optional[int] = None
+    total: Optional[int] = None
+    fraction: Optional[float] = None
+    elapsed_seconds: Optional[float] = None
+    stages: List[AnalysisRunStageTiming] = []
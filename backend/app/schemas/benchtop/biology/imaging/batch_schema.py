@@ -0,0 +1,48 @@
+# backend/app/schemas/benchtop/biology/imaging/batch_schema.py
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.schemas.benchtop.biology.imaging.filters.gaussian_blur_schema import GaussianBlurParams
+from app.schemas.benchtop.biology.imaging.segmentation.auto_threshold_schema import AutoThresholdParams
+
+# Tools that can run in batch mode, with the schema validating their parameters.
+BATCH_TOOL_PARAMS = {
+    "gaussian_blur": GaussianBlurParams,
+    "auto_threshold": AutoThresholdParams,
+}
+
+# File types picked up when a batch is given as an S3 prefix.
+BATCH_IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+
+
+class ImagingBatchInput(BaseModel):
+    """One image of a batch."""
+    s3_path: str = Field(..., description="s3://bucket/key of the input image.")
+    dataset_id: Optional[str] = Field(None, description="Dataset the image belongs to, if it was given by id.")
+
+
+class ImagingBatchParams(BaseModel):
+    """
+    Pydantic schema for an imaging batch run: one tool with one set of parameters,
+    applied to every input image.
+    """
+    tool: str = Field(..., description=f"Tool applied to every image: one of {list(BATCH_TOOL_PARAMS)}.")
+    tool_parameters: Dict[str, Any] = Field(default_factory=dict, description="Parameters for the tool.")
+    inputs: List[ImagingBatchInput] = Field(default_factory=list, description="Images to process.")
+
+    @field_validator('tool')
+    @classmethod
+    def validate_tool(cls, v: str) -> str:
+        """Validate that the tool supports batch mode."""
+        if v not in BATCH_TOOL_PARAMS:
+            raise ValueError(f"Invalid tool '{v}'. Must be one of {list(BATCH_TOOL_PARAMS)}")
+        return v
+
+    def tool_params(self):
+        """The tool's own validated parameter object (e.g. GaussianBlurParams)."""
+        return BATCH_TOOL_PARAMS[self.tool](**self.tool_parameters)
+
+    class Config:
+        from_attributes = True
@@ -1,6 +1,14 @@
 # backend/app/schemas/benchtop/biology/imaging/filters/gaussian_blur_schema.py
 
-from pydantic import BaseModel, Field
+from typing import Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+# Kept in sync with native_ops.VALID_BACKENDS.
+VALID_BACKENDS = ["auto", "imagej", "native"]
+
+# Encoders from encoders.OUTPUT_FORMATS that suit a continuous-tone image ('mask_1bit' does not).
+VALID_OUTPUT_FORMATS = ["png", "webp", "npy"]
 
 class GaussianBlurParams(BaseModel):
     """
@@ -8,6 +16,24 @@ class GaussianBlurParams(BaseModel):
     This defines the data contract for the tool's processor.
     """
     sigma: float = Field(..., description="Sigma value for the Gaussian kernel.", gt=0)
+    backend: str = Field("auto", description="Where to run the filter: 'native' (NumPy/SciPy), 'imagej', or 'auto'.")
+    output_format: Optional[str] = Field(None, description="Encoding of the result; defaults to the tool config's output.format.")
+
+    @field_validator('backend')
+    @classmethod
+    def validate_backend(cls, v: str) -> str:
+        """Validate that the provided backend is one of the supported options."""
+        if v not in VALID_BACKENDS:
+            raise ValueError(f"Invalid backend '{v}'. Must be one of {VALID_BACKENDS}")
+        return v
+
+    @field_validator('output_format')
+    @classmethod
+    def validate_output_format(cls, v: Optional[str]) -> Optional[str]:
+        """Validate that the provided output format is one of the supported encoders."""
+        if v is not None and v not in VALID_OUTPUT_FORMATS:
+            raise ValueError(f"Invalid output format '{v}'. Must be one of {VALID_OUTPUT_FORMATS}")
+        return v
 
     class Config:
         # Pydantic v1 style config for compatibility if needed, can be model_config in v2
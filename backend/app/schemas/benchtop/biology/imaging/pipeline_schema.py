@@ -0,0 +1,75 @@
+# backend/app/schemas/benchtop/biology/imaging/pipeline_schema.py
+
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.schemas.benchtop.biology.imaging.filters.gaussian_blur_schema import GaussianBlurParams
+from app.schemas.benchtop.biology.imaging.segmentation.auto_threshold_schema import (
+    AutoThresholdParams,
+    VALID_OUTPUT_FORMATS,
+)
+
+# Ops that can appear in a pipeline, with the schema validating their parameters.
+# Kept in sync with pipeline.PIPELINE_OPS on the worker side.
+PIPELINE_OP_PARAMS = {
+    "gaussian_blur": GaussianBlurParams,
+    "auto_threshold": AutoThresholdParams,
+}
+
+MAX_PIPELINE_STEPS = 20
+
+
+class PipelineStep(BaseModel):
+    """One op of a pipeline and its parameters."""
+    op: str = Field(..., description=f"Operation: one of {list(PIPELINE_OP_PARAMS)}.")
+    parameters: Dict[str, Any] = Field(default_factory=dict, description="Parameters for the op, e.g. {'sigma': 2.0}.")
+    save_output: bool = Field(False, description="Also upload this step's output as an intermediate result.")
+
+    @field_validator('op')
+    @classmethod
+    def validate_op(cls, v: str) -> str:
+        """Validate that the op is available in pipelines."""
+        if v not in PIPELINE_OP_PARAMS:
+            raise ValueError(f"Invalid op '{v}'. Must be one of {list(PIPELINE_OP_PARAMS)}")
+        return v
+
+    def op_params(self):
+        """The op's own validated parameter object (e.g. GaussianBlurParams)."""
+        return PIPELINE_OP_PARAMS[self.op](**self.parameters)
+
+    class Config:
+        from_attributes = True
+
+
+class ImagingPipelineParams(BaseModel):
+    """
+    Pydantic schema for an imaging pipeline: ordered ops run back to back on the
+    same in-memory image within one task.
+    """
+    steps: List[PipelineStep] = Field(..., description="Ops in execution order.")
+    output_format: Optional[str] = Field(None, description="Encoding of the final output; defaults to the pipeline config's output.format.")
+
+    @field_validator('steps')
+    @classmethod
+    def validate_steps(cls, v: List[PipelineStep]) -> List[PipelineStep]:
+        """Validate the number of steps and every step's own parameters."""
+        if not 1 <= len(v) <= MAX_PIPELINE_STEPS:
+            raise ValueError(f"A pipeline needs between 1 and {MAX_PIPELINE_STEPS} steps, got {len(v)}.")
+        for index, step in enumerate(v):
+            try:
+                step.op_params()
+            except ValueError as e:
+                raise ValueError(f"Step {index} ({step.op}): {e}")
+        return v
+
+    @field_validator('output_format')
+    @classmethod
+    def validate_output_format(cls, v: Optional[str]) -> Optional[str]:
+        """Validate that the provided output format is one of the supported encoders."""
+        if v is not None and v not in VALID_OUTPUT_FORMATS:
+            raise ValueError(f"Invalid output format '{v}'. Must be one of {VALID_OUTPUT_FORMATS}")
+        return v
+
+    class Config:
+        from_attributes = True
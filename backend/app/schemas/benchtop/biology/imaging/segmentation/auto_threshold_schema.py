@@ -1,5 +1,7 @@
 # backend/app/schemas/benchtop/biology/imaging/segmentation/auto_threshold_schema.py
 
+from typing import Optional
+
 from pydantic import BaseModel, Field, field_validator
 
 # This list should be kept in sync with the corresponding YAML config file
@@ -10,12 +12,20 @@ VALID_METHODS = [
     "RenyiEntropy", "Shanbhag"
 ]
 
+# Kept in sync with native_ops.VALID_BACKENDS.
+VALID_BACKENDS = ["auto", "imagej", "native"]
+
+# Kept in sync with encoders.OUTPUT_FORMATS.
+VALID_OUTPUT_FORMATS = ["png", "webp", "mask_1bit", "npy"]
+
 class AutoThresholdParams(BaseModel):
     """
     Pydantic schema for Auto Threshold parameters.
     This defines the data contract for the tool's processor.
     """
     method: str = Field(..., description="The automatic thresholding algorithm to use.")
+    backend: str = Field("auto", description="Where to run the threshold: 'native' (NumPy/SciPy), 'imagej', or 'auto'.")
+    output_format: Optional[str] = Field(None, description="Encoding of the mask; defaults to the tool config's output.format.")
 
     @field_validator('method')
     @classmethod
@@ -25,5 +35,21 @@ class AutoThresholdParams(BaseModel):
             raise ValueError(f"Invalid threshold method '{v}'. Must be one of {VALID_METHODS}")
         return v
 
+    @field_validator('backend')
+    @classmethod
+    def validate_backend(cls, v: str) -> str:
+        """Validate that the provided backend is one of the supported options."""
+        if v not in VALID_BACKENDS:
+            raise ValueError(f"Invalid backend '{v}'. Must be one of {VALID_BACKENDS}")
+        return v
+
+    @field_validator('output_format')
+    @classmethod
+    def validate_output_format(cls, v: Optional[str]) -> Optional[str]:
+        """Validate that the provided output format is one of the supported encoders."""
+        if v is not None and v not in VALID_OUTPUT_FORMATS:
+            raise ValueError(f"Invalid output format '{v}'. Must be one of {VALID_OUTPUT_FORMATS}")
+        return v
+
     class Config:
         from_attributes = True
\ No newline at end of file
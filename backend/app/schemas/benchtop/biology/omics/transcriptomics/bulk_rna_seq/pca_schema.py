@@ -1,7 +1,11 @@
 # backend/app/schemas/benchtop/biology/omics/transcriptomics/bulk_rna_seq/pca_schema.py
 
 from typing import Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+# Kept in sync with pca_engine.VALID_SVD_SOLVERS; duplicated here so the schema
+# does not have to import the scientific stack.
+VALID_SVD_SOLVERS = ["auto", "full", "randomized", "arpack", "incremental"]
 
 class PCAParams(BaseModel):
     """
@@ -14,6 +18,17 @@ class PCAParams(BaseModel):
     n_components: int = Field(10, description="Number of principal components to compute.")
     pc_x_axis: int = Field(1, description="Principal component for the X-axis.")
     pc_y_axis: int = Field(2, description="Principal component for the Y-axis.")
+    remove_constant_genes: bool = Field(True, description="Drop all-zero and constant genes before PCA.")
+    top_variable_genes: Optional[int] = Field(None, gt=0, description="If set, keep only this many most variable genes.")
+    svd_solver: str = Field("auto", description="SVD solver: 'auto', 'full', 'randomized', 'arpack' or 'incremental'.")
+
+    @field_validator('svd_solver')
+    @classmethod
+    def validate_svd_solver(cls, v: str) -> str:
+        """Validate that the provided solver is one the PCA engine supports."""
+        if v not in VALID_SVD_SOLVERS:
+            raise ValueError(f"Invalid SVD solver '{v}'. Must be one of {VALID_SVD_SOLVERS}")
+        return v
 
     class Config:
         # Pydantic v1 style config for compatibility if needed, can be model_config in v2
@@ -1,6 +1,6 @@
 # app/schemas/benchtop/biology/omics/transcriptomics/bulk_rna_seq/volcano.py
 
-from typing import Optional, Dict
+from typing import List, Literal, Optional, Dict
 from pydantic import BaseModel, Field
 
 from .tool_base import ToolParams  # import your common base class
@@ -47,6 +47,35 @@ class VolcanoParams(ToolParams):
         ge=0,
         description="Number of most significant genes to label on the plot.",
     )
+    multi_contrast: bool = Field(
+        default=False,
+        description="Treat the table as several contrasts side by side "
+                    "('<contrast>_logFC' / '<contrast>_PValue' column pairs) and "
+                    "return per-contrast summaries and their overlap.",
+    )
+    contrasts: Optional[List[str]] = Field(
+        default=None,
+        description="Contrasts to compare in multi-contrast mode; all found by default.",
+    )
+    render_mode: Literal["auto", "points", "density"] = Field(
+        default="auto",
+        description="'points' sends every gene; 'density' bins neutral genes into a "
+                    "2D grid and sends only significant genes as points; 'auto' "
+                    "switches to density for large tables.",
+    )
+    density_bins: Optional[int] = Field(
+        default=None,
+        ge=10,
+        le=1000,
+        description="Grid resolution (bins per axis) in density mode; "
+                    "defaults to the tool config.",
+    )
+    streaming: Optional[bool] = Field(
+        default=None,
+        description="Read the table in chunks instead of loading it (delimited text "
+                    "files only; results use density mode). By default tables larger "
+                    "than the tool config's streaming threshold are streamed.",
+    )
     color_scheme: Optional[Dict[str, str]] = Field(
         default=None,
         description="Custom hex colours for {'up', 'down', 'neutral'} points.",
@@ -1,9 +1,12 @@
 # backend/app/services/imagej_service.py
 
-import imagej
 import logging
-import scyjava
-from typing import Optional
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -13,58 +16,118 @@ class ImageJService:
     A singleton service to manage the ImageJ gateway lifecycle.
     Ensures that the JVM is started only once.
     This is crucial for performance in a server environment.
+
+    A process can host exactly one JVM, so each Celery prefork child owns one gateway:
+    the worker's --concurrency is the size of the gateway pool. Children start and warm
+    their gateway at worker_process_init (see app.tasks.worker_lifecycle).
     """
     _gateway = None
     _initialized = False
+    _warmed_up = False
+    _init_seconds: Optional[float] = None
+    _warmup_seconds: Optional[float] = None
+    _error: Optional[str] = None
+    _lock = threading.Lock()
 
     def __init__(self):
         # This constructor should not be called directly by users.
         # The singleton pattern is managed by the instance() class method.
         raise RuntimeError("Call instance() to get the ImageJ gateway.")
 
+    @staticmethod
+    def _configure_jvm():
+        """
+        Apply JVM options from settings. This must be done BEFORE imagej.init() is called,
+        since the JVM cannot be reconfigured once it has started.
+        """
+        import scyjava
+        if settings.IMAGEJ_JVM_MAX_HEAP:
+            scyjava.config.add_option(f"-Xmx{settings.IMAGEJ_JVM_MAX_HEAP}")
+        for option in settings.IMAGEJ_JVM_OPTIONS.split():
+            scyjava.config.add_option(option)
+
     @classmethod
     def instance(cls):
         """
         Returns the singleton instance of the ImageJ gateway.
         Initializes the gateway on the first call.
 
-        This method is thread-safe in Python's GIL context for our application's
-        startup and typical Celery worker model.
+        Initialization is guarded by a lock so that threads sharing a process
+        never race to start a second JVM.
         """
-        if not cls._initialized:
-            logger.info("Initializing ImageJ gateway for the first time...")
-            try:
-                # For a server environment, we might need to allocate more memory.
-                # This must be done BEFORE imagej.init() is called.
-                # Example: scyjava.config.add_option('-Xmx6g') # 6 gigabytes
-                # For now, we use defaults.
-
-                # Initialize in headless mode. PyImageJ will download the necessary
-                # ImageJ2 components on the first run if not found.
-                # We can later configure this to point to a specific local Fiji app
-                # directory if we need to bundle specific plugins.
-                cls._gateway = imagej.init(mode='headless')
-                cls._initialized = True
-                logger.info(f"ImageJ gateway initialized successfully. Version: {cls._gateway.getVersion()}")
-            except Exception as e:
-                logger.error(f"Failed to initialize ImageJ gateway: {e}", exc_info=True)
-                # This is a critical failure. The application cannot proceed with
-                # imaging tasks. Re-raising allows the calling process (e.g., app startup)
-                # to know about the failure.
-                raise e
+        if cls._initialized:
+            return cls._gateway
+        with cls._lock:
+            if not cls._initialized:
+                logger.info("Initializing ImageJ gateway for the first time...")
+                try:
+                    # Imported here so that importing this module (e.g. from the API process)
+                    # never loads pyimagej/JPype; only processes that use the gateway do.
+                    import imagej
+                    cls._configure_jvm()
+                    started = time.perf_counter()
+                    # Initialize in headless mode. PyImageJ will download the necessary
+                    # ImageJ2 components on the first run if not found.
+                    # We can later configure this to point to a specific local Fiji app
+                    # directory if we need to bundle specific plugins.
+                    cls._gateway = imagej.init(mode='headless')
+                    cls._init_seconds = time.perf_counter() - started
+                    cls._initialized = True
+                    cls._error = None
+                    logger.info(f"ImageJ gateway initialized successfully in {cls._init_seconds:.1f}s. "
+                                f"Version: {cls._gateway.getVersion()}")
+                except Exception as e:
+                    cls._error = str(e)
+                    logger.error(f"Failed to initialize ImageJ gateway: {e}", exc_info=True)
+                    # This is a critical failure. The application cannot proceed with
+                    # imaging tasks. Re-raising allows the calling process (e.g., worker
+                    # startup) to know about the failure.
+                    raise e
         return cls._gateway
 
+    @classmethod
+    def warm_up(cls):
+        """
+        Run each op the imaging tools use once on a tiny image, so class loading, the
+        NumPy <-> Java conversions and the JIT are paid here rather than by a user's run.
+        """
+        if cls._warmed_up:
+            return
+        ij = cls.instance()
+        started = time.perf_counter()
+        sample = (np.arange(64 * 64) % 251).astype(np.uint8).reshape(64, 64)
+        dataset = ij.py.to_dataset(sample)
+        ij.py.from_java(ij.op().filter().gauss(dataset, 1.0))
+        ij.py.from_java(ij.op().threshold().otsu(dataset))
+        cls._warmup_seconds = time.perf_counter() - started
+        cls._warmed_up = True
+        logger.info(f"ImageJ gateway warmed up in {cls._warmup_seconds:.2f}s.")
+
+    @classmethod
+    def status(cls) -> Dict[str, Any]:
+        """Readiness of this process's gateway, for worker health reporting."""
+        return {
+            "initialized": cls._initialized,
+            "warmed_up": cls._warmed_up,
+            "version": str(cls._gateway.getVersion()) if cls._initialized else None,
+            "init_seconds": cls._init_seconds,
+            "warmup_seconds": cls._warmup_seconds,
+            "jvm_max_heap": settings.IMAGEJ_JVM_MAX_HEAP,
+            "error": cls._error,
+        }
+
 # This provides a clean, callable object for other modules to use.
 # e.g., from app.services.imagej_service import imagej_service
 # gateway = imagej_service.instance()
 imagej_service = ImageJService
 
-def init_imagej_gateway():
+def init_imagej_gateway(warm_up: bool = False):
     """
-    A startup function that can be called from main.py's startup event
-    to eagerly initialize the ImageJ gateway. This allows us to catch
-    initialization errors when the application starts, rather than on the
-    first user request.
+    A startup function that eagerly initializes (and optionally warms) the ImageJ
+    gateway. This allows us to catch initialization errors when the process starts,
+    rather than on the first user request.
     """
     logger.info("Triggering eager initialization of ImageJ gateway...")
-    ImageJService.instance()
\ No newline at end of file
+    ImageJService.instance()
+    if warm_up:
+        ImageJService.warm_up()
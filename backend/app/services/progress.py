@@ -0,0 +1,104 @@
+# backend/app/services/progress.py
+
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.redis_service import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Live progress of running analyses. Tasks report through the checkpoint callback they
+# hand their processor (see app.services.run_control); the reporter keeps the current
+# stage and a per-stage timing trace in memory and publishes a snapshot to Redis, never
+# to the database, at most every PUBLISH_INTERVAL_SECONDS (stages seen for the first time
+# always go out). A stage that is entered again (e.g. per-plane steps of a stack) adds
+# to its existing entry, so the trace grows with the number of distinct stages only.
+# The final trace is stored with the run's output artifacts as `stage_timings`.
+
+PROGRESS_KEY_PREFIX = "benchmate:progress:"
+PROGRESS_TTL_SECONDS = 7 * 24 * 60 * 60
+PUBLISH_INTERVAL_SECONDS = 0.5
+
+
+def _progress_key(analysis_run_id: str) -> str:
+    return f"{PROGRESS_KEY_PREFIX}{analysis_run_id}"
+
+
+class ProgressReporter:
+    """
+    Progress and stage timings of one analysis run.
+    Call `update(stage, done, total)` at stage boundaries (done/total omitted) and inside
+    long loops; call `finish(state)` once at the end to get the timing trace.
+    """
+
+    def __init__(self, analysis_run_id: str, min_interval: float = PUBLISH_INTERVAL_SECONDS):
+        self.analysis_run_id = analysis_run_id
+        self.min_interval = min_interval
+        self.started = time.monotonic()
+        # {"stage", "started_seconds" (first entry), "seconds" (total), "entries"}, in first-entry order
+        self.stages: List[Dict[str, Any]] = []
+        self.done: Optional[int] = None
+        self.total: Optional[int] = None
+        self._published_at = float("-inf")
+        self._stage: Optional[str] = None
+        self._current: Optional[Dict[str, Any]] = None
+        self._entered_at = 0.0
+
+    def update(self, stage: str, done: Optional[int] = None, total: Optional[int] = None) -> None:
+        now = time.monotonic()
+        first_seen = False
+        if self._current is None or self._current["stage"] != stage:
+            self._close_stage(now)
+            entry = next((entry for entry in self.stages if entry["stage"] == stage), None)
+            if entry is None:
+                first_seen = True
+                entry = {"stage": stage, "started_seconds": round(now - self.started, 4), "seconds": None, "entries": 0}
+                self.stages.append(entry)
+            entry["entries"] += 1
+            self._stage, self._current, self._entered_at = stage, entry, now
+        self.done, self.total = done, total
+        if first_seen or now - self._published_at >= self.min_interval:
+            self._publish(self.snapshot(now))
+            self._published_at = now
+
+    def snapshot(self, now: Optional[float] = None, state: str = "running") -> Dict[str, Any]:
+        now = time.monotonic() if now is None else now
+        fraction = round(self.done / self.total, 4) if self.done is not None and self.total else None
+        return {
+            "state": state,
+            "stage": self._stage,
+            "done": self.done,
+            "total": self.total,
+            "fraction": fraction,
+            "elapsed_seconds": round(now - self.started, 3),
+            "stages": [dict(stage) for stage in self.stages],
+        }
+
+    def finish(self, state: str) -> List[Dict[str, Any]]:
+        """Close the last stage, publish the final snapshot and return the stage timings."""
+        now = time.monotonic()
+        self._close_stage(now)
+        self.done = self.total = None
+        final = self.snapshot(now, state=state)
+        self._publish(final)
+        return final["stages"]
+
+    def _close_stage(self, now: float) -> None:
+        if self._current is not None:
+            self._current["seconds"] = round((self._current["seconds"] or 0.0) + now - self._entered_at, 4)
+            self._current = None
+
+    def _publish(self, snapshot: Dict[str, Any]) -> None:
+        # Best-effort: progress must never fail a run
+        try:
+            get_redis_client().set(_progress_key(self.analysis_run_id), json.dumps(snapshot), ex=PROGRESS_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Could not publish progress of run {self.analysis_run_id}: {e}")
+
+
+def get_progress(analysis_run_id: str) -> Optional[Dict[str, Any]]:
+    """The last published snapshot of a run, or None if it has not reported any."""
+    raw = get_redis_client().get(_progress_key(analysis_run_id))
+    return json.loads(raw) if raw else None
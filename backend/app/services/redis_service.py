@@ -0,0 +1,26 @@
+# backend/app/services/redis_service.py
+
+import logging
+from functools import lru_cache
+
+import redis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_redis_client() -> redis.Redis:
+    """
+    Returns the shared Redis client for application state (worker health, run control).
+    The connection pool is created lazily and re-created automatically after a fork,
+    so this is safe to call from Celery prefork children.
+    """
+    logger.info(f"Connecting to Redis state DB {settings.REDIS_STATE_DB} at {settings.REDIS_HOSTNAME}:{settings.REDIS_PORT}")
+    return redis.Redis(
+        host=settings.REDIS_HOSTNAME,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_STATE_DB,
+        decode_responses=True,
+    )
@@ -0,0 +1,86 @@
+# backend/app/services/run_control.py
+
+import logging
+import time
+from typing import Callable, Optional
+
+from app.services.progress import ProgressReporter
+from app.services.redis_service import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Cooperative cancellation of analysis runs. The cancel endpoint sets a flag in Redis;
+# tasks pass `checkpoint(analysis_run_id)` to their processor, which calls it at the
+# start of every stage (and inside long loops), and the first call after the flag is
+# set raises RunCancelled. The task then records the run as CANCELLED and the worker
+# is free for the next run. The same calls drive progress reporting (app.services.progress).
+
+CANCEL_KEY_PREFIX = "benchmate:run_control:cancel:"
+# Outlives any run; the flag is only read while the run is queued or running
+CANCEL_FLAG_TTL_SECONDS = 7 * 24 * 60 * 60
+# Inside a stage (loop progress), the flag is read at most this often
+CANCEL_POLL_SECONDS = 1.0
+
+
+class RunCancelled(Exception):
+    """Raised at a checkpoint of a run whose cancellation was requested."""
+
+
+def _cancel_key(analysis_run_id: str) -> str:
+    return f"{CANCEL_KEY_PREFIX}{analysis_run_id}"
+
+
+def request_cancel(analysis_run_id: str) -> None:
+    get_redis_client().set(_cancel_key(analysis_run_id), "1", ex=CANCEL_FLAG_TTL_SECONDS)
+
+
+def is_cancel_requested(analysis_run_id: str) -> bool:
+    """Never raises: if Redis is unreachable the run simply keeps going."""
+    try:
+        return bool(get_redis_client().exists(_cancel_key(analysis_run_id)))
+    except Exception as e:
+        logger.warning(f"Could not read the cancel flag of run {analysis_run_id}: {e}")
+        return False
+
+
+def clear(analysis_run_id: str) -> None:
+    try:
+        get_redis_client().delete(_cancel_key(analysis_run_id))
+    except Exception as e:
+        logger.warning(f"Could not clear the cancel flag of run {analysis_run_id}: {e}")
+
+
+def finish(analysis_run_id: str) -> bool:
+    """
+    Call once a run has its final status, before recording it. Returns whether its
+    cancellation was requested, so a run that got past its last checkpoint (e.g. while
+    uploading) is still recorded as cancelled, and clears the flag.
+    """
+    cancelled = is_cancel_requested(analysis_run_id)
+    clear(analysis_run_id)
+    return cancelled
+
+
+def checkpoint(analysis_run_id: Optional[str],
+               progress: Optional[ProgressReporter] = None) -> Callable[..., None]:
+    """
+    Build the callback a processor calls as it works: checkpoint("clustering") when a
+    stage starts, checkpoint("processing_images", done, total) inside long loops.
+    Each call is passed on to `progress`, if given, and raises RunCancelled once the
+    run's cancellation has been requested.
+    """
+    last_check = {"stage": None, "at": float("-inf")}
+
+    def _check(stage: str, done: Optional[int] = None, total: Optional[int] = None) -> None:
+        if progress is not None:
+            progress.update(stage, done, total)
+        if not analysis_run_id:
+            return
+        # Every new stage reads the flag; repeated calls within a stage are throttled
+        now = time.monotonic()
+        if stage == last_check["stage"] and now - last_check["at"] < CANCEL_POLL_SECONDS:
+            return
+        last_check["stage"], last_check["at"] = stage, now
+        if is_cancel_requested(analysis_run_id):
+            raise RunCancelled(f"Run {analysis_run_id} was cancelled (at stage '{stage}').")
+    return _check
@@ -4,7 +4,7 @@ from botocore.client import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 from fastapi import UploadFile, HTTPException, status
 import logging
-from typing import Optional, BinaryIO
+from typing import Optional, BinaryIO, List, Tuple
 import io
 
 from app.core.config import settings
@@ -137,6 +137,91 @@ class S3Service:
             return None
 
 
+    def download_file_to_path(self, bucket_name: str, object_key: str, file_path: str) -> bool:
+        """
+        Download an object straight to a local file, for inputs too large to hold in
+        memory (download_file_to_buffer keeps the whole object in RAM).
+        """
+        if not self.s3_client_internal:
+            logger.error("S3 internal client not initialized. Cannot download file.")
+            return False
+        try:
+            self.s3_client_internal.download_file(bucket_name, object_key, file_path)
+            logger.info(f"File '{object_key}' from bucket '{bucket_name}' downloaded to '{file_path}'.")
+            return True
+        except ClientError as e:
+            logger.error(f"Failed to download file from S3 (s3://{bucket_name}/{object_key}): {e}")
+            return False
+
+
+    def get_object_size(self, bucket_name: str, object_key: str) -> Optional[int]:
+        """Size of an object in bytes, or None if it cannot be read."""
+        if not self.s3_client_internal:
+            logger.error("S3 internal client not initialized. Cannot read object metadata.")
+            return None
+        try:
+            return int(self.s3_client_internal.head_object(Bucket=bucket_name, Key=object_key)["ContentLength"])
+        except ClientError as e:
+            logger.error(f"Failed to read object metadata from S3 (s3://{bucket_name}/{object_key}): {e}")
+            return None
+
+
+    def upload_bytes(
+        self, data: bytes, bucket_name: str, object_name: str, content_type: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Synchronous upload of an in-memory object, for Celery workers (upload_file is the
+        async UploadFile path used by the API). The boto3 client is thread-safe, so this
+        can be called from a worker's thread pool.
+        """
+        if not self.s3_client_internal:
+            logger.error("S3 internal client not initialized. Cannot upload bytes.")
+            return None
+        extra_args = {"ContentType": content_type} if content_type else {}
+        try:
+            self.s3_client_internal.put_object(Bucket=bucket_name, Key=object_name, Body=data, **extra_args)
+            logger.info(f"Uploaded {len(data)} bytes to '{bucket_name}/{object_name}'.")
+            return f"s3://{bucket_name}/{object_name}"
+        except ClientError as e:
+            logger.error(f"Failed to upload bytes to S3 (s3://{bucket_name}/{object_name}): {e}")
+            return None
+
+
+    def upload_file_object(
+        self, file_obj: BinaryIO, bucket_name: str, object_name: str, content_type: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Synchronous upload of an open file (e.g. a worker's temp file), read from its
+        current position. Large files go up as a multipart upload without being loaded
+        into memory.
+        """
+        if not self.s3_client_internal:
+            logger.error("S3 internal client not initialized. Cannot upload file.")
+            return None
+        extra_args = {"ContentType": content_type} if content_type else None
+        try:
+            self.s3_client_internal.upload_fileobj(file_obj, bucket_name, object_name, ExtraArgs=extra_args)
+            logger.info(f"File object uploaded to '{bucket_name}/{object_name}'.")
+            return f"s3://{bucket_name}/{object_name}"
+        except ClientError as e:
+            logger.error(f"Failed to upload file to S3 (s3://{bucket_name}/{object_name}): {e}")
+            return None
+
+
+    def list_object_keys(self, bucket_name: str, prefix: str, suffixes: Tuple[str, ...] = ()) -> List[str]:
+        """List every object key under a prefix (paginated), optionally filtered by suffix (case-insensitive)."""
+        if not self.s3_client_internal:
+            logger.error("S3 internal client not initialized. Cannot list objects.")
+            return []
+        keys: List[str] = []
+        paginator = self.s3_client_internal.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if not suffixes or obj["Key"].lower().endswith(suffixes):
+                    keys.append(obj["Key"])
+        return keys
+
+
     def generate_presigned_url(self, bucket_name: str, object_key: str, expiration: int = 3600, http_method: str = 'GET') -> Optional[str]:
         """
         Generates a presigned URL for an S3 object using the public-facing endpoint.
@@ -197,6 +282,13 @@ class S3Service:
 
 s3_service = S3Service()
 
+def parse_s3_path(s3_path: str) -> Tuple[str, str]:
+    """Split 's3://bucket/key' into (bucket, key)."""
+    if not s3_path.startswith("s3://") or "/" not in s3_path[5:]:
+        raise ValueError(f"Not an s3://bucket/key path: {s3_path}")
+    bucket_name, object_key = s3_path[5:].split("/", 1)
+    return bucket_name, object_key
+
 def init_s3_buckets():
     if s3_service.check_s3_connection(): # This will use s3_client_internal
         s3_service.create_bucket_if_not_exists(settings.S3_BUCKET_NAME_DATASETS)
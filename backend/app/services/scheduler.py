@@ -0,0 +1,258 @@
+# backend/app/services/scheduler.py
+
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import LockError
+
+from app.core.config import settings
+from app.services.redis_service import get_redis_client
+from app.tasks import dispatch
+
+logger = logging.getLogger(__name__)
+
+# Fair-share scheduler between the submit routers and Celery.
+#
+# Submitted runs wait in Redis, one FIFO list per (workload class, priority, project),
+# and are handed to Celery only while their workload class has fewer than
+# SCHEDULER_MAX_INFLIGHT_PER_WORKLOAD runs in flight. The broker queues therefore stay
+# short, so an interactive run never waits behind a project's 500 queued batch runs:
+#   * 'interactive' runs are always dispatched before 'batch' runs;
+#   * within a priority, the project with the fewest runs in flight goes next (oldest
+#     waiting run breaks ties), which round-robins between busy projects;
+#   * a project never has more than SCHEDULER_MAX_RUNNING_PER_PROJECT runs in flight.
+# Slots are released from the worker's task_postrun hook (app.tasks.worker_lifecycle),
+# which also pumps the next runs out.
+
+PRIORITIES = ("interactive", "batch")  # Highest first
+
+KEY_PREFIX = "benchmate:scheduler:"
+JOBS_KEY = KEY_PREFIX + "jobs"  # run id -> job envelope (JSON)
+LOCK_KEY = KEY_PREFIX + "lock"
+
+
+def _pending_key(workload: str, priority: str, project_id: str) -> str:
+    return f"{KEY_PREFIX}pending:{workload}:{priority}:{project_id}"
+
+
+def _projects_key(workload: str, priority: str) -> str:
+    # Projects that have runs waiting for this workload class and priority
+    return f"{KEY_PREFIX}projects:{workload}:{priority}"
+
+
+def _inflight_key(workload: str) -> str:
+    # Sorted set: run id -> dispatch time
+    return f"{KEY_PREFIX}inflight:{workload}"
+
+
+def _project_inflight_key(project_id: str) -> str:
+    return f"{KEY_PREFIX}project_inflight:{project_id}"
+
+
+# --- Helper Functions ---
+def choose_next(candidates: List[Dict[str, Any]], max_running_per_project: int) -> Optional[Dict[str, Any]]:
+    """
+    Pick the project whose head run goes next. Each candidate describes one project:
+    {"project_id", "running" (runs in flight), "enqueued_at" (of its oldest waiting run)}.
+    Projects at their concurrency cap are skipped.
+    """
+    eligible = [c for c in candidates if c["running"] < max_running_per_project]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda c: (c["running"], c["enqueued_at"]))
+
+
+def estimate_position(index: int, higher_priority_pending: int, other_projects_pending: List[int]) -> int:
+    """
+    Estimated 1-based place of a waiting run: everything of a higher priority goes
+    first, then projects take turns, so each other project gets ahead of it at most
+    as many runs as it has runs ahead of it in its own project's list.
+    """
+    return higher_priority_pending + index + sum(min(n, index) for n in other_projects_pending) + 1
+
+
+def _load_job(client, analysis_run_id: str) -> Optional[Dict[str, Any]]:
+    raw = client.hget(JOBS_KEY, analysis_run_id)
+    return json.loads(raw) if raw else None
+
+
+def _expire_stale(client, workload: str, now: float) -> None:
+    """Free slots whose task never reported back (e.g. the worker was killed)."""
+    cutoff = now - settings.SCHEDULER_INFLIGHT_TIMEOUT_SECONDS
+    for run_id in client.zrangebyscore(_inflight_key(workload), "-inf", cutoff):
+        logger.warning(f"Scheduler: releasing stale in-flight slot of run {run_id}")
+        _release(client, run_id)
+
+
+def _release(client, analysis_run_id: str) -> Optional[Dict[str, Any]]:
+    job = _load_job(client, analysis_run_id)
+    if job is None:
+        return None
+    pipe = client.pipeline()
+    pipe.zrem(_inflight_key(job["workload"]), analysis_run_id)
+    pipe.zrem(_project_inflight_key(job["project_id"]), analysis_run_id)
+    pipe.hdel(JOBS_KEY, analysis_run_id)
+    pipe.execute()
+    return job
+
+
+def _next_job(client, workload: str) -> Optional[Dict[str, Any]]:
+    """Pop the run that should be dispatched next for a workload class, if any may go."""
+    for priority in PRIORITIES:
+        candidates = []
+        for project_id in client.smembers(_projects_key(workload, priority)):
+            head = client.lindex(_pending_key(workload, priority, project_id), 0)
+            if head is None:
+                client.srem(_projects_key(workload, priority), project_id)
+                continue
+            candidates.append({
+                "project_id": project_id,
+                "running": client.zcard(_project_inflight_key(project_id)),
+                "enqueued_at": _load_job(client, head)["enqueued_at"],
+            })
+        chosen = choose_next(candidates, settings.SCHEDULER_MAX_RUNNING_PER_PROJECT)
+        if chosen is None:
+            continue
+        pending_key = _pending_key(workload, priority, chosen["project_id"])
+        run_id = client.lpop(pending_key)
+        if client.llen(pending_key) == 0:
+            client.srem(_projects_key(workload, priority), chosen["project_id"])
+        return _load_job(client, run_id)
+    return None
+
+
+def _dispatch(client, job: Dict[str, Any], now: float) -> None:
+    run_id = job["analysis_run_id"]
+    job["dispatched_at"] = now
+    pipe = client.pipeline()
+    pipe.zadd(_inflight_key(job["workload"]), {run_id: now})
+    pipe.zadd(_project_inflight_key(job["project_id"]), {run_id: now})
+    pipe.hset(JOBS_KEY, run_id, json.dumps(job))
+    pipe.execute()
+    try:
+        dispatch.enqueue_analysis(
+            job["task_name"],
+            analysis_run_id=run_id,
+            dataset_s3_path=job["dataset_s3_path"],
+            parameters=job["parameters"],
+        )
+    except Exception:
+        # Put the run back at the head of its list; the caller decides what to do
+        job.pop("dispatched_at")
+        pipe = client.pipeline()
+        pipe.zrem(_inflight_key(job["workload"]), run_id)
+        pipe.zrem(_project_inflight_key(job["project_id"]), run_id)
+        pipe.hset(JOBS_KEY, run_id, json.dumps(job))
+        pipe.lpush(_pending_key(job["workload"], job["priority"], job["project_id"]), run_id)
+        pipe.sadd(_projects_key(job["workload"], job["priority"]), job["project_id"])
+        pipe.execute()
+        raise
+
+
+# --- Main Scheduler Logic ---
+def pump() -> int:
+    """
+    Hand waiting runs to Celery until every workload class is at its in-flight limit
+    or has nothing eligible left. Returns the number of runs dispatched.
+    """
+    client = get_redis_client()
+    dispatched = 0
+    try:
+        with client.lock(LOCK_KEY, timeout=30, blocking_timeout=10):
+            now = time.time()
+            for workload in dispatch.WORKLOADS:
+                _expire_stale(client, workload, now)
+                while client.zcard(_inflight_key(workload)) < settings.SCHEDULER_MAX_INFLIGHT_PER_WORKLOAD:
+                    job = _next_job(client, workload)
+                    if job is None:
+                        break
+                    _dispatch(client, job, now)
+                    dispatched += 1
+    except LockError:
+        # Another process is pumping and will pick up whatever is waiting
+        logger.warning("Scheduler: could not acquire the pump lock; skipping this pump.")
+    return dispatched
+
+
+def submit(task_name: str, analysis_run_id: str, project_id: str, dataset_s3_path: Optional[str],
+           parameters: Dict[str, Any], priority: str = "interactive") -> Optional[int]:
+    """
+    Queue an analysis run with the scheduler and dispatch whatever may run now.
+    Returns the run's estimated queue position, or None if it went straight to Celery.
+    Raises if the run cannot be queued or dispatched, in which case it is not left behind.
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Invalid priority '{priority}'. Must be one of: {', '.join(PRIORITIES)}.")
+    if not settings.SCHEDULER_ENABLED:
+        dispatch.enqueue_analysis(task_name, analysis_run_id=analysis_run_id,
+                                  dataset_s3_path=dataset_s3_path, parameters=parameters)
+        return None
+
+    workload = dispatch.TASK_WORKLOADS[task_name]
+    job = {
+        "task_name": task_name,
+        "analysis_run_id": analysis_run_id,
+        "project_id": project_id,
+        "workload": workload,
+        "priority": priority,
+        "dataset_s3_path": dataset_s3_path,
+        "parameters": parameters,
+        "enqueued_at": time.time(),
+    }
+    client = get_redis_client()
+    pipe = client.pipeline()
+    pipe.hset(JOBS_KEY, analysis_run_id, json.dumps(job))
+    pipe.rpush(_pending_key(workload, priority, project_id), analysis_run_id)
+    pipe.sadd(_projects_key(workload, priority), project_id)
+    pipe.execute()
+
+    try:
+        pump()
+    except Exception:
+        remove(analysis_run_id)
+        raise
+    return queue_position(analysis_run_id)
+
+
+def remove(analysis_run_id: str) -> bool:
+    """Drop a run that is still waiting. Returns False if it was not waiting."""
+    client = get_redis_client()
+    # Under the pump lock, so a run is never popped for dispatch while it is being removed
+    with client.lock(LOCK_KEY, timeout=30, blocking_timeout=10):
+        job = _load_job(client, analysis_run_id)
+        if job is None or "dispatched_at" in job:
+            return False
+        client.lrem(_pending_key(job["workload"], job["priority"], job["project_id"]), 0, analysis_run_id)
+        client.hdel(JOBS_KEY, analysis_run_id)
+    return True
+
+
+def complete(analysis_run_id: str) -> None:
+    """Release a finished run's slots and dispatch the next runs."""
+    if _release(get_redis_client(), analysis_run_id) is not None:
+        pump()
+
+
+def queue_position(analysis_run_id: str) -> Optional[int]:
+    """Estimated 1-based position of a waiting run; None once dispatched (or unknown)."""
+    client = get_redis_client()
+    job = _load_job(client, analysis_run_id)
+    if job is None or "dispatched_at" in job:
+        return None
+    workload, priority = job["workload"], job["priority"]
+    index = client.lpos(_pending_key(workload, priority, job["project_id"]), analysis_run_id)
+    if index is None:
+        return None
+
+    higher_priority_pending = 0
+    for higher in PRIORITIES[:PRIORITIES.index(priority)]:
+        for project_id in client.smembers(_projects_key(workload, higher)):
+            higher_priority_pending += client.llen(_pending_key(workload, higher, project_id))
+    other_projects_pending = [
+        client.llen(_pending_key(workload, priority, project_id))
+        for project_id in client.smembers(_projects_key(workload, priority))
+        if project_id != job["project_id"]
+    ]
+    return estimate_position(index, higher_priority_pending, other_projects_pending)
@@ -0,0 +1,45 @@
+# backend/app/services/worker_health.py
+
+import json
+import logging
+import os
+import socket
+from typing import Any, Dict, List
+
+from app.services.redis_service import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# One key per worker process: each Celery prefork child owns its own JVM/gateway.
+IMAGING_STATUS_KEY_PREFIX = "benchmate:worker_health:imaging:"
+# Keys are refreshed after every task; a process that died without cleaning up expires.
+IMAGING_STATUS_TTL_SECONDS = 24 * 60 * 60
+
+
+def _process_key() -> str:
+    return f"{IMAGING_STATUS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+
+
+def report_imaging_status(status: Dict[str, Any]) -> None:
+    """Publish this process's imaging-runtime status. Never raises: health is best-effort."""
+    payload = {"hostname": socket.gethostname(), "pid": os.getpid(), **status}
+    try:
+        get_redis_client().set(_process_key(), json.dumps(payload), ex=IMAGING_STATUS_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Could not report imaging worker status: {e}")
+
+
+def clear_imaging_status() -> None:
+    try:
+        get_redis_client().delete(_process_key())
+    except Exception as e:
+        logger.warning(f"Could not clear imaging worker status: {e}")
+
+
+def list_imaging_status() -> List[Dict[str, Any]]:
+    """Return the last reported status of every live imaging worker process."""
+    client = get_redis_client()
+    keys = sorted(client.scan_iter(match=f"{IMAGING_STATUS_KEY_PREFIX}*"))
+    if not keys:
+        return []
+    return [json.loads(raw) for raw in client.mget(keys) if raw]
@@ -0,0 +1,82 @@
+# backend/app/tasks/dispatch.py
+
+from typing import Any, Dict, Optional
+
+from celery.result import AsyncResult
+
+from app.celery_worker import celery_app
+from app.core.config import settings
+
+# Enqueue tasks by their registered name. The API process imports only this module,
+# never the task modules themselves, so pandas/scipy/sklearn/PIL/pyimagej load only
+# in worker processes. Task modules use these constants in their decorators, so the
+# names cannot drift apart.
+
+VOLCANO_PLOT_TASK = "app.celery_worker.run_volcano_plot_analysis"
+PCA_PLOT_TASK = "app.celery_worker.run_pca_plot_analysis"
+HEATMAP_TASK = "app.celery_worker.run_heatmap_analysis"
+IMAGE_FILTER_TASK = "app.tasks.run_image_filter_analysis"
+IMAGE_SEGMENTATION_TASK = "app.tasks.run_image_segmentation_analysis"
+IMAGE_BATCH_TASK = "app.tasks.run_image_batch_analysis"
+IMAGE_PIPELINE_TASK = "app.tasks.run_image_pipeline_analysis"
+# Parameter sweeps: one task evaluates every combination against one loaded dataset
+VOLCANO_SWEEP_TASK = "app.tasks.run_volcano_plot_sweep"
+PCA_SWEEP_TASK = "app.tasks.run_pca_plot_sweep"
+HEATMAP_SWEEP_TASK = "app.tasks.run_heatmap_sweep"
+
+# Workload class of every task. Each class has its own queue and worker pool
+# (see Settings.worker_pool and app.tasks.worker_pools), so a burst of imaging runs
+# cannot starve quick volcano plots and a large clustering job cannot run a JVM
+# worker out of memory.
+WORKLOADS = ("omics_light", "omics_heavy", "imaging")
+
+TASK_WORKLOADS = {
+    VOLCANO_PLOT_TASK: "omics_light",
+    PCA_PLOT_TASK: "omics_heavy",
+    HEATMAP_TASK: "omics_heavy",
+    IMAGE_FILTER_TASK: "imaging",
+    IMAGE_SEGMENTATION_TASK: "imaging",
+    IMAGE_BATCH_TASK: "imaging",
+    IMAGE_PIPELINE_TASK: "imaging",
+    VOLCANO_SWEEP_TASK: "omics_light",
+    PCA_SWEEP_TASK: "omics_heavy",
+    HEATMAP_SWEEP_TASK: "omics_heavy",
+}
+
+
+def route_task(name, args, kwargs, options, task=None, **kw) -> Optional[Dict[str, str]]:
+    """
+    Celery router (configured as `task_routes` in app.celery_worker): sends each task
+    to its workload class's queue. Unknown tasks fall through to the default queue.
+    """
+    workload = TASK_WORKLOADS.get(name)
+    if workload is None:
+        return None
+    return {"queue": settings.worker_queue(workload)}
+
+
+def enqueue_analysis(task_name: str, analysis_run_id: str, dataset_s3_path: Optional[str],
+                     parameters: Dict[str, Any], **options: Any) -> AsyncResult:
+    """
+    Send an analysis task to the broker. The Celery task id is the analysis run id,
+    so a run can be looked up (or revoked) from its id alone.
+    """
+    return celery_app.send_task(
+        task_name,
+        kwargs={
+            "analysis_run_id": analysis_run_id,
+            "dataset_s3_path": dataset_s3_path,
+            "parameters": parameters,
+        },
+        task_id=analysis_run_id,
+        **options,
+    )
+
+
+def revoke_analysis(analysis_run_id: str) -> None:
+    """
+    Drop a run's task if no worker has started it yet. Running tasks are not killed
+    (an imaging child would lose its warmed JVM); they stop at their next checkpoint
+    once the run's cancel flag is set (see app.services.run_control).
+    """
+    celery_app.control.revoke(analysis_run_id)
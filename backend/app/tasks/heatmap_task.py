@@ -11,17 +11,19 @@ from sqlalchemy.orm import Session as SQLAlchemySession
 from app.db.session import SessionLocal
 from app import crud, models
 from app.core.config import settings
+from app.services import progress, run_control
 from app.services.s3_service import s3_service
 from app.utils.config_loader import load_yaml_config
 from app.models.analysis_run import AnalysisStatus
 
 # Import the new heatmap processor and its Pydantic schema
-from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import heatmap_processor
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import expression_matrix, heatmap_processor
 from app.schemas.benchtop.biology.omics.transcriptomics.bulk_rna_seq.heatmap_schema import HeatmapParams as ToolHeatmapParams
 
 from app.celery_worker import celery_app
+from app.tasks import dispatch, sweep
 
-@celery_app.task(name="app.celery_worker.run_heatmap_analysis", bind=True, max_retries=1, default_retry_delay=30)
+@celery_app.task(name=dispatch.HEATMAP_TASK, bind=True, max_retries=1, default_retry_delay=30)
 def run_heatmap_analysis(self, analysis_run_id: str, dataset_s3_path: str, parameters: dict):
     """
     Celery task to run heatmap analysis, following the standard modular pattern.
@@ -37,23 +39,32 @@ def run_heatmap_analysis(self, analysis_run_id: str, dataset_s3_path: str, param
     final_status: AnalysisStatus = AnalysisStatus.FAILED
     final_error_message: str | None = "Task did not complete due to an unexpected issue."
     output_artifacts: Dict[str, Any] = {}
+    progress_reporter = progress.ProgressReporter(analysis_run_id)
 
     try:
         db_run = crud.get_analysis_run(db, analysis_run_id=analysis_run_uuid)
         if not db_run:
             raise ValueError("AnalysisRun record not found in database.")
 
+        # Stops here if the run was cancelled while it waited in the queue
+        checkpoint = run_control.checkpoint(analysis_run_id, progress=progress_reporter)
+        checkpoint("queued")
+
         crud.update_analysis_run_status(db, db_run=db_run, status=AnalysisStatus.RUNNING)
         db.commit()
         print(f"{task_log_prefix} Status updated to RUNNING.")
 
         s3_object_key = dataset_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_DATASETS}/", "", 1)
-        input_file_buffer = s3_service.download_file_to_buffer(
-            bucket_name=settings.S3_BUCKET_NAME_DATASETS,
-            object_key=s3_object_key
-        )
-        if not input_file_buffer:
-            raise ConnectionError("Failed to download input file from S3.")
+        if expression_matrix.is_cached(dataset_s3_path):
+            print(f"{task_log_prefix} Dataset already parsed in this worker; skipping S3 download.")
+        else:
+            checkpoint("downloading")
+            input_file_buffer = s3_service.download_file_to_buffer(
+                bucket_name=settings.S3_BUCKET_NAME_DATASETS,
+                object_key=s3_object_key
+            )
+            if not input_file_buffer:
+                raise ConnectionError("Failed to download input file from S3.")
 
         tool_config_yaml_path = "benchtop/biology/omics/transcriptomics/bulk_rna_seq/heatmap.yaml"
         tool_default_config = load_yaml_config(tool_config_yaml_path)
@@ -66,15 +77,19 @@ def run_heatmap_analysis(self, analysis_run_id: str, dataset_s3_path: str, param
             file_obj=input_file_buffer,
             filename=original_filename,
             params=processor_params_obj,
-            config=tool_default_config
+            config=tool_default_config,
+            cache_key=dataset_s3_path,
+            checkpoint=checkpoint
         )
         print(f"{task_log_prefix} Processor finished.")
 
+        checkpoint("serializing")
         results_json_bytes = json.dumps(result_dict, indent=2).encode('utf-8')
         results_json_buffer = io.BytesIO(results_json_bytes)
         
         json_s3_object_name = f"analysis_runs/{analysis_run_id}/results/results.json"
         
+        checkpoint("uploading")
         s3_service.s3_client_internal.upload_fileobj(
             results_json_buffer,
             settings.S3_BUCKET_NAME_RESULTS,
@@ -91,6 +106,11 @@ def run_heatmap_analysis(self, analysis_run_id: str, dataset_s3_path: str, param
         final_status = AnalysisStatus.COMPLETED
         final_error_message = None
 
+    except run_control.RunCancelled as rc:
+        print(f"{task_log_prefix} {rc}")
+        final_status = AnalysisStatus.CANCELLED
+        final_error_message = "Cancelled by user."
+        output_artifacts = {}
     except ValueError as ve:
         print(f"{task_log_prefix} ERROR (ValueError): {str(ve)}\n{traceback.format_exc()}")
         final_status = AnalysisStatus.FAILED
@@ -106,8 +126,13 @@ def run_heatmap_analysis(self, analysis_run_id: str, dataset_s3_path: str, param
             print(f"{task_log_prefix} Max retries exceeded.")
             pass
     finally:
+        # A cancel that arrived after the last checkpoint still wins
+        if run_control.finish(analysis_run_id) and final_status != AnalysisStatus.CANCELLED:
+            final_status, final_error_message, output_artifacts = AnalysisStatus.CANCELLED, "Cancelled by user.", {}
         print(f"{task_log_prefix} Finalizing task. Status: {final_status}")
         if db_run:
+            # Per-stage timing trace, for performance debugging
+            output_artifacts = {**output_artifacts, "stage_timings": progress_reporter.finish(final_status.value)}
             crud.update_analysis_run_internal(
                 db=db,
                 db_run=db_run,
@@ -123,4 +148,43 @@ def run_heatmap_analysis(self, analysis_run_id: str, dataset_s3_path: str, param
             input_file_buffer.close()
 
         db.close()
-        print(f"{task_log_prefix} Task finished.")
\ No newline at end of file
+        print(f"{task_log_prefix} Task finished.")
+
+@celery_app.task(name=dispatch.HEATMAP_SWEEP_TASK, bind=True)
+def run_heatmap_sweep(self, analysis_run_id: str, dataset_s3_path: str, parameters: dict):
+    """
+    Celery task evaluating a heatmap parameter sweep (e.g. clustering_method x distance_metric).
+    The table is downloaded once and parsed once into the worker's expression-matrix cache;
+    each run of the sweep (parameters["runs"]) is then computed from the parsed block.
+    analysis_run_id is the sweep's id; every run records its own status and results.
+    """
+    task_log_prefix = f"TASK [ID:{self.request.id}, SweepID:{analysis_run_id}, Tool:Heatmap]"
+    print(f"{task_log_prefix} Received {len(parameters['runs'])} runs.")
+
+    tool_default_config = load_yaml_config("benchtop/biology/omics/transcriptomics/bulk_rna_seq/heatmap.yaml")
+    original_filename = dataset_s3_path.split('/')[-1]
+
+    def load_dataset():
+        # Tables too large for the cache are re-parsed from this buffer, never re-downloaded
+        if expression_matrix.is_cached(dataset_s3_path):
+            return None
+        return sweep.download_dataset(dataset_s3_path)
+
+    def evaluate(run_id: str, input_file_buffer, run_parameters: dict, checkpoint) -> Dict[str, Any]:
+        if input_file_buffer is not None:
+            input_file_buffer.seek(0)
+        result_dict = heatmap_processor.run(
+            file_obj=input_file_buffer,
+            filename=original_filename,
+            params=ToolHeatmapParams(**run_parameters),
+            config=tool_default_config,
+            cache_key=dataset_s3_path,
+            checkpoint=checkpoint
+        )
+        checkpoint("uploading")
+        return {
+            "results_json_s3_path": sweep.upload_results_json(run_id, result_dict),
+            "summary_stats": result_dict.get("summary_stats", {})
+        }
+
+    return sweep.run_sweep(task_log_prefix, parameters["runs"], load_dataset, evaluate)
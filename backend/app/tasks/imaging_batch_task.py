@@ -0,0 +1,188 @@
+# backend/app/tasks/imaging_batch_task.py
+
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Dict, List, Optional
+
+from celery.utils.log import get_task_logger
+from sqlalchemy.orm import Session as SQLAlchemySession
+
+from app import crud, models
+from app.celery_worker import celery_app
+from app.tasks import dispatch
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.analysis_run import AnalysisStatus
+from app.services import progress, run_control
+from app.services.s3_service import s3_service, parse_s3_path
+from app.services.imagej_service import imagej_service
+from app.schemas.benchtop.biology.imaging.batch_schema import BATCH_IMAGE_SUFFIXES, ImagingBatchParams
+from app.utils.benchtop.biology.imaging import batch
+from app.utils.benchtop.biology.imaging.encoders import file_type
+from app.utils.benchtop.biology.imaging.previews import upload_previews
+from app.utils.config_loader import load_yaml_config
+
+
+# Configure a logger for this task module
+logger = get_task_logger(__name__)
+
+
+def _upload_result(data: bytes, object_name: str, content_type: str):
+    """Upload one result object (image, preview tile, ...) to the results bucket."""
+    return s3_service.upload_bytes(
+        data, bucket_name=settings.S3_BUCKET_NAME_RESULTS, object_name=object_name, content_type=content_type
+    )
+
+
+def _list_prefix_inputs(s3_prefix_path: str) -> List[Dict[str, Any]]:
+    """Expand an s3://bucket/prefix into one batch input per image object under it."""
+    bucket_name, prefix = parse_s3_path(s3_prefix_path)
+    keys = s3_service.list_object_keys(bucket_name, prefix, suffixes=BATCH_IMAGE_SUFFIXES)
+    return [{"s3_path": f"s3://{bucket_name}/{key}", "dataset_id": None} for key in sorted(keys)]
+
+
+@celery_app.task(name=dispatch.IMAGE_BATCH_TASK, bind=True, max_retries=1, default_retry_delay=30)
+def run_image_batch_analysis(self, analysis_run_id: str, dataset_s3_path: Optional[str], parameters: dict):
+    """
+    Celery task applying one imaging tool to many images (a list of datasets, or every
+    image under an S3 prefix given as dataset_s3_path) in a single run. Images are
+    pipelined through a thread pool and a per-image manifest is written to S3.
+    """
+    task_log_prefix = f"TASK [ID:{self.request.id}, RunID:{analysis_run_id}, Tool:Imaging Batch]"
+    logger.info(f"{task_log_prefix} - Task started.")
+
+    db: SQLAlchemySession = SessionLocal()
+    analysis_run_uuid = uuid.UUID(analysis_run_id)
+    db_run: models.AnalysisRun | None = None
+
+    final_status: AnalysisStatus = AnalysisStatus.FAILED
+    final_error_message: str | None = "Task did not complete due to an unexpected issue."
+    output_artifacts: Dict[str, Any] = {}
+    progress_reporter = progress.ProgressReporter(analysis_run_id)
+
+    try:
+        db_run = crud.get_analysis_run(db, analysis_run_id=analysis_run_uuid)
+        if not db_run:
+            raise ValueError("AnalysisRun not found in the database.")
+
+        # Stops here if the run was cancelled while it waited in the queue
+        checkpoint = run_control.checkpoint(analysis_run_id, progress=progress_reporter)
+        checkpoint("queued")
+
+        crud.update_analysis_run_status(db, db_run=db_run, status=AnalysisStatus.RUNNING)
+        logger.info(f"{task_log_prefix} - Status updated to RUNNING.")
+
+        # 1. Resolve parameters, inputs and the tool's processor
+        batch_params = ImagingBatchParams(**parameters)
+        tool_params = batch_params.tool_params()
+        items = [item.model_dump() for item in batch_params.inputs]
+        if dataset_s3_path:
+            items.extend(_list_prefix_inputs(dataset_s3_path))
+        batch_config = load_yaml_config("benchtop/biology/imaging/batch.yaml")
+        max_images = batch_config['parameters']['max_images']
+        if not items:
+            raise ValueError("The batch has no input images.")
+        if len(items) > max_images:
+            raise ValueError(f"The batch has {len(items)} images; at most {max_images} are allowed per run.")
+        logger.info(f"{task_log_prefix} - {len(items)} images to process with '{batch_params.tool}'.")
+
+        processor, tool_config_path = batch.BATCH_PROCESSORS[batch_params.tool]
+        tool_config = load_yaml_config(tool_config_path)
+        # Parallelism comes from processing many images at once; large images are still
+        # tiled, but one thread per image avoids oversubscribing the cores.
+        tool_config['engine'] = {**(tool_config.get('engine') or {}), 'max_workers': 1}
+
+        ij_gateway = None
+        compute_lock = None
+        if processor.needs_imagej(tool_params):
+            ij_gateway = imagej_service.instance()
+            # The gateway is shared by the whole process; downloads/uploads still overlap.
+            compute_lock = threading.Lock()
+            logger.info(f"{task_log_prefix} - Acquired ImageJ gateway instance.")
+
+        # 2. Pipeline stages
+        def fetch(item: Dict[str, Any]) -> bytes:
+            bucket_name, object_key = parse_s3_path(item["s3_path"])
+            buffer = s3_service.download_file_to_buffer(bucket_name=bucket_name, object_key=object_key)
+            if not buffer:
+                raise FileNotFoundError(f"Could not download input file from S3 path: {item['s3_path']}")
+            return buffer.getvalue()
+
+        def process(image_bytes: bytes) -> Dict[str, Any]:
+            return processor.run(ij_gateway, image_bytes, tool_params, config=tool_config)
+
+        def store(index: int, item: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+            extension, content_type = file_type(result.get("output_format", "png"))
+            stem = f"{index:05d}_{os.path.splitext(os.path.basename(item['s3_path']))[0]}"
+            results_prefix = f"analysis_runs/{analysis_run_id}/results/images"
+            object_name = f"{results_prefix}/{stem}.{extension}"
+            s3_path = _upload_result(result["processed_image_bytes"], object_name, content_type)
+            if not s3_path:
+                raise IOError(f"Could not upload the result image to S3 at {object_name}")
+            preview_artifact = None
+            if result.get("previews"):
+                preview_artifact = upload_previews(result["previews"], _upload_result, prefix=results_prefix,
+                                                   name=stem, max_workers=2)
+            return {"output_s3_path": s3_path, "preview": preview_artifact}
+
+        # 3. Run the batch
+        engine = batch_config.get('engine') or {}
+        started = time.perf_counter()
+        manifest = batch.run_pipeline(
+            items, fetch, process, store,
+            max_workers=engine.get('max_workers') or os.cpu_count() or 1,
+            prefetch_per_worker=engine.get('prefetch_per_worker') or 2,
+            compute_lock=compute_lock,
+            checkpoint=checkpoint,
+        )
+        summary = batch.summarize_manifest(manifest, time.perf_counter() - started)
+        logger.info(f"{task_log_prefix} - Batch finished: {summary}")
+
+        # 4. Upload the manifest
+        checkpoint("uploading")
+        manifest_object_name = f"analysis_runs/{analysis_run_id}/results/manifest.json"
+        manifest_s3_path = _upload_result(
+            json.dumps({"tool": batch_params.tool, "tool_parameters": tool_params.model_dump(),
+                        "summary": summary, "images": manifest}, indent=2).encode("utf-8"),
+            manifest_object_name, "application/json",
+        )
+        if not manifest_s3_path:
+            raise IOError(f"Could not upload the batch manifest to S3 at {manifest_object_name}")
+
+        output_artifacts = {"manifest_s3_path": manifest_s3_path, "summary": summary}
+        if summary["succeeded"] == 0:
+            final_status = AnalysisStatus.FAILED
+            final_error_message = f"All {summary['images']} images failed; see the manifest for per-image errors."
+        else:
+            final_status = AnalysisStatus.COMPLETED
+            final_error_message = None
+
+    except run_control.RunCancelled as rc:
+        logger.info(f"{task_log_prefix} - {rc}")
+        final_status = AnalysisStatus.CANCELLED
+        final_error_message = "Cancelled by user."
+        output_artifacts = {}
+    except Exception as e:
+        logger.error(f"{task_log_prefix} - An error occurred: {str(e)}", exc_info=True)
+        final_status = AnalysisStatus.FAILED
+        final_error_message = f"An unexpected error occurred: {str(e)}"
+        output_artifacts = {"error_details": str(e), "traceback": traceback.format_exc()}
+
+    finally:
+        # A cancel that arrived after the last checkpoint still wins
+        if run_control.finish(analysis_run_id) and final_status != AnalysisStatus.CANCELLED:
+            final_status, final_error_message, output_artifacts = AnalysisStatus.CANCELLED, "Cancelled by user.", {}
+        if db_run:
+            # Per-stage timing trace, for performance debugging
+            output_artifacts = {**output_artifacts, "stage_timings": progress_reporter.finish(final_status.value)}
+            crud.update_analysis_run_internal(
+                db=db, db_run=db_run,
+                run_in={"status": final_status, "error_message": final_error_message, "output_artifacts": output_artifacts}
+            )
+            logger.info(f"{task_log_prefix} - Final status '{final_status.value}' updated in DB.")
+        db.close()
+        logger.info(f"{task_log_prefix} - Task finished.")
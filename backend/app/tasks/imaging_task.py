@@ -1,32 +1,44 @@
 # backend/app/tasks/imaging_task.py
 
-import io
 import json
 import logging
+import os
+import tempfile
 import traceback
 import uuid
-from typing import Any, Dict
+from typing import Any, BinaryIO, Dict, Optional
 
 from celery.utils.log import get_task_logger
 from sqlalchemy.orm import Session as SQLAlchemySession
 
 from app import crud, models, schemas
 from app.celery_worker import celery_app
+from app.tasks import dispatch
 from app.core.config import settings
 from app.db.session import SessionLocal
 from app.models.analysis_run import AnalysisStatus
-from app.services import s3_service
+from app.services import progress, run_control
+from app.services.s3_service import s3_service
 from app.services.imagej_service import imagej_service
+# --- Pipeline-related imports ---
+from app.utils.benchtop.biology.imaging import pipeline as imaging_pipeline
+from app.schemas.benchtop.biology.imaging.pipeline_schema import ImagingPipelineParams
+
+from app.utils.benchtop.biology.imaging.encoders import file_type
+from app.utils.benchtop.biology.imaging.previews import tile_store, upload_previews
+from app.utils.config_loader import load_yaml_config
 
 # --- Filter-related imports ---
 from app.utils.benchtop.biology.imaging.filters.gaussian_blur_processor import (
     run as gaussian_blur_processor,
+    needs_imagej as gaussian_blur_needs_imagej,
 )
 from app.schemas.benchtop.biology.imaging.filters.gaussian_blur_schema import GaussianBlurParams
 
 # --- NEW: Segmentation-related imports ---
 from app.utils.benchtop.biology.imaging.segmentation.auto_threshold_processor import (
     run as auto_threshold_processor,
+    needs_imagej as auto_threshold_needs_imagej,
 )
 from app.schemas.benchtop.biology.imaging.segmentation.auto_threshold_schema import AutoThresholdParams
 
@@ -35,7 +47,33 @@ from app.schemas.benchtop.biology.imaging.segmentation.auto_threshold_schema imp
 logger = get_task_logger(__name__)
 
 
-@celery_app.task(name="app.tasks.run_image_filter_analysis", bind=True, max_retries=1, default_retry_delay=30)
+def _upload_result(data: bytes, object_name: str, content_type: str):
+    """Upload one result object (image, preview tile, ...) to the results bucket."""
+    return s3_service.upload_bytes(
+        data, bucket_name=settings.S3_BUCKET_NAME_RESULTS, object_name=object_name, content_type=content_type
+    )
+
+
+def _upload_image(result_dict: Dict[str, Any], output_file: BinaryIO, object_name: str,
+                  content_type: str) -> Optional[str]:
+    """
+    Upload a processor's full-resolution output: from output_file when the processor wrote
+    it there (processed_image_bytes is None), otherwise from the returned bytes.
+    """
+    processed_image_bytes = result_dict.get("processed_image_bytes")
+    if processed_image_bytes is None:
+        if not output_file.seek(0, os.SEEK_END):
+            raise ValueError("Processor did not write a processed image.")
+        output_file.seek(0)
+        return s3_service.upload_file_object(
+            output_file, bucket_name=settings.S3_BUCKET_NAME_RESULTS, object_name=object_name, content_type=content_type
+        )
+    if not processed_image_bytes:
+        raise ValueError("Processor did not return processed image bytes.")
+    return _upload_result(processed_image_bytes, object_name, content_type)
+
+
+@celery_app.task(name=dispatch.IMAGE_FILTER_TASK, bind=True, max_retries=1, default_retry_delay=30)
 def run_image_filter_analysis(self, analysis_run_id: str, dataset_s3_path: str, parameters: dict):
     """
     Celery task to run a generic image filter analysis (e.g., Gaussian Blur).
@@ -50,53 +88,85 @@ def run_image_filter_analysis(self, analysis_run_id: str, dataset_s3_path: str,
     final_status: AnalysisStatus = AnalysisStatus.FAILED
     final_error_message: str | None = "Task did not complete due to an unexpected issue."
     output_artifacts: Dict[str, Any] = {}
+    progress_reporter = progress.ProgressReporter(analysis_run_id)
+    # The input is downloaded to, and the output encoded into, files in a scratch
+    # directory, so neither has to fit in memory
+    scratch_dir: tempfile.TemporaryDirectory | None = None
+    output_file: BinaryIO | None = None
 
     try:
         db_run = crud.get_analysis_run(db, analysis_run_id=analysis_run_uuid)
         if not db_run:
             raise ValueError("AnalysisRun not found in the database.")
 
+        # Stops here if the run was cancelled while it waited in the queue
+        checkpoint = run_control.checkpoint(analysis_run_id, progress=progress_reporter)
+        checkpoint("queued")
+
         crud.update_analysis_run_status(db, db_run=db_run, status=AnalysisStatus.RUNNING)
         logger.info(f"{task_log_prefix} - Status updated to RUNNING.")
 
-        s3_object_key = dataset_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_DATASETS}/", "", 1)
-        input_file_buffer = s3_service.download_file_to_buffer(
-            bucket_name=settings.S3_BUCKET_NAME_DATASETS, object_key=s3_object_key
+        checkpoint("downloading")
+        tool_config = load_yaml_config("benchtop/biology/imaging/filters/gaussian_blur.yaml")
+        scratch_dir = tempfile.TemporaryDirectory(
+            prefix="image_filter_", dir=(tool_config.get("engine") or {}).get("scratch_dir")
         )
-        if not input_file_buffer:
+        s3_object_key = dataset_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_DATASETS}/", "", 1)
+        input_path = os.path.join(scratch_dir.name, "input")
+        if not s3_service.download_file_to_path(settings.S3_BUCKET_NAME_DATASETS, s3_object_key, input_path):
             raise FileNotFoundError(f"Could not download input file from S3 path: {dataset_s3_path}")
         logger.info(f"{task_log_prefix} - Successfully downloaded input image from S3.")
-
-        ij_gateway = imagej_service.instance()
-        logger.info(f"{task_log_prefix} - Acquired ImageJ gateway instance.")
+        checkpoint("processing")
 
         processor_params_obj = GaussianBlurParams(**parameters)
+
+        # Only start (or attach to) the JVM when the request actually needs ImageJ
+        ij_gateway = None
+        if gaussian_blur_needs_imagej(processor_params_obj):
+            ij_gateway = imagej_service.instance()
+            logger.info(f"{task_log_prefix} - Acquired ImageJ gateway instance.")
         
+        output_file = tempfile.TemporaryFile(dir=scratch_dir.name)
+        # Preview tiles are uploaded in batches while the pyramid is built
+        results_prefix = f"analysis_runs/{analysis_run_id}/results"
         result_dict = gaussian_blur_processor(
-            ij_gateway=ij_gateway, image_bytes=input_file_buffer.getvalue(), params=processor_params_obj
+            ij_gateway=ij_gateway, image=input_path, params=processor_params_obj,
+            config=tool_config, output_file=output_file,
+            store_preview_tiles=tile_store(_upload_result, prefix=results_prefix, name="filtered_image")
         )
         logger.info(f"{task_log_prefix} - Image processing completed.")
-
-        processed_image_bytes = result_dict.get("processed_image_bytes")
-        if not processed_image_bytes:
-            raise ValueError("Processor did not return processed image bytes.")
-
-        image_s3_object_name = f"analysis_runs/{analysis_run_id}/results/filtered_image.png"
-        s3_service.upload_file(
-            bucket_name=settings.S3_BUCKET_NAME_RESULTS,
-            file_obj=io.BytesIO(processed_image_bytes),
-            object_name=image_s3_object_name
-        )
-        image_s3_path = f"s3://{settings.S3_BUCKET_NAME_RESULTS}/{image_s3_object_name}"
+        checkpoint("uploading")
+
+        # The extension follows the tool's output encoder (TIFF input comes back as TIFF)
+        extension, content_type = file_type(result_dict.get("output_format", "png"))
+        image_s3_object_name = f"analysis_runs/{analysis_run_id}/results/filtered_image.{extension}"
+        image_s3_path = _upload_image(result_dict, output_file, image_s3_object_name, content_type)
+        if not image_s3_path:
+            raise IOError(f"Could not upload the result image to S3 at {image_s3_object_name}")
         logger.info(f"{task_log_prefix} - Successfully uploaded filtered image to S3 at {image_s3_path}")
 
+        # Thumbnail and DZI pyramid next to the full-resolution image, so the UI can load
+        # only what fits the viewport
+        preview_artifact = None
+        if result_dict.get("previews"):
+            preview_artifact = upload_previews(
+                result_dict["previews"], _upload_result, prefix=results_prefix, name="filtered_image",
+            )
+            logger.info(f"{task_log_prefix} - Uploaded previews ({preview_artifact.get('tile_count', 0)} DZI tiles).")
+
         output_artifacts = {
             "filtered_image_s3_path": image_s3_path,
+            "preview": preview_artifact,
             "summary": result_dict.get("summary", {})
         }
         final_status = AnalysisStatus.COMPLETED
         final_error_message = None
 
+    except run_control.RunCancelled as rc:
+        logger.info(f"{task_log_prefix} - {rc}")
+        final_status = AnalysisStatus.CANCELLED
+        final_error_message = "Cancelled by user."
+        output_artifacts = {}
     except Exception as e:
         logger.error(f"{task_log_prefix} - An error occurred: {str(e)}", exc_info=True)
         final_status = AnalysisStatus.FAILED
@@ -104,18 +174,27 @@ def run_image_filter_analysis(self, analysis_run_id: str, dataset_s3_path: str,
         output_artifacts = {"error_details": str(e), "traceback": traceback.format_exc()}
 
     finally:
+        # A cancel that arrived after the last checkpoint still wins
+        if run_control.finish(analysis_run_id) and final_status != AnalysisStatus.CANCELLED:
+            final_status, final_error_message, output_artifacts = AnalysisStatus.CANCELLED, "Cancelled by user.", {}
         if db_run:
+            # Per-stage timing trace, for performance debugging
+            output_artifacts = {**output_artifacts, "stage_timings": progress_reporter.finish(final_status.value)}
             crud.update_analysis_run_internal(
                 db=db, db_run=db_run,
                 run_in={"status": final_status, "error_message": final_error_message, "output_artifacts": output_artifacts}
             )
             logger.info(f"{task_log_prefix} - Final status '{final_status.value}' updated in DB.")
+        if output_file:
+            output_file.close()
+        if scratch_dir:
+            scratch_dir.cleanup()
         db.close()
         logger.info(f"{task_log_prefix} - Task finished.")
 
 
 # --- NEW TASK FOR AUTO THRESHOLD ---
-@celery_app.task(name="app.tasks.run_image_segmentation_analysis", bind=True, max_retries=1, default_retry_delay=30)
+@celery_app.task(name=dispatch.IMAGE_SEGMENTATION_TASK, bind=True, max_retries=1, default_retry_delay=30)
 def run_image_segmentation_analysis(self, analysis_run_id: str, dataset_s3_path: str, parameters: dict):
     """
     Celery task to run a generic image segmentation analysis (e.g., Auto Threshold).
@@ -131,56 +210,88 @@ def run_image_segmentation_analysis(self, analysis_run_id: str, dataset_s3_path:
     final_status: AnalysisStatus = AnalysisStatus.FAILED
     final_error_message: str | None = "Task did not complete due to an unexpected issue."
     output_artifacts: Dict[str, Any] = {}
+    progress_reporter = progress.ProgressReporter(analysis_run_id)
+    # The input is downloaded to, and the output encoded into, files in a scratch
+    # directory, so neither has to fit in memory
+    scratch_dir: tempfile.TemporaryDirectory | None = None
+    output_file: BinaryIO | None = None
 
     try:
         db_run = crud.get_analysis_run(db, analysis_run_id=analysis_run_uuid)
         if not db_run:
             raise ValueError("AnalysisRun not found in the database.")
 
+        # Stops here if the run was cancelled while it waited in the queue
+        checkpoint = run_control.checkpoint(analysis_run_id, progress=progress_reporter)
+        checkpoint("queued")
+
         crud.update_analysis_run_status(db, db_run=db_run, status=AnalysisStatus.RUNNING)
         logger.info(f"{task_log_prefix} - Status updated to RUNNING.")
 
-        s3_object_key = dataset_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_DATASETS}/", "", 1)
-        input_file_buffer = s3_service.download_file_to_buffer(
-            bucket_name=settings.S3_BUCKET_NAME_DATASETS, object_key=s3_object_key
+        checkpoint("downloading")
+        tool_config = load_yaml_config("benchtop/biology/imaging/segmentation/auto_threshold.yaml")
+        scratch_dir = tempfile.TemporaryDirectory(
+            prefix="image_segmentation_", dir=(tool_config.get("engine") or {}).get("scratch_dir")
         )
-        if not input_file_buffer:
+        s3_object_key = dataset_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_DATASETS}/", "", 1)
+        input_path = os.path.join(scratch_dir.name, "input")
+        if not s3_service.download_file_to_path(settings.S3_BUCKET_NAME_DATASETS, s3_object_key, input_path):
             raise FileNotFoundError(f"Could not download input file from S3 path: {dataset_s3_path}")
         logger.info(f"{task_log_prefix} - Successfully downloaded input image from S3.")
-
-        ij_gateway = imagej_service.instance()
-        logger.info(f"{task_log_prefix} - Acquired ImageJ gateway instance.")
+        checkpoint("processing")
 
         # Validate parameters using the AutoThresholdParams schema
         processor_params_obj = AutoThresholdParams(**parameters)
+
+        # Only start (or attach to) the JVM when the request actually needs ImageJ
+        ij_gateway = None
+        if auto_threshold_needs_imagej(processor_params_obj):
+            ij_gateway = imagej_service.instance()
+            logger.info(f"{task_log_prefix} - Acquired ImageJ gateway instance.")
         
         # Call the auto_threshold_processor
+        output_file = tempfile.TemporaryFile(dir=scratch_dir.name)
+        # Preview tiles are uploaded in batches while the pyramid is built
+        results_prefix = f"analysis_runs/{analysis_run_id}/results"
         result_dict = auto_threshold_processor(
-            ij_gateway=ij_gateway, image_bytes=input_file_buffer.getvalue(), params=processor_params_obj
+            ij_gateway=ij_gateway, image=input_path, params=processor_params_obj,
+            config=tool_config, output_file=output_file,
+            store_preview_tiles=tile_store(_upload_result, prefix=results_prefix, name="thresholded_image")
         )
         logger.info(f"{task_log_prefix} - Image processing completed.")
-
-        processed_image_bytes = result_dict.get("processed_image_bytes")
-        if not processed_image_bytes:
-            raise ValueError("Processor did not return processed image bytes.")
+        checkpoint("uploading")
 
         # Save the result with a descriptive name
-        image_s3_object_name = f"analysis_runs/{analysis_run_id}/results/thresholded_image.png"
-        s3_service.upload_file(
-            bucket_name=settings.S3_BUCKET_NAME_RESULTS,
-            file_obj=io.BytesIO(processed_image_bytes),
-            object_name=image_s3_object_name
-        )
-        image_s3_path = f"s3://{settings.S3_BUCKET_NAME_RESULTS}/{image_s3_object_name}"
+        # The extension follows the tool's output encoder (TIFF input comes back as TIFF)
+        extension, content_type = file_type(result_dict.get("output_format", "png"))
+        image_s3_object_name = f"analysis_runs/{analysis_run_id}/results/thresholded_image.{extension}"
+        image_s3_path = _upload_image(result_dict, output_file, image_s3_object_name, content_type)
+        if not image_s3_path:
+            raise IOError(f"Could not upload the result image to S3 at {image_s3_object_name}")
         logger.info(f"{task_log_prefix} - Successfully uploaded thresholded image to S3 at {image_s3_path}")
 
+        # Thumbnail and DZI pyramid next to the full-resolution image, so the UI can load
+        # only what fits the viewport
+        preview_artifact = None
+        if result_dict.get("previews"):
+            preview_artifact = upload_previews(
+                result_dict["previews"], _upload_result, prefix=results_prefix, name="thresholded_image",
+            )
+            logger.info(f"{task_log_prefix} - Uploaded previews ({preview_artifact.get('tile_count', 0)} DZI tiles).")
+
         output_artifacts = {
-            "thresholded_image_s3_path": image_s3_path, # Use a specific key for this output
+            "thresholded_image_s3_path": image_s3_path,
+            "preview": preview_artifact, # Use a specific key for this output
             "summary": result_dict.get("summary", {})
         }
         final_status = AnalysisStatus.COMPLETED
         final_error_message = None
 
+    except run_control.RunCancelled as rc:
+        logger.info(f"{task_log_prefix} - {rc}")
+        final_status = AnalysisStatus.CANCELLED
+        final_error_message = "Cancelled by user."
+        output_artifacts = {}
     except Exception as e:
         logger.error(f"{task_log_prefix} - An error occurred: {str(e)}", exc_info=True)
         final_status = AnalysisStatus.FAILED
@@ -188,11 +299,160 @@ def run_image_segmentation_analysis(self, analysis_run_id: str, dataset_s3_path:
         output_artifacts = {"error_details": str(e), "traceback": traceback.format_exc()}
 
     finally:
+        # A cancel that arrived after the last checkpoint still wins
+        if run_control.finish(analysis_run_id) and final_status != AnalysisStatus.CANCELLED:
+            final_status, final_error_message, output_artifacts = AnalysisStatus.CANCELLED, "Cancelled by user.", {}
         if db_run:
+            # Per-stage timing trace, for performance debugging
+            output_artifacts = {**output_artifacts, "stage_timings": progress_reporter.finish(final_status.value)}
             crud.update_analysis_run_internal(
                 db=db, db_run=db_run,
                 run_in={"status": final_status, "error_message": final_error_message, "output_artifacts": output_artifacts}
             )
             logger.info(f"{task_log_prefix} - Final status '{final_status.value}' updated in DB.")
+        if output_file:
+            output_file.close()
+        if scratch_dir:
+            scratch_dir.cleanup()
         db.close()
-        logger.info(f"{task_log_prefix} - Task finished.")
\ No newline at end of file
+        logger.info(f"{task_log_prefix} - Task finished.")
+
+# --- TASK FOR CHAINED IMAGING PIPELINES ---
+@celery_app.task(name=dispatch.IMAGE_PIPELINE_TASK, bind=True, max_retries=1, default_retry_delay=30)
+def run_image_pipeline_analysis(self, analysis_run_id: str, dataset_s3_path: str, parameters: dict):
+    """
+    Celery task to run an ordered chain of imaging ops (e.g. blur then threshold) on one
+    image. The image is downloaded and decoded once; the ops run back to back in memory
+    and only the final output (plus intermediates marked save_output) is uploaded.
+    """
+    task_log_prefix = f"TASK [ID:{self.request.id}, RunID:{analysis_run_id}, Tool:Imaging Pipeline]"
+    logger.info(f"{task_log_prefix} - Task started.")
+
+    db: SQLAlchemySession = SessionLocal()
+    analysis_run_uuid = uuid.UUID(analysis_run_id)
+    db_run: models.AnalysisRun | None = None
+
+    final_status: AnalysisStatus = AnalysisStatus.FAILED
+    final_error_message: str | None = "Task did not complete due to an unexpected issue."
+    output_artifacts: Dict[str, Any] = {}
+    progress_reporter = progress.ProgressReporter(analysis_run_id)
+    # The input is downloaded to, and the final output encoded into, files in a scratch
+    # directory, so neither has to fit in memory
+    scratch_dir: tempfile.TemporaryDirectory | None = None
+    output_file: BinaryIO | None = None
+
+    try:
+        db_run = crud.get_analysis_run(db, analysis_run_id=analysis_run_uuid)
+        if not db_run:
+            raise ValueError("AnalysisRun not found in the database.")
+
+        # Stops here if the run was cancelled while it waited in the queue
+        checkpoint = run_control.checkpoint(analysis_run_id, progress=progress_reporter)
+        checkpoint("queued")
+
+        crud.update_analysis_run_status(db, db_run=db_run, status=AnalysisStatus.RUNNING)
+        logger.info(f"{task_log_prefix} - Status updated to RUNNING.")
+
+        checkpoint("downloading")
+        tool_config = load_yaml_config("benchtop/biology/imaging/pipeline.yaml")
+        scratch_dir = tempfile.TemporaryDirectory(
+            prefix="image_pipeline_", dir=(tool_config.get("engine") or {}).get("scratch_dir")
+        )
+        s3_object_key = dataset_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_DATASETS}/", "", 1)
+        input_path = os.path.join(scratch_dir.name, "input")
+        if not s3_service.download_file_to_path(settings.S3_BUCKET_NAME_DATASETS, s3_object_key, input_path):
+            raise FileNotFoundError(f"Could not download input file from S3 path: {dataset_s3_path}")
+        logger.info(f"{task_log_prefix} - Successfully downloaded input image from S3.")
+        checkpoint("processing")
+
+        processor_params_obj = ImagingPipelineParams(**parameters)
+
+        # Only start (or attach to) the JVM when some step actually needs ImageJ
+        ij_gateway = None
+        if imaging_pipeline.needs_imagej(processor_params_obj):
+            ij_gateway = imagej_service.instance()
+            logger.info(f"{task_log_prefix} - Acquired ImageJ gateway instance.")
+
+        output_file = tempfile.TemporaryFile(dir=scratch_dir.name)
+        # Preview tiles are uploaded in batches while the pyramid is built
+        results_prefix = f"analysis_runs/{analysis_run_id}/results"
+        result_dict = imaging_pipeline.run(
+            ij_gateway=ij_gateway, image=input_path, params=processor_params_obj,
+            config=tool_config, checkpoint=checkpoint, output_file=output_file,
+            store_preview_tiles=tile_store(_upload_result, prefix=results_prefix, name="pipeline_output")
+        )
+        logger.info(f"{task_log_prefix} - Pipeline of {len(processor_params_obj.steps)} steps completed.")
+        checkpoint("uploading")
+
+        extension, content_type = file_type(result_dict.get("output_format", "png"))
+        image_s3_object_name = f"{results_prefix}/pipeline_output.{extension}"
+        image_s3_path = _upload_image(result_dict, output_file, image_s3_object_name, content_type)
+        if not image_s3_path:
+            raise IOError(f"Could not upload the result image to S3 at {image_s3_object_name}")
+        logger.info(f"{task_log_prefix} - Successfully uploaded pipeline output to S3 at {image_s3_path}")
+
+        intermediate_artifacts = []
+        for intermediate in result_dict.get("intermediates", []):
+            extension, content_type = file_type(intermediate["output_format"])
+            object_name = f"{results_prefix}/intermediates/step_{intermediate['step']:02d}_{intermediate['op']}.{extension}"
+            if intermediate.get("file") is not None:
+                # Tiled runs encode intermediates into temp files
+                with intermediate["file"] as intermediate_file:
+                    intermediate_file.seek(0)
+                    s3_path = s3_service.upload_file_object(
+                        intermediate_file, bucket_name=settings.S3_BUCKET_NAME_RESULTS,
+                        object_name=object_name, content_type=content_type
+                    )
+            else:
+                s3_path = _upload_result(intermediate["bytes"], object_name, content_type)
+            if not s3_path:
+                raise IOError(f"Could not upload intermediate result to S3 at {object_name}")
+            intermediate_artifacts.append({
+                "step": intermediate["step"], "op": intermediate["op"], "s3_path": s3_path,
+                "encoding": intermediate["encoding"],
+            })
+
+        preview_artifact = None
+        if result_dict.get("previews"):
+            preview_artifact = upload_previews(
+                result_dict["previews"], _upload_result, prefix=results_prefix, name="pipeline_output",
+            )
+
+        output_artifacts = {
+            "output_image_s3_path": image_s3_path,
+            "intermediates": intermediate_artifacts,
+            "preview": preview_artifact,
+            "summary": result_dict.get("summary", {})
+        }
+        final_status = AnalysisStatus.COMPLETED
+        final_error_message = None
+
+    except run_control.RunCancelled as rc:
+        logger.info(f"{task_log_prefix} - {rc}")
+        final_status = AnalysisStatus.CANCELLED
+        final_error_message = "Cancelled by user."
+        output_artifacts = {}
+    except Exception as e:
+        logger.error(f"{task_log_prefix} - An error occurred: {str(e)}", exc_info=True)
+        final_status = AnalysisStatus.FAILED
+        final_error_message = f"An unexpected error occurred: {str(e)}"
+        output_artifacts = {"error_details": str(e), "traceback": traceback.format_exc()}
+
+    finally:
+        # A cancel that arrived after the last checkpoint still wins
+        if run_control.finish(analysis_run_id) and final_status != AnalysisStatus.CANCELLED:
+            final_status, final_error_message, output_artifacts = AnalysisStatus.CANCELLED, "Cancelled by user.", {}
+        if db_run:
+            # Per-stage timing trace, for performance debugging
+            output_artifacts = {**output_artifacts, "stage_timings": progress_reporter.finish(final_status.value)}
+            crud.update_analysis_run_internal(
+                db=db, db_run=db_run,
+                run_in={"status": final_status, "error_message": final_error_message, "output_artifacts": output_artifacts}
+            )
+            logger.info(f"{task_log_prefix} - Final status '{final_status.value}' updated in DB.")
+        if output_file:
+            output_file.close()
+        if scratch_dir:
+            scratch_dir.cleanup()
+        db.close()
+        logger.info(f"{task_log_prefix} - Task finished.")
@@ -0,0 +1,148 @@
+# backend/app/tasks/sweep.py
+
+import io
+import json
+import traceback
+import uuid
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy.orm import Session as SQLAlchemySession
+
+from app import crud, models
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.analysis_run import AnalysisStatus
+from app.services import progress, run_control
+from app.services.s3_service import s3_service
+
+# Shared body of the parameter-sweep tasks. A sweep is one Celery task (and one scheduler
+# slot) carrying many analysis runs on the same dataset: the dataset is downloaded and
+# parsed once, then every run is evaluated against it in turn. Each run keeps its own
+# status, progress, cancellation and results, exactly as if it had been submitted alone.
+
+
+# --- Helper Functions ---
+def download_dataset(dataset_s3_path: str) -> io.BytesIO:
+    s3_object_key = dataset_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_DATASETS}/", "", 1)
+    input_file_buffer = s3_service.download_file_to_buffer(
+        bucket_name=settings.S3_BUCKET_NAME_DATASETS,
+        object_key=s3_object_key
+    )
+    if not input_file_buffer:
+        raise ConnectionError("Failed to download input file from S3.")
+    return input_file_buffer
+
+
+def upload_results_json(analysis_run_id: str, result_dict: Dict[str, Any]) -> str:
+    """Upload a run's results payload and return its S3 path."""
+    json_s3_object_name = f"analysis_runs/{analysis_run_id}/results/results.json"
+    s3_service.s3_client_internal.upload_fileobj(
+        io.BytesIO(json.dumps(result_dict, indent=2).encode('utf-8')),
+        settings.S3_BUCKET_NAME_RESULTS,
+        json_s3_object_name
+    )
+    return f"s3://{settings.S3_BUCKET_NAME_RESULTS}/{json_s3_object_name}"
+
+
+def _run_one(db: SQLAlchemySession, task_log_prefix: str, run: Dict[str, Any],
+             get_dataset: Callable[[], Any],
+             evaluate: Callable[[str, Any, Dict[str, Any], Callable[..., None]], Dict[str, Any]]) -> AnalysisStatus:
+    analysis_run_id = run["analysis_run_id"]
+    run_log_prefix = f"{task_log_prefix} [RunID:{analysis_run_id}]"
+    db_run: models.AnalysisRun | None = None
+
+    final_status: AnalysisStatus = AnalysisStatus.FAILED
+    final_error_message: str | None = "Task did not complete due to an unexpected issue."
+    output_artifacts: Dict[str, Any] = {}
+    progress_reporter = progress.ProgressReporter(analysis_run_id)
+
+    try:
+        db_run = crud.get_analysis_run(db, analysis_run_id=uuid.UUID(analysis_run_id))
+        if not db_run:
+            raise ValueError("AnalysisRun record not found in database.")
+
+        # Runs of a sweep can be cancelled one by one
+        checkpoint = run_control.checkpoint(analysis_run_id, progress=progress_reporter)
+        checkpoint("queued")
+
+        crud.update_analysis_run_status(db, db_run=db_run, status=AnalysisStatus.RUNNING)
+        print(f"{run_log_prefix} Status updated to RUNNING.")
+
+        checkpoint("downloading")
+        dataset = get_dataset()
+
+        output_artifacts = evaluate(analysis_run_id, dataset, run["parameters"], checkpoint)
+        final_status = AnalysisStatus.COMPLETED
+        final_error_message = None
+
+    except run_control.RunCancelled as rc:
+        print(f"{run_log_prefix} {rc}")
+        final_status = AnalysisStatus.CANCELLED
+        final_error_message = "Cancelled by user."
+        output_artifacts = {}
+    except ValueError as ve:
+        print(f"{run_log_prefix} ERROR (ValueError): {str(ve)}\n{traceback.format_exc()}")
+        final_error_message = f"Configuration or data error: {str(ve)}"
+        output_artifacts = {"error_details": str(ve), "traceback": traceback.format_exc()}
+    except Exception as e:
+        # One failing combination does not stop the rest of the sweep
+        print(f"{run_log_prefix} ERROR (Exception): {str(e)}\n{traceback.format_exc()}")
+        final_error_message = f"An unexpected error occurred: {str(e)}"
+        output_artifacts = {"error_details": str(e), "traceback": traceback.format_exc()}
+    finally:
+        # A cancel that arrived after the last checkpoint still wins
+        if run_control.finish(analysis_run_id) and final_status != AnalysisStatus.CANCELLED:
+            final_status, final_error_message, output_artifacts = AnalysisStatus.CANCELLED, "Cancelled by user.", {}
+        if db_run:
+            # Per-stage timing trace, for performance debugging
+            output_artifacts = {**output_artifacts, "stage_timings": progress_reporter.finish(final_status.value)}
+            crud.update_analysis_run_internal(
+                db=db,
+                db_run=db_run,
+                run_in={
+                    "status": final_status,
+                    "error_message": final_error_message,
+                    "output_artifacts": output_artifacts,
+                }
+            )
+            print(f"{run_log_prefix} Final status '{final_status.value}' saved to DB.")
+    return final_status
+
+
+# --- Main Sweep Logic ---
+def run_sweep(task_log_prefix: str, runs: List[Dict[str, Any]],
+              load_dataset: Callable[[], Any],
+              evaluate: Callable[[str, Any, Dict[str, Any], Callable[..., None]], Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Evaluate every run of a sweep ({"analysis_run_id", "parameters"} each) in order.
+    `load_dataset()` is called once, when the first run that was not cancelled starts, and
+    its result is shared by all runs; if it fails, every remaining run fails with its error.
+    `evaluate(analysis_run_id, dataset, parameters, checkpoint)` computes and uploads one
+    run's results and returns its output artifacts.
+    Returns the number of runs per final status.
+    """
+    loaded: Dict[str, Any] = {}
+
+    def get_dataset() -> Any:
+        if "error" in loaded:
+            raise loaded["error"]
+        if "dataset" not in loaded:
+            print(f"{task_log_prefix} Loading the sweep's dataset.")
+            try:
+                loaded["dataset"] = load_dataset()
+            except Exception as e:
+                loaded["error"] = e
+                raise
+        return loaded["dataset"]
+
+    db: SQLAlchemySession = SessionLocal()
+    counts: Dict[str, int] = {}
+    try:
+        for index, run in enumerate(runs):
+            print(f"{task_log_prefix} Run {index + 1}/{len(runs)}.")
+            final_status = _run_one(db, task_log_prefix, run, get_dataset, evaluate)
+            counts[final_status.value] = counts.get(final_status.value, 0) + 1
+    finally:
+        db.close()
+    print(f"{task_log_prefix} Sweep finished: {counts}")
+    return counts
@@ -3,8 +3,9 @@ import os
 import uuid
 import io
 import json
+import tempfile
 import traceback
-from typing import Any, Dict
+from typing import Any, BinaryIO, Dict, Optional
 from celery import Celery
 from celery.exceptions import MaxRetriesExceededError
 from sqlalchemy.orm import Session as SQLAlchemySession
@@ -12,18 +13,44 @@ from sqlalchemy.orm import Session as SQLAlchemySession
 from app.db.session import SessionLocal
 from app import crud, models, schemas
 from app.core.config import settings
+from app.services import progress, run_control
 from app.services.s3_service import s3_service
 from app.utils.config_loader import load_yaml_config
 from app.models.analysis_run import AnalysisStatus
 
 # Import the processor and its Pydantic schema for VOLCANO PLOT
-from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import volcano_processor
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import volcano_artifact, volcano_processor, volcano_streaming
 from app.schemas.benchtop.biology.omics.transcriptomics.bulk_rna_seq.volcano import VolcanoParams as ToolVolcanoParams
 
 # This is needed to ensure the task is registered with the Celery app
 from app.celery_worker import celery_app
+from app.tasks import dispatch, sweep
 
-@celery_app.task(name="app.celery_worker.run_volcano_plot_analysis", bind=True, max_retries=1, default_retry_delay=30)
+def _upload_columns(analysis_run_id: str, columns_buffer: BinaryIO) -> Optional[str]:
+    # A BytesIO, or a temp file for streamed runs
+    if not columns_buffer.seek(0, os.SEEK_END):
+        return None  # Multi-contrast runs store no columns
+    columns_s3_object_name = f"analysis_runs/{analysis_run_id}/results/{volcano_artifact.ARTIFACT_FILENAME}"
+    columns_buffer.seek(0)
+    s3_service.s3_client_internal.upload_fileobj(
+        columns_buffer,
+        settings.S3_BUCKET_NAME_RESULTS,
+        columns_s3_object_name
+    )
+    return f"s3://{settings.S3_BUCKET_NAME_RESULTS}/{columns_s3_object_name}"
+
+
+def _render_artifacts(result_dict: Dict[str, Any]) -> Dict[str, Any]:
+    # How the run was plotted, so the classification endpoint can return the same kind of plot
+    density = result_dict.get("density")
+    return {
+        "render_mode": result_dict.get("render_mode"),
+        "density_bins": len(density["x_edges"]) - 1 if density else None,
+        "max_points": result_dict.get("summary_stats", {}).get("max_points"),
+    }
+
+
+@celery_app.task(name=dispatch.VOLCANO_PLOT_TASK, bind=True, max_retries=1, default_retry_delay=30)
 def run_volcano_plot_analysis(self, analysis_run_id: str, dataset_s3_path: str, parameters: dict):
     """
     Celery task to run volcano plot analysis, now in its own dedicated module.
@@ -35,61 +62,97 @@ def run_volcano_plot_analysis(self, analysis_run_id: str, dataset_s3_path: str,
     analysis_run_uuid = uuid.UUID(analysis_run_id)
     db_run: models.AnalysisRun | None = None
     input_file_buffer: io.BytesIO | None = None
+    scratch_dir: tempfile.TemporaryDirectory | None = None
+    columns_buffer: BinaryIO | None = None
 
     final_status: AnalysisStatus = AnalysisStatus.FAILED
     final_error_message: str | None = "Task did not complete due to an unexpected issue."
     final_run_log_update: str = ""
     output_artifacts: Dict[str, Any] = {}
+    progress_reporter = progress.ProgressReporter(analysis_run_id)
 
     try:
         db_run = crud.get_analysis_run(db, analysis_run_id=analysis_run_uuid)
         if not db_run:
             raise ValueError("AnalysisRun record not found in database.")
 
+        # Stops here if the run was cancelled while it waited in the queue
+        checkpoint = run_control.checkpoint(analysis_run_id, progress=progress_reporter)
+        checkpoint("queued")
+
         crud.update_analysis_run_status(db, db_run=db_run, status=AnalysisStatus.RUNNING)
         db.commit()
         print(f"{task_log_prefix} Status updated to RUNNING.")
 
-        print(f"{task_log_prefix} Downloading input file from S3: {dataset_s3_path}")
-        s3_object_key = dataset_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_DATASETS}/", "", 1)
-        input_file_buffer = s3_service.download_file_to_buffer(
-            bucket_name=settings.S3_BUCKET_NAME_DATASETS,
-            object_key=s3_object_key
-        )
-        if not input_file_buffer:
-            raise ConnectionError("Failed to download input file from S3.")
-        print(f"{task_log_prefix} Input file downloaded successfully.")
-
         print(f"{task_log_prefix} Preparing to run processor.")
         tool_config_yaml_path = "benchtop/biology/omics/transcriptomics/bulk_rna_seq/volcano.yaml"
         tool_default_config = load_yaml_config(tool_config_yaml_path)
         
         processor_params_obj = ToolVolcanoParams(**parameters)
 
-        class MockFileWithFilename:
-            def __init__(self, buffer: io.BytesIO, filename: str):
-                self.file = buffer
-                self.filename = filename
-                self.seek = buffer.seek
-                self.read = buffer.read
-
+        checkpoint("downloading")
+        s3_object_key = dataset_s3_path.replace(f"s3://{settings.S3_BUCKET_NAME_DATASETS}/", "", 1)
         original_filename = s3_object_key.split('/')[-1]
-        mock_file_obj = MockFileWithFilename(input_file_buffer, original_filename)
+        input_size = None
+        if processor_params_obj.streaming is None and not processor_params_obj.multi_contrast:
+            input_size = s3_service.get_object_size(settings.S3_BUCKET_NAME_DATASETS, s3_object_key)
 
-        print(f"{task_log_prefix} Executing volcano_processor.run...")
-        result_dict = volcano_processor.run(
-            file_obj=mock_file_obj,
-            params=processor_params_obj,
-            config=tool_default_config
-        )
+        if volcano_streaming.should_stream(processor_params_obj, tool_default_config, input_size):
+            # Large table: download to disk and process it in chunks; memory stays bounded
+            engine_config = tool_default_config.get("engine", {}) or {}
+            scratch_dir = tempfile.TemporaryDirectory(prefix="volcano_input_", dir=engine_config.get("scratch_dir"))
+            input_path = os.path.join(scratch_dir.name, original_filename)
+            print(f"{task_log_prefix} Downloading input file from S3 to disk for streaming: {dataset_s3_path}")
+            if not s3_service.download_file_to_path(settings.S3_BUCKET_NAME_DATASETS, s3_object_key, input_path):
+                raise ConnectionError("Failed to download input file from S3.")
+
+            print(f"{task_log_prefix} Executing volcano_streaming.run...")
+            columns_buffer = tempfile.TemporaryFile(dir=scratch_dir.name)
+            result_dict = volcano_streaming.run(
+                input_path,
+                params=processor_params_obj,
+                config=tool_default_config,
+                checkpoint=checkpoint,
+                columns_out=columns_buffer
+            )
+        else:
+            print(f"{task_log_prefix} Downloading input file from S3: {dataset_s3_path}")
+            input_file_buffer = s3_service.download_file_to_buffer(
+                bucket_name=settings.S3_BUCKET_NAME_DATASETS,
+                object_key=s3_object_key
+            )
+            if not input_file_buffer:
+                raise ConnectionError("Failed to download input file from S3.")
+            print(f"{task_log_prefix} Input file downloaded successfully.")
+
+            class MockFileWithFilename:
+                def __init__(self, buffer: io.BytesIO, filename: str):
+                    self.file = buffer
+                    self.filename = filename
+                    self.seek = buffer.seek
+                    self.read = buffer.read
+
+            mock_file_obj = MockFileWithFilename(input_file_buffer, original_filename)
+
+            print(f"{task_log_prefix} Executing volcano_processor.run...")
+            columns_buffer = io.BytesIO()
+            result_dict = volcano_processor.run(
+                file_obj=mock_file_obj,
+                params=processor_params_obj,
+                config=tool_default_config,
+                checkpoint=checkpoint,
+                columns_out=columns_buffer
+            )
         print(f"{task_log_prefix} Processor finished.")
 
+        checkpoint("serializing")
         print(f"{task_log_prefix} Uploading results JSON to S3.")
         results_json_bytes = json.dumps(result_dict, indent=2).encode('utf-8')
         results_json_buffer = io.BytesIO(results_json_bytes)
         
         json_s3_object_name = f"analysis_runs/{analysis_run_id}/results/results.json"
         
+        checkpoint("uploading")
         s3_service.s3_client_internal.upload_fileobj(
             results_json_buffer,
             settings.S3_BUCKET_NAME_RESULTS,
@@ -99,13 +162,24 @@ def run_volcano_plot_analysis(self, analysis_run_id: str, dataset_s3_path: str,
         results_json_s3_path = f"s3://{settings.S3_BUCKET_NAME_RESULTS}/{json_s3_object_name}"
         print(f"{task_log_prefix} Results JSON uploaded to: {results_json_s3_path}")
 
+        # Persist the classified columns so threshold changes can be served without a rerun
+        columns_s3_path = _upload_columns(analysis_run_id, columns_buffer)
+        print(f"{task_log_prefix} Columns uploaded to: {columns_s3_path}")
+
         output_artifacts = {
             "results_json_s3_path": results_json_s3_path,
-            "summary_stats": result_dict.get("summary_stats", {})
+            "columns_s3_path": columns_s3_path,
+            "summary_stats": result_dict.get("summary_stats", {}),
+            **_render_artifacts(result_dict)
         }
         final_status = AnalysisStatus.COMPLETED
         final_error_message = None
 
+    except run_control.RunCancelled as rc:
+        print(f"{task_log_prefix} {rc}")
+        final_status = AnalysisStatus.CANCELLED
+        final_error_message = "Cancelled by user."
+        output_artifacts = {}
     except ValueError as ve:
         print(f"{task_log_prefix} ERROR (ValueError): {str(ve)}\n{traceback.format_exc()}")
         final_status = AnalysisStatus.FAILED
@@ -121,8 +195,13 @@ def run_volcano_plot_analysis(self, analysis_run_id: str, dataset_s3_path: str,
             print(f"{task_log_prefix} Max retries exceeded.")
             pass
     finally:
+        # A cancel that arrived after the last checkpoint still wins
+        if run_control.finish(analysis_run_id) and final_status != AnalysisStatus.CANCELLED:
+            final_status, final_error_message, output_artifacts = AnalysisStatus.CANCELLED, "Cancelled by user.", {}
         print(f"{task_log_prefix} Finalizing task. Status: {final_status}")
         if db_run:
+            # Per-stage timing trace, for performance debugging
+            output_artifacts = {**output_artifacts, "stage_timings": progress_reporter.finish(final_status.value)}
             crud.update_analysis_run_internal(
                 db=db,
                 db_run=db_run,
@@ -138,6 +217,47 @@ def run_volcano_plot_analysis(self, analysis_run_id: str, dataset_s3_path: str,
         
         if input_file_buffer:
             input_file_buffer.close()
+        if columns_buffer:
+            columns_buffer.close()
+        if scratch_dir:
+            scratch_dir.cleanup()
 
         db.close()
-        print(f"{task_log_prefix} Task finished.")
\ No newline at end of file
+        print(f"{task_log_prefix} Task finished.")
+
+@celery_app.task(name=dispatch.VOLCANO_SWEEP_TASK, bind=True)
+def run_volcano_plot_sweep(self, analysis_run_id: str, dataset_s3_path: str, parameters: dict):
+    """
+    Celery task evaluating a volcano plot parameter sweep: the table is downloaded and
+    parsed once, then each run of the sweep (parameters["runs"]) is classified against it.
+    analysis_run_id is the sweep's id; every run records its own status and results.
+    """
+    task_log_prefix = f"TASK [ID:{self.request.id}, SweepID:{analysis_run_id}, Tool:Volcano]"
+    print(f"{task_log_prefix} Received {len(parameters['runs'])} runs.")
+
+    tool_default_config = load_yaml_config("benchtop/biology/omics/transcriptomics/bulk_rna_seq/volcano.yaml")
+
+    def load_dataset():
+        input_file_buffer = sweep.download_dataset(dataset_s3_path)
+        input_file_buffer.filename = dataset_s3_path.split('/')[-1]
+        return volcano_processor.load_input(input_file_buffer)
+
+    def evaluate(run_id: str, data, run_parameters: dict, checkpoint) -> Dict[str, Any]:
+        columns_buffer = io.BytesIO()
+        result_dict = volcano_processor.run(
+            file_obj=None,
+            params=ToolVolcanoParams(**run_parameters),
+            config=tool_default_config,
+            checkpoint=checkpoint,
+            data=data,
+            columns_out=columns_buffer
+        )
+        checkpoint("uploading")
+        return {
+            "results_json_s3_path": sweep.upload_results_json(run_id, result_dict),
+            "columns_s3_path": _upload_columns(run_id, columns_buffer),
+            "summary_stats": result_dict.get("summary_stats", {}),
+            **_render_artifacts(result_dict)
+        }
+
+    return sweep.run_sweep(task_log_prefix, parameters["runs"], load_dataset, evaluate)
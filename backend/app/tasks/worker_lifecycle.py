@@ -0,0 +1,68 @@
+# backend/app/tasks/worker_lifecycle.py
+
+from celery import states
+from celery.signals import task_postrun, task_revoked, worker_process_init, worker_process_shutdown
+from celery.utils.log import get_task_logger
+
+from app.core.config import settings
+from app.services import scheduler, worker_health
+from app.services.imagej_service import imagej_service
+
+# Worker process lifecycle hooks. The JVM cannot survive a fork, so the gateway is
+# started in each prefork child (worker_process_init) rather than in the parent.
+
+logger = get_task_logger(__name__)
+
+
+@worker_process_init.connect
+def init_imaging_runtime(**kwargs):
+    """
+    Start and warm the ImageJ gateway in a freshly forked worker child, so no
+    user-facing run pays the JVM cold start.
+    """
+    if not (settings.IMAGEJ_WARMUP_ON_WORKER_START and settings.imaging_runtime_enabled("worker")):
+        return
+    try:
+        imagej_service.instance()
+        imagej_service.warm_up()
+    except Exception as e:
+        # Keep the child alive: native-backend imaging and omics tasks don't need the JVM.
+        logger.error(f"ImageJ warm-up failed in worker process: {e}", exc_info=True)
+    worker_health.report_imaging_status(imagej_service.status())
+
+
+@task_postrun.connect
+def refresh_imaging_status(**kwargs):
+    # Keeps the health key alive while the process is serving tasks
+    if imagej_service.status()["initialized"]:
+        worker_health.report_imaging_status(imagej_service.status())
+
+
+@task_postrun.connect
+def release_scheduler_slot(task_id=None, state=None, **kwargs):
+    """
+    Free the finished run's scheduler slot and dispatch the next waiting runs.
+    The Celery task id is the analysis run id (see app.tasks.dispatch).
+    """
+    if state == states.RETRY:
+        # self.retry() re-queued the run under the same id; it keeps its slot until that attempt finishes
+        return
+    try:
+        scheduler.complete(task_id)
+    except Exception as e:
+        # The slot expires on its own (SCHEDULER_INFLIGHT_TIMEOUT_SECONDS); never fail the task
+        logger.error(f"Could not release the scheduler slot of run {task_id}: {e}", exc_info=True)
+
+
+@task_revoked.connect
+def release_revoked_scheduler_slot(request=None, **kwargs):
+    # A revoked (cancelled) task never runs, so task_postrun never fires for it
+    try:
+        scheduler.complete(request.id)
+    except Exception as e:
+        logger.error(f"Could not release the scheduler slot of revoked run {getattr(request, 'id', None)}: {e}", exc_info=True)
+
+
+@worker_process_shutdown.connect
+def clear_imaging_runtime_status(**kwargs):
+    worker_health.clear_imaging_status()
@@ -0,0 +1,42 @@
+# backend/app/tasks/worker_pools.py
+
+import sys
+from typing import List
+
+from app.celery_worker import celery_app
+from app.core.config import settings
+from app.tasks.dispatch import WORKLOADS
+
+# Starts a Celery worker for one workload class, with the queue, pool type, concurrency,
+# prefetch multiplier and per-child memory limit taken from Settings, e.g.
+#
+#   python -m app.tasks.worker_pools imaging
+#
+# Each class can then be scaled independently (more containers or a larger
+# *_WORKER_CONCURRENCY) without touching the others.
+
+
+def worker_argv(workload: str, loglevel: str = "INFO") -> List[str]:
+    """Build the `celery worker` arguments for a workload class."""
+    if workload not in WORKLOADS:
+        raise ValueError(f"Unknown workload class '{workload}'. Expected one of: {', '.join(WORKLOADS)}.")
+    pool = settings.worker_pool(workload)
+    argv = [
+        "worker",
+        "-l", loglevel,
+        "-Q", pool["queue"],
+        "-n", f"{workload}@%h",  # Distinct node names so the pools show up separately in Flower
+        "--pool", pool["pool"],
+        "--concurrency", str(pool["concurrency"]),
+        "--prefetch-multiplier", str(pool["prefetch_multiplier"]),
+        "-E",
+    ]
+    if pool["max_memory_per_child_kb"] > 0:
+        argv += ["--max-memory-per-child", str(pool["max_memory_per_child_kb"])]
+    return argv
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit(f"Usage: python -m app.tasks.worker_pools <{'|'.join(WORKLOADS)}>")
+    celery_app.worker_main(worker_argv(sys.argv[1]))
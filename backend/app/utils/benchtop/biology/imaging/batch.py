@@ -0,0 +1,117 @@
+# backend/app/utils/benchtop/biology/imaging/batch.py
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.benchtop.biology.imaging.filters import gaussian_blur_processor
+from app.utils.benchtop.biology.imaging.segmentation import auto_threshold_processor
+
+# Batch execution for the imaging tools. Each image flows download -> process/encode
+# -> upload inside one pool thread, so with N threads the network I/O of some images
+# overlaps the compute of others (decoding, SciPy filters and zlib all release the
+# GIL). Only a bounded number of images is admitted ahead of the pool, which keeps
+# memory flat no matter how many images the batch holds.
+
+# Tool name (as in batch_schema.BATCH_TOOL_PARAMS) -> (processor module, YAML config path)
+BATCH_PROCESSORS = {
+    "gaussian_blur": (gaussian_blur_processor, "benchtop/biology/imaging/filters/gaussian_blur.yaml"),
+    "auto_threshold": (auto_threshold_processor, "benchtop/biology/imaging/segmentation/auto_threshold.yaml"),
+}
+
+
+# --- Helper Functions ---
+def _run_item(index: int, item: Dict[str, Any], fetch: Callable, process: Callable, store: Callable,
+              compute_lock: Optional[threading.Lock]) -> Dict[str, Any]:
+    """Run one image through the pipeline. Failures are recorded, never raised."""
+    entry: Dict[str, Any] = {"index": index, **item, "status": "failed"}
+    timings: Dict[str, float] = {}
+    try:
+        started = time.perf_counter()
+        image_bytes = fetch(item)
+        timings["download_seconds"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with compute_lock or nullcontext():
+            result = process(image_bytes)
+        timings["process_seconds"] = time.perf_counter() - started
+        del image_bytes
+
+        started = time.perf_counter()
+        entry.update(store(index, item, result))
+        timings["upload_seconds"] = time.perf_counter() - started
+
+        entry.update({
+            "status": "completed",
+            "output_format": result.get("output_format", "png"),
+            "output_bytes": len(result["processed_image_bytes"]),
+            "summary": result.get("summary", {}),
+        })
+    except Exception as e:
+        entry["error"] = str(e)
+    entry["timings"] = {name: round(seconds, 4) for name, seconds in timings.items()}
+    return entry
+
+
+def summarize_manifest(manifest: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Totals for a batch: counts, throughput and time spent per stage (summed over images)."""
+    succeeded = sum(1 for entry in manifest if entry["status"] == "completed")
+    stage_totals = {}
+    for stage in ("download_seconds", "process_seconds", "upload_seconds"):
+        stage_totals[stage] = round(sum(entry["timings"].get(stage, 0.0) for entry in manifest), 3)
+    return {
+        "images": len(manifest),
+        "succeeded": succeeded,
+        "failed": len(manifest) - succeeded,
+        "wall_seconds": round(wall_seconds, 3),
+        "images_per_second": round(len(manifest) / wall_seconds, 3) if wall_seconds > 0 else None,
+        "stage_seconds": stage_totals,
+    }
+
+
+# --- Main Batch Logic ---
+def run_pipeline(
+    items: List[Dict[str, Any]],
+    fetch: Callable[[Dict[str, Any]], bytes],
+    process: Callable[[bytes], Dict[str, Any]],
+    store: Callable[[int, Dict[str, Any], Dict[str, Any]], Dict[str, Any]],
+    max_workers: int = 4,
+    prefetch_per_worker: int = 2,
+    compute_lock: Optional[threading.Lock] = None,
+    checkpoint: Optional[Callable[..., None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Process every item and return a manifest with one entry per item, in input order.
+
+    Args:
+        items: One dict per image (e.g. {"s3_path": ..., "dataset_id": ...}); copied into its entry.
+        fetch: Returns the input image bytes for an item.
+        process: A processor call returning its result dict (processed_image_bytes, summary, ...).
+        store: Persists a result and returns the fields to record for it
+            (e.g. {"output_s3_path": ..., "preview": ...}).
+        max_workers: Pool threads.
+        prefetch_per_worker: Images admitted per thread; bounds how many are held in memory.
+        compute_lock: Serializes `process` when it uses a shared resource such as the ImageJ
+            gateway, while downloads and uploads still overlap.
+        checkpoint: Called as checkpoint("processing_images", done, total) before each image
+            is admitted (see app.services.run_control); if it raises, no further images
+            start and the images in flight finish first.
+    """
+    in_flight_limit = max(1, max_workers * prefetch_per_worker)
+    manifest: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        pending = {}
+        for index, item in enumerate(items):
+            if checkpoint is not None:
+                checkpoint("processing_images", index, len(items))
+            if len(pending) >= in_flight_limit:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    manifest[pending.pop(future)] = future.result()
+            future = pool.submit(_run_item, index, item, fetch, process, store, compute_lock)
+            pending[future] = index
+        for future in list(pending):
+            manifest[pending.pop(future)] = future.result()
+    return manifest
@@ -0,0 +1,106 @@
+# backend/app/utils/benchtop/biology/imaging/encoders.py
+
+import io
+import time
+import numpy as np
+from PIL import Image
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+from app.utils.benchtop.biology.imaging import image_io
+
+# Output encoders for the imaging tools. The encoding is chosen per tool in its YAML
+# `output` section (and may be overridden per request), and every encode is timed and
+# sized so the trade-off shows up in the run summary.
+#   png        lossless, browser-viewable; compress_level trades encode time for size
+#   webp       lossless WebP (8-bit only); usually smaller than PNG, slower to encode
+#   mask_1bit  bit-packed 1-bit PNG for binary masks (8x fewer raw bytes than 0/255)
+#   npy        raw NumPy array with dtype and shape, for downstream tools; no compression
+
+OUTPUT_FORMATS = ["png", "webp", "mask_1bit", "npy"]
+
+# Output format -> (file extension, content type). "tiff" is produced by stack input.
+_FILE_TYPES = {
+    "png": ("png", "image/png"),
+    "mask_1bit": ("png", "image/png"),
+    "webp": ("webp", "image/webp"),
+    "npy": ("npy", "application/octet-stream"),
+    "tiff": ("tif", "image/tiff"),
+}
+
+DEFAULT_PNG_COMPRESS_LEVEL = 6
+DEFAULT_WEBP_METHOD = 4
+_WEBP_MAX_DIMENSION = 16383
+
+
+# --- Helper Functions ---
+def file_type(output_format: str) -> Tuple[str, str]:
+    """(file extension, content type) for a result's output_format."""
+    return _FILE_TYPES[output_format]
+
+
+def output_settings(config: Optional[dict], requested_format: Optional[str] = None) -> Dict[str, Any]:
+    """Encoder settings from a tool config's `output` section; a request may override the format."""
+    output = (config or {}).get('output', {}) or {}
+    settings = {
+        "format": requested_format or output.get('format') or "png",
+        "png_compress_level": output.get('png_compress_level', DEFAULT_PNG_COMPRESS_LEVEL),
+        "webp_method": output.get('webp_method', DEFAULT_WEBP_METHOD),
+        "tiff_compression": output.get('tiff_compression'),
+    }
+    if settings["format"] not in OUTPUT_FORMATS:
+        raise ValueError(f"Invalid output format '{settings['format']}'. Must be one of {OUTPUT_FORMATS}")
+    return settings
+
+
+def _encode_png(array: np.ndarray, out: BinaryIO, compress_level: int, bool_bit_depth: int = 8) -> None:
+    if isinstance(array, np.memmap) or array.dtype == bool:
+        # Disk-backed (tiled) outputs are streamed band by band; masks may be bit-packed
+        image_io.encode_png_stream(array, file_obj=out, compress_level=compress_level, bool_bit_depth=bool_bit_depth)
+        return
+    Image.fromarray(array).save(out, format="PNG", compress_level=compress_level)
+
+
+def _encode_webp(array: np.ndarray, out: BinaryIO, method: int) -> None:
+    if array.dtype == bool:
+        array = array.astype(np.uint8) * 255
+    if array.dtype != np.uint8:
+        raise ValueError(f"WebP output supports 8-bit images only, got {array.dtype}; use 'png' or 'npy'.")
+    if max(array.shape[:2]) > _WEBP_MAX_DIMENSION:
+        raise ValueError(f"WebP output is limited to {_WEBP_MAX_DIMENSION} pixels per side; use 'png' or 'npy'.")
+    Image.fromarray(np.asarray(array)).save(out, format="WEBP", lossless=True, quality=100, method=method)
+
+
+def _encode_npy(array: np.ndarray, out: BinaryIO) -> None:
+    np.save(out, array, allow_pickle=False)
+
+
+# --- Main Encoder Logic ---
+def encode(array: np.ndarray, settings: Dict[str, Any],
+           file_obj: Optional[BinaryIO] = None) -> Tuple[Optional[bytes], Dict[str, Any]]:
+    """
+    Encode a full-resolution result with the configured format.
+    Returns (encoded_bytes, encoding_summary) where the summary records the format,
+    encode time, encoded size and the raw (in-memory) size for comparison.
+    With file_obj (e.g. a temp file), the result is written there instead and
+    encoded_bytes is None, so large results never sit in memory.
+    """
+    output_format = settings["format"]
+    out = file_obj if file_obj is not None else io.BytesIO()
+    start_offset = out.tell()
+    started = time.perf_counter()
+    if output_format == "png":
+        _encode_png(array, out, settings["png_compress_level"])
+    elif output_format == "mask_1bit":
+        _encode_png(array if array.dtype == bool else array > 0, out, settings["png_compress_level"], bool_bit_depth=1)
+    elif output_format == "webp":
+        _encode_webp(array, out, settings["webp_method"])
+    else:
+        _encode_npy(array, out)
+    encode_seconds = time.perf_counter() - started
+    return (None if file_obj is not None else out.getvalue()), {
+        "format": output_format,
+        "content_type": file_type(output_format)[1],
+        "encode_seconds": round(encode_seconds, 4),
+        "bytes": out.tell() - start_offset,
+        "raw_bytes": int(array.nbytes),
+    }
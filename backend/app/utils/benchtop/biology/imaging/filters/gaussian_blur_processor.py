@@ -1,76 +1,191 @@
 # backend/app/utils/benchtop/biology/imaging/filters/gaussian_blur_processor.py
 
-import io
+import os
+import tempfile
 import numpy as np
-from PIL import Image
-from typing import Dict, Any
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
 
 from app.schemas.benchtop.biology.imaging.filters.gaussian_blur_schema import GaussianBlurParams
+from app.utils.benchtop.biology.imaging import encoders, image_io, native_ops, previews, tiling
+
+# --- Helper Functions ---
+def needs_imagej(params: GaussianBlurParams) -> bool:
+    """Whether this request has to run on the ImageJ gateway (i.e. the JVM)."""
+    return native_ops.resolve_backend(params.backend) == "imagej"
+
+
+def apply(input_array: np.ndarray, params: GaussianBlurParams, ij_gateway=None) -> np.ndarray:
+    """
+    Blur a NumPy image with the requested backend and return an array of the same dtype.
+    The native backend filters the two spatial axes only; ImageJ's gauss op applies sigma
+    to every axis, including a trailing RGB channel axis.
+    """
+    if native_ops.resolve_backend(params.backend) == "native":
+        return native_ops.gaussian_blur(input_array, params.sigma)
+
+    if ij_gateway is None:
+        raise ValueError("The 'imagej' backend requires an initialized ImageJ gateway.")
+    # Convert NumPy array to an ImageJ2 Dataset, run the 'gauss' op from the 'filter'
+    # namespace, and convert the resulting Dataset back to a NumPy array.
+    ij_dataset = ij_gateway.py.to_dataset(input_array)
+    blurred_dataset = ij_gateway.op().filter().gauss(ij_dataset, params.sigma)
+    return np.asarray(ij_gateway.py.from_java(blurred_dataset))
+
+
+def apply_tiled(input_array: np.ndarray, params: GaussianBlurParams, out: np.ndarray,
+                engine: Dict[str, Any], ij_gateway=None) -> np.ndarray:
+    """
+    Blur tile by tile into `out`. The halo is the Gauss3 kernel radius for sigma, which
+    makes every tile's interior identical to blurring the whole image. ImageJ tiles run
+    one at a time, since the gateway is shared by the whole process.
+    """
+    return tiling.apply_tiled(
+        input_array,
+        lambda tile: apply(tile, params, ij_gateway=ij_gateway),
+        out,
+        tile_size=engine["tile_size"],
+        halo=native_ops.gauss_kernel_radius(params.sigma),
+        max_workers=1 if ij_gateway is not None else engine["max_workers"],
+    )
+
+
+def _blur_plane(plane: np.ndarray, params: GaussianBlurParams, engine: Dict[str, Any],
+                plane_buffer: Callable[..., np.ndarray], ij_gateway=None) -> np.ndarray:
+    """
+    Blur one plane of a stack, tiled when large, keeping the plane's dtype. Large planes
+    are blurred into a disk-backed buffer reused for every plane (see image_io.plane_buffers).
+    """
+    if tiling.should_tile(plane.shape, engine["min_tiled_pixels"]):
+        return apply_tiled(plane, params, plane_buffer(plane.shape, plane.dtype), engine, ij_gateway=ij_gateway)
+    blurred = apply(plane, params, ij_gateway=ij_gateway)
+    # ImageJ may hand back a wider type; stacks are written back at the input bit depth
+    return blurred if blurred.dtype == plane.dtype else native_ops.round_to_dtype(blurred, plane.dtype)
+
 
 # --- Main Processor Logic ---
 def run(
-    ij_gateway,  # The initialized PyImageJ gateway instance
-    image_bytes: bytes,
-    params: GaussianBlurParams
+    ij_gateway,  # The initialized PyImageJ gateway instance, or None for the native backend
+    image: image_io.ImageSource,
+    params: GaussianBlurParams,
+    config: Optional[dict] = None,
+    output_file: Optional[BinaryIO] = None,
+    store_preview_tiles: Optional[Callable[[List[Tuple[str, bytes]]], None]] = None,
 ) -> Dict[str, Any]:
     """
-    Applies a Gaussian blur to an image using ImageJ ops.
+    Applies a Gaussian blur to an image, either natively (NumPy/SciPy) or using ImageJ ops.
 
-    This function follows the standard pattern for PyImageJ processing:
-    1. Convert Python data (NumPy array) into ImageJ data types (Dataset).
-    2. Run the desired ImageJ operation(s).
-    3. Convert the ImageJ result back into Python data types.
+    This function follows the standard pattern for image processing:
+    1. Decode the input into a NumPy array.
+    2. Run the filter on the selected backend (see `apply`), tile by tile into a
+       memory-mapped output for images above the configured size.
+    3. Encode the result with the tool's configured encoder (PNG by default).
+
+    TIFF/OME-TIFF input (including 16-bit and z/t/c stacks) is never converted: every
+    plane is blurred at its original bit depth and the result is a multi-page TIFF.
+    TIFF is read region by region; other formats are decoded whole and capped at the
+    engine's max_decoded_pixels (see image_io).
 
     Args:
-        ij_gateway: The active PyImageJ gateway from the ImageJService.
-        image_bytes: The input image as bytes (e.g., from an uploaded file).
+        ij_gateway: The active PyImageJ gateway from the ImageJService. Only required
+            when the request resolves to the 'imagej' backend.
+        image: The input image as bytes, or the path of a local file.
         params: A Pydantic model containing validated parameters for the filter.
+        config: The tool's YAML config; its `engine` section controls tiling and its
+            `output` section the encoder.
+        output_file: If given (e.g. a temp file), the full-resolution result (2D image
+            or TIFF stack) is written there and processed_image_bytes is None.
+        store_preview_tiles: Receives the preview's DZI tiles in batches as they are
+            encoded (see previews.tile_store); otherwise they are returned.
 
     Returns:
-        A dictionary containing the processed image as bytes (in PNG format)
-        and a summary of the operation.
+        A dictionary containing the processed image as bytes (in the configured output
+        format, or TIFF for TIFF input), its format, and a summary of the operation.
     """
-    # 1. Convert input bytes to a NumPy array
-    # Using PIL (Pillow) as an intermediate to handle various image formats.
-    pil_image = Image.open(io.BytesIO(image_bytes))
+    backend = "imagej" if needs_imagej(params) else "native"
+    engine = tiling.engine_settings(config)
+    output = encoders.output_settings(config, params.output_format)
+    preview = previews.preview_settings(config)
+
+    # 1a. TIFF stacks: read (memory-mapped where possible) and blur plane by plane
+    if image_io.is_tiff(image):
+        with tempfile.TemporaryDirectory(prefix="gaussian_blur_", dir=engine["scratch_dir"]) as scratch_dir:
+            plane_buffer = image_io.plane_buffers(scratch_dir)
+            stack_file, stack_summary = image_io.process_tiff_stack(
+                image,
+                lambda plane: _blur_plane(plane, params, engine, plane_buffer, ij_gateway=ij_gateway),
+                output_file=output_file,
+                scratch_dir=engine["scratch_dir"],
+                compression=output["tiff_compression"],
+                max_pixels=engine["max_image_pixels"],
+            )
+        # Written to output_file when given; otherwise read back from the temp file
+        output_bytes = None if output_file is not None else image_io.read_and_close(stack_file)
+        return {
+            "processed_image_bytes": output_bytes,
+            "output_format": "tiff",
+            "summary": {
+                "filter_applied": "Gaussian Blur",
+                "parameters_used": params.model_dump(),
+                "backend": backend,
+                "stack": stack_summary,
+            },
+            # Stacks are viewed plane by plane in dedicated viewers; no 2D preview is built
+            "previews": None,
+        }
+
+    # 1b. Convert the input to a NumPy array
+    # Using PIL (Pillow) as an intermediate to handle various image formats; the size is
+    # checked from the header before anything is decoded.
+    pil_image = image_io.open_image(image, engine["max_decoded_pixels"])
     
     # For this initial implementation, we will process the image in its original mode
     # if it's a common type like Grayscale (L) or RGB. More complex modes might
     # require specific handling in future iterations.
     original_mode = pil_image.mode
-    if original_mode not in ['L', 'RGB', 'RGBA']:
+    if original_mode not in ['L', 'RGB', 'RGBA', 'I;16']:
         # Convert to a standard mode (e.g., RGB) to ensure compatibility.
         pil_image = pil_image.convert('RGB')
 
+    original_width, original_height = pil_image.size
     input_array = np.array(pil_image)
+    pil_image.close() # The array is the only decoded copy kept
 
-    # 2. Convert NumPy array to an ImageJ2 Dataset object
-    # The gateway's `py.to_dataset` helper handles this conversion.
-    ij_dataset = ij_gateway.py.to_dataset(input_array)
-
-    # 3. Run the Gaussian Blur command from the ImageJ Ops framework
-    # This is the core processing step. We call the 'gauss' op within the 'filter' namespace.
-    # The result is another ImageJ2 Dataset object.
-    blurred_dataset = ij_gateway.op().filter().gauss(ij_dataset, params.sigma)
-
-    # 4. Convert the resulting ImageJ2 Dataset back to a NumPy array
-    # The gateway's `py.from_java` helper handles the conversion back to a Python object.
-    output_array = ij_gateway.py.from_java(blurred_dataset)
+    # 2. Run the Gaussian blur on the selected backend
+    tiled = tiling.should_tile(input_array.shape, engine["min_tiled_pixels"])
+    if tiled:
+        # 3. Tiled path: blur into a disk-backed output and encode it band by band
+        with tempfile.TemporaryDirectory(prefix="gaussian_blur_", dir=engine["scratch_dir"]) as scratch_dir:
+            output_array = np.lib.format.open_memmap(
+                os.path.join(scratch_dir, "blurred.npy"), mode="w+",
+                dtype=input_array.dtype, shape=input_array.shape,
+            )
+            apply_tiled(input_array, params, output_array, engine, ij_gateway=ij_gateway)
+            del input_array
+            output_bytes, encoding = encoders.encode(output_array, output, file_obj=output_file)
+            preview_images = previews.build_previews(output_array, preview, store_preview_tiles, engine["scratch_dir"])
+            del output_array
+    else:
+        output_array = apply(input_array, params, ij_gateway=ij_gateway)
 
-    # 5. Convert output NumPy array back to image bytes (in PNG format) for storage/display
-    output_image = Image.fromarray(output_array)
-    output_buffer = io.BytesIO()
-    output_image.save(output_buffer, format="PNG")
-    output_bytes = output_buffer.getvalue()
+        # 3. Encode the full-resolution output with the configured encoder (see encoders.py)
+        output_bytes, encoding = encoders.encode(output_array, output, file_obj=output_file)
+        preview_images = previews.build_previews(output_array, preview, store_preview_tiles, engine["scratch_dir"])
 
-    # 6. Construct the final result dictionary
+    # 4. Construct the final result dictionary
     result = {
         "processed_image_bytes": output_bytes,
+        "output_format": output["format"],
         "summary": {
             "filter_applied": "Gaussian Blur",
             "parameters_used": params.model_dump(),
-            "original_dimensions": f"{pil_image.width}x{pil_image.height}",
+            "backend": backend,
+            "tiled": tiled,
+            "original_dimensions": f"{original_width}x{original_height}",
             "original_mode": original_mode,
-        }
+            "encoding": encoding,
+            "preview_seconds": preview_images["build_seconds"] if preview_images else None,
+        },
+        # Thumbnail and DZI pyramid for the browser, separate from the full-resolution output
+        "previews": preview_images,
     }
-    return result
\ No newline at end of file
+    return result
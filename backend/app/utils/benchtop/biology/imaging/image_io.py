@@ -0,0 +1,266 @@
+# backend/app/utils/benchtop/biology/imaging/image_io.py
+
+import io
+import os
+import struct
+import tempfile
+import zlib
+import numpy as np
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+# Image decoding/encoding shared by the imaging processors. Inputs are either the encoded
+# bytes or the path of a local file (the tasks download large inputs to disk).
+#   TIFF/OME-TIFF  read region by region (memory-mapped, or decoded once into a
+#                  memory-mapped scratch array), so size is limited by disk, not RAM
+#   anything else  decoded whole by PIL, so it is capped at engine.max_decoded_pixels;
+#                  PIL's own decompression-bomb limit is left untouched
+
+ImageSource = Union[bytes, str]
+
+# Ceiling for region-read (TIFF) input, sized for whole-slide and stitched images
+DEFAULT_MAX_IMAGE_PIXELS = 1_000_000_000
+# Ceiling for formats decoded whole into memory: PIL's default decompression-bomb limit
+DEFAULT_MAX_DECODED_PIXELS = Image.MAX_IMAGE_PIXELS
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Classic and BigTIFF headers, little- and big-endian (OME-TIFF is a TIFF with XML metadata)
+_TIFF_SIGNATURES = (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+")
+# Above this size the output stack is written as BigTIFF (classic TIFF offsets are 32-bit)
+_BIGTIFF_THRESHOLD_BYTES = 2**32 - 2**25
+# PNG color types by number of channels: gray, gray+alpha, RGB, RGBA
+_PNG_COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return (struct.pack(">I", len(data)) + chunk_type + data
+            + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+
+def encode_png_stream(array: np.ndarray, file_obj: Optional[BinaryIO] = None,
+                      compress_level: int = 6, rows_per_chunk: int = 256,
+                      bool_bit_depth: int = 8) -> bytes:
+    """
+    Encode an 8/16-bit (rows x cols [x channels]) array as PNG, band by band, so only
+    `rows_per_chunk` rows are held uncompressed at a time. Works directly on np.memmap
+    output from the tiled engine. Boolean masks are written as 0/255 (bool_bit_depth=8)
+    or bit-packed (bool_bit_depth=1). Writes to file_obj if given, otherwise returns the bytes.
+    """
+    if array.dtype == bool:
+        if bool_bit_depth not in (1, 8):
+            raise ValueError(f"Boolean masks are written at 1 or 8 bits, got {bool_bit_depth}.")
+        bit_depth, sample_dtype = bool_bit_depth, np.uint8
+    elif array.dtype in (np.uint8, np.int8):
+        bit_depth, sample_dtype = 8, np.uint8
+    elif array.dtype in (np.uint16, np.int16):
+        bit_depth, sample_dtype = 16, np.dtype(">u2")
+    else:
+        raise ValueError(f"PNG output supports 8- and 16-bit images, got {array.dtype}.")
+    height, width = array.shape[:2]
+    channels = array.shape[2] if array.ndim == 3 else 1
+    if channels not in _PNG_COLOR_TYPES or (bit_depth == 1 and channels != 1):
+        raise ValueError(f"PNG output supports 1-4 channels (1 for bit-packed masks), got {channels}.")
+    # Filter offset in bytes; sub-byte depths use 1 per the PNG spec
+    bytes_per_pixel = max(1, channels * bit_depth // 8)
+
+    out = file_obj if file_obj is not None else io.BytesIO()
+    out.write(_PNG_SIGNATURE)
+    out.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth,
+                                             _PNG_COLOR_TYPES[channels], 0, 0, 0)))
+    compressor = zlib.compressobj(compress_level)
+    for start in range(0, height, rows_per_chunk):
+        band = np.asarray(array[start:start + rows_per_chunk])
+        if bit_depth == 1:
+            raw = np.packbits(band, axis=1)
+        else:
+            if band.dtype == bool:
+                band = band.astype(np.uint8) * 255
+            raw = np.ascontiguousarray(band.astype(sample_dtype, copy=False)).view(np.uint8).reshape(len(band), -1)
+        # 'Sub' filter (type 1): each byte minus the same byte of the previous pixel
+        filtered = np.empty((raw.shape[0], raw.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 1
+        filtered[:, 1:1 + bytes_per_pixel] = raw[:, :bytes_per_pixel]
+        np.subtract(raw[:, bytes_per_pixel:], raw[:, :-bytes_per_pixel], out=filtered[:, 1 + bytes_per_pixel:])
+        data = compressor.compress(filtered.tobytes())
+        if data:
+            out.write(_png_chunk(b"IDAT", data))
+    out.write(_png_chunk(b"IDAT", compressor.flush()))
+    out.write(_png_chunk(b"IEND", b""))
+    return b"" if file_obj is not None else out.getvalue()
+
+
+# --- Input ---
+def _header(image: ImageSource, size: int) -> bytes:
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            return f.read(size)
+    return image[:size]
+
+
+def is_tiff(image: ImageSource) -> bool:
+    return _header(image, 4) in _TIFF_SIGNATURES
+
+
+def check_pixel_limit(shape: Tuple[int, ...], max_pixels: int, hint: str = "") -> None:
+    """Reject an image whose two spatial axes hold more than max_pixels pixels."""
+    pixels = int(shape[0]) * int(shape[1])
+    if pixels > max_pixels:
+        raise ValueError(f"Image of {shape[1]}x{shape[0]} pixels exceeds the limit of {max_pixels} pixels.{hint}")
+
+
+def open_image(image: ImageSource, max_pixels: int = DEFAULT_MAX_DECODED_PIXELS) -> Image.Image:
+    """
+    Open a non-TIFF image with PIL. Only the header is read here, and the size is checked
+    against max_pixels before anything is decoded.
+    """
+    hint = " Larger images can be processed when supplied as TIFF."
+    try:
+        pil_image = Image.open(image if isinstance(image, str) else io.BytesIO(image))
+    except Image.DecompressionBombError as e:
+        raise ValueError(f"{e}{hint}") from e
+    check_pixel_limit((pil_image.height, pil_image.width), max_pixels, hint)
+    return pil_image
+
+
+# --- TIFF stacks ---
+
+
+def _import_tifffile():
+    try:
+        import tifffile
+    except ImportError as e:
+        raise ValueError("TIFF input requires the 'tifffile' package on the imaging worker.") from e
+    return tifffile
+
+
+def _spatial_ndim(axes: str) -> int:
+    """Trailing axes that make up one plane: YX, or YXS for RGB(A) samples."""
+    return 3 if axes.endswith("S") else 2
+
+
+def _open_series(tifffile, path: str, scratch_dir: str) -> Tuple[np.ndarray, str, bool]:
+    """
+    Map the first image series of a TIFF into memory. Uncompressed, contiguous files are
+    memory-mapped in place; anything else is decoded once into a memory-mapped scratch
+    array, so stacks larger than RAM never need to be resident.
+    """
+    with tifffile.TiffFile(path) as tif:
+        series = tif.series[0]
+        axes = series.axes
+        try:
+            return tifffile.memmap(path, series=0, mode="r"), axes, True
+        except ValueError:
+            decoded = series.asarray(out=os.path.join(scratch_dir, "decoded.npy"))
+            return decoded, axes, False
+
+
+def plane_buffers(scratch_dir: str) -> Callable[..., np.ndarray]:
+    """
+    For plane functions that write large planes to disk: returns buffer(shape, dtype,
+    slot=0), a memory-mapped array in scratch_dir. Buffers are reused across planes, which
+    is safe because process_tiff_stack writes each result out before computing the next;
+    functions that chain several buffers of one shape and dtype keep them apart by slot.
+    """
+    buffers: Dict[Tuple[Tuple[int, ...], str, Any], np.ndarray] = {}
+
+    def buffer(shape: Tuple[int, ...], dtype: Any, slot: Any = 0) -> np.ndarray:
+        key = (tuple(shape), np.dtype(dtype).str, slot)
+        if key not in buffers:
+            buffers[key] = np.lib.format.open_memmap(
+                os.path.join(scratch_dir, f"plane_{len(buffers)}.npy"), mode="w+", dtype=dtype, shape=tuple(shape),
+            )
+        return buffers[key]
+    return buffer
+
+
+def read_and_close(file_obj: BinaryIO) -> bytes:
+    """The contents of a stack written by process_tiff_stack, for callers that need bytes."""
+    with file_obj:
+        return file_obj.read()
+
+
+def process_tiff_stack(
+    image: ImageSource,
+    plane_func: Callable[[np.ndarray], np.ndarray],
+    output_file: Optional[BinaryIO] = None,
+    scratch_dir: Optional[str] = None,
+    compression: Optional[str] = None,
+    max_pixels: int = DEFAULT_MAX_IMAGE_PIXELS,
+    on_plane: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[BinaryIO, Dict[str, Any]]:
+    """
+    Run plane_func over every 2D plane (YX, or YXS for RGB) of a TIFF/OME-TIFF stack and
+    write the results as a multi-page TIFF with the same leading (z/t/c) axes. Planes are
+    read, processed and written one at a time, and bit depth is whatever plane_func
+    returns (the processors keep the input dtype). `compression` is a tifffile codec
+    name (e.g. 'zlib'); None writes uncompressed. Planes larger than max_pixels are
+    rejected. on_plane(index, total), if given, is called before each plane is processed
+    (e.g. to report progress).
+
+    The stack is written to output_file, or to a new temp file in scratch_dir that the
+    caller must close. Returns (file, stack_summary), with the file positioned at the
+    start of the stack.
+    """
+    tifffile = _import_tifffile()
+    with tempfile.TemporaryDirectory(prefix="tiff_stack_", dir=scratch_dir) as stack_dir:
+        if isinstance(image, str):
+            input_path = image
+        else:
+            input_path = os.path.join(stack_dir, "input.tif")
+            with open(input_path, "wb") as f:
+                f.write(image)
+
+        data, axes, memory_mapped = _open_series(tifffile, input_path, stack_dir)
+        spatial_ndim = _spatial_ndim(axes)
+        check_pixel_limit(data.shape[-spatial_ndim:], max_pixels)
+        leading_shape = data.shape[:-spatial_ndim]
+        plane_indices = list(np.ndindex(*leading_shape))
+
+        def process(position: int) -> np.ndarray:
+            if on_plane is not None:
+                on_plane(position, len(plane_indices))
+            return plane_func(np.asarray(data[plane_indices[position]]))
+
+        # The first plane fixes the output plane shape and dtype (e.g. thresholding drops RGB samples)
+        first_plane = process(0)
+        output_shape = leading_shape + first_plane.shape
+        output_axes = axes[:len(leading_shape)] + ("YXS" if first_plane.ndim == 3 else "YX")
+
+        def planes():
+            yield first_plane
+            for position in range(1, len(plane_indices)):
+                yield process(position)
+
+        output_nbytes = int(np.prod(output_shape)) * first_plane.dtype.itemsize
+        output = output_file if output_file is not None else tempfile.TemporaryFile(dir=scratch_dir)
+        start = output.tell()
+        try:
+            # Named explicitly: anonymous temp files have an int .name, which tifffile rejects
+            tifffile.imwrite(
+                tifffile.FileHandle(output, name="stack.tif"),
+                planes(),
+                shape=output_shape,
+                dtype=first_plane.dtype,
+                photometric="rgb" if first_plane.ndim == 3 else "minisblack",
+                metadata={"axes": output_axes},
+                bigtiff=output_nbytes > _BIGTIFF_THRESHOLD_BYTES,
+                compression=compression,
+            )
+        except BaseException:
+            if output_file is None:
+                output.close()
+            raise
+        summary = {
+            "axes": axes,
+            "shape": list(data.shape),
+            "dtype": str(data.dtype),
+            "planes": len(plane_indices),
+            "memory_mapped": memory_mapped,
+            "output_dtype": str(first_plane.dtype),
+            "compression": compression,
+            "output_bytes": output.tell() - start,
+        }
+        del data
+    output.seek(start)
+    return output, summary
@@ -0,0 +1,439 @@
+# backend/app/utils/benchtop/biology/imaging/native_ops.py
+
+import math
+import numpy as np
+from typing import Callable, Dict, Optional
+
+from scipy import ndimage
+
+# NumPy/SciPy implementations of the ImageJ ops used by the imaging tools, so that
+# common jobs can run without starting (or crossing into) the JVM.
+# They follow ImageJ Ops semantics closely enough to be checked against it in
+# tests/backend/test_imaging_native_ops.py:
+#   - filter.gauss: ImgLib2 Gauss3 kernel size, single-boundary mirror extension and
+#     rounding back into the input's integer type;
+#   - threshold.<method>: 256-bin histogram over the image's min..max, the ImageJ
+#     AutoThresholder bin selection, then foreground = value > bin center.
+
+VALID_BACKENDS = ["auto", "imagej", "native"]
+
+HISTOGRAM_BINS = 256
+_EPSILON = 2.220446049250313e-16  # Java's DBL_EPSILON, used by several ImageJ methods
+
+
+# --- Backend Selection ---
+def resolve_backend(requested: str, native_supported: bool = True) -> str:
+    """
+    Turn the requested backend into the one to run. 'auto' prefers the native
+    implementation whenever it covers the operation and falls back to ImageJ otherwise.
+    """
+    if requested not in VALID_BACKENDS:
+        raise ValueError(f"Invalid backend '{requested}'. Must be one of {VALID_BACKENDS}")
+    if requested == "native" and not native_supported:
+        raise ValueError("This operation has no native implementation; use the 'imagej' backend.")
+    if requested == "auto":
+        return "native" if native_supported else "imagej"
+    return requested
+
+
+# --- Gaussian Filter ---
+def gauss_kernel_radius(sigma: float) -> int:
+    """Half-kernel size used by ImgLib2's Gauss3, minus the center tap."""
+    return max(2, int(3 * sigma + 0.5) + 1) - 1
+
+
+def round_to_dtype(values: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """Write float results back into dtype the way ImgLib2's setReal does (round half up, clamp)."""
+    dtype = np.dtype(dtype)
+    if not np.issubdtype(dtype, np.integer):
+        return values.astype(dtype, copy=False)
+    info = np.iinfo(dtype)
+    return np.clip(np.floor(values + 0.5), info.min, info.max).astype(dtype)
+
+
+def gaussian_blur(image: np.ndarray, sigma: float) -> np.ndarray:
+    """
+    Gaussian blur over the spatial (first two) axes; a trailing channel axis is filtered
+    per channel. Returns an array of the input's dtype.
+    """
+    sigmas = (sigma, sigma) + (0,) * (image.ndim - 2)
+    blurred = ndimage.gaussian_filter(image.astype(np.float64), sigma=sigmas, mode='mirror',
+                                      radius=[gauss_kernel_radius(sigma) if s else 0 for s in sigmas])
+    return round_to_dtype(blurred, image.dtype)
+
+
+# --- Histogram Helpers ---
+def bin_counts(image: np.ndarray, minimum: float, bin_width: float, bins: int = HISTOGRAM_BINS) -> np.ndarray:
+    """Counts of `image` in `bins` equal bins starting at minimum (values past the end land in the last bin)."""
+    if bin_width == 0:
+        counts = np.zeros(bins, dtype=np.int64)
+        counts[0] = image.size
+        return counts
+    idx = ((image.astype(np.float64, copy=False) - minimum) / bin_width).astype(np.int64)
+    np.minimum(idx, bins - 1, out=idx)
+    return np.bincount(idx.ravel(), minlength=bins)
+
+
+def histogram(image: np.ndarray, bins: int = HISTOGRAM_BINS):
+    """
+    Histogram of an image over [min, max] in `bins` equal bins (max lands in the last bin).
+    Returns (counts, minimum, bin_width).
+    """
+    minimum, maximum = float(image.min()), float(image.max())
+    bin_width = (maximum - minimum) / bins
+    return bin_counts(image, minimum, bin_width, bins), minimum, bin_width
+
+
+def _java_int(value: float) -> int:
+    """Java's (int) cast: truncation toward zero, NaN -> 0, saturating at the int range."""
+    if math.isnan(value):
+        return 0
+    return math.trunc(max(-2 ** 31, min(2 ** 31 - 1, value)))
+
+
+def _java_round(value: float) -> int:
+    """Java's Math.round: floor(x + 0.5), NaN -> 0."""
+    return 0 if math.isnan(value) else int(math.floor(value + 0.5))
+
+
+def _cumulative(data: np.ndarray):
+    """Normalized histogram, its cumulative sum P1 and the complement P2 = 1 - P1."""
+    norm_histo = data / data.sum()
+    p1 = np.cumsum(norm_histo)
+    return norm_histo, p1, 1.0 - p1
+
+
+def _entropy_bounds(p1: np.ndarray, p2: np.ndarray):
+    nonzero_p1 = np.flatnonzero(np.abs(p1) >= _EPSILON)
+    first_bin = int(nonzero_p1[0]) if nonzero_p1.size else 0
+    nonzero_p2 = np.flatnonzero(np.abs(p2[first_bin:]) >= _EPSILON)
+    last_bin = first_bin + int(nonzero_p2[-1]) if nonzero_p2.size else len(p1) - 1
+    return first_bin, last_bin
+
+
+def _max_entropy_bin(data: np.ndarray, norm_histo: np.ndarray, p1: np.ndarray, p2: np.ndarray,
+                     first_bin: int, last_bin: int, initial_max: float, initial_bin: int) -> int:
+    threshold, max_ent = initial_bin, initial_max
+    present = data != 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for it in range(first_bin, last_bin + 1):
+            back = norm_histo[:it + 1][present[:it + 1]] / p1[it]
+            obj = norm_histo[it + 1:][present[it + 1:]] / p2[it]
+            tot_ent = -np.sum(back * np.log(back)) - np.sum(obj * np.log(obj))
+            if max_ent < tot_ent:
+                max_ent, threshold = tot_ent, it
+    return threshold
+
+
+# --- Threshold Methods (ports of ImageJ's AutoThresholder) ---
+def _huang(data: np.ndarray) -> int:
+    nonzero = np.flatnonzero(data)
+    if nonzero.size == 0:
+        return 0
+    first, last = int(nonzero[0]), int(nonzero[-1])
+    if first == last:
+        return 0
+
+    idx = np.arange(len(data), dtype=np.float64)
+    S = np.cumsum(data[:last + 1].astype(np.float64))
+    W = np.cumsum(idx[:last + 1] * data[:last + 1])
+    C = float(last - first)
+    mu = 1.0 / (1.0 + np.arange(1, last + 1 - first) / C)
+    Smu = np.zeros(last + 1 - first)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        Smu[1:] = -mu * np.log(mu) - (1 - mu) * np.log(1 - mu)
+    Smu = np.nan_to_num(Smu)
+
+    span = np.arange(first, last + 1)
+    weights = data[first:last + 1].astype(np.float64)
+    best_threshold, best_entropy = 0, np.finfo(np.float64).max
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for threshold in range(first, last + 1):
+            split = threshold - first + 1
+            mu_back = _java_round(W[threshold] / S[threshold])
+            mu_obj = _java_round((W[last] - W[threshold]) / (S[last] - S[threshold]))
+            entropy = (np.dot(Smu[np.abs(span[:split] - mu_back)], weights[:split])
+                       + np.dot(Smu[np.abs(span[split:] - mu_obj)], weights[split:]))
+            if best_entropy > entropy:
+                best_entropy, best_threshold = entropy, threshold
+    return best_threshold
+
+
+def _isodata(data: np.ndarray) -> int:
+    g = 0
+    for i in range(1, len(data)):
+        if data[i] > 0:
+            g = i + 1
+            break
+    idx = np.arange(len(data))
+    while True:
+        totl, l = int(data[:g + 1].sum()), int(np.dot(idx[:g + 1], data[:g + 1]))
+        toth, h = int(data[g + 1:].sum()), int(np.dot(idx[g + 1:], data[g + 1:]))
+        if totl > 0 and toth > 0:
+            l //= totl
+            h //= toth
+            if g == _java_round((l + h) / 2.0):
+                break
+        g += 1
+        if g > len(data) - 2:
+            return -1
+    return g
+
+
+def _li(data: np.ndarray) -> int:
+    idx = np.arange(len(data), dtype=np.float64)
+    num_pixels = float(data.sum())
+    new_thresh = float(np.dot(idx, data)) / num_pixels
+    tolerance = 0.5
+    while True:
+        old_thresh = new_thresh
+        threshold = _java_int(old_thresh + 0.5)
+        num_back = float(data[:threshold + 1].sum())
+        mean_back = 0.0 if num_back == 0 else float(np.dot(idx[:threshold + 1], data[:threshold + 1])) / num_back
+        num_obj = float(data[threshold + 1:].sum())
+        mean_obj = 0.0 if num_obj == 0 else float(np.dot(idx[threshold + 1:], data[threshold + 1:])) / num_obj
+        with np.errstate(divide='ignore', invalid='ignore'):
+            temp = float((mean_back - mean_obj) / (np.log(mean_back) - np.log(mean_obj)))
+        new_thresh = float(_java_int(temp - 0.5) if temp < -_EPSILON else _java_int(temp + 0.5))
+        if abs(new_thresh - old_thresh) <= tolerance:
+            return threshold
+
+
+def _max_entropy(data: np.ndarray) -> int:
+    norm_histo, p1, p2 = _cumulative(data)
+    first_bin, last_bin = _entropy_bounds(p1, p2)
+    return _max_entropy_bin(data, norm_histo, p1, p2, first_bin, last_bin,
+                            initial_max=np.finfo(np.float64).tiny, initial_bin=-1)
+
+
+def _mean(data: np.ndarray) -> int:
+    return int(math.floor(float(np.dot(np.arange(len(data)), data)) / float(data.sum())))
+
+
+def _min_error(data: np.ndarray) -> int:
+    idx = np.arange(len(data), dtype=np.float64)
+    A = np.cumsum(data.astype(np.float64))
+    B = np.cumsum(idx * data)
+    C = np.cumsum(idx * idx * data)
+    last = len(data) - 1
+
+    threshold, t_prev = _mean(data), -2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        while threshold != t_prev and 0 <= threshold < last:
+            mu = B[threshold] / A[threshold]
+            nu = (B[last] - B[threshold]) / (A[last] - A[threshold])
+            p = A[threshold] / A[last]
+            q = (A[last] - A[threshold]) / A[last]
+            sigma2 = C[threshold] / A[threshold] - mu * mu
+            tau2 = (C[last] - C[threshold]) / (A[last] - A[threshold]) - nu * nu
+            w0 = 1.0 / sigma2 - 1.0 / tau2
+            w1 = mu / sigma2 - nu / tau2
+            w2 = (mu * mu) / sigma2 - (nu * nu) / tau2 + np.log10((sigma2 * q * q) / (tau2 * p * p))
+            sqterm = w1 * w1 - w0 * w2
+            if sqterm < 0:
+                break  # not converging
+            t_prev = threshold
+            temp = (w1 + np.sqrt(sqterm)) / w0
+            threshold = t_prev if np.isnan(temp) else int(math.floor(temp))
+    return threshold
+
+
+def _is_bimodal(y: np.ndarray) -> bool:
+    modes = np.count_nonzero((y[:-2] < y[1:-1]) & (y[2:] < y[1:-1]))
+    return modes == 2
+
+
+def _minimum(data: np.ndarray) -> int:
+    nonzero = np.flatnonzero(data)
+    maximum = int(nonzero[-1]) if nonzero.size else -1
+    histo = data.astype(np.float64)
+    iterations = 0
+    while not _is_bimodal(histo):
+        # Smooth with a 3-point running mean (zero outside the histogram)
+        padded = np.concatenate(([0.0], histo, [0.0]))
+        histo = (padded[:-2] + padded[1:-1] + padded[2:]) / 3
+        iterations += 1
+        if iterations > 10000:
+            return -1
+    # The threshold is the minimum between the two peaks
+    for i in range(1, maximum):
+        if histo[i - 1] > histo[i] and histo[i + 1] >= histo[i]:
+            return i
+    return -1
+
+
+def _moments(data: np.ndarray) -> int:
+    histo = data / float(data.sum())
+    idx = np.arange(len(data), dtype=np.float64)
+    m0, m1, m2, m3 = 1.0, float(np.dot(idx, histo)), float(np.dot(idx ** 2, histo)), float(np.dot(idx ** 3, histo))
+    cd = m0 * m2 - m1 * m1
+    c0 = (-m2 * m2 + m1 * m3) / cd
+    c1 = (m0 * -m3 + m2 * m1) / cd
+    with np.errstate(invalid='ignore', divide='ignore'):
+        discriminant = np.sqrt(np.float64(c1 * c1 - 4.0 * c0))
+        z0, z1 = 0.5 * (-c1 - discriminant), 0.5 * (-c1 + discriminant)
+        p0 = (z1 - m1) / (z1 - z0)
+    # The threshold is the gray level closest to the p0-tile of the normalized histogram
+    above = np.flatnonzero(np.cumsum(histo) > p0)
+    return int(above[0]) if above.size else -1
+
+
+def _otsu(data: np.ndarray) -> int:
+    norm_histo = data / float(data.sum())
+    p1 = np.cumsum(norm_histo)
+    first_moment = np.cumsum(np.arange(len(data)) * norm_histo)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bcv = (first_moment[-1] * p1 - first_moment) ** 2 / (p1 * (1.0 - p1))
+    bcv = np.where(np.isfinite(bcv), bcv, 0.0)
+    # First bin with the largest between-class variance; -1 if none is positive
+    return int(np.argmax(bcv)) if bcv.max() > 0 else -1
+
+
+def _percentile(data: np.ndarray) -> int:
+    avec = np.abs(np.cumsum(data) / float(data.sum()) - 0.5)
+    below = avec < 1.0
+    return int(np.argmin(np.where(below, avec, np.inf))) if below.any() else -1
+
+
+def _renyi_entropy(data: np.ndarray) -> int:
+    norm_histo, p1, p2 = _cumulative(data)
+    first_bin, last_bin = _entropy_bounds(p1, p2)
+
+    # alpha = 1 is plain maximum entropy
+    t1 = _max_entropy_bin(data, norm_histo, p1, p2, first_bin, last_bin, initial_max=0.0, initial_bin=0)
+
+    def renyi_bin(alpha: float, transform: Callable[[np.ndarray, float], np.ndarray]) -> int:
+        threshold, max_ent = 0, 0.0
+        term = 1.0 / (1.0 - alpha)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for it in range(first_bin, last_bin + 1):
+                ent_back = np.sum(transform(norm_histo[:it + 1], p1[it]))
+                ent_obj = np.sum(transform(norm_histo[it + 1:], p2[it]))
+                product = ent_back * ent_obj
+                tot_ent = term * (math.log(product) if product > 0.0 else 0.0)
+                if tot_ent > max_ent:
+                    max_ent, threshold = tot_ent, it
+        return threshold
+
+    t2 = renyi_bin(0.5, lambda h, p: np.sqrt(h / p))
+    t3 = renyi_bin(2.0, lambda h, p: (h * h) / (p * p))
+    t1, t2, t3 = sorted((t1, t2, t3))
+
+    if abs(t1 - t2) <= 5:
+        beta1, beta2, beta3 = (1, 2, 1) if abs(t2 - t3) <= 5 else (0, 1, 3)
+    else:
+        beta1, beta2, beta3 = (3, 1, 0) if abs(t2 - t3) <= 5 else (1, 2, 1)
+    omega = p1[t3] - p1[t1]
+    return _java_int(t1 * (p1[t1] + 0.25 * omega * beta1) + 0.25 * t2 * omega * beta2
+                     + t3 * (p2[t3] + 0.25 * omega * beta3))
+
+
+def _shanbhag(data: np.ndarray) -> int:
+    norm_histo, p1, p2 = _cumulative(data)
+    first_bin, last_bin = _entropy_bounds(p1, p2)
+    threshold, min_ent = -1, np.finfo(np.float64).max
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for it in range(first_bin, last_bin + 1):
+            term = 0.5 / p1[it]
+            ent_back = -np.sum(norm_histo[1:it + 1] * np.log(1.0 - term * p1[:it])) * term
+            term = 0.5 / p2[it]
+            ent_obj = -np.sum(norm_histo[it + 1:] * np.log(1.0 - term * p2[it + 1:])) * term
+            tot_ent = abs(ent_back - ent_obj)
+            if tot_ent < min_ent:
+                min_ent, threshold = tot_ent, it
+    return threshold
+
+
+def _triangle(data: np.ndarray) -> int:
+    data = data.astype(np.float64)
+    n = len(data)
+    nonzero = np.flatnonzero(data)
+    low = int(nonzero[0]) if nonzero.size else 0
+    if low > 0:
+        low -= 1  # line to the (p == 0) point, not to data[min]
+    high = int(nonzero[-1]) if nonzero.size and nonzero[-1] > 0 else 0
+    if high < n - 1:
+        high += 1
+    peak = int(np.argmax(data)) if data.max() > 0 else 0
+
+    inverted = (peak - low) < (high - peak)
+    if inverted:
+        data = data[::-1]
+        low, peak = n - 1 - high, n - 1 - peak
+    if low == peak:
+        return low
+
+    nx, ny = data[peak], float(low - peak)
+    d = math.sqrt(nx * nx + ny * ny)
+    nx, ny = nx / d, ny / d
+    d = nx * low + ny * data[low]
+
+    split, split_distance = low, 0.0
+    for i in range(low + 1, peak + 1):
+        distance = nx * i + ny * data[i] - d
+        if distance > split_distance:
+            split, split_distance = i, distance
+    split -= 1
+    return n - 1 - split if inverted else split
+
+
+def _yen(data: np.ndarray) -> int:
+    norm_histo = data / float(data.sum())
+    p1 = np.cumsum(norm_histo)
+    p1_sq = np.cumsum(norm_histo ** 2)
+    p2_sq = np.zeros(len(data))
+    p2_sq[:-1] = np.cumsum((norm_histo[1:] ** 2)[::-1])[::-1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sq_product, spread = p1_sq * p2_sq, p1 * (1.0 - p1)
+        crit = (-np.where(sq_product > 0, np.log(np.where(sq_product > 0, sq_product, 1.0)), 0.0)
+                + 2 * np.where(spread > 0, np.log(np.where(spread > 0, spread, 1.0)), 0.0))
+    best = int(np.argmax(crit))
+    return best if crit[best] > np.finfo(np.float64).tiny else -1
+
+
+THRESHOLD_METHODS: Dict[str, Callable[[np.ndarray], int]] = {
+    "Huang": _huang,
+    "IsoData": _isodata,
+    "Li": _li,
+    "MaxEntropy": _max_entropy,
+    "Mean": _mean,
+    "MinError": _min_error,
+    "Minimum": _minimum,
+    "Moments": _moments,
+    "Otsu": _otsu,
+    "Percentile": _percentile,
+    "RenyiEntropy": _renyi_entropy,
+    "Shanbhag": _shanbhag,
+    "Triangle": _triangle,
+    "Yen": _yen,
+}
+
+
+def supports_threshold(method: str) -> bool:
+    return method in THRESHOLD_METHODS
+
+
+# --- Thresholding ---
+def compute_threshold(image: Optional[np.ndarray], method: str, counts: Optional[np.ndarray] = None,
+                      minimum: Optional[float] = None, bin_width: Optional[float] = None) -> float:
+    """
+    Return the intensity threshold chosen by `method`. A precomputed histogram
+    (counts, minimum, bin_width, e.g. from a tiled pass) can be passed instead of an image.
+    """
+    if method not in THRESHOLD_METHODS:
+        raise ValueError(f"Threshold method '{method}' has no native implementation.")
+    if counts is None:
+        counts, minimum, bin_width = histogram(image)
+    threshold_bin = THRESHOLD_METHODS[method](np.asarray(counts, dtype=np.int64))
+    # Convert the bin back to a gray level (bin center), as ImageJ Ops does
+    return minimum + (threshold_bin + 0.5) * bin_width
+
+
+def auto_threshold(image: np.ndarray, method: str):
+    """
+    Threshold an image with an ImageJ auto-threshold method.
+    Returns (boolean foreground mask, threshold value).
+    """
+    threshold = compute_threshold(image, method)
+    return image > threshold, threshold
@@ -0,0 +1,270 @@
+# backend/app/utils/benchtop/biology/imaging/pipeline.py
+
+import tempfile
+import time
+import numpy as np
+from functools import partial
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from app.schemas.benchtop.biology.imaging.pipeline_schema import ImagingPipelineParams
+from app.utils.benchtop.biology.imaging import encoders, image_io, native_ops, previews, tiling
+from app.utils.benchtop.biology.imaging.filters import gaussian_blur_processor
+from app.utils.benchtop.biology.imaging.segmentation import auto_threshold_processor
+
+# Chained imaging ops run back to back on one in-memory array. Between ops the image
+# stays float32 (masks stay boolean), so there is no 8-bit rounding, encoding, upload
+# or re-decoding between steps; only the final output is converted back to the input's
+# bit depth. Planes above the engine's min_tiled_pixels run every op tile by tile into
+# memory-mapped buffers in the scratch dir instead, the same way the single-op tools do.
+# New ops register an (apply, needs_imagej, apply_tiled) triple in PIPELINE_OPS.
+
+
+# --- Ops ---
+def _as_float(array: np.ndarray) -> np.ndarray:
+    """Working representation between ops: float32, with masks as 0/255 like ImageJ binaries."""
+    if array.dtype == bool:
+        return array.astype(np.float32) * 255
+    return array.astype(np.float32, copy=False)
+
+
+def _gaussian_blur_op(array: np.ndarray, params, ij_gateway=None) -> np.ndarray:
+    return gaussian_blur_processor.apply(_as_float(array), params, ij_gateway=ij_gateway).astype(np.float32, copy=False)
+
+
+def _auto_threshold_op(array: np.ndarray, params, ij_gateway=None) -> np.ndarray:
+    gray = auto_threshold_processor.to_grayscale(array if array.dtype != bool else _as_float(array))
+    return auto_threshold_processor.apply(gray, params, ij_gateway=ij_gateway)
+
+
+def _gaussian_blur_tiled(array: np.ndarray, params, buffer: Callable[..., np.ndarray],
+                         engine: Dict[str, Any], ij_gateway=None) -> np.ndarray:
+    """Blur tile by tile into a float32 buffer; the kernel-radius halo keeps it exact."""
+    return tiling.apply_tiled(
+        array,
+        lambda tile: _gaussian_blur_op(tile, params, ij_gateway=ij_gateway),
+        buffer(array.shape, np.float32),
+        tile_size=engine["tile_size"],
+        halo=native_ops.gauss_kernel_radius(params.sigma),
+        max_workers=1 if ij_gateway is not None else engine["max_workers"],
+    )
+
+
+def _auto_threshold_tiled(array: np.ndarray, params, buffer: Callable[..., np.ndarray],
+                          engine: Dict[str, Any], ij_gateway=None) -> np.ndarray:
+    """
+    Threshold tile by tile into a boolean buffer on a global histogram (see
+    auto_threshold_processor.apply_tiled). Native backend only: ImageJ ops threshold
+    each input on its own histogram, so they cannot be tiled.
+    """
+    if auto_threshold_processor.needs_imagej(params):
+        raise ValueError(f"The '{params.method}' threshold runs on ImageJ, which needs the whole image; "
+                         f"planes above {engine['min_tiled_pixels']} pixels need a natively supported method.")
+    gray = array
+    if array.ndim == 3 or array.dtype == bool:
+        gray = tiling.apply_tiled(
+            array,
+            lambda tile: auto_threshold_processor.to_grayscale(tile if tile.dtype != bool else _as_float(tile)),
+            buffer(array.shape[:2], np.float32 if array.dtype == bool else array.dtype),
+            tile_size=engine["tile_size"],
+            max_workers=engine["max_workers"],
+        )
+    mask = buffer(array.shape[:2], bool)
+    auto_threshold_processor.apply_tiled(gray, params, mask, engine)
+    return mask
+
+
+# Op name (as in pipeline_schema.PIPELINE_OP_PARAMS) ->
+#   (apply(array, params, ij_gateway), needs_imagej(params),
+#    apply_tiled(array, params, buffer, engine, ij_gateway))
+PIPELINE_OPS: Dict[str, Tuple[Callable, Callable, Callable]] = {
+    "gaussian_blur": (_gaussian_blur_op, gaussian_blur_processor.needs_imagej, _gaussian_blur_tiled),
+    "auto_threshold": (_auto_threshold_op, auto_threshold_processor.needs_imagej, _auto_threshold_tiled),
+}
+
+
+# --- Helper Functions ---
+def needs_imagej(params: ImagingPipelineParams) -> bool:
+    """Whether any step has to run on the ImageJ gateway."""
+    return any(PIPELINE_OPS[step.op][1](step.op_params()) for step in params.steps)
+
+
+def finalize(array: np.ndarray, input_dtype: np.dtype, buffer: Optional[Callable[..., np.ndarray]] = None,
+             engine: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """
+    Bring a working array back to the input bit depth (masks stay boolean). With a
+    buffer (tiled runs), the conversion is written tile by tile into it.
+    """
+    if array.dtype == bool or not np.issubdtype(array.dtype, np.floating):
+        return array
+    if buffer is None:
+        return native_ops.round_to_dtype(array, input_dtype)
+    return tiling.apply_tiled(
+        array,
+        lambda tile: native_ops.round_to_dtype(tile, input_dtype),
+        buffer(array.shape, input_dtype, "final"),
+        tile_size=engine["tile_size"],
+        max_workers=engine["max_workers"],
+    )
+
+
+def run_steps(
+    array: np.ndarray,
+    params: ImagingPipelineParams,
+    ij_gateway=None,
+    on_output: Optional[Callable[[int, str, np.ndarray], None]] = None,
+    checkpoint: Optional[Callable[..., None]] = None,
+    buffer: Optional[Callable[..., np.ndarray]] = None,
+    engine: Optional[Dict[str, Any]] = None,
+) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    Apply every step in order. on_output(index, op, array) is called for steps with
+    save_output, and checkpoint(stage) (see app.services.run_control) before each step.
+    With a buffer (see image_io.plane_buffers) and engine settings, every step runs
+    tiled, alternating between two sets of buffers so no step overwrites its input.
+    Returns (final working array, per-step timings).
+    """
+    timings = []
+    for index, step in enumerate(params.steps):
+        if checkpoint is not None:
+            checkpoint(f"step_{index:02d}_{step.op}")
+        apply_op, _, apply_tiled = PIPELINE_OPS[step.op]
+        started = time.perf_counter()
+        if buffer is not None:
+            array = apply_tiled(array, step.op_params(), partial(buffer, slot=index % 2), engine, ij_gateway=ij_gateway)
+        else:
+            array = apply_op(array, step.op_params(), ij_gateway=ij_gateway)
+        timings.append({"step": index, "op": step.op, "seconds": round(time.perf_counter() - started, 4)})
+        if step.save_output and index < len(params.steps) - 1 and on_output is not None:
+            on_output(index, step.op, array)
+    return array, timings
+
+
+# --- Main Processor Logic ---
+def run(
+    ij_gateway,  # The initialized PyImageJ gateway instance, or None if no step needs ImageJ
+    image: image_io.ImageSource,
+    params: ImagingPipelineParams,
+    config: Optional[dict] = None,
+    checkpoint: Optional[Callable[..., None]] = None,
+    output_file: Optional[BinaryIO] = None,
+    store_preview_tiles: Optional[Callable[[List[Tuple[str, bytes]]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Runs a chain of imaging ops on one image without re-encoding between steps.
+
+    1. Decode the input once (TIFF stacks keep their bit depth and run plane by plane).
+    2. Run the steps back to back on the same array (see `run_steps`); planes above the
+       engine's min_tiled_pixels run tile by tile into memory-mapped buffers.
+    3. Encode the final output (and any saved intermediates) and build previews.
+
+    `image` is the input as bytes or the path of a local file. TIFF is read region by
+    region and capped at engine.max_image_pixels; other formats are decoded whole and
+    capped at engine.max_decoded_pixels (see image_io). If output_file is given (e.g. a
+    temp file), the final output is written there and processed_image_bytes is None.
+    store_preview_tiles receives the preview's DZI tiles in batches as they are encoded
+    (see previews.tile_store).
+
+    Returns:
+        A dictionary with the final output bytes and format, a list of encoded
+        intermediates ({"step", "op", "output_format", "bytes"}, or "file" in place of
+        "bytes" for tiled runs: a temp file the caller uploads and closes), previews and
+        a summary.
+    """
+    engine = tiling.engine_settings(config)
+    output = encoders.output_settings(config, params.output_format)
+    preview = previews.preview_settings(config)
+    steps_used = [step.model_dump() for step in params.steps]
+
+    with tempfile.TemporaryDirectory(prefix="image_pipeline_", dir=engine["scratch_dir"]) as scratch_dir:
+        buffer = image_io.plane_buffers(scratch_dir)
+
+        # 1a. TIFF stacks: the whole chain runs per plane; intermediates are not kept.
+        # Progress is reported once per plane as one stage, not per step of every plane.
+        if image_io.is_tiff(image):
+            def plane_chain(plane: np.ndarray) -> np.ndarray:
+                tiled = tiling.should_tile(plane.shape, engine["min_tiled_pixels"])
+                plane_buffer = buffer if tiled else None
+                result, _ = run_steps(plane, params, ij_gateway=ij_gateway, buffer=plane_buffer, engine=engine)
+                result = finalize(result, plane.dtype, plane_buffer, engine)
+                if result.dtype != bool:
+                    return result
+                if tiled:
+                    return np.multiply(result, 255, out=buffer(result.shape, np.uint8, "final"), dtype=np.uint8)
+                return result.astype(np.uint8) * 255
+
+            stack_file, stack_summary = image_io.process_tiff_stack(
+                image,
+                plane_chain,
+                output_file=output_file,
+                scratch_dir=engine["scratch_dir"],
+                compression=output["tiff_compression"],
+                max_pixels=engine["max_image_pixels"],
+                on_plane=(lambda index, total: checkpoint("processing_planes", index, total)) if checkpoint else None,
+            )
+            output_bytes = None if output_file is not None else image_io.read_and_close(stack_file)
+            return {
+                "processed_image_bytes": output_bytes,
+                "output_format": "tiff",
+                "intermediates": [],
+                "previews": None,
+                "summary": {"pipeline": steps_used, "stack": stack_summary},
+            }
+
+        # 1b. Decode to a NumPy array, keeping 8/16-bit grayscale and RGB(A) as they are;
+        # the size is checked from the header before anything is decoded
+        pil_image = image_io.open_image(image, engine["max_decoded_pixels"])
+        original_mode = pil_image.mode
+        if original_mode not in ['L', 'RGB', 'RGBA', 'I;16']:
+            pil_image = pil_image.convert('RGB')
+        original_width, original_height = pil_image.size
+        input_array = np.array(pil_image)
+        pil_image.close() # The array is the only decoded copy kept
+        tiled = tiling.should_tile(input_array.shape, engine["min_tiled_pixels"])
+
+        # 2. Run the chain, encoding requested intermediates as they are produced
+        # (float working arrays are stored losslessly as .npy; masks/integers as PNG).
+        # Tiled runs encode them into temp files rather than memory.
+        intermediates: List[Dict[str, Any]] = []
+
+        def keep_intermediate(index: int, op: str, array: np.ndarray) -> None:
+            fmt = "npy" if np.issubdtype(array.dtype, np.floating) else "png"
+            file_obj = tempfile.TemporaryFile(dir=engine["scratch_dir"]) if tiled else None
+            data, encoding = encoders.encode(array, {**output, "format": fmt}, file_obj=file_obj)
+            intermediates.append({"step": index, "op": op, "output_format": fmt, "bytes": data, "file": file_obj,
+                                  "encoding": encoding})
+
+        try:
+            result_array, step_timings = run_steps(input_array, params, ij_gateway=ij_gateway,
+                                                   on_output=keep_intermediate, checkpoint=checkpoint,
+                                                   buffer=buffer if tiled else None, engine=engine)
+            output_array = finalize(result_array, input_array.dtype, buffer if tiled else None, engine)
+            del input_array, result_array
+
+            # 3. Encode the final output and build previews
+            if output["format"] == "mask_1bit" and output_array.dtype != bool:
+                raise ValueError("The 'mask_1bit' output format needs a pipeline that ends with a thresholding op.")
+            output_bytes, encoding = encoders.encode(output_array, output, file_obj=output_file)
+            preview_images = previews.build_previews(output_array, preview, store_preview_tiles, engine["scratch_dir"])
+            del output_array
+        except BaseException:
+            for intermediate in intermediates:
+                if intermediate["file"] is not None:
+                    intermediate["file"].close()
+            raise
+
+    return {
+        "processed_image_bytes": output_bytes,
+        "output_format": output["format"],
+        "intermediates": intermediates,
+        "previews": preview_images,
+        "summary": {
+            "pipeline": steps_used,
+            "backend": "imagej" if needs_imagej(params) else "native",
+            "tiled": tiled,
+            "step_timings": step_timings,
+            "original_dimensions": f"{original_width}x{original_height}",
+            "original_mode": original_mode,
+            "encoding": encoding,
+            "preview_seconds": preview_images["build_seconds"] if preview_images else None,
+        },
+    }
@@ -0,0 +1,280 @@
+# backend/app/utils/benchtop/biology/imaging/previews.py
+
+import io
+import math
+import os
+import tempfile
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Browser previews for imaging results, kept separate from the full-resolution output:
+# a small thumbnail plus, for large images, a Deep Zoom (DZI) pyramid of fixed-size
+# tiles, so a viewer (e.g. OpenSeadragon) fetches only the tiles that fit its viewport.
+# The pyramid is built by repeated 2x2 averaging, reading the full-resolution level in
+# row bands so a memory-mapped (tiled) result is never loaded whole. Large levels are
+# written to memory-mapped scratch files, and tiles can be handed to store_tiles (e.g. an
+# uploader from tile_store) in batches as they are encoded, so memory does not grow with
+# the number of tiles.
+
+DEFAULT_THUMBNAIL_SIZE = 256
+DEFAULT_TILE_SIZE = 254
+DEFAULT_OVERLAP = 1
+DEFAULT_MIN_PYRAMID_DIMENSION = 1024
+_BAND_ROWS = 512
+# Tiles encoded before they are passed to store_tiles
+TILE_BATCH = 256
+# Pyramid levels larger than this are memory-mapped in the scratch dir
+_LEVEL_MEMMAP_BYTES = 64 * 1024 ** 2
+_TILE_FORMATS = {"jpg": ("JPEG", "image/jpeg"), "png": ("PNG", "image/png"), "webp": ("WEBP", "image/webp")}
+
+
+# --- Helper Functions ---
+def preview_settings(config: Optional[dict]) -> Dict[str, Any]:
+    """Preview settings from a tool config's `preview` section. Without one, previews are off."""
+    preview = (config or {}).get('preview', {}) or {}
+    settings = {
+        "enabled": bool(preview.get('enabled', False)),
+        "thumbnail_size": int(preview.get('thumbnail_size') or DEFAULT_THUMBNAIL_SIZE),
+        "tile_size": int(preview.get('tile_size') or DEFAULT_TILE_SIZE),
+        "overlap": int(preview.get('overlap', DEFAULT_OVERLAP)),
+        "tile_format": preview.get('tile_format') or "jpg",
+        "min_pyramid_dimension": int(preview.get('min_pyramid_dimension') or DEFAULT_MIN_PYRAMID_DIMENSION),
+    }
+    if settings["tile_format"] not in _TILE_FORMATS:
+        raise ValueError(f"Invalid preview tile format '{settings['tile_format']}'. Must be one of {list(_TILE_FORMATS)}")
+    return settings
+
+
+def to_display(band: np.ndarray, value_range: Optional[Tuple[float, float]] = None) -> np.ndarray:
+    """
+    8-bit display version of (part of) a result: masks become 0/255, other integer
+    types are linearly stretched over value_range (the image's min/max).
+    """
+    if band.dtype == bool:
+        return band.astype(np.uint8) * 255
+    if band.dtype == np.uint8:
+        return band
+    low, high = value_range if value_range is not None else (float(band.min()), float(band.max()))
+    scale = 255.0 / (high - low) if high > low else 0.0
+    return np.clip((band.astype(np.float32) - low) * scale + 0.5, 0, 255).astype(np.uint8)
+
+
+def downsample_2x(level: np.ndarray, value_range: Optional[Tuple[float, float]] = None,
+                  out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Next (half-size, rounded up) pyramid level by 2x2 averaging, read in row bands.
+    Odd edges are padded by repetition. Input of any dtype is converted for display first.
+    The level is written into `out` (uint8, e.g. a memmap) when given.
+    """
+    height, width = level.shape[:2]
+    if out is None:
+        out = np.empty(level_shape(level.shape), dtype=np.uint8)
+    for start in range(0, height, _BAND_ROWS):
+        band = to_display(np.asarray(level[start:start + _BAND_ROWS]), value_range).astype(np.float32)
+        if band.shape[0] % 2:
+            band = np.concatenate([band, band[-1:]], axis=0)
+        if band.shape[1] % 2:
+            band = np.concatenate([band, band[:, -1:]], axis=1)
+        summed = band[0::2, 0::2] + band[1::2, 0::2] + band[0::2, 1::2] + band[1::2, 1::2]
+        out[start // 2:start // 2 + summed.shape[0]] = (summed * 0.25 + 0.5).astype(np.uint8)
+    return out
+
+
+def level_shape(shape: Tuple[int, ...]) -> Tuple[int, ...]:
+    """Shape of the pyramid level below one of `shape`."""
+    return ((shape[0] + 1) // 2, (shape[1] + 1) // 2) + tuple(shape[2:])
+
+
+def _encode(array: np.ndarray, tile_format: str) -> bytes:
+    pil_format, _ = _TILE_FORMATS[tile_format]
+    if tile_format == "jpg" and array.ndim == 3 and array.shape[2] in (2, 4):
+        array = array[..., :-1] if array.shape[2] == 4 else array[..., 0]  # JPEG has no alpha
+    buffer = io.BytesIO()
+    options = {"quality": 85} if tile_format in ("jpg", "webp") else {"compress_level": 1}
+    Image.fromarray(array).save(buffer, format=pil_format, **options)
+    return buffer.getvalue()
+
+
+def _level_tiles(level: np.ndarray, tile_size: int, overlap: int):
+    """Yield (col, row, tile) for one DZI level; tiles share `overlap` pixels with neighbours."""
+    height, width = level.shape[:2]
+    for row in range(math.ceil(height / tile_size)):
+        top, bottom = max(row * tile_size - overlap, 0), min((row + 1) * tile_size + overlap, height)
+        for col in range(math.ceil(width / tile_size)):
+            left, right = max(col * tile_size - overlap, 0), min((col + 1) * tile_size + overlap, width)
+            yield col, row, level[top:bottom, left:right]
+
+
+def dzi_descriptor(width: int, height: int, tile_size: int, overlap: int, tile_format: str) -> bytes:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="{tile_format}" '
+        f'Overlap="{overlap}" TileSize="{tile_size}">\n'
+        f'  <Size Width="{width}" Height="{height}"/>\n'
+        '</Image>\n'
+    ).encode("utf-8")
+
+
+def tile_store(
+    upload: Callable[[bytes, str, str], Optional[str]],
+    prefix: str,
+    name: str,
+    max_workers: int = 8,
+) -> Callable[[List[Tuple[str, bytes]]], None]:
+    """
+    store_tiles for build_previews: uploads each batch of ("<level>/<col>_<row>.<ext>",
+    bytes) tiles under `{prefix}/{name}_files/` with `upload(data, object_name,
+    content_type) -> path`, in parallel, before the next batch is encoded.
+    """
+    content_types = {ext: content_type for ext, (_, content_type) in _TILE_FORMATS.items()}
+
+    def upload_tile(tile: Tuple[str, bytes]) -> None:
+        tile_name, data = tile
+        object_name = f"{prefix}/{name}_files/{tile_name}"
+        if not upload(data, object_name, content_types[tile_name.rsplit(".", 1)[-1]]):
+            raise IOError(f"Could not upload preview object {object_name}")
+
+    def store(tiles: List[Tuple[str, bytes]]) -> None:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            list(pool.map(upload_tile, tiles))
+    return store
+
+
+# --- Main Preview Logic ---
+def build_previews(
+    array: np.ndarray,
+    settings: Dict[str, Any],
+    store_tiles: Optional[Callable[[List[Tuple[str, bytes]]], None]] = None,
+    scratch_dir: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Build the thumbnail and (for images at least min_pyramid_dimension on a side) the
+    DZI pyramid of a 2D result (rows x cols [x RGB]). Returns None when previews are off.
+
+    The returned dict holds encoded bytes only: {"thumbnail": {...}, "dzi": {...} | None,
+    "build_seconds": float}. DZI tiles ("<level>/<col>_<row>.<ext>", bytes) are passed to
+    store_tiles in batches of TILE_BATCH as they are encoded (dzi["tiles"] is then None);
+    without store_tiles they are collected in dzi["tiles"]. Large pyramid levels are
+    memory-mapped in a temporary directory under scratch_dir.
+    """
+    if not settings["enabled"]:
+        return None
+    with tempfile.TemporaryDirectory(prefix="previews_", dir=scratch_dir) as level_dir:
+        return _build_previews(array, settings, store_tiles, level_dir)
+
+
+def _build_previews(array: np.ndarray, settings: Dict[str, Any],
+                    store_tiles: Optional[Callable[[List[Tuple[str, bytes]]], None]],
+                    level_dir: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    height, width = array.shape[:2]
+    value_range = None
+    if array.dtype not in (np.uint8, bool):
+        value_range = (float(np.min(array)), float(np.max(array)))
+
+    tile_size, overlap, tile_format = settings["tile_size"], settings["overlap"], settings["tile_format"]
+    build_pyramid = max(height, width) >= settings["min_pyramid_dimension"]
+    max_level = math.ceil(math.log2(max(height, width, 1)))
+
+    # Walk the levels from full resolution down to 1x1, storing DZI tiles if requested
+    # and keeping the smallest level still at least thumbnail-sized.
+    tiles: List[Tuple[str, bytes]] = []
+    stored_tiles: List[Tuple[str, bytes]] = []
+    tile_count = 0
+    level_index, level = max_level, array
+    thumbnail_source = None
+    while True:
+        is_base = level is array
+        if build_pyramid:
+            for col, row, tile in _level_tiles(level, tile_size, overlap):
+                display_tile = to_display(np.asarray(tile), value_range)
+                tiles.append((f"{level_index}/{col}_{row}.{tile_format}", _encode(display_tile, tile_format)))
+                tile_count += 1
+                if store_tiles is not None and len(tiles) >= TILE_BATCH:
+                    store_tiles(tiles)
+                    tiles = []
+        if max(level.shape[:2]) >= settings["thumbnail_size"] or thumbnail_source is None:
+            thumbnail_source = level
+        if level_index == 0 or (not build_pyramid and max(level.shape[:2]) <= settings["thumbnail_size"]):
+            break
+        next_shape = level_shape(level.shape)
+        out = None
+        if int(np.prod(next_shape)) > _LEVEL_MEMMAP_BYTES:
+            out = np.lib.format.open_memmap(os.path.join(level_dir, f"level_{level_index - 1}.npy"),
+                                            mode="w+", dtype=np.uint8, shape=next_shape)
+        level = downsample_2x(level, value_range if is_base else None, out=out)
+        level_index -= 1
+    if store_tiles is not None and tiles:
+        store_tiles(tiles)
+        tiles = []
+
+    thumbnail_image = Image.fromarray(to_display(np.asarray(thumbnail_source), value_range if thumbnail_source is array else None))
+    thumbnail_image.thumbnail((settings["thumbnail_size"], settings["thumbnail_size"]), Image.LANCZOS)
+    thumbnail_buffer = io.BytesIO()
+    thumbnail_image.save(thumbnail_buffer, format="PNG")
+
+    dzi = None
+    if build_pyramid:
+        dzi = {
+            "descriptor": dzi_descriptor(width, height, tile_size, overlap, tile_format),
+            "tiles": tiles if store_tiles is None else None,
+            "tile_count": tile_count,
+            "width": width,
+            "height": height,
+            "tile_size": tile_size,
+            "overlap": overlap,
+            "format": tile_format,
+            "levels": max_level + 1,
+        }
+    return {
+        "thumbnail": {
+            "bytes": thumbnail_buffer.getvalue(),
+            "width": thumbnail_image.width,
+            "height": thumbnail_image.height,
+        },
+        "dzi": dzi,
+        "build_seconds": round(time.perf_counter() - started, 4),
+    }
+
+
+def upload_previews(
+    previews: Dict[str, Any],
+    upload: Callable[[bytes, str, str], Optional[str]],
+    prefix: str,
+    name: str,
+    max_workers: int = 8,
+) -> Dict[str, Any]:
+    """
+    Store previews under `prefix` with `upload(data, object_name, content_type) -> path`
+    (tiles in parallel, unless build_previews already stored them) and return the artifact
+    entry for output_artifacts: {"thumbnail_s3_path", "dzi_s3_path", "width", "height", ...}.
+    """
+    def checked(data: bytes, object_name: str, content_type: str) -> str:
+        path = upload(data, object_name, content_type)
+        if not path:
+            raise IOError(f"Could not upload preview object {object_name}")
+        return path
+
+    artifact: Dict[str, Any] = {
+        "thumbnail_s3_path": checked(previews["thumbnail"]["bytes"], f"{prefix}/{name}_thumbnail.png", "image/png"),
+        "thumbnail_width": previews["thumbnail"]["width"],
+        "thumbnail_height": previews["thumbnail"]["height"],
+        "dzi_s3_path": None,
+    }
+    dzi = previews.get("dzi")
+    if dzi:
+        if dzi["tiles"]:
+            tile_store(upload, prefix, name, max_workers=max_workers)(dzi["tiles"])
+        artifact.update({
+            "dzi_s3_path": checked(dzi["descriptor"], f"{prefix}/{name}.dzi", "application/xml"),
+            "width": dzi["width"],
+            "height": dzi["height"],
+            "tile_size": dzi["tile_size"],
+            "overlap": dzi["overlap"],
+            "levels": dzi["levels"],
+            "tile_count": dzi["tile_count"],
+        })
+    return artifact
@@ -1,80 +1,213 @@
 # backend/app/utils/benchtop/biology/imaging/segmentation/auto_threshold_processor.py
 
-import io
+import os
+import tempfile
 import numpy as np
-from PIL import Image
-from typing import Dict, Any
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
 
 from app.schemas.benchtop.biology.imaging.segmentation.auto_threshold_schema import AutoThresholdParams
+from app.utils.benchtop.biology.imaging import encoders, image_io, native_ops, previews, tiling
+
+# --- Helper Functions ---
+def needs_imagej(params: AutoThresholdParams) -> bool:
+    """Whether this request has to run on the ImageJ gateway (i.e. the JVM)."""
+    return native_ops.resolve_backend(
+        params.backend, native_supported=native_ops.supports_threshold(params.method)
+    ) == "imagej"
+
+
+def apply(input_array: np.ndarray, params: AutoThresholdParams, ij_gateway=None) -> np.ndarray:
+    """
+    Threshold a grayscale NumPy image with the requested backend.
+    Returns a boolean array (True for foreground, False for background).
+    """
+    backend = native_ops.resolve_backend(
+        params.backend, native_supported=native_ops.supports_threshold(params.method)
+    )
+    if backend == "native":
+        mask, _ = native_ops.auto_threshold(input_array, params.method)
+        return mask
+
+    if ij_gateway is None:
+        raise ValueError("The 'imagej' backend requires an initialized ImageJ gateway.")
+    ij_dataset = ij_gateway.py.to_dataset(input_array)
+
+    # The method name from the frontend (e.g., "Otsu") is converted to lowercase
+    # to match the method names on the ImageJ Ops `threshold` service (e.g., `otsu`).
+    threshold_op_name = params.method.lower()
+    threshold_ops = ij_gateway.op().threshold()
+    if not hasattr(threshold_ops, threshold_op_name):
+        raise AttributeError(f"The thresholding operation '{threshold_op_name}' is not available in this ImageJ instance.")
+
+    # Dynamically call the correct op, e.g., `ij_gateway.op().threshold().otsu(ij_dataset)`,
+    # and convert the resulting Img<BitType> back to a boolean NumPy array.
+    binary_img = getattr(threshold_ops, threshold_op_name)(ij_dataset)
+    return np.asarray(ij_gateway.py.from_java(binary_img)).astype(bool)
+
+
+def apply_tiled(input_array: np.ndarray, params: AutoThresholdParams, out: np.ndarray,
+                engine: Dict[str, Any]) -> float:
+    """
+    Native threshold tile by tile into the boolean `out`. The threshold comes from a
+    global histogram accumulated over the tiles, so the mask matches the whole-image
+    result; the comparison is a point operation and needs no halo. Returns the threshold.
+    """
+    counts, minimum, bin_width = tiling.tiled_histogram(
+        input_array, tile_size=engine["tile_size"], max_workers=engine["max_workers"]
+    )
+    threshold = native_ops.compute_threshold(None, params.method, counts, minimum, bin_width)
+    tiling.apply_tiled(
+        input_array,
+        lambda tile: tile > threshold,
+        out,
+        tile_size=engine["tile_size"],
+        max_workers=engine["max_workers"],
+    )
+    return threshold
+
+
+def to_grayscale(plane: np.ndarray) -> np.ndarray:
+    """Collapse trailing RGB(A) samples to luminance (PIL's 'L' weights), keeping the dtype."""
+    if plane.ndim == 2:
+        return plane
+    luminance = plane[..., 0] * 0.299 + plane[..., 1] * 0.587 + plane[..., 2] * 0.114
+    return native_ops.round_to_dtype(luminance, plane.dtype)
+
+
+def _threshold_plane(plane: np.ndarray, params: AutoThresholdParams, engine: Dict[str, Any],
+                     plane_buffer: Callable[..., np.ndarray], ij_gateway=None) -> np.ndarray:
+    """
+    Threshold one plane of a stack on its own histogram, returning a 0/255 uint8 mask.
+    Large planes are thresholded into disk-backed buffers reused for every plane (see
+    image_io.plane_buffers).
+    """
+    plane = to_grayscale(plane)
+    if ij_gateway is None and tiling.should_tile(plane.shape, engine["min_tiled_pixels"]):
+        mask = plane_buffer(plane.shape, bool)
+        apply_tiled(plane, params, mask, engine)
+        return np.multiply(mask, 255, out=plane_buffer(plane.shape, np.uint8), dtype=np.uint8)
+    mask = apply(plane, params, ij_gateway=ij_gateway)
+    return mask.astype(np.uint8) * 255
+
 
 # --- Main Processor Logic ---
 def run(
-    ij_gateway,  # The initialized PyImageJ gateway instance
-    image_bytes: bytes,
-    params: AutoThresholdParams
+    ij_gateway,  # The initialized PyImageJ gateway instance, or None for the native backend
+    image: image_io.ImageSource,
+    params: AutoThresholdParams,
+    config: Optional[dict] = None,
+    output_file: Optional[BinaryIO] = None,
+    store_preview_tiles: Optional[Callable[[List[Tuple[str, bytes]]], None]] = None,
 ) -> Dict[str, Any]:
     """
-    Applies an automatic thresholding algorithm to an image using ImageJ ops.
+    Applies an automatic thresholding algorithm to an image, either natively
+    (NumPy/SciPy ports of ImageJ's AutoThresholder) or using ImageJ ops.
 
-    This processor follows the standardized architecture: it receives an initialized
+    This processor follows the standardized architecture: it receives an (optional)
     ImageJ gateway and a validated parameters object, performs a specific task,
     and returns a result dictionary.
 
     Args:
-        ij_gateway: The active PyImageJ gateway from the ImageJService.
-        image_bytes: The input image as bytes.
+        ij_gateway: The active PyImageJ gateway from the ImageJService. Only required
+            when the request resolves to the 'imagej' backend.
+        image: The input image as bytes, or the path of a local file.
         params: A Pydantic model containing the validated thresholding method.
+        config: The tool's YAML config; its `engine` section controls tiling (native
+            backend only, since ImageJ ops threshold each input on its own histogram)
+            and its `output` section the encoder.
+        output_file: If given (e.g. a temp file), the full-resolution result (2D mask
+            or TIFF stack) is written there and processed_image_bytes is None.
+        store_preview_tiles: Receives the preview's DZI tiles in batches as they are
+            encoded (see previews.tile_store); otherwise they are returned.
+
+    TIFF/OME-TIFF input (including 16-bit and z/t/c stacks) is thresholded at its
+    original bit depth, plane by plane, and the masks are returned as a multi-page TIFF.
+    TIFF is read region by region; other formats are decoded whole and capped at the
+    engine's max_decoded_pixels (see image_io).
 
     Returns:
-        A dictionary containing the processed binary image as bytes (in PNG format)
-        and a summary of the operation.
+        A dictionary containing the processed binary image as bytes (in the configured
+        output format, or TIFF for TIFF input), its format, and a summary of the operation.
     """
-    # 1. Convert input bytes to a grayscale NumPy array.
-    # Thresholding operates on intensity values, so a single channel is required.
-    pil_image = Image.open(io.BytesIO(image_bytes))
-    if pil_image.mode != 'L':
-        pil_image = pil_image.convert('L') # Convert to 8-bit grayscale
-
-    input_array = np.array(pil_image)
-
-    # 2. Convert NumPy array to an ImageJ2 Dataset object
-    ij_dataset = ij_gateway.py.to_dataset(input_array)
-
-    # 3. Dynamically select and run the chosen thresholding operation
-    # The method name from the frontend (e.g., "Otsu") is converted to lowercase
-    # to match the method names on the ImageJ Ops `threshold` service (e.g., `otsu`).
-    threshold_op_name = params.method.lower()
-    
-    # Get the thresholding operation namespace from the gateway
-    threshold_ops = ij_gateway.op().threshold()
+    backend = "imagej" if needs_imagej(params) else "native"
+    engine = tiling.engine_settings(config)
+    output = encoders.output_settings(config, params.output_format)
+    preview = previews.preview_settings(config)
 
-    # Check if the requested op exists on the threshold service
-    if not hasattr(threshold_ops, threshold_op_name):
-        raise AttributeError(f"The thresholding operation '{threshold_op_name}' is not available in this ImageJ instance.")
+    # 1a. TIFF stacks: read (memory-mapped where possible) and threshold plane by plane
+    if image_io.is_tiff(image):
+        with tempfile.TemporaryDirectory(prefix="auto_threshold_", dir=engine["scratch_dir"]) as scratch_dir:
+            plane_buffer = image_io.plane_buffers(scratch_dir)
+            stack_file, stack_summary = image_io.process_tiff_stack(
+                image,
+                lambda plane: _threshold_plane(plane, params, engine, plane_buffer, ij_gateway=ij_gateway),
+                output_file=output_file,
+                scratch_dir=engine["scratch_dir"],
+                compression=output["tiff_compression"],
+                max_pixels=engine["max_image_pixels"],
+            )
+        # Written to output_file when given; otherwise read back from the temp file
+        output_bytes = None if output_file is not None else image_io.read_and_close(stack_file)
+        return {
+            "processed_image_bytes": output_bytes,
+            "output_format": "tiff",
+            "summary": {
+                "filter_applied": "Auto Threshold",
+                "parameters_used": params.model_dump(),
+                "backend": backend,
+                "stack": stack_summary,
+            },
+            # Stacks are viewed plane by plane in dedicated viewers; no 2D preview is built
+            "previews": None,
+        }
 
-    # Dynamically call the correct op, e.g., `ij_gateway.op().threshold().otsu(ij_dataset)`
-    binary_img = getattr(threshold_ops, threshold_op_name)(ij_dataset)
+    # 1b. Convert input bytes to a grayscale NumPy array.
+    # Thresholding operates on intensity values, so a single channel is required;
+    # 16-bit grayscale is kept as is rather than truncated to 8-bit.
+    # The size is checked from the header before anything is decoded.
+    pil_image = image_io.open_image(image, engine["max_decoded_pixels"])
+    if pil_image.mode not in ('L', 'I;16'):
+        pil_image = pil_image.convert('L') # Convert to 8-bit grayscale
 
-    # 4. Convert the resulting ImageJ Img<BitType> back to a NumPy array
-    # The result is a boolean array (True for foreground, False for background).
-    output_array_bool = ij_gateway.py.from_java(binary_img)
+    original_width, original_height = pil_image.size
+    input_array = np.array(pil_image)
+    pil_image.close() # The array is the only decoded copy kept
 
-    # 5. Convert boolean array to an 8-bit integer array (0 and 255) for image saving
-    output_array_uint8 = (output_array_bool * 255).astype(np.uint8)
+    # 2. Run the selected thresholding method on the selected backend
+    tiled = backend == "native" and tiling.should_tile(input_array.shape, engine["min_tiled_pixels"])
+    if tiled:
+        # 3. Tiled path: write the mask to a disk-backed output and encode it band by band
+        with tempfile.TemporaryDirectory(prefix="auto_threshold_", dir=engine["scratch_dir"]) as scratch_dir:
+            output_array = np.lib.format.open_memmap(
+                os.path.join(scratch_dir, "mask.npy"), mode="w+", dtype=bool, shape=input_array.shape,
+            )
+            apply_tiled(input_array, params, output_array, engine)
+            del input_array
+            output_bytes, encoding = encoders.encode(output_array, output, file_obj=output_file)
+            preview_images = previews.build_previews(output_array, preview, store_preview_tiles, engine["scratch_dir"])
+            del output_array
+    else:
+        output_array_bool = apply(input_array, params, ij_gateway=ij_gateway)
 
-    # 6. Convert output NumPy array back to image bytes (PNG format)
-    output_image = Image.fromarray(output_array_uint8, mode='L')
-    output_buffer = io.BytesIO()
-    output_image.save(output_buffer, format="PNG")
-    output_bytes = output_buffer.getvalue()
+        # 3. Encode the boolean mask with the configured encoder: 'png' writes 0/255,
+        # 'mask_1bit' a bit-packed PNG, 'npy' the boolean array (see encoders.py)
+        output_bytes, encoding = encoders.encode(output_array_bool, output, file_obj=output_file)
+        preview_images = previews.build_previews(output_array_bool, preview, store_preview_tiles, engine["scratch_dir"])
 
-    # 7. Construct the final result dictionary
+    # 4. Construct the final result dictionary
     result = {
         "processed_image_bytes": output_bytes,
+        "output_format": output["format"],
         "summary": {
             "filter_applied": "Auto Threshold",
             "parameters_used": params.model_dump(),
-            "original_dimensions": f"{pil_image.width}x{pil_image.height}",
-        }
+            "backend": backend,
+            "tiled": tiled,
+            "original_dimensions": f"{original_width}x{original_height}",
+            "encoding": encoding,
+            "preview_seconds": preview_images["build_seconds"] if preview_images else None,
+        },
+        # Thumbnail and DZI pyramid for the browser, separate from the full-resolution output
+        "previews": preview_images,
     }
-    return result
\ No newline at end of file
+    return result
@@ -0,0 +1,118 @@
+# backend/app/utils/benchtop/biology/imaging/tiling.py
+
+import os
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.utils.benchtop.biology.imaging import image_io, native_ops
+
+# Tiled execution for images too large to filter in one piece. Tiles are read with a
+# halo (overlap) wide enough that each tile's interior is identical to filtering the
+# whole image, processed on a thread pool (NumPy/SciPy release the GIL), and written
+# straight into a preallocated output (typically an np.memmap). Only a bounded number
+# of tiles is in flight, so working memory does not grow with the image.
+
+DEFAULT_TILE_SIZE = 2048
+DEFAULT_MIN_TILED_PIXELS = 4096 * 4096
+DEFAULT_MAX_WORKERS = 4
+
+TileSpec = Tuple[Tuple[slice, slice], Tuple[slice, slice], Tuple[slice, slice]]
+
+
+# --- Helper Functions ---
+def engine_settings(config: Optional[dict]) -> Dict[str, Any]:
+    """Tiling settings from a tool config's `engine` section, with defaults."""
+    engine = (config or {}).get('engine', {}) or {}
+    return {
+        "tile_size": int(engine.get('tile_size') or DEFAULT_TILE_SIZE),
+        "min_tiled_pixels": int(engine.get('min_tiled_pixels') or DEFAULT_MIN_TILED_PIXELS),
+        "max_workers": int(engine.get('max_workers') or min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1)),
+        "scratch_dir": engine.get('scratch_dir'),
+        # Input size caps (see image_io): TIFF is read region by region, other formats whole
+        "max_image_pixels": int(engine.get('max_image_pixels') or image_io.DEFAULT_MAX_IMAGE_PIXELS),
+        "max_decoded_pixels": int(engine.get('max_decoded_pixels') or image_io.DEFAULT_MAX_DECODED_PIXELS),
+    }
+
+
+def should_tile(shape: Tuple[int, ...], min_tiled_pixels: int) -> bool:
+    return shape[0] * shape[1] > min_tiled_pixels
+
+
+def tile_grid(shape: Tuple[int, ...], tile_size: int, halo: int = 0) -> List[TileSpec]:
+    """
+    Split the two spatial axes into tiles. Each entry is (read, write, crop):
+    read the `read` region (tile plus halo, clipped to the image), process it, and
+    store result[crop] into output[write].
+    """
+    height, width = shape[:2]
+    tiles = []
+    for top in range(0, height, tile_size):
+        bottom = min(top + tile_size, height)
+        read_top, read_bottom = max(top - halo, 0), min(bottom + halo, height)
+        for left in range(0, width, tile_size):
+            right = min(left + tile_size, width)
+            read_left, read_right = max(left - halo, 0), min(right + halo, width)
+            tiles.append((
+                (slice(read_top, read_bottom), slice(read_left, read_right)),
+                (slice(top, bottom), slice(left, right)),
+                (slice(top - read_top, bottom - read_top), slice(left - read_left, right - read_left)),
+            ))
+    return tiles
+
+
+def _run_bounded(func: Callable[[Any], Any], items: List[Any], max_workers: int) -> List[Any]:
+    """Map func over items on a thread pool, keeping at most 2 * max_workers items in flight."""
+    if max_workers <= 1:
+        return [func(item) for item in items]
+    results: Dict[int, Any] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {}
+        for index, item in enumerate(items):
+            if len(pending) >= 2 * max_workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+            pending[pool.submit(func, item)] = index
+        for future in list(pending):
+            results[pending.pop(future)] = future.result()
+    return [results[i] for i in range(len(items))]
+
+
+# --- Main Engine Logic ---
+def apply_tiled(
+    image: np.ndarray,
+    func: Callable[[np.ndarray], np.ndarray],
+    out: np.ndarray,
+    tile_size: int = DEFAULT_TILE_SIZE,
+    halo: int = 0,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> np.ndarray:
+    """
+    Apply a per-tile function over an image into `out` (same spatial shape).
+    `halo` must cover the filter's reach (e.g. the Gaussian kernel radius) for the
+    result to match whole-image processing.
+    """
+    def process(tile: TileSpec) -> None:
+        read, write, crop = tile
+        out[write] = func(np.asarray(image[read]))[crop]
+
+    _run_bounded(process, tile_grid(image.shape, tile_size, halo), max_workers)
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+def tiled_histogram(image: np.ndarray, tile_size: int = DEFAULT_TILE_SIZE,
+                    max_workers: int = DEFAULT_MAX_WORKERS, bins: int = native_ops.HISTOGRAM_BINS):
+    """
+    Streaming equivalent of native_ops.histogram: one pass for the global min/max,
+    one pass accumulating bin counts. Returns (counts, minimum, bin_width).
+    """
+    regions = [read for read, _, _ in tile_grid(image.shape, tile_size)]
+    extremes = _run_bounded(lambda r: (float(np.min(image[r])), float(np.max(image[r]))), regions, max_workers)
+    minimum = min(lo for lo, _ in extremes)
+    bin_width = (max(hi for _, hi in extremes) - minimum) / bins
+    counts = _run_bounded(lambda r: native_ops.bin_counts(np.asarray(image[r]), minimum, bin_width, bins),
+                          regions, max_workers)
+    return np.sum(counts, axis=0), minimum, bin_width
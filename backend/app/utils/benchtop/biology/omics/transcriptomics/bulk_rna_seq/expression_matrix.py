@@ -0,0 +1,340 @@
+# backend/app/utils/benchtop/biology/omics/transcriptomics/bulk_rna_seq/expression_matrix.py
+import pandas as pd
+import numpy as np
+import os
+import re
+import logging
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+# Shared expression-matrix preparation for the PCA and heatmap tools.
+# A table is parsed once into a float32 (genes x columns) block, stored column-major so
+# every sample is contiguous and `values.T` is a C-contiguous (samples x genes) matrix.
+# Parsed blocks are cached per dataset inside the worker process and are read-only;
+# callers that need to modify values must copy (or subset, which copies).
+# Gene metadata columns (logFC, p-values, FDR) are also kept as float64: float32 has ~7
+# significant digits, too few for p-value cut-offs near 1e-8 or for tied FDRs.
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the parsed blocks kept in memory by each worker process.
+CACHE_MAX_BYTES = int(os.getenv("EXPRESSION_MATRIX_CACHE_MB", "1024")) * 1024 ** 2
+
+# Columns converted per step when filling a preallocated block.
+COLUMN_CHUNK = 64
+
+# Rows parsed per step when a delimited table is streamed into a memmap.
+CHUNK_ROWS = 50_000
+
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# --- Helper Functions ---
+def load_data(file_obj: Any, file_extension: str) -> pd.DataFrame:
+    try:
+        read_func = {
+            '.xlsx': pd.read_excel,
+            '.csv': pd.read_csv,
+            '.tsv': pd.read_csv,
+            '.txt': pd.read_csv,
+        }
+        kwargs = {'sep': '\t'} if file_extension in ['.tsv', '.txt'] else {}
+        return read_func[file_extension](file_obj, **kwargs)
+    except KeyError:
+        logger.warning("Unknown extension '%s', trying generic CSV read.", file_extension)
+        file_obj.seek(0)
+        return pd.read_csv(file_obj)
+    except Exception as e:
+        raise ValueError(f"Failed to load or parse the data file: {e}")
+
+
+def _delimiter(file_extension: str) -> Optional[str]:
+    """Separator used by load_data, or None for formats that cannot be read in chunks (Excel)."""
+    if file_extension == '.xlsx':
+        return None
+    return '\t' if file_extension in ['.tsv', '.txt'] else ','
+
+
+def infer_groups_from_sample_names(sample_names: List[str]) -> List[str]:
+    try:
+        prefixes = [re.split(r'[_.-](?:rep|r|s|gfp\w*)?\d*$', name, flags=re.IGNORECASE)[0]
+                    for name in sample_names]
+        if 1 < len(set(prefixes)) < len(sample_names):
+            return prefixes
+        prefixes = [re.split(r'[_.-]', name)[0] for name in sample_names]
+        if 1 < len(set(prefixes)) < len(sample_names):
+            return prefixes
+    except Exception:
+        pass
+    return ['all_samples'] * len(sample_names)
+
+
+def to_float32_block(df: pd.DataFrame, memmap_path: Optional[str] = None) -> np.ndarray:
+    """
+    Convert a frame to one column-major float32 block in a single pass.
+    Numeric columns are copied in bulk; only non-numeric columns go through
+    pd.to_numeric (non-parsable values become NaN). If memmap_path is given,
+    the block is written to an on-disk memmap instead of the heap.
+    """
+    is_numeric = np.array([pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+                           for dtype in df.dtypes], dtype=bool)
+    numeric_idx = np.flatnonzero(is_numeric)
+    all_numeric = numeric_idx.size == len(is_numeric)
+
+    if all_numeric and not memmap_path:
+        # pandas stores a homogeneous frame column-major already, so this is one cast, no reshuffle
+        return np.asfortranarray(df.to_numpy(dtype=np.float32, na_value=np.nan))
+
+    if memmap_path:
+        block = np.memmap(memmap_path, dtype=np.float32, mode='w+', shape=df.shape, order='F')
+    else:
+        block = np.empty(df.shape, dtype=np.float32, order='F')
+
+    # Fill in column chunks so the temporary float32 copy stays small (matters for memmaps)
+    for start in range(0, df.shape[1], COLUMN_CHUNK):
+        stop = min(start + COLUMN_CHUNK, df.shape[1])
+        if is_numeric[start:stop].all():
+            block[:, start:stop] = df.iloc[:, start:stop].to_numpy(dtype=np.float32, na_value=np.nan)
+            continue
+        for i in range(start, stop):
+            column = df.iloc[:, i] if is_numeric[i] else pd.to_numeric(df.iloc[:, i], errors='coerce')
+            block[:, i] = column.to_numpy(dtype=np.float32, na_value=np.nan)
+    return block
+
+
+def _matching_columns(columns: List[str], names: Iterable[str]) -> List[int]:
+    """Positions of the columns named in `names` (case-insensitive)."""
+    names_lower = {str(name).strip().lower() for name in names}
+    return [i for i, col in enumerate(columns) if col.lower() in names_lower]
+
+
+def to_float64(column: pd.Series) -> np.ndarray:
+    """A column as a float64 array (non-parsable values become NaN)."""
+    return pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _column_subset(block: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """Select columns, returning a view when they form a contiguous run (the common case)."""
+    if idx.size and np.array_equal(idx, np.arange(idx[0], idx[0] + idx.size)):
+        return block[:, idx[0]:idx[0] + idx.size]
+    return block[:, idx]
+
+
+# --- Cache ---
+def is_cached(cache_key: Optional[str]) -> bool:
+    with _cache_lock:
+        return cache_key is not None and cache_key in _cache
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def _cache_get(cache_key: str) -> Optional[Dict[str, Any]]:
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+        if entry is not None:
+            _cache.move_to_end(cache_key)
+        return entry
+
+
+def _entry_nbytes(entry: Dict[str, Any]) -> int:
+    return entry["values"].nbytes + sum(column.nbytes for column in entry["metadata"].values())
+
+
+def _cache_put(cache_key: str, entry: Dict[str, Any]) -> None:
+    if _entry_nbytes(entry) > CACHE_MAX_BYTES:
+        return
+    with _cache_lock:
+        _cache[cache_key] = entry
+        _cache.move_to_end(cache_key)
+        while sum(_entry_nbytes(e) for e in _cache.values()) > CACHE_MAX_BYTES:
+            evicted_key, _ = _cache.popitem(last=False)
+            logger.info("Evicted expression matrix for '%s' from cache.", evicted_key)
+
+
+def parse_table(file_obj: Any, filename: str, memmap_path: Optional[str] = None,
+                metadata_columns: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Load a (genes x columns) table: strip headers, use the first column as the gene index
+    and convert every remaining column into one float32 block. Columns named in
+    metadata_columns are also kept as float64 ("metadata", keyed by column name).
+    """
+    file_extension = os.path.splitext(filename)[1].lower()
+    df = load_data(file_obj, file_extension)
+
+    # Trim whitespace from column headers
+    df.columns = df.columns.astype(str).str.strip()
+    df = df.set_index(df.columns[0])
+    logger.info("Parsed table with %d genes and %d columns.", df.shape[0], df.shape[1])
+
+    values = to_float32_block(df, memmap_path=memmap_path)
+    values.flags.writeable = False
+    return {
+        "values": values,
+        "columns": df.columns.tolist(),
+        "gene_index": df.index,
+        "column_has_missing": np.isnan(values).any(axis=0),
+        "metadata": {df.columns[i]: to_float64(df.iloc[:, i]) for i in _matching_columns(df.columns.tolist(), metadata_columns)},
+    }
+
+
+def scan_table(file_obj: Any, filename: str, chunk_rows: int = CHUNK_ROWS) -> Optional[Dict[str, Any]]:
+    """
+    Size a delimited table without parsing its values: reads the header and, chunk by
+    chunk, the gene column only. Returns {"columns", "gene_index"} (columns excludes the
+    gene column), or None for formats that can only be read whole (Excel).
+    """
+    sep = _delimiter(os.path.splitext(filename)[1].lower())
+    if sep is None:
+        return None
+    try:
+        file_obj.seek(0)
+        header = pd.read_csv(file_obj, sep=sep, nrows=0).columns.astype(str).str.strip()
+        file_obj.seek(0)
+        genes = [chunk.iloc[:, 0] for chunk in pd.read_csv(file_obj, sep=sep, usecols=[0], chunksize=chunk_rows)]
+    except Exception as e:
+        raise ValueError(f"Failed to load or parse the data file: {e}")
+    finally:
+        file_obj.seek(0)
+    gene_index = pd.Index(pd.concat(genes) if genes else [], name=header[0])
+    return {"columns": header[1:].tolist(), "gene_index": gene_index}
+
+
+def parse_table_chunked(file_obj: Any, filename: str, memmap_path: str, scan: Dict[str, Any],
+                        chunk_rows: int = CHUNK_ROWS, metadata_columns: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    parse_table for delimited input too large for the heap: rows are read chunk by chunk
+    straight into an on-disk float32 memmap sized from scan_table, so the table is never
+    held as one DataFrame.
+    """
+    sep = _delimiter(os.path.splitext(filename)[1].lower())
+    columns, gene_index = scan["columns"], scan["gene_index"]
+    values = np.memmap(memmap_path, dtype=np.float32, mode='w+', shape=(len(gene_index), len(columns)), order='F')
+    column_has_missing = np.zeros(len(columns), dtype=bool)
+    metadata_positions = _matching_columns(columns, metadata_columns)
+    metadata = {columns[i]: np.empty(len(gene_index), dtype=np.float64) for i in metadata_positions}
+    row = 0
+    try:
+        file_obj.seek(0)
+        for chunk in pd.read_csv(file_obj, sep=sep, chunksize=chunk_rows):
+            samples = chunk.iloc[:, 1:]
+            block = to_float32_block(samples)
+            values[row:row + len(block)] = block
+            column_has_missing |= np.isnan(block).any(axis=0)
+            for i in metadata_positions:
+                metadata[columns[i]][row:row + len(block)] = to_float64(samples.iloc[:, i])
+            row += len(block)
+    except Exception as e:
+        raise ValueError(f"Failed to load or parse the data file: {e}")
+    if row != len(gene_index):
+        raise ValueError(f"The data file changed while it was read ({row} rows, expected {len(gene_index)}).")
+    logger.info("Streamed table with %d genes and %d columns to disk.", len(gene_index), len(columns))
+
+    values.flush()
+    values.flags.writeable = False
+    return {
+        "values": values,
+        "columns": columns,
+        "gene_index": gene_index,
+        "column_has_missing": column_has_missing,
+        "metadata": metadata,
+    }
+
+
+# --- Main Entry Point ---
+def prepare_expression_matrix(
+    file_obj: Any,
+    filename: str,
+    excluded_metadata_columns: Iterable[str] = (),
+    cache_key: Optional[str] = None,
+    memmap_path: Optional[str] = None,
+    scan: Optional[Dict[str, Any]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> Dict[str, Any]:
+    """
+    Return the sample expression block and gene metadata for a dataset.
+
+    Columns named in excluded_metadata_columns (case-insensitive) are returned separately as
+    numeric gene metadata; everything else is treated as a sample. When cache_key is given the
+    parsed table is reused across calls (and tools), in which case file_obj may be None.
+    With memmap_path the block is written to disk instead (and never cached); delimited
+    tables are then streamed in chunks of chunk_rows (scan: a scan_table result, if the
+    caller already has one).
+
+    Returns a dict with:
+      values        read-only float32 (genes x samples) array, column-major
+      gene_index    pandas Index of gene identifiers
+      sample_names  sample column names (original case, whitespace-stripped)
+      metadata      DataFrame of the excluded columns, float64, indexed by gene
+      has_missing   whether values contains any NaN
+    """
+    excluded_metadata_columns = list(excluded_metadata_columns)
+    table = _cache_get(cache_key) if cache_key else None
+    if table is not None and file_obj is not None and any(
+            table["columns"][i] not in table["metadata"]
+            for i in _matching_columns(table["columns"], excluded_metadata_columns)):
+        table = None  # Cached without float64 copies of these metadata columns: parse again
+    if table is None:
+        if file_obj is None:
+            raise ValueError("No input file provided and the dataset is not cached.")
+        if memmap_path is not None:
+            scan = scan or scan_table(file_obj, filename, chunk_rows)
+        if memmap_path is not None and scan is not None:
+            table = parse_table_chunked(file_obj, filename, memmap_path, scan, chunk_rows,
+                                        metadata_columns=excluded_metadata_columns)
+        else:
+            table = parse_table(file_obj, filename, memmap_path=memmap_path,
+                                metadata_columns=excluded_metadata_columns)
+        if cache_key and memmap_path is None:
+            _cache_put(cache_key, table)
+    else:
+        logger.info("Using cached expression matrix for '%s'.", cache_key)
+
+    excluded_lower = {str(col).strip().lower() for col in excluded_metadata_columns}
+    logger.info("Excluding metadata columns: %s", excluded_lower)
+    columns = table["columns"]
+    is_metadata = np.array([col.lower() in excluded_lower for col in columns], dtype=bool)
+    sample_idx, metadata_idx = np.flatnonzero(~is_metadata), np.flatnonzero(is_metadata)
+    if not sample_idx.size:
+        raise ValueError("No valid sample columns found after excluding metadata. "
+                         "Check your data file and configuration.")
+
+    values = _column_subset(table["values"], sample_idx)
+    values.flags.writeable = False
+    # Metadata comes from the float64 copies; a table cached by a tool that excluded other
+    # columns, and reused without the file, falls back to the float32 block for the rest
+    metadata = pd.DataFrame(
+        {columns[i]: table["metadata"][columns[i]] if columns[i] in table["metadata"]
+         else table["values"][:, i].astype(np.float64) for i in metadata_idx},
+        index=table["gene_index"],
+        columns=[columns[i] for i in metadata_idx],
+    )
+
+    return {
+        "values": values,
+        "gene_index": table["gene_index"],
+        "sample_names": [columns[i] for i in sample_idx],
+        "metadata": metadata,
+        "has_missing": bool(table["column_has_missing"][sample_idx].any()),
+    }
+
+
+def impute_means(values: np.ndarray, axis: int) -> np.ndarray:
+    """
+    Return a float32 copy of `values` with NaNs replaced by the mean along `axis`
+    (axis=1: per-row mean, axis=0: per-column mean). Lines with no values stay NaN.
+    """
+    out = np.array(values, dtype=np.float32)
+    missing = np.isnan(out)
+    if missing.any():
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)  # all-NaN lines
+            means = np.nanmean(out, axis=axis)
+        rows, cols = np.nonzero(missing)
+        out[rows, cols] = means[rows] if axis == 1 else means[cols]
+    return out
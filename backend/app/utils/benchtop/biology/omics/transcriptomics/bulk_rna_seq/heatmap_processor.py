@@ -2,67 +2,46 @@
 import pandas as pd
 import numpy as np
 import io
-import os
-import re
 import logging
-from typing import Any, Optional, Dict, List
+from typing import Callable, Optional
 
 from scipy.cluster.hierarchy import linkage, leaves_list
 from sklearn.preprocessing import StandardScaler
-from sklearn.impute import SimpleImputer
 
 from app.schemas.benchtop.biology.omics.transcriptomics.bulk_rna_seq.heatmap_schema import HeatmapParams
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import expression_matrix as expression_matrix_utils
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq.expression_matrix import infer_groups_from_sample_names
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# --- Helper Functions ---
-def load_data(file_obj: Any, file_extension: str) -> pd.DataFrame:
-    try:
-        read_func = {'.xlsx': pd.read_excel, '.csv': pd.read_csv, '.tsv': pd.read_csv, '.txt': pd.read_csv}
-        kwargs = {'sep': '\t'} if file_extension in ['.tsv', '.txt'] else {}
-        return read_func[file_extension](file_obj, **kwargs)
-    except KeyError:
-        file_obj.seek(0); return pd.read_csv(file_obj)
-    except Exception as e:
-        raise ValueError(f"Failed to load or parse the data file: {e}")
-
-def infer_groups_from_sample_names(sample_names: List[str]) -> List[str]:
-    try:
-        prefixes = [re.split(r'[_.-](?:rep|r|s|gfp\w*)?\d*$', name, flags=re.IGNORECASE)[0] for name in sample_names]
-        if 1 < len(set(prefixes)) < len(sample_names): return prefixes
-        prefixes = [re.split(r'[_.-]', name)[0] for name in sample_names]
-        if 1 < len(set(prefixes)) < len(sample_names): return prefixes
-    except Exception: pass
-    return ['all_samples'] * len(sample_names)
-
 # --- Main Processor Logic ---
-def run(file_obj: io.BytesIO, filename: str, params: HeatmapParams, config: dict) -> dict:
-    file_extension = os.path.splitext(filename)[1].lower()
-    df = load_data(file_obj, file_extension)
-    
-    df.columns = df.columns.str.strip()
-    original_columns_map = {col.lower(): col for col in df.columns}
-    df.columns = df.columns.str.lower()
-
-    df = df.set_index(df.columns[0])
-
-    excluded_cols_lower = {str(c).lower() for c in config.get('expected_input', {}).get('excluded_metadata_columns', [])}
-    logger.info(f"Excluding metadata columns: {excluded_cols_lower}")
-    
-    sample_columns = [col for col in df.columns if col not in excluded_cols_lower]
-    metadata_columns = [col for col in df.columns if col in excluded_cols_lower]
-    
-    if not sample_columns:
-        raise ValueError("No valid sample columns found after excluding metadata.")
-    
-    expression_matrix = df[sample_columns].apply(pd.to_numeric, errors='coerce')
-    gene_metadata = df[metadata_columns]
-
-    imputer = SimpleImputer(strategy='mean')
-    expression_matrix = pd.DataFrame(imputer.fit_transform(expression_matrix), 
-                                     index=expression_matrix.index, 
-                                     columns=expression_matrix.columns)
+def run(file_obj: Optional[io.BytesIO], filename: str, params: HeatmapParams, config: dict,
+        cache_key: Optional[str] = None, checkpoint: Optional[Callable[..., None]] = None) -> dict:
+    """
+    Select, transform and cluster genes for the heatmap payload. `checkpoint` (see
+    app.services.run_control) is called as each stage starts; it reports progress and
+    raises if the run was cancelled.
+    """
+    checkpoint = checkpoint or (lambda stage, done=None, total=None: None)
+    checkpoint("loading")
+    excluded_cols = config.get('expected_input', {}).get('excluded_metadata_columns', []) or []
+    matrix = expression_matrix_utils.prepare_expression_matrix(file_obj, filename, excluded_cols, cache_key=cache_key)
+
+    values, sample_names = matrix["values"], matrix["sample_names"]
+    if matrix["has_missing"]:
+        checkpoint("imputing")
+        # Per-sample mean imputation; samples with no values at all are dropped (as SimpleImputer did)
+        has_values = ~np.isnan(values).all(axis=0)
+        if not has_values.all():
+            values = values[:, has_values]
+            sample_names = [name for name, keep in zip(sample_names, has_values) if keep]
+        values = expression_matrix_utils.impute_means(values, axis=0)
+
+    expression_matrix = pd.DataFrame(values, index=matrix["gene_index"], columns=sample_names, copy=False)
+    gene_metadata = matrix["metadata"]
+    gene_metadata.columns = gene_metadata.columns.str.lower()
+    checkpoint("selecting_genes")
 
     selection_reason = ""
     if params.gene_selection_method == "top_n_variable":
@@ -91,6 +70,9 @@ def run(file_obj: io.BytesIO, filename: str, params: HeatmapParams, config: dict
     if matrix_to_plot.empty:
         raise ValueError("No genes remained after filtering. Please check your filtering criteria.")
     logger.info(f"Gene selection method '{params.gene_selection_method}' resulted in {len(matrix_to_plot)} genes.")
+    checkpoint("transforming")
+    # Only the selected genes are promoted back to float64 for transformation and clustering
+    matrix_to_plot = matrix_to_plot.astype(np.float64)
 
     if params.normalization_method == "log2_transform":
         matrix_to_plot = np.log2(matrix_to_plot + 1)
@@ -103,15 +85,18 @@ def run(file_obj: io.BytesIO, filename: str, params: HeatmapParams, config: dict
     gene_order, sample_order = matrix_to_plot.index.tolist(), matrix_to_plot.columns.tolist()
 
     if params.cluster_genes:
+        checkpoint("clustering_genes")
         linkage_matrix_genes = linkage(matrix_to_plot, method=params.clustering_method, metric=params.distance_metric)
         gene_order = matrix_to_plot.index[leaves_list(linkage_matrix_genes)].tolist()
 
     if params.cluster_samples:
+        checkpoint("clustering_samples")
         linkage_matrix_samples = linkage(matrix_to_plot.T, method=params.clustering_method, metric=params.distance_metric)
         sample_order = matrix_to_plot.columns[leaves_list(linkage_matrix_samples)].tolist()
     
+    checkpoint("serializing")
     final_matrix = matrix_to_plot.loc[gene_order, sample_order]
-    final_sample_names = [original_columns_map[col] for col in final_matrix.columns]
+    final_sample_names = final_matrix.columns.tolist()
 
     plot_data = {
         "heatmap_values": final_matrix.values.tolist(),
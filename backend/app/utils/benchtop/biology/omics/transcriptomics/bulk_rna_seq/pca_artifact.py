@@ -0,0 +1,88 @@
+# backend/app/utils/benchtop/biology/omics/transcriptomics/bulk_rna_seq/pca_artifact.py
+import numpy as np
+from typing import Any, BinaryIO, Dict, List, Sequence
+
+# This module only depends on NumPy so the API process can serve cached PCA results
+# without importing pandas/sklearn.
+
+ARTIFACT_FILENAME = "pca_decomposition.npz"
+
+
+def save_decomposition(
+    file_obj: BinaryIO,
+    scores: np.ndarray,
+    components: np.ndarray,
+    explained_variance_ratio: np.ndarray,
+    sample_names: Sequence[str],
+    gene_names: Sequence[str],
+    groups: Sequence[str],
+) -> None:
+    """
+    Write a PCA decomposition as an uncompressed .npz (float32 matrices, string labels).
+    Uncompressed keeps reads to a straight memcpy, which is what the axis endpoints need.
+    """
+    np.savez(
+        file_obj,
+        scores=np.asarray(scores, dtype=np.float32),
+        components=np.asarray(components, dtype=np.float32),
+        explained_variance_ratio=np.asarray(explained_variance_ratio, dtype=np.float64),
+        sample_names=np.asarray([str(s) for s in sample_names]),
+        gene_names=np.asarray([str(g) for g in gene_names]),
+        groups=np.asarray([str(g) for g in groups]),
+    )
+
+
+def load_decomposition(file_obj: BinaryIO) -> Dict[str, np.ndarray]:
+    """
+    Read a decomposition written by save_decomposition into plain arrays.
+    """
+    with np.load(file_obj, allow_pickle=False) as npz:
+        return {key: npz[key] for key in npz.files}
+
+
+def _check_component(decomposition: Dict[str, np.ndarray], pc: int) -> int:
+    n_components = decomposition["scores"].shape[1]
+    if not 1 <= pc <= n_components:
+        raise ValueError(f"Requested PC{pc} is out of bounds for the {n_components} components calculated.")
+    return pc - 1
+
+
+def select_components(decomposition: Dict[str, np.ndarray], pc_x: int, pc_y: int) -> Dict[str, Any]:
+    """
+    Build the PCA scatter payload for an arbitrary pair of components.
+    """
+    x_idx, y_idx = _check_component(decomposition, pc_x), _check_component(decomposition, pc_y)
+    scores = decomposition["scores"]
+    ratios = decomposition["explained_variance_ratio"]
+    x_col, y_col = f"PC{pc_x}", f"PC{pc_y}"
+
+    plot_data = [
+        {"sample": sample, x_col: float(x), y_col: float(y), "group": group}
+        for sample, x, y, group in zip(decomposition["sample_names"].tolist(), scores[:, x_idx].tolist(),
+                                       scores[:, y_idx].tolist(), decomposition["groups"].tolist())
+    ]
+    return {
+        "pc_x_axis": pc_x,
+        "pc_y_axis": pc_y,
+        "x_axis_label": f"PC{pc_x} ({ratios[x_idx]:.1%})",
+        "y_axis_label": f"PC{pc_y} ({ratios[y_idx]:.1%})",
+        "explained_variance_ratio": ratios.tolist(),
+        "plot_data": plot_data,
+    }
+
+
+def top_loading_genes(decomposition: Dict[str, np.ndarray], pc: int, top_n: int = 20) -> List[Dict[str, Any]]:
+    """
+    Return the top_n genes with the largest absolute loading on a component,
+    ordered by |loading| descending. Uses a partial sort over the loadings row.
+    """
+    loadings = decomposition["components"][_check_component(decomposition, pc)]
+    top_n = max(0, min(top_n, loadings.shape[0]))
+    if top_n == 0:
+        return []
+
+    magnitude = np.abs(loadings)
+    top_idx = np.argpartition(magnitude, -top_n)[-top_n:]
+    top_idx = top_idx[np.argsort(magnitude[top_idx])[::-1]]
+    gene_names = decomposition["gene_names"]
+    return [{"gene": str(gene_names[i]), "loading": float(loadings[i])} for i in top_idx]
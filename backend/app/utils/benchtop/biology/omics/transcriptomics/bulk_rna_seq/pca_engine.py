@@ -0,0 +1,267 @@
+# backend/app/utils/benchtop/biology/omics/transcriptomics/bulk_rna_seq/pca_engine.py
+import numpy as np
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from scipy import linalg
+from scipy.sparse.linalg import svds
+from sklearn.decomposition import IncrementalPCA
+from sklearn.utils.extmath import randomized_svd, svd_flip
+
+logger = logging.getLogger(__name__)
+
+VALID_SVD_SOLVERS = ["auto", "full", "randomized", "arpack", "incremental"]
+
+# Below this size a full LAPACK SVD is fast enough that a truncated solver isn't worth it.
+FULL_SVD_MAX_DIM = 500
+# A truncated solver only pays off while n_components is well below the matrix rank.
+TRUNCATED_MAX_COMPONENT_FRACTION = 0.8
+# Defaults for the out-of-core path; both can be overridden from pca.yaml's `engine` section.
+DEFAULT_INCREMENTAL_THRESHOLD_MB = 2048
+DEFAULT_INCREMENTAL_BATCH_SIZE = 256
+
+
+# --- Helper Functions ---
+def choose_solver(n_samples: int, n_features: int, n_components: int, requested: str = "auto") -> str:
+    """
+    Resolve the SVD solver to use for a (n_samples x n_features) matrix.
+
+    'auto' keeps the exact LAPACK SVD for small matrices or when most of the spectrum
+    is requested, and switches to randomized SVD when n_components is much smaller
+    than the matrix rank. 'arpack' is honoured only when it is valid (k < min dim).
+    """
+    if requested not in VALID_SVD_SOLVERS:
+        raise ValueError(f"Invalid SVD solver '{requested}'. Must be one of {VALID_SVD_SOLVERS}")
+
+    min_dim = min(n_samples, n_features)
+    if requested == "incremental":
+        raise ValueError("The incremental solver streams from disk; use fit_incremental_pca instead.")
+    if requested == "arpack" and n_components >= min_dim:
+        logger.warning("ARPACK needs n_components < %d; falling back to the full solver.", min_dim)
+        return "full"
+    if requested != "auto":
+        return requested
+
+    if max(n_samples, n_features) <= FULL_SVD_MAX_DIM or n_components >= TRUNCATED_MAX_COMPONENT_FRACTION * min_dim:
+        return "full"
+    return "randomized"
+
+
+def should_use_incremental(n_samples: int, n_features: int, requested: str = "auto",
+                           threshold_mb: float = DEFAULT_INCREMENTAL_THRESHOLD_MB) -> bool:
+    """
+    Decide whether a (n_samples x n_features) float32 matrix should be streamed from disk.
+    Explicit 'incremental' always streams; 'auto' streams once the matrix exceeds threshold_mb.
+    """
+    if requested == "incremental":
+        return True
+    if requested != "auto":
+        return False
+    return n_samples * n_features * np.dtype(np.float32).itemsize > threshold_mb * 1024 ** 2
+
+
+def batch_slices(n_samples: int, batch_size: int, min_batch: int = 1) -> List[slice]:
+    """
+    Split range(n_samples) into contiguous slices of ~batch_size rows, folding a short
+    trailing batch into its predecessor so every batch has at least min_batch rows.
+    """
+    batch_size = max(batch_size, min_batch)
+    slices = [slice(start, min(start + batch_size, n_samples)) for start in range(0, n_samples, batch_size)]
+    if len(slices) > 1 and slices[-1].stop - slices[-1].start < min_batch:
+        last = slices.pop()
+        slices[-1] = slice(slices[-1].start, last.stop)
+    return slices
+
+
+def standardize_inplace(data: np.ndarray, scale: bool = True) -> float:
+    """
+    Center (and optionally unit-scale) the columns of a float32 matrix in place.
+    Mirrors StandardScaler (population std, zero-variance columns left unscaled) without
+    allocating a second copy of the matrix. Returns the total variance (ddof=1) of the
+    standardized data, which PCA needs for explained-variance ratios.
+    """
+    n_samples = data.shape[0]
+    data -= data.mean(axis=0, dtype=np.float64).astype(np.float32)
+
+    # einsum reduces column-wise without materializing data**2
+    sum_sq = np.einsum('ij,ij->j', data, data, dtype=np.float64)
+    if scale:
+        std = np.sqrt(sum_sq / n_samples)
+        std[std == 0.0] = 1.0
+        data /= std.astype(np.float32)
+        sum_sq = sum_sq / (std ** 2)
+
+    return float(sum_sq.sum() / (n_samples - 1))
+
+
+# --- Main Engine Logic ---
+def fit_pca(
+    data: np.ndarray,
+    n_components: int,
+    scale: bool = True,
+    solver: str = "auto",
+    random_state: int = 0,
+) -> Dict[str, Any]:
+    """
+    Run PCA on an imputed (samples x genes) matrix.
+
+    The matrix is converted to float32 once (no copy if it already is one and is writable)
+    and then centered/scaled in place, so callers should not reuse `data` afterwards.
+
+    Returns a dict with 'scores' (samples x k), 'components' (k x genes),
+    'explained_variance', 'explained_variance_ratio' and the 'solver' actually used.
+    """
+    data = np.asarray(data, dtype=np.float32)
+    if not data.flags.writeable:
+        data = data.copy()
+
+    n_samples, n_features = data.shape
+    n_components = min(n_components, n_samples, n_features)
+    solver_used = choose_solver(n_samples, n_features, n_components, solver)
+    logger.info("Running PCA with solver '%s' on a %dx%d float32 matrix (k=%d).",
+                solver_used, n_samples, n_features, n_components)
+
+    total_var = standardize_inplace(data, scale=scale)
+
+    if solver_used == "full":
+        U, S, Vt = linalg.svd(data, full_matrices=False, overwrite_a=True, check_finite=False)
+    elif solver_used == "randomized":
+        U, S, Vt = randomized_svd(data, n_components, n_iter="auto", random_state=random_state)
+    else:  # arpack
+        v0 = np.random.RandomState(random_state).uniform(-1, 1, size=min(data.shape))
+        U, S, Vt = svds(data, k=n_components, tol=0.0, v0=v0)
+        # svds returns singular values in ascending order
+        U, S, Vt = U[:, ::-1], S[::-1], Vt[::-1]
+
+    # Deterministic signs so repeated runs (and different solvers) agree
+    U, Vt = svd_flip(U, Vt)
+    U, S, Vt = U[:, :n_components], S[:n_components], Vt[:n_components]
+
+    explained_variance = (S.astype(np.float64) ** 2) / (n_samples - 1)
+    explained_variance_ratio = explained_variance / total_var if total_var > 0 else np.zeros_like(explained_variance)
+
+    return {
+        "scores": U * S,
+        "components": Vt,
+        "explained_variance": explained_variance,
+        "explained_variance_ratio": explained_variance_ratio,
+        "solver": solver_used,
+    }
+
+
+def accumulate_gene_stats(data: np.ndarray, batch_size: int = DEFAULT_INCREMENTAL_BATCH_SIZE) -> Dict[str, np.ndarray]:
+    """
+    First streaming pass: NaN-aware per-gene mean and population variance, computed from
+    running count/sum/sum-of-squares over sample batches. Missing values are treated as
+    if they had been mean-imputed, so they add nothing to the variance.
+    """
+    n_samples, n_features = data.shape
+    count = np.zeros(n_features, dtype=np.int64)
+    total = np.zeros(n_features, dtype=np.float64)
+    total_sq = np.zeros(n_features, dtype=np.float64)
+
+    for rows in batch_slices(n_samples, batch_size):
+        batch = np.array(data[rows], dtype=np.float64)
+        present = ~np.isnan(batch)
+        batch[~present] = 0.0
+        count += present.sum(axis=0)
+        total += batch.sum(axis=0)
+        total_sq += np.einsum('ij,ij->j', batch, batch)
+
+    kept_genes = count > 0
+    mean = np.divide(total, count, out=np.zeros(n_features), where=kept_genes)
+    var = np.maximum(total_sq - count * mean ** 2, 0.0) / n_samples
+    return {"mean": mean, "var": var, "kept_genes": kept_genes}
+
+
+def variance_prefilter(
+    stats: Dict[str, np.ndarray],
+    remove_constant: bool = True,
+    top_k: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Turn per-gene statistics (from accumulate_gene_stats) into a boolean keep-mask.
+
+    Genes with no numeric values are always dropped. With remove_constant, all-zero and
+    constant genes go too (they carry no variance, so PCA gains nothing from them).
+    With top_k, only the k most variable remaining genes are kept (partial sort).
+    """
+    keep = stats["kept_genes"].copy()
+    if remove_constant:
+        # Relative tolerance absorbs float rounding in sum-of-squares for constant genes
+        tolerance = (np.finfo(np.float32).eps * np.abs(stats["mean"])) ** 2
+        keep &= stats["var"] > tolerance
+
+    if top_k is not None and 0 < top_k < int(keep.sum()):
+        candidates = np.flatnonzero(keep)
+        top = candidates[np.argpartition(stats["var"][candidates], -top_k)[-top_k:]]
+        keep = np.zeros_like(keep)
+        keep[top] = True
+    return keep
+
+
+def fit_incremental_pca(
+    data: np.ndarray,
+    n_components: int,
+    scale: bool = True,
+    batch_size: int = DEFAULT_INCREMENTAL_BATCH_SIZE,
+    remove_constant: bool = False,
+    top_k: Optional[int] = None,
+    progress: Optional[Callable[..., None]] = None,
+) -> Dict[str, Any]:
+    """
+    Out-of-core PCA over a (samples x genes) matrix, typically a np.memmap that may
+    still contain NaNs. Only one batch of samples is materialized at a time:
+
+    1. accumulate per-gene mean/variance and apply the variance prefilter
+       (genes with no numeric values are always dropped),
+    2. fit IncrementalPCA on imputed, standardized batches,
+    3. project each batch to get the scores.
+
+    progress(stage, done, total), if given, is called before each batch of steps 2 and 3.
+
+    Returns the same keys as fit_pca, plus 'kept_genes' (mask over the input columns).
+    """
+    progress = progress or (lambda stage, done=None, total=None: None)
+    n_samples, n_features = data.shape
+    stats = accumulate_gene_stats(data, batch_size)
+    kept_genes = variance_prefilter(stats, remove_constant=remove_constant, top_k=top_k)
+    mean = stats["mean"][kept_genes]
+    std = np.sqrt(stats["var"][kept_genes]) if scale else np.ones(int(kept_genes.sum()))
+    std[std == 0.0] = 1.0
+
+    n_kept = int(kept_genes.sum())
+    n_components = min(n_components, n_samples, n_kept)
+    slices = batch_slices(n_samples, batch_size, min_batch=n_components)
+    logger.info("Running incremental PCA on a %dx%d matrix in %d batches (k=%d).",
+                n_samples, n_kept, len(slices), n_components)
+
+    mean32, std32 = mean.astype(np.float32), std.astype(np.float32)
+
+    def load_batch(rows: slice) -> np.ndarray:
+        batch = np.asarray(data[rows])[:, kept_genes].astype(np.float32, copy=False)
+        missing = np.isnan(batch)
+        if missing.any():
+            batch[missing] = np.broadcast_to(mean32, batch.shape)[missing]
+        batch -= mean32
+        batch /= std32
+        return batch
+
+    ipca = IncrementalPCA(n_components=n_components)
+    for index, rows in enumerate(slices):
+        progress("decomposing", index, 2 * len(slices))
+        ipca.partial_fit(load_batch(rows))
+
+    scores = np.empty((n_samples, n_components), dtype=np.float32)
+    for index, rows in enumerate(slices):
+        progress("decomposing", len(slices) + index, 2 * len(slices))
+        scores[rows] = ipca.transform(load_batch(rows))
+
+    return {
+        "scores": scores,
+        "components": ipca.components_.astype(np.float32),
+        "explained_variance": ipca.explained_variance_,
+        "explained_variance_ratio": ipca.explained_variance_ratio_,
+        "solver": "incremental",
+        "kept_genes": kept_genes,
+    }
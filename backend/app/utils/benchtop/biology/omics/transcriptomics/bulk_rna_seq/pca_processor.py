@@ -2,109 +2,198 @@ import pandas as pd
 import numpy as np
 import io
 import os
-import re
 import logging
-from typing import Any, Optional, Dict, List
-
-from sklearn.preprocessing import StandardScaler
-from sklearn.impute import SimpleImputer
-from sklearn.decomposition import PCA
+import tempfile
+from contextlib import nullcontext
+from typing import BinaryIO, Callable, Optional, Tuple
 
 from app.schemas.benchtop.biology.omics.transcriptomics.bulk_rna_seq.pca_schema import PCAParams
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import expression_matrix, pca_artifact, pca_engine
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq.expression_matrix import infer_groups_from_sample_names
 
 # Configure logging for debugging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- Helper Functions ---
-def load_data(file_obj: Any, file_extension: str) -> pd.DataFrame:
-    try:
-        read_func = {
-            '.xlsx': pd.read_excel,
-            '.csv': pd.read_csv,
-            '.tsv': pd.read_csv,
-            '.txt': pd.read_csv,
-        }
-        kwargs = {'sep': '\t'} if file_extension in ['.tsv', '.txt'] else {}
-        return read_func[file_extension](file_obj, **kwargs)
-    except KeyError:
-        logger.warning("Unknown extension '%s', trying generic CSV read.", file_extension)
-        file_obj.seek(0)
-        return pd.read_csv(file_obj)
-    except Exception as e:
-        raise ValueError(f"Failed to load or parse the data file: {e}")
-
-
-def infer_groups_from_sample_names(sample_names: List[str]) -> List[str]:
-    try:
-        prefixes = [re.split(r'[_.-](?:rep|r|s|gfp\w*)?\d*$', name, flags=re.IGNORECASE)[0]
-                    for name in sample_names]
-        if 1 < len(set(prefixes)) < len(sample_names):
-            return prefixes
-        prefixes = [re.split(r'[_.-]', name)[0] for name in sample_names]
-        if 1 < len(set(prefixes)) < len(sample_names):
-            return prefixes
-    except Exception:
-        pass
-    return ['all_samples'] * len(sample_names)
-
-# --- Main Processor Logic ---
-def run(file_obj: io.BytesIO, filename: str, params: PCAParams, config: dict) -> dict:
-    file_extension = os.path.splitext(filename)[1].lower()
-    df = load_data(file_obj, file_extension)
+def impute_gene_means(data: np.ndarray):
+    """
+    Replace NaNs in a (samples x genes) matrix with each gene's mean, in place.
+    Genes with no numeric values at all are dropped, matching SimpleImputer's default.
+    Returns the imputed matrix and a boolean mask of the genes that were kept.
+    """
+    missing = np.isnan(data)
+    if not missing.any():
+        return data, np.ones(data.shape[1], dtype=bool)
+
+    kept_genes = ~missing.all(axis=0)
+    if not kept_genes.all():
+        data = data[:, kept_genes]
+        missing = missing[:, kept_genes]
+
+    with np.errstate(invalid='ignore'):
+        gene_means = np.nanmean(data, axis=0)
+    rows, cols = np.nonzero(missing)
+    data[rows, cols] = gene_means[cols]
+    return data, kept_genes
+
+def _check_shape(n_samples: int, n_features: int) -> None:
+    if n_samples < 2 or n_features < 2:
+        raise ValueError(f"PCA requires at least 2 samples and 2 features. Found {n_samples} samples and {n_features} features.")
 
-    # Trim whitespace from column headers
-    df.columns = df.columns.str.strip()
-    logger.info("Columns after trimming: %r", df.columns.tolist())
 
-    # 1. Set Gene Index
-    df = df.set_index(df.columns[0])
-    logger.info("DataFrame shape after indexing gene names: %s", df.shape)
+def _spill_plan(file_obj: Optional[io.BytesIO], filename: str, params: PCAParams, metadata_cols: list,
+                engine_config: dict, cache_key: Optional[str]) -> Tuple[bool, Optional[dict]]:
+    """
+    Decide, before parsing, whether the table goes to a scratch memmap: whenever the
+    solver will be incremental (explicitly, or 'auto' above incremental_threshold_mb).
+    Returns (spill_to_disk, scan); the scan sizes the memmap for the chunked reader.
+    """
+    if file_obj is None or expression_matrix.is_cached(cache_key) or params.svd_solver not in ("auto", "incremental"):
+        return False, None
+    threshold_mb = engine_config.get('incremental_threshold_mb', pca_engine.DEFAULT_INCREMENTAL_THRESHOLD_MB)
+    if params.svd_solver == "auto":
+        # Every value takes at least two bytes of text (digit and separator), so a file
+        # this small cannot reach the threshold and needs no sizing pass
+        file_bytes = file_obj.seek(0, os.SEEK_END)
+        file_obj.seek(0)
+        if 2 * file_bytes <= threshold_mb * 1024 ** 2:
+            return False, None
+    scan = expression_matrix.scan_table(
+        file_obj, filename, engine_config.get('chunk_rows') or expression_matrix.CHUNK_ROWS
+    )
+    if scan is None:
+        # Excel cannot be sized without parsing it; only an explicit request spills
+        return params.svd_solver == "incremental", None
+    excluded = {str(col).strip().lower() for col in metadata_cols}
+    n_samples = sum(col.lower() not in excluded for col in scan["columns"])
+    return pca_engine.should_use_incremental(n_samples, len(scan["gene_index"]), params.svd_solver, threshold_mb), scan
+
+
+def _run_in_memory(data: np.ndarray, params: PCAParams) -> dict:
+    # data is the shared read-only (samples x genes) float32 view; drop uninformative
+    # genes before taking the one writable copy that imputation and PCA work on
+    logger.info("Shape of data_for_pca (samples x genes): %s", data.shape)
+    kept_genes = pca_engine.variance_prefilter(
+        pca_engine.accumulate_gene_stats(data),
+        remove_constant=params.remove_constant_genes,
+        top_k=params.top_variable_genes,
+    )
+    if kept_genes.all():
+        data = np.array(data)
+    else:
+        data = data[:, kept_genes]
+        logger.info("Variance prefilter kept %d of %d genes.", int(kept_genes.sum()), kept_genes.size)
+
+    # Impute missing values with per-gene means, in float32 and in place
+    data, _ = impute_gene_means(data)
+    _check_shape(*data.shape)
+
+    # Centering/scaling happens in place inside the engine
+    pca_result = pca_engine.fit_pca(
+        data,
+        n_components=params.n_components,
+        scale=params.scale_data,
+        solver=params.svd_solver,
+    )
+    pca_result["n_features"] = data.shape[1]
+    pca_result["kept_genes"] = kept_genes
+    return pca_result
+
+
+def _run_incremental(data: np.ndarray, params: PCAParams, engine_config: dict,
+                     progress: Optional[Callable[..., None]] = None) -> dict:
+    _check_shape(*data.shape)
+    pca_result = pca_engine.fit_incremental_pca(
+        data,
+        n_components=params.n_components,
+        scale=params.scale_data,
+        batch_size=engine_config.get('incremental_batch_size', pca_engine.DEFAULT_INCREMENTAL_BATCH_SIZE),
+        remove_constant=params.remove_constant_genes,
+        top_k=params.top_variable_genes,
+        progress=progress,
+    )
+    pca_result["n_features"] = int(pca_result["kept_genes"].sum())
+    _check_shape(pca_result["scores"].shape[0], pca_result["n_features"])
+    return pca_result
 
-    # 2. Identify metadata columns to exclude (from config and grouping)
-    metadata_cols = config.get('expected_input', {}).get('excluded_metadata_columns', []) or []
+# --- Main Processor Logic ---
+def run(file_obj: Optional[io.BytesIO], filename: str, params: PCAParams, config: dict,
+        decomposition_out: Optional[BinaryIO] = None, cache_key: Optional[str] = None,
+        checkpoint: Optional[Callable[..., None]] = None) -> dict:
+    """
+    Run PCA on an expression table (genes x samples) and return the plot payload.
+    If decomposition_out is given, the full scores, loadings and explained variance are
+    also written to it (see pca_artifact) so other PC pairs can be served without a rerun.
+    With cache_key, the parsed table is shared with other runs on the same dataset
+    (see expression_matrix) and file_obj may be None when it is already cached.
+    `checkpoint` (see app.services.run_control) is called as each stage starts and per
+    batch of the incremental solver; it reports progress and raises if the run was cancelled.
+    """
+    checkpoint = checkpoint or (lambda stage, done=None, total=None: None)
+    checkpoint("loading")
+    # 1-3. Parse the table into a float32 block, excluding metadata columns (from config and grouping)
+    metadata_cols = list(config.get('expected_input', {}).get('excluded_metadata_columns', []) or [])
     if params.grouping_column:
         metadata_cols.append(params.grouping_column)
-    metadata_cols_lower = {str(col).strip().lower() for col in metadata_cols}
-    logger.info("Excluding metadata columns: %s", metadata_cols_lower)
-
-    # 3. Select sample columns by excluding metadata columns
-    final_sample_columns = [col for col in df.columns
-                             if col.strip().lower() not in metadata_cols_lower]
-    if not final_sample_columns:
-        raise ValueError("No valid sample columns found after excluding metadata. "
-                         "Check your data file and configuration.")
-    logger.info("Final sample columns selected: %r", final_sample_columns)
-
-    df_samples_only = df[final_sample_columns]
-
-    # 4. Convert to numeric and transpose
-    df_numeric = df_samples_only.apply(pd.to_numeric, errors='coerce')
-    data_for_pca = df_numeric.T  # Transpose: (samples x genes)
-    logger.info("Shape of data_for_pca (samples x genes): %s", data_for_pca.shape)
-
-    # 5. Impute missing values and scale if requested
-    imputer = SimpleImputer(strategy='mean')
-    data_imputed = imputer.fit_transform(data_for_pca)
-    data_scaled = StandardScaler().fit_transform(data_imputed) if params.scale_data else data_imputed
-
-    n_samples, n_features = data_scaled.shape
-    if n_samples < 2 or n_features < 2:
-        raise ValueError(f"PCA requires at least 2 samples and 2 features. Found {n_samples} samples and {n_features} features.")
 
-    # 6. Run PCA
-    n_components = min(params.n_components, n_samples, n_features)
-    pca = PCA(n_components=n_components)
-    principal_components = pca.fit_transform(data_scaled)
-    explained_variance = pca.explained_variance_ratio_
-    logger.info("Explained variance ratios: %s", explained_variance)
+    # Runs that will use the incremental solver stream the table into a scratch memmap
+    # chunk by chunk rather than parsing it onto the heap (and never cache it)
+    engine_config = config.get('engine', {}) or {}
+    spill_to_disk, scan = _spill_plan(file_obj, filename, params, metadata_cols, engine_config, cache_key)
+    scratch = (tempfile.TemporaryDirectory(prefix="pca_", dir=engine_config.get('scratch_dir'))
+               if spill_to_disk else nullcontext())
+    with scratch as scratch_dir:
+        matrix = expression_matrix.prepare_expression_matrix(
+            file_obj, filename, metadata_cols,
+            cache_key=None if spill_to_disk else cache_key,
+            memmap_path=os.path.join(scratch_dir, "expression.f32") if spill_to_disk else None,
+            scan=scan,
+            chunk_rows=engine_config.get('chunk_rows') or expression_matrix.CHUNK_ROWS,
+        )
+        sample_names = matrix["sample_names"]
+        gene_names = matrix["gene_index"]
+        logger.info("Final sample columns selected: %r", sample_names)
+        checkpoint("decomposing")
+
+        # 4-6. Impute and run PCA on the (samples x genes) view. Cohorts too large to hold
+        # comfortably in worker memory are streamed batch by batch instead.
+        data = matrix["values"].T
+        del matrix
+        use_incremental = pca_engine.should_use_incremental(
+            len(sample_names), len(gene_names), params.svd_solver,
+            engine_config.get('incremental_threshold_mb', pca_engine.DEFAULT_INCREMENTAL_THRESHOLD_MB)
+        )
+        if use_incremental:
+            pca_result = _run_incremental(data, params, engine_config, progress=checkpoint)
+        else:
+            pca_result = _run_in_memory(data, params)
+        del data
+    checkpoint("serializing")
+
+    principal_components = pca_result["scores"]
+    explained_variance = pca_result["explained_variance_ratio"]
+    n_samples, n_features = principal_components.shape[0], int(pca_result["n_features"])
+    n_components = principal_components.shape[1]
+    logger.info("Explained variance ratios (%s solver): %s", pca_result["solver"], explained_variance)
 
     # 7. Prepare results
     pc_columns = [f"PC{i+1}" for i in range(n_components)]
-    results_df = pd.DataFrame(principal_components, columns=pc_columns, index=data_for_pca.index)
+    results_df = pd.DataFrame(principal_components, columns=pc_columns, index=pd.Index(sample_names))
     results_df = results_df.rename_axis('sample').reset_index()
     results_df['group'] = infer_groups_from_sample_names(results_df['sample'].tolist())
 
+    if decomposition_out is not None:
+        pca_artifact.save_decomposition(
+            decomposition_out,
+            scores=principal_components,
+            components=pca_result["components"],
+            explained_variance_ratio=explained_variance,
+            sample_names=sample_names,
+            gene_names=gene_names[pca_result["kept_genes"]],
+            groups=results_df['group'].tolist(),
+        )
+
     # 8. Build output
     pc_x_idx, pc_y_idx = params.pc_x_axis - 1, params.pc_y_axis - 1
     if not (0 <= pc_x_idx < n_components and 0 <= pc_y_idx < n_components):
@@ -116,7 +205,10 @@ def run(file_obj: io.BytesIO, filename: str, params: PCAParams, config: dict) ->
         "summary_stats": {
             "total_samples": n_samples,
             "total_genes": n_features,
+            "genes_input": len(gene_names),
+            "genes_kept": n_features,
             "explained_variance_ratio": explained_variance.tolist(),
+            "pca_solver": pca_result["solver"],
             "parameters_used": params.model_dump()
         },
         "default_plot_config": {
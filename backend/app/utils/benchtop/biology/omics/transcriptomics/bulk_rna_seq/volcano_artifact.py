@@ -0,0 +1,175 @@
+# backend/app/utils/benchtop/biology/omics/transcriptomics/bulk_rna_seq/volcano_artifact.py
+import numpy as np
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+# This module only depends on NumPy so the API process can reclassify stored volcano
+# results without importing pandas. Thresholds only change the up/down/neutral labels,
+# never the plotted values, so a completed run keeps its columns and any new pair of
+# thresholds is a couple of vectorized comparisons away.
+
+ARTIFACT_FILENAME = "volcano_columns.npz"
+
+# Label of each classification code, in code order
+CLASSES = ("neutral", "up", "down")
+NEUTRAL, UP, DOWN = 0, 1, 2
+
+
+def classify(log2fc: np.ndarray, pvalue: np.ndarray,
+             fold_change_threshold: float, p_value_threshold: float) -> np.ndarray:
+    """
+    Classification code (see CLASSES) of every gene: up if log2FC >= threshold, down if
+    log2FC <= -threshold, in both cases only when p < p_value_threshold.
+    """
+    significant = pvalue < p_value_threshold
+    codes = np.full(log2fc.shape, NEUTRAL, dtype=np.int8)
+    codes[significant & (log2fc <= -fold_change_threshold)] = DOWN
+    codes[significant & (log2fc >= fold_change_threshold)] = UP
+    return codes
+
+
+def count_classes(codes: np.ndarray) -> Dict[str, int]:
+    counts = np.bincount(codes, minlength=len(CLASSES))
+    return {label: int(count) for label, count in zip(CLASSES, counts)}
+
+
+def changed_positions(codes: np.ndarray, baseline_codes: np.ndarray) -> Dict[str, List[int]]:
+    """Positions whose code differs from baseline_codes, grouped by their new label."""
+    changed = codes != baseline_codes
+    return {label: np.flatnonzero(changed & (codes == code)).tolist() for code, label in enumerate(CLASSES)}
+
+
+def significance_score(log2fc: np.ndarray, minus_log10_pvalue: np.ndarray) -> np.ndarray:
+    """Combined significance used to rank genes for labelling: |log2FC| x -log10(p)."""
+    return np.abs(log2fc) * minus_log10_pvalue
+
+
+def top_n_indices(score: np.ndarray, mask: np.ndarray, top_n: int) -> List[int]:
+    """
+    Positions of the top_n highest scores among the masked genes, best first. A partial
+    sort (argpartition) selects them, so only the top_n winners are fully sorted.
+    """
+    candidates = np.flatnonzero(mask)
+    top_n = max(0, min(top_n, candidates.size))
+    if top_n == 0:
+        return []
+    candidate_scores = score[candidates]
+    top = np.argpartition(-candidate_scores, top_n - 1)[:top_n]
+    top = top[np.argsort(-candidate_scores[top], kind="stable")]
+    return candidates[top].tolist()
+
+
+def top_labels(codes: np.ndarray, score: np.ndarray, top_n_up: int, top_n_down: int) -> Dict[str, List[int]]:
+    """Positions of the genes to label: the best-scoring up and down genes."""
+    return {
+        "up": top_n_indices(score, codes == UP, top_n_up),
+        "down": top_n_indices(score, codes == DOWN, top_n_down),
+    }
+
+
+def bin_density(log2fc: np.ndarray, minus_log10_pvalue: np.ndarray, bins: int) -> Dict[str, Any]:
+    """
+    Count points on a bins x bins grid over log2FC x -log10(p). Payload size depends only
+    on `bins`, not on the number of points. counts[i][j] is the cell between
+    x_edges[i]..x_edges[i+1] and y_edges[j]..y_edges[j+1].
+    """
+    counts, x_edges, y_edges = np.histogram2d(log2fc, minus_log10_pvalue, bins=bins)
+    return {
+        "x_edges": x_edges.tolist(),
+        "y_edges": y_edges.tolist(),
+        "counts": counts.astype(np.int64).tolist(),
+        "n_points": int(len(log2fc)),
+    }
+
+
+def _best_per_side(codes: np.ndarray, score: np.ndarray, rows: np.ndarray, max_points: int) -> np.ndarray:
+    """The max_points // 2 best-scoring up and down rows (as streamed runs keep them), in table order."""
+    per_side_cap = max(1, max_points // 2)
+    kept = [np.asarray(top_n_indices(score, codes == side, per_side_cap), dtype=np.int64) for side in (UP, DOWN)]
+    return np.sort(np.concatenate(kept)) if rows.size > 2 * per_side_cap else rows
+
+
+def save_columns(file_obj: BinaryIO, genes: Sequence[str], log2fc: np.ndarray, pvalue: np.ndarray,
+                 minus_log10_pvalue: np.ndarray) -> None:
+    """
+    Write the classified columns of a volcano run as an uncompressed .npz. Every gene is
+    stored, in table order (which is the plot_data order of point-mode runs).
+    Values stay float64, so reclassifying gives exactly the labels the processor would.
+    """
+    np.savez(
+        file_obj,
+        genes=np.asarray([str(g) for g in genes]),
+        log2fc=np.asarray(log2fc, dtype=np.float64),
+        pvalue=np.asarray(pvalue, dtype=np.float64),
+        minus_log10_pvalue=np.asarray(minus_log10_pvalue, dtype=np.float64),
+    )
+
+
+def load_columns(file_obj: BinaryIO) -> Dict[str, np.ndarray]:
+    """
+    Read columns written by save_columns into plain arrays.
+    """
+    with np.load(file_obj, allow_pickle=False) as npz:
+        return {key: npz[key] for key in npz.files}
+
+
+def columns_nbytes(columns: Dict[str, np.ndarray]) -> int:
+    return sum(values.nbytes for values in columns.values())
+
+
+def reclassify(columns: Dict[str, np.ndarray], fold_change_threshold: float, p_value_threshold: float,
+               label_top_n: int = 0, baseline_thresholds: Tuple[float, float] = (1.0, 0.05),
+               render_mode: str = "points", density_bins: int = 100,
+               max_points: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Counts of a stored run under new thresholds, and only the genes whose label differs
+    from the run's own (baseline_thresholds): their stored positions, grouped by new
+    label.
+
+    Point-mode runs plot every gene in stored order, so `changed` applies to plot_data
+    directly and top_labels are stored positions. Density-mode runs plot only the
+    significant genes, so their new plot is returned instead: the genes neutral under the
+    new thresholds re-binned into a density_bins grid, and the significant genes as
+    `points` (with their stored position as "_row"; at most max_points, best first per
+    side, for runs that capped them). top_labels are then positions in `points`.
+    """
+    codes = classify(columns["log2fc"], columns["pvalue"], fold_change_threshold, p_value_threshold)
+    baseline_codes = classify(columns["log2fc"], columns["pvalue"], *baseline_thresholds)
+    counts = count_classes(codes)
+    if "minus_log10_pvalue" in columns:
+        minus_log10_pvalue = columns["minus_log10_pvalue"]
+    else:  # Columns stored before the -log10(p) column was added
+        minus_log10_pvalue = -np.log10(columns["pvalue"])
+    score = significance_score(columns["log2fc"], minus_log10_pvalue)
+    result = {
+        "fold_change_threshold": fold_change_threshold,
+        "p_value_threshold": p_value_threshold,
+        "summary_stats": {
+            "total_genes": int(codes.shape[0]),
+            "upregulated": counts["up"],
+            "downregulated": counts["down"],
+            "neutral": counts["neutral"],
+        },
+        "changed": changed_positions(codes, baseline_codes),
+        "render_mode": render_mode,
+        "density": None,
+        "points": None,
+    }
+    if render_mode != "density":
+        result["top_labels"] = top_labels(codes, score, label_top_n, label_top_n)
+        return result
+
+    neutral = codes == NEUTRAL
+    result["density"] = bin_density(columns["log2fc"][neutral], minus_log10_pvalue[neutral], density_bins)
+    rows = np.flatnonzero(~neutral)
+    if max_points:
+        rows = _best_per_side(codes, score, rows, max_points)
+    result["points"] = [
+        {"_row": row, "_gene": gene, "_log2fc": lfc, "_pvalue": p, "_minus_log10_pvalue_": mlp, "_classification": CLASSES[code]}
+        for row, gene, lfc, p, mlp, code in zip(
+            rows.tolist(), columns["genes"][rows].tolist(), columns["log2fc"][rows].tolist(),
+            columns["pvalue"][rows].tolist(), minus_log10_pvalue[rows].tolist(), codes[rows].tolist(),
+        )
+    ]
+    result["summary_stats"]["points_truncated"] = int((~neutral).sum() - rows.size)
+    result["top_labels"] = top_labels(codes[rows], score[rows], label_top_n, label_top_n)
+    return result
@@ -3,10 +3,11 @@ import pandas as pd
 import numpy as np
 import io
 import os
-from typing import Any, Optional, Dict
+from typing import Any, BinaryIO, Callable, Optional, Dict, Tuple
 
 # Import the Pydantic schema for type hinting and validation
 from app.schemas.benchtop.biology.omics.transcriptomics.bulk_rna_seq.volcano import VolcanoParams
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import volcano_artifact
 
 # --- Data Loading and Preprocessing (Largely Unchanged) ---
 
@@ -98,15 +99,13 @@ def preprocess_data(df: pd.DataFrame, mapping: dict, config: dict, params: Volca
         df_processed.replace([np.inf, -np.inf], finite_max + 10, inplace=True) # Add a fixed amount to ensure it's visibly higher
     # --- END OF FIX ---
 
-    # Classify regulation status
-    def classify_regulation(row):
-        if row[log2fc_col_actual] >= params.fold_change_threshold and row[pval_col_actual] < params.p_value_threshold:
-            return 'up'
-        elif row[log2fc_col_actual] <= -params.fold_change_threshold and row[pval_col_actual] < params.p_value_threshold:
-            return 'down'
-        else:
-            return 'neutral'
-    df_processed['_classification'] = df_processed.apply(classify_regulation, axis=1)
+    # Classify regulation status (vectorized; the same rule reclassifies stored runs)
+    codes = volcano_artifact.classify(
+        df_processed[log2fc_col_actual].to_numpy(dtype=np.float64),
+        df_processed[pval_col_actual].to_numpy(dtype=np.float64),
+        params.fold_change_threshold, params.p_value_threshold
+    )
+    df_processed['_classification'] = np.asarray(volcano_artifact.CLASSES, dtype=object)[codes]
 
     # Rename columns to standardized internal names for easier frontend consumption
     df_processed.rename(columns={
@@ -118,12 +117,177 @@ def preprocess_data(df: pd.DataFrame, mapping: dict, config: dict, params: Volca
     return df_processed[['_gene', '_log2fc', '_pvalue', '_minus_log10_pvalue_', '_classification']]
 
 
+def resolve_render_mode(params: VolcanoParams, config: dict, n_points: int) -> str:
+    """
+    'points' ships every gene; 'density' bins the neutral genes into a grid. 'auto' picks
+    density once the table is larger than the config's auto_threshold_points.
+    """
+    if params.render_mode != "auto":
+        return params.render_mode
+    threshold = config.get("density", {}).get("auto_threshold_points", 100000)
+    return "density" if n_points > threshold else "points"
+
+
+def resolve_label_counts(params: VolcanoParams, config: dict) -> Tuple[int, int]:
+    """
+    How many up and down genes to label. An explicit label_top_n applies to both sides;
+    otherwise the config's auto_label.top_n_up/top_n_down are used when set, and finally
+    the label_top_n default.
+    """
+    if "label_top_n" not in params.model_fields_set:
+        auto_label = config.get("auto_label", {}) or {}
+        top_n_up, top_n_down = auto_label.get("top_n_up", 0) or 0, auto_label.get("top_n_down", 0) or 0
+        if top_n_up or top_n_down:
+            return int(top_n_up), int(top_n_down)
+    return params.label_top_n, params.label_top_n
+
+
+# --- Multi-contrast Mode ---
+# A wide table holds several DE contrasts side by side, e.g. "KO_vs_WT_logFC" and
+# "KO_vs_WT_PValue" (or "logFC.KO_vs_WT"). The table is parsed once and every contrast is
+# classified in a single pass over (genes x contrasts) matrices.
+
+CONTRAST_SEPARATORS = "_.:|- "
+DEFAULT_LOG2FC_SYNONYMS = ["log2foldchange", "log2_fc", "logfc", "foldchange"]
+DEFAULT_PVALUE_SYNONYMS = ["pvalue", "p_value", "pval", "adj.pval", "fdr"]
+
+
+def _split_contrast(column: str, synonyms: list) -> Optional[Tuple[str, int]]:
+    """
+    (contrast, synonym priority) if the column is a synonym prefixed or suffixed by a
+    contrast name, else None. Longer synonyms are tried first ('adj.pval' before 'pval').
+    """
+    lower = column.lower()
+    for synonym in sorted(synonyms, key=len, reverse=True):
+        if len(lower) > len(synonym) + 1:
+            if lower.endswith(synonym) and lower[-len(synonym) - 1] in CONTRAST_SEPARATORS:
+                return column[:-len(synonym) - 1].strip(), synonyms.index(synonym)
+            if lower.startswith(synonym) and lower[len(synonym)] in CONTRAST_SEPARATORS:
+                return column[len(synonym) + 1:].strip(), synonyms.index(synonym)
+    return None
+
+
+def resolve_contrast_columns(columns: list, config: dict, params: VolcanoParams) -> Dict[str, Dict[str, str]]:
+    """
+    Map each contrast to its {"log2fc_col", "pvalue_col"} pair, in table order. The
+    requested log2fc_col/pvalue_col names are tried before the config's synonyms.
+    """
+    expected = config.get("expected_columns", {})
+    synonyms = {
+        "log2fc_col": [params.log2fc_col] + expected.get("log2fc_synonyms", DEFAULT_LOG2FC_SYNONYMS),
+        "pvalue_col": [params.pvalue_col] + expected.get("pvalue_synonyms", DEFAULT_PVALUE_SYNONYMS),
+    }
+    found: Dict[str, Dict[str, Tuple[int, str]]] = {}
+    for column in map(str, columns):
+        for kind, names in synonyms.items():
+            match = _split_contrast(column, [str(name).lower() for name in names if name])
+            if match:
+                contrast, priority = match
+                current = found.setdefault(contrast, {}).get(kind)
+                if current is None or priority < current[0]:
+                    found[contrast][kind] = (priority, column)
+                break
+
+    pairs = {contrast: {kind: column for kind, (_, column) in kinds.items()}
+             for contrast, kinds in found.items() if contrast and len(kinds) == 2}
+    if params.contrasts:
+        missing = [c for c in params.contrasts if c not in pairs]
+        if missing:
+            raise ValueError(f"No log2FC/p-value column pair found for contrasts: {', '.join(missing)}.")
+        pairs = {c: pairs[c] for c in params.contrasts}
+    if not pairs:
+        raise ValueError("No contrasts found. Name columns like '<contrast>_logFC' and '<contrast>_PValue'.")
+    return pairs
+
+
+def run_multi_contrast(df: pd.DataFrame, params: VolcanoParams, config: dict,
+                       checkpoint: Callable[..., None]) -> dict:
+    """
+    Classify every contrast of a wide table and summarize them: per-contrast counts and top
+    genes, the pairwise overlap of significant genes, and UpSet-style intersection sizes.
+    """
+    # 1. Resolve the gene column and the column pair of every contrast
+    expected = config.get("expected_columns", {})
+    gene_col = find_column(df, expected.get("gene_synonyms", ["gene", "gene_symbol", "id", "geneid"]), params.gene_col)
+    if not gene_col:
+        raise ValueError("Could not find required columns for: gene identifier. Please map them correctly.")
+    pairs = resolve_contrast_columns(list(df.columns), config, params)
+    contrasts = list(pairs)
+    if len(contrasts) > 62:
+        raise ValueError(f"At most 62 contrasts are supported per run; the table has {len(contrasts)}.")
+
+    # 2. One (genes x contrasts) matrix per quantity; missing values stay NaN (neutral)
+    log2fc = df[[pairs[c]["log2fc_col"] for c in contrasts]].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    pvalue = df[[pairs[c]["pvalue_col"] for c in contrasts]].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+
+    # Zero p-values become a tenth of each contrast's smallest non-zero p-value, as in preprocess_data
+    with np.errstate(invalid='ignore', divide='ignore'):
+        min_nonzero = np.nanmin(np.where(pvalue > 0, pvalue, np.nan), axis=0) if len(pvalue) else np.full(len(contrasts), np.nan)
+    min_nonzero = np.where(np.isnan(min_nonzero), 1.0, min_nonzero)
+    pvalue = np.where(pvalue == 0, min_nonzero * 0.1, pvalue)
+
+    # 3. Classify all contrasts at once (NaN comparisons are False, so missing values are neutral)
+    with np.errstate(invalid='ignore'):
+        codes = volcano_artifact.classify(log2fc, pvalue, params.fold_change_threshold, params.p_value_threshold)
+    checkpoint("summarizing")
+
+    significant = codes != volcano_artifact.NEUTRAL
+    up = (codes == volcano_artifact.UP).sum(axis=0)
+    down = (codes == volcano_artifact.DOWN).sum(axis=0)
+    measured = (~np.isnan(log2fc) & ~np.isnan(pvalue)).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        score = volcano_artifact.significance_score(log2fc, -np.log10(pvalue))
+    score = np.nan_to_num(score, nan=-np.inf)
+    top_n_up, top_n_down = resolve_label_counts(params, config)
+    genes = df[gene_col].astype(str).to_numpy()
+
+    contrast_summaries = []
+    for j, contrast in enumerate(contrasts):
+        top = volcano_artifact.top_labels(codes[:, j], score[:, j], top_n_up, top_n_down)
+        contrast_summaries.append({
+            "contrast": contrast,
+            "log2fc_col": pairs[contrast]["log2fc_col"],
+            "pvalue_col": pairs[contrast]["pvalue_col"],
+            "total_genes": int(measured[j]),
+            "upregulated": int(up[j]),
+            "downregulated": int(down[j]),
+            "neutral": int(measured[j] - up[j] - down[j]),
+            "top_genes": {side: genes[idx].tolist() for side, idx in top.items()},
+        })
+
+    # 4. Overlap of significant genes between every pair of contrasts (diagonal = per contrast)
+    significant_i32 = significant.astype(np.int32)
+    overlap = significant_i32.T @ significant_i32
+
+    # 5. UpSet intersections: genes per exact combination of contrasts they are significant in
+    membership = significant.astype(np.int64) @ (np.int64(1) << np.arange(len(contrasts), dtype=np.int64))
+    patterns, pattern_counts = np.unique(membership[membership > 0], return_counts=True)
+    order = np.argsort(-pattern_counts, kind="stable")
+    intersections = [
+        {"contrasts": [c for j, c in enumerate(contrasts) if int(patterns[i]) >> j & 1], "genes": int(pattern_counts[i])}
+        for i in order
+    ]
+
+    return {
+        "plot_type": "volcano_multi_contrast",
+        "contrasts": contrasts,
+        "contrast_summaries": contrast_summaries,
+        "overlap": {"contrasts": contrasts, "matrix": overlap.tolist()},
+        "intersections": intersections,
+        "summary_stats": {
+            "total_genes": int(len(df)),
+            "contrasts": len(contrasts),
+            "genes_significant_in_any": int(significant.any(axis=1).sum()),
+            "parameters_used": params.model_dump()
+        },
+    }
+
+
 # --- REFACTORED Main Entry Point ---
 
-def run(file_obj: Any, params: VolcanoParams, config: dict) -> dict:
+def load_input(file_obj: Any) -> pd.DataFrame:
     """
-    Unified entry point for the volcano tool.
-    Processes data and returns a JSON-serializable dictionary for frontend rendering.
+    Load the uploaded table into a DataFrame, picking the parser from the file name.
     """
     # 1. Determine file extension and get buffer
     file_extension = ""
@@ -138,7 +302,30 @@ def run(file_obj: Any, params: VolcanoParams, config: dict) -> dict:
     actual_file_buffer.seek(0)
 
     # 2. Load data into DataFrame
-    df = load_data(actual_file_buffer, file_extension)
+    return load_data(actual_file_buffer, file_extension)
+
+
+def run(file_obj: Any, params: VolcanoParams, config: dict,
+        checkpoint: Optional[Callable[..., None]] = None,
+        data: Optional[pd.DataFrame] = None,
+        columns_out: Optional[BinaryIO] = None) -> dict:
+    """
+    Unified entry point for the volcano tool.
+    Processes data and returns a JSON-serializable dictionary for frontend rendering.
+    `checkpoint` (see app.services.run_control) is called as each stage starts; it
+    reports progress and raises if the run was cancelled. A parameter sweep loads the
+    table once with load_input and passes it as `data` (it is not modified).
+    If columns_out is given, the classified columns are also written to it (see
+    volcano_artifact) so the run can be reclassified under new thresholds without a rerun.
+    With params.multi_contrast the table is summarized per contrast instead (see
+    run_multi_contrast) and nothing is written to columns_out.
+    """
+    checkpoint = checkpoint or (lambda stage, done=None, total=None: None)
+    checkpoint("loading")
+    df = data if data is not None else load_input(file_obj)
+    checkpoint("classifying")
+    if params.multi_contrast:
+        return run_multi_contrast(df, params, config, checkpoint)
 
     # 3. Build mapping dict for preprocess_data
     mapping_for_preprocessing = {
@@ -150,6 +337,16 @@ def run(file_obj: Any, params: VolcanoParams, config: dict) -> dict:
 
     # 4. Preprocess and classify data
     df_processed = preprocess_data(df, mapping=mapping_for_preprocessing, config=config, params=params)
+    checkpoint("serializing")
+
+    if columns_out is not None:
+        volcano_artifact.save_columns(
+            columns_out,
+            genes=df_processed['_gene'].astype(str).to_numpy(),
+            log2fc=df_processed['_log2fc'].to_numpy(dtype=np.float64),
+            pvalue=df_processed['_pvalue'].to_numpy(dtype=np.float64),
+            minus_log10_pvalue=df_processed['_minus_log10_pvalue_'].to_numpy(dtype=np.float64),
+        )
 
     # 5. Prepare summary statistics
     classification_counts = df_processed['_classification'].value_counts().to_dict()
@@ -173,13 +370,43 @@ def run(file_obj: Any, params: VolcanoParams, config: dict) -> dict:
         "legend_labels": config.get("legend", {}).get("labels", {})
     }
 
-    # 7. Convert processed dataframe to a list of records for JSON output
-    plot_data = df_processed.to_dict(orient='records')
+    # 7. Convert processed dataframe to a list of records for JSON output. In density mode
+    # only significant genes are sent as points; neutral ones are binned into a grid.
+    render_mode = resolve_render_mode(params, config, len(df_processed))
+    density = None
+    plot_df = df_processed
+    if render_mode == "density":
+        neutral = (df_processed['_classification'] == 'neutral').to_numpy()
+        bins = params.density_bins or config.get("density", {}).get("bins", 100)
+        density = volcano_artifact.bin_density(
+            df_processed['_log2fc'].to_numpy(dtype=np.float64)[neutral],
+            df_processed['_minus_log10_pvalue_'].to_numpy(dtype=np.float64)[neutral],
+            bins
+        )
+        plot_df = df_processed.loc[~neutral]
+    plot_data = plot_df.to_dict(orient='records')
+
+    # 7b. Choose the genes to label server-side (positions in plot_data), so clients never
+    # sort the full point list. Labelled genes are significant, so always sent as points.
+    top_n_up, top_n_down = resolve_label_counts(params, config)
+    top_labels = volcano_artifact.top_labels(
+        volcano_artifact.classify(
+            plot_df['_log2fc'].to_numpy(dtype=np.float64), plot_df['_pvalue'].to_numpy(dtype=np.float64),
+            params.fold_change_threshold, params.p_value_threshold
+        ),
+        volcano_artifact.significance_score(
+            plot_df['_log2fc'].to_numpy(dtype=np.float64), plot_df['_minus_log10_pvalue_'].to_numpy(dtype=np.float64)
+        ),
+        top_n_up, top_n_down
+    )
 
     # 8. Construct the final JSON output
     final_output = {
         "plot_type": "volcano",
+        "render_mode": render_mode,
         "plot_data": plot_data,
+        "density": density,
+        "top_labels": top_labels,
         "summary_stats": summary_stats,
         "default_plot_config": default_plot_config
     }
@@ -0,0 +1,301 @@
+# backend/app/utils/benchtop/biology/omics/transcriptomics/bulk_rna_seq/volcano_streaming.py
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+from app.schemas.benchtop.biology.omics.transcriptomics.bulk_rna_seq.volcano import VolcanoParams
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import volcano_artifact
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq.volcano_processor import (
+    find_column,
+    resolve_label_counts,
+)
+
+# Volcano engine for delimited tables larger than memory. The table is read twice in
+# chunks of `chunk_rows` rows, three columns at a time:
+#   pass 1 gathers the global statistics preprocess_data needs up front (smallest non-zero
+#          p-value for zero replacement, finite -log10(p) maximum for infinity replacement,
+#          value ranges for the density grid, row count and gene-name width);
+#   pass 2 classifies each chunk, adds neutral genes to the density grid, keeps a bounded
+#          set of the most significant genes as points, and writes the columns artifact
+#          chunk by chunk into disk-backed arrays.
+# Memory depends on chunk_rows, max_points and the grid size, never on the table size.
+# Classification, counts and the columns artifact match volcano_processor.run exactly. The
+# payload is its density mode, except that the grid spans the range of all genes (the
+# neutral range is only known after classifying) and at most max_points significant
+# genes are sent as points, the best-scoring ones; summary_stats.points_truncated says
+# how many were left out.
+
+DEFAULT_CHUNK_ROWS = 200_000
+DEFAULT_MAX_POINTS = 50_000
+STREAMABLE_EXTENSIONS = (".csv", ".tsv", ".txt")
+
+
+# --- Helper Functions ---
+def should_stream(params: VolcanoParams, config: dict, file_size_bytes: Optional[int]) -> bool:
+    """
+    Explicit `streaming` wins; otherwise tables above engine.streaming_threshold_mb stream.
+    Multi-contrast runs always load the table.
+    """
+    if params.multi_contrast:
+        if params.streaming:
+            raise ValueError("Streaming mode does not support multi-contrast runs.")
+        return False
+    if params.streaming is not None:
+        return params.streaming
+    threshold_mb = (config.get("engine", {}) or {}).get("streaming_threshold_mb")
+    return bool(threshold_mb) and file_size_bytes is not None and file_size_bytes > threshold_mb * 1024 ** 2
+
+
+def _separator(path: str) -> str:
+    """Comma for .csv; otherwise whichever of tab and comma the header line uses more."""
+    if path.lower().endswith(".csv"):
+        return ","
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        header = f.readline()
+    return "\t" if header.count("\t") > header.count(",") else ","
+
+
+def _resolve_columns(path: str, sep: str, params: VolcanoParams, config: dict) -> Tuple[str, str, str]:
+    header = pd.read_csv(path, sep=sep, nrows=0)
+    expected = config.get("expected_columns", {})
+    gene_col = find_column(header, expected.get("gene_synonyms", ["gene", "gene_symbol", "id", "geneid"]), params.gene_col)
+    log2fc_col = find_column(header, expected.get("log2fc_synonyms", ["log2foldchange", "log2_fc", "logfc", "foldchange"]), params.log2fc_col)
+    pval_col = find_column(header, expected.get("pvalue_synonyms", ["pvalue", "p_value", "pval", "adj.pval", "fdr"]), params.pvalue_col)
+
+    missing_required = []
+    if not pval_col: missing_required.append("p-value")
+    if not log2fc_col: missing_required.append("log2 fold change")
+    if not gene_col: missing_required.append("gene identifier")
+    if missing_required:
+        raise ValueError(f"Could not find required columns for: {', '.join(missing_required)}. Please map them correctly.")
+    return gene_col, log2fc_col, pval_col
+
+
+def _read_chunks(path: str, sep: str, columns: Tuple[str, str, str],
+                 chunk_rows: int) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """(genes, log2fc, pvalue) per chunk, with rows lacking a numeric log2FC or p-value dropped."""
+    gene_col, log2fc_col, pval_col = columns
+    reader = pd.read_csv(path, sep=sep, usecols=list(dict.fromkeys(columns)), dtype={gene_col: str},
+                         chunksize=chunk_rows)
+    for chunk in reader:
+        log2fc = pd.to_numeric(chunk[log2fc_col], errors='coerce').to_numpy(dtype=np.float64)
+        pvalue = pd.to_numeric(chunk[pval_col], errors='coerce').to_numpy(dtype=np.float64)
+        keep = ~np.isnan(log2fc) & ~np.isnan(pvalue)
+        yield chunk[gene_col].astype(str).to_numpy()[keep], log2fc[keep], pvalue[keep]
+
+
+def _scan(chunks: Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+          checkpoint: Callable[..., None]) -> Dict[str, Any]:
+    """
+    Pass 1: the global statistics of the cleaned table that preprocess_data reads off the
+    whole column (smallest positive p-value, whether zeros or infinities occur), plus the
+    value ranges for the density grid.
+    """
+    stats = {"n_rows": 0, "gene_width": 1, "min_positive_p": np.inf, "min_finite_p": np.inf,
+             "max_finite_p": -np.inf, "has_positive_p": False, "has_zero_p": False, "has_inf_p": False, "has_inf_log2fc": False,
+             "log2fc_min": np.inf, "log2fc_max": -np.inf}
+    for genes, log2fc, pvalue in chunks:
+        stats["n_rows"] += len(genes)
+        if len(genes):
+            stats["gene_width"] = max(stats["gene_width"], int(np.char.str_len(genes.astype(str)).max()))
+            positive = pvalue[pvalue > 0]
+            if positive.size:
+                stats["has_positive_p"] = True
+                stats["min_positive_p"] = min(stats["min_positive_p"], float(positive.min()))
+            positive_finite = positive[np.isfinite(positive)]
+            if positive_finite.size:
+                stats["min_finite_p"] = min(stats["min_finite_p"], float(positive_finite.min()))
+                stats["max_finite_p"] = max(stats["max_finite_p"], float(positive_finite.max()))
+            stats["has_zero_p"] |= bool((pvalue == 0).any())
+            stats["has_inf_p"] |= bool(np.isposinf(pvalue).any())
+            stats["has_inf_log2fc"] |= bool(np.isinf(log2fc).any())
+            finite = log2fc[np.isfinite(log2fc)]
+            if finite.size:
+                stats["log2fc_min"] = min(stats["log2fc_min"], float(finite.min()))
+                stats["log2fc_max"] = max(stats["log2fc_max"], float(finite.max()))
+        checkpoint("scanning", stats["n_rows"], None)
+
+    # Zeros become a tenth of the smallest positive p-value, as in preprocess_data
+    stats["zero_replacement"] = stats["min_positive_p"] * 0.1 if stats["has_positive_p"] else None
+    # Any infinite -log10(p) (a remaining zero or an infinite p-value) makes preprocess_data
+    # replace every infinity in the table by the finite -log10(p) maximum + 10; -log10 is
+    # decreasing, so that maximum comes from the smallest positive finite p-value
+    replaced = stats["zero_replacement"] or 0.0
+    stats["replace_inf"] = bool(stats["has_zero_p"] and replaced in (0.0, np.inf)) or stats["has_inf_p"]
+    smallest = min(stats["min_finite_p"], replaced) if stats["has_zero_p"] and 0 < replaced < np.inf else stats["min_finite_p"]
+    stats["finite_max"] = float(-np.log10(smallest)) if np.isfinite(smallest) else float("nan")
+    return stats
+
+
+def _preprocess_chunk(log2fc: np.ndarray, pvalue: np.ndarray,
+                      stats: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Zero replacement, -log10(p) and infinity replacement exactly as preprocess_data does
+    them, from the global statistics of pass 1 instead of the whole column.
+    """
+    if stats["zero_replacement"] is not None:
+        pvalue = np.where(pvalue == 0, stats["zero_replacement"], pvalue)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        minus_log10_p = -np.log10(pvalue)
+    if stats["replace_inf"]:
+        fill = stats["finite_max"] + 10
+        log2fc, pvalue, minus_log10_p = (np.where(np.isinf(values), fill, values)
+                                         for values in (log2fc, pvalue, minus_log10_p))
+    return log2fc, pvalue, minus_log10_p
+
+
+def _edges(low: float, high: float, bins: int) -> np.ndarray:
+    # Same widening as np.histogram2d for an empty or single-valued range
+    if not (np.isfinite(low) and np.isfinite(high)):
+        low, high = 0.0, 1.0
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+def _keep_best(kept: Dict[str, np.ndarray], new: Dict[str, np.ndarray], cap: int) -> Dict[str, np.ndarray]:
+    """Merge a chunk's candidates into the kept set, trimming back to the cap best scores."""
+    merged = {key: np.concatenate([kept[key], new[key]]) for key in new} if kept else new
+    if len(merged["score"]) > cap:
+        best = np.argpartition(-merged["score"], cap - 1)[:cap]
+        merged = {key: values[best] for key, values in merged.items()}
+    return merged
+
+
+# --- Main Processor Logic ---
+def run(path: str, params: VolcanoParams, config: dict,
+        checkpoint: Optional[Callable[..., None]] = None,
+        columns_out: Optional[BinaryIO] = None) -> dict:
+    """
+    Two-pass chunked volcano run over a delimited file on disk; returns the same payload
+    as volcano_processor.run in density mode. `checkpoint` is called per chunk.
+    If columns_out is given, the columns artifact (see volcano_artifact) is written to it.
+    """
+    checkpoint = checkpoint or (lambda stage, done=None, total=None: None)
+    if os.path.splitext(path)[1].lower() not in STREAMABLE_EXTENSIONS:
+        raise ValueError(f"Streaming mode reads delimited text files ({', '.join(STREAMABLE_EXTENSIONS)}) only.")
+    engine_config = config.get("engine", {}) or {}
+    chunk_rows = engine_config.get("chunk_rows") or DEFAULT_CHUNK_ROWS
+    max_points = engine_config.get("max_points") or DEFAULT_MAX_POINTS
+
+    # 1. Resolve the three columns from the header
+    checkpoint("loading")
+    sep = _separator(path)
+    columns = _resolve_columns(path, sep, params, config)
+
+    # 2. First pass: global statistics
+    stats = _scan(_read_chunks(path, sep, columns, chunk_rows), checkpoint)
+    n_rows = stats["n_rows"]
+    bins = params.density_bins or config.get("density", {}).get("bins", 100)
+    fill = stats["finite_max"] + 10
+    x_low, x_high = stats["log2fc_min"], stats["log2fc_max"]
+    if stats["replace_inf"] and stats["has_inf_log2fc"]:
+        x_low, x_high = min(x_low, fill), max(x_high, fill)
+    y_low = float(-np.log10(stats["max_finite_p"])) if np.isfinite(stats["max_finite_p"]) else stats["finite_max"]
+    y_high = fill if stats["replace_inf"] else stats["finite_max"]
+    x_edges, y_edges = _edges(x_low, x_high, bins), _edges(y_low, y_high, bins)
+    grid = np.zeros((bins, bins), dtype=np.int64)
+    counts = np.zeros(len(volcano_artifact.CLASSES), dtype=np.int64)
+    kept: Dict[int, Dict[str, np.ndarray]] = {volcano_artifact.UP: {}, volcano_artifact.DOWN: {}}
+    per_side_cap = max(1, max_points // 2)
+
+    # 3. Second pass: classify, bin, keep the best points, write the columns
+    with tempfile.TemporaryDirectory(prefix="volcano_", dir=engine_config.get("scratch_dir")) as scratch_dir:
+        out = None
+        if columns_out is not None:
+            out = {
+                "genes": np.lib.format.open_memmap(os.path.join(scratch_dir, "genes.npy"), mode="w+",
+                                                   dtype=f"<U{stats['gene_width']}", shape=(n_rows,)),
+                **{name: np.lib.format.open_memmap(os.path.join(scratch_dir, f"{name}.npy"), mode="w+",
+                                                   dtype=np.float64, shape=(n_rows,))
+                   for name in ("log2fc", "pvalue", "minus_log10_pvalue")},
+            }
+
+        offset = 0
+        for genes, log2fc, pvalue in _read_chunks(path, sep, columns, chunk_rows):
+            log2fc, pvalue, minus_log10_p = _preprocess_chunk(log2fc, pvalue, stats)
+            codes = volcano_artifact.classify(log2fc, pvalue, params.fold_change_threshold, params.p_value_threshold)
+            counts += np.bincount(codes, minlength=len(volcano_artifact.CLASSES))
+
+            neutral = codes == volcano_artifact.NEUTRAL
+            grid += np.histogram2d(log2fc[neutral], minus_log10_p[neutral], bins=[x_edges, y_edges])[0].astype(np.int64)
+
+            score = volcano_artifact.significance_score(log2fc, minus_log10_p)
+            rows = np.arange(offset, offset + len(genes))
+            for side in kept:
+                mask = codes == side
+                kept[side] = _keep_best(kept[side], {
+                    "row": rows[mask], "gene": genes[mask], "log2fc": log2fc[mask], "pvalue": pvalue[mask],
+                    "minus_log10_pvalue": minus_log10_p[mask], "score": score[mask],
+                }, per_side_cap)
+
+            if out is not None:
+                chunk_slice = slice(offset, offset + len(genes))
+                out["genes"][chunk_slice] = genes
+                out["log2fc"][chunk_slice] = log2fc
+                out["pvalue"][chunk_slice] = pvalue
+                out["minus_log10_pvalue"][chunk_slice] = minus_log10_p
+            offset += len(genes)
+            checkpoint("classifying", offset, n_rows)
+
+        checkpoint("serializing")
+        if out is not None:
+            # np.savez copies memmaps into the archive in bounded buffers
+            for array in out.values():
+                array.flush()
+            np.savez(columns_out, **out)
+            del out
+
+    # 4. Points: the kept significant genes, in table order
+    points = {key: np.concatenate([kept[side][key] for side in kept if kept[side]]) if any(kept.values()) else np.empty(0)
+              for key in ("row", "gene", "log2fc", "pvalue", "minus_log10_pvalue", "score")}
+    order = np.argsort(points["row"], kind="stable")
+    points = {key: values[order] for key, values in points.items()}
+    point_codes = volcano_artifact.classify(points["log2fc"], points["pvalue"],
+                                            params.fold_change_threshold, params.p_value_threshold)
+    labels = np.asarray(volcano_artifact.CLASSES, dtype=object)[point_codes]
+    plot_data = [
+        {"_gene": gene, "_log2fc": float(lfc), "_pvalue": float(p), "_minus_log10_pvalue_": float(mlp), "_classification": label}
+        for gene, lfc, p, mlp, label in zip(points["gene"].tolist(), points["log2fc"], points["pvalue"],
+                                            points["minus_log10_pvalue"], labels)
+    ]
+    top_n_up, top_n_down = resolve_label_counts(params, config)
+    top_labels = volcano_artifact.top_labels(point_codes, points["score"], top_n_up, top_n_down)
+
+    # 5. Summary, plot configuration and payload, as in volcano_processor.run
+    class_counts = {label: int(count) for label, count in zip(volcano_artifact.CLASSES, counts)}
+    summary_stats = {
+        "total_genes": int(n_rows),
+        "initial_upregulated": class_counts["up"],
+        "initial_downregulated": class_counts["down"],
+        "initial_neutral": class_counts["neutral"],
+        "points_truncated": int(class_counts["up"] + class_counts["down"] - len(plot_data)),
+        "max_points": int(max_points),
+        "streamed": True,
+        "parameters_used": params.model_dump()
+    }
+    default_plot_config = {
+        "title": config.get("graph", {}).get("title", "Volcano Plot"),
+        "x_axis_label": "Log2 Fold Change",
+        "y_axis_label": "-log10(p-value)",
+        "fold_change_threshold": params.fold_change_threshold,
+        "p_value_threshold": params.p_value_threshold,
+        "colors": config.get("colors", {"up": "#FF0000", "down": "#0000FF", "neutral": "#B0B0B0"}),
+        "legend_labels": config.get("legend", {}).get("labels", {})
+    }
+    return {
+        "plot_type": "volcano",
+        "render_mode": "density",
+        "plot_data": plot_data,
+        "density": {
+            "x_edges": x_edges.tolist(),
+            "y_edges": y_edges.tolist(),
+            "counts": grid.tolist(),
+            "n_points": class_counts["neutral"],
+        },
+        "top_labels": top_labels,
+        "summary_stats": summary_stats,
+        "default_plot_config": default_plot_config
+    }
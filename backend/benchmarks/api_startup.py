@@ -0,0 +1,102 @@
+# backend/benchmarks/api_startup.py
+"""
+Measure how long the FastAPI process takes to import and boot, and what it loads.
+
+Each sample runs in a fresh interpreter (so module caches don't hide import cost):
+  - import_seconds: `import main` (routers, schemas, and everything they pull in)
+  - startup_seconds: running the startup event handlers (S3 buckets, optional JVM)
+  - max_rss_mb: peak resident memory of that process
+  - heavy_modules: which heavyweight packages ended up loaded in the API process
+
+Usage (from backend/):
+    python benchmarks/api_startup.py --repeat 5
+    python benchmarks/api_startup.py --max-import-seconds 2.0   # non-zero exit if slower
+    python benchmarks/api_startup.py --profile-imports 25       # slowest imports (-X importtime)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages the API process should not need to load to serve requests
+HEAVY_MODULES = ["imagej", "jpype", "scyjava", "sklearn", "scipy", "pandas", "PIL"]
+
+_PROBE = r"""
+import asyncio, json, resource, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+async def _boot():
+    # Run the lifespan (startup handlers) the way uvicorn does, without serving requests
+    async with main.app.router.lifespan_context(main.app):
+        pass
+asyncio.run(_boot())
+booted = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - started,
+    "startup_seconds": booted - imported,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules": sorted(m for m in %r if m in sys.modules),
+}))
+"""
+
+
+def run_once() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE % (HEAVY_MODULES,)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    # The probe's JSON is the last line; anything before it is application logging
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def profile_imports(top_n: int) -> list:
+    """Top modules by cumulative import time for `import main`, from CPython's -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append({"module": module.strip(), "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[:top_n]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Number of fresh-process samples.")
+    parser.add_argument("--max-import-seconds", type=float, default=None,
+                        help="Exit non-zero if the median import time exceeds this.")
+    parser.add_argument("--profile-imports", type=int, default=0, metavar="N",
+                        help="Also report the N slowest imports by cumulative time.")
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.repeat)]
+    report = {
+        "samples": len(samples),
+        "import_seconds_median": statistics.median(s["import_seconds"] for s in samples),
+        "startup_seconds_median": statistics.median(s["startup_seconds"] for s in samples),
+        "max_rss_mb_median": statistics.median(s["max_rss_mb"] for s in samples),
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+    if args.profile_imports:
+        report["slowest_imports"] = profile_imports(args.profile_imports)
+    print(json.dumps(report, indent=2))
+
+    if args.max_import_seconds is not None and report["import_seconds_median"] > args.max_import_seconds:
+        print(f"API import took {report['import_seconds_median']:.2f}s "
+              f"(limit {args.max_import_seconds:.2f}s)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -44,10 +44,11 @@ async def startup_event():
         init_s3_buckets()
         logger.info("S3 buckets initialized successfully.")
 
-        # Eagerly initialize the ImageJ gateway
-        # This will start the JVM and catch any setup errors early.
-        init_imagej_gateway()
-        logger.info("ImageJ gateway initialized successfully.")
+        # The API process only enqueues imaging jobs; the JVM lives in Celery workers.
+        # Set IMAGING_RUNTIME_ROLES to include "api" to start it here as well.
+        if settings.imaging_runtime_enabled("api"):
+            init_imagej_gateway()
+            logger.info("ImageJ gateway initialized successfully.")
 
     except Exception as e:
         logger.critical(f"A critical error occurred during startup: {e}", exc_info=True)
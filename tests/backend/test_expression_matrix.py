@@ -0,0 +1,106 @@
+# tests/backend/test_expression_matrix.py
+
+import io
+
+import numpy as np
+import pytest
+
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import expression_matrix, heatmap_processor, pca_processor
+from app.schemas.benchtop.biology.omics.transcriptomics.bulk_rna_seq.heatmap_schema import HeatmapParams
+from app.schemas.benchtop.biology.omics.transcriptomics.bulk_rna_seq.pca_schema import PCAParams
+
+CSV = (
+    "Gene, logFC ,PValue,ctrl_1,ctrl_2,treat_1,treat_2\n"
+    "g1,2.5,0.001,1,2,10,11\n"
+    "g2,-3.0,0.002,5,6,1,n/a\n"
+    "g3,0.1,0.5,3,3,4,4\n"
+    "g4,1.2,0.04,7,,2,1\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    expression_matrix.clear_cache()
+    yield
+    expression_matrix.clear_cache()
+
+
+def test_prepare_splits_samples_and_metadata():
+    """
+    Metadata columns are matched case-insensitively and kept apart; non-numeric
+    sample values become NaN in a read-only, column-major float32 block.
+    """
+    matrix = expression_matrix.prepare_expression_matrix(io.BytesIO(CSV.encode()), "de.csv", ["logfc", "PVALUE"])
+
+    values = matrix["values"]
+    assert matrix["sample_names"] == ["ctrl_1", "ctrl_2", "treat_1", "treat_2"]
+    assert list(matrix["gene_index"]) == ["g1", "g2", "g3", "g4"]
+    assert list(matrix["metadata"].columns) == ["logFC", "PValue"]
+    assert values.dtype == np.float32 and values.flags.f_contiguous and not values.flags.writeable
+    assert np.isnan(values[1, 3]) and np.isnan(values[3, 1])
+    assert matrix["has_missing"]
+
+    imputed = expression_matrix.impute_means(values, axis=1)
+    assert imputed[1, 3] == pytest.approx(4.0)
+
+
+def test_cached_table_is_reused_across_tools():
+    """
+    Once parsed under a cache key, PCA and heatmap runs can share the table without the file.
+    """
+    expression_matrix.prepare_expression_matrix(io.BytesIO(CSV.encode()), "de.csv", cache_key="s3://datasets/de.csv")
+    assert expression_matrix.is_cached("s3://datasets/de.csv")
+
+    pca_result = pca_processor.run(None, "de.csv", PCAParams(n_components=2), {
+        'expected_input': {'excluded_metadata_columns': ['logFC', 'PValue']}
+    }, cache_key="s3://datasets/de.csv")
+    heatmap_result = heatmap_processor.run(None, "de.csv", HeatmapParams(gene_selection_method="de_genes"), {
+        'expected_input': {'excluded_metadata_columns': ['logFC', 'PValue']}
+    }, cache_key="s3://datasets/de.csv")
+
+    assert [row['sample'] for row in pca_result['plot_data']] == ["ctrl_1", "ctrl_2", "treat_1", "treat_2"]
+    assert sorted(heatmap_result['plot_data']['gene_labels']) == ["g1", "g2", "g4"]
+
+    with pytest.raises(ValueError):
+        expression_matrix.prepare_expression_matrix(None, "de.csv", cache_key="s3://datasets/other.csv")
+
+
+def test_streamed_table_matches_in_memory_parse(tmp_path):
+    """Chunked reads into a memmap give the same block, genes and missing-value flags."""
+    in_memory = expression_matrix.prepare_expression_matrix(io.BytesIO(CSV.encode()), "de.csv", ["logfc", "pvalue"])
+    streamed = expression_matrix.prepare_expression_matrix(
+        io.BytesIO(CSV.encode()), "de.csv", ["logfc", "pvalue"],
+        cache_key="s3://datasets/de.csv", memmap_path=str(tmp_path / "expression.f32"), chunk_rows=3,
+    )
+    assert isinstance(streamed["values"], np.memmap)
+    np.testing.assert_array_equal(streamed["values"], in_memory["values"])
+    assert list(streamed["gene_index"]) == list(in_memory["gene_index"])
+    assert streamed["sample_names"] == in_memory["sample_names"]
+    assert streamed["has_missing"] and not expression_matrix.is_cached("s3://datasets/de.csv")
+
+
+def test_auto_solver_streams_tables_above_the_threshold(monkeypatch):
+    """'auto' runs above incremental_threshold_mb are parsed chunk by chunk, not into a DataFrame."""
+    monkeypatch.setattr(expression_matrix, "parse_table", lambda *args, **kwargs: pytest.fail("parsed on the heap"))
+    config = {'expected_input': {'excluded_metadata_columns': ['logFC', 'PValue']},
+              'engine': {'incremental_threshold_mb': 1e-6, 'incremental_batch_size': 2, 'chunk_rows': 2}}
+    result = pca_processor.run(io.BytesIO(CSV.encode()), "de.csv", PCAParams(n_components=2), config,
+                               cache_key="s3://datasets/de.csv")
+    assert result["summary_stats"]["pca_solver"] == "incremental"
+    assert not expression_matrix.is_cached("s3://datasets/de.csv")
+
+
+def test_metadata_columns_keep_float64_precision(tmp_path):
+    """Only the sample block is float32; p-values such as 1e-300 or 0.1234567891 stay exact."""
+    table = "Gene,logFC,PValue,s1,s2\ng1,2.123456789,1e-300,1,2\ng2,-1.5,0.1234567891,3,n/a\n"
+    matrices = [
+        expression_matrix.prepare_expression_matrix(io.BytesIO(table.encode()), "de.csv", ["logfc", "pvalue"]),
+        expression_matrix.prepare_expression_matrix(io.BytesIO(table.encode()), "de.csv", ["logfc", "pvalue"],
+                                                    memmap_path=str(tmp_path / "expression.f32"), chunk_rows=1),
+    ]
+    for matrix in matrices:
+        metadata = matrix["metadata"]
+        assert matrix["values"].dtype == np.float32
+        assert (metadata.dtypes == np.float64).all()
+        assert metadata["PValue"].tolist() == [1e-300, 0.1234567891]
+        assert metadata["logFC"].tolist() == [2.123456789, -1.5]
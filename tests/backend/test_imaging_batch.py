@@ -0,0 +1,87 @@
+# tests/backend/test_imaging_batch.py
+
+import io
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+from pydantic import ValidationError
+
+from app.utils.benchtop.biology.imaging import batch
+from app.utils.benchtop.biology.imaging.filters import gaussian_blur_processor
+from app.schemas.benchtop.biology.imaging.batch_schema import ImagingBatchParams
+from app.schemas.benchtop.biology.imaging.filters.gaussian_blur_schema import GaussianBlurParams
+
+
+def _png_bytes(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def plate():
+    """A small 'plate' of images keyed by path, plus one path that cannot be fetched."""
+    rng = np.random.RandomState(11)
+    images = {f"s3://datasets/plate/well_{i:02d}.png": _png_bytes(rng.randint(0, 255, (40, 48)).astype(np.uint8))
+              for i in range(12)}
+    return images
+
+
+def test_pipeline_matches_single_runs_and_keeps_order(plate):
+    params = GaussianBlurParams(sigma=1.5)
+    items = [{"s3_path": path, "dataset_id": None} for path in plate]
+    items.insert(5, {"s3_path": "s3://datasets/plate/missing.png", "dataset_id": None})
+    stored = {}
+    lock = threading.Lock()
+
+    def fetch(item):
+        return plate[item["s3_path"]]
+
+    def process(image_bytes):
+        return gaussian_blur_processor.run(None, image_bytes, params)
+
+    def store(index, item, result):
+        with lock:
+            stored[item["s3_path"]] = result["processed_image_bytes"]
+        return {"output_s3_path": f"s3://results/{index}.png"}
+
+    manifest = batch.run_pipeline(items, fetch, process, store, max_workers=4, prefetch_per_worker=1)
+
+    assert [entry["s3_path"] for entry in manifest] == [item["s3_path"] for item in items]
+    failed = [entry for entry in manifest if entry["status"] == "failed"]
+    assert len(failed) == 1 and failed[0]["index"] == 5 and "missing" in failed[0]["error"]
+    for entry in manifest:
+        if entry["status"] == "completed":
+            expected = gaussian_blur_processor.run(None, plate[entry["s3_path"]], params)["processed_image_bytes"]
+            assert stored[entry["s3_path"]] == expected
+            assert entry["output_s3_path"] == f"s3://results/{entry['index']}.png"
+            assert set(entry["timings"]) == {"download_seconds", "process_seconds", "upload_seconds"}
+
+    summary = batch.summarize_manifest(manifest, wall_seconds=2.0)
+    assert (summary["images"], summary["succeeded"], summary["failed"]) == (13, 12, 1)
+
+
+def test_batch_params_validate_tool_and_parameters():
+    params = ImagingBatchParams(tool="auto_threshold", tool_parameters={"method": "Otsu"})
+    assert params.tool_params().method == "Otsu"
+    with pytest.raises(ValidationError):
+        ImagingBatchParams(tool="deconvolve")
+    with pytest.raises(ValidationError):
+        ImagingBatchParams(tool="gaussian_blur", tool_parameters={"sigma": -1}).tool_params()
+
+
+def test_api_rejects_more_dataset_ids_than_max_images(monkeypatch):
+    """The image cap is checked before any dataset is looked up."""
+    import uuid
+    from fastapi import HTTPException
+    from app.api.endpoints.tools.imaging import batch_router as router
+
+    monkeypatch.setattr(router, "load_yaml_config", lambda rel_path: {"parameters": {"max_images": 2}})
+    monkeypatch.setattr(router.crud, "get_dataset", lambda *args, **kwargs: pytest.fail("dataset looked up"))
+    submission = router.ImagingBatchSubmit(project_id=uuid.uuid4(), tool="gaussian_blur", tool_parameters={"sigma": 1.0},
+                                           dataset_ids=[uuid.uuid4() for _ in range(3)])
+    with pytest.raises(HTTPException) as rejected:
+        router.submit_imaging_batch_analysis(db=None, submission_data=submission, current_user=None)
+    assert rejected.value.status_code == 400 and "at most 2" in rejected.value.detail
@@ -0,0 +1,72 @@
+# tests/backend/test_imaging_encoders.py
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.utils.benchtop.biology.imaging import encoders, image_io, native_ops
+from app.utils.benchtop.biology.imaging.segmentation import auto_threshold_processor
+from app.schemas.benchtop.biology.imaging.segmentation.auto_threshold_schema import AutoThresholdParams
+
+
+@pytest.fixture
+def blurred_and_mask():
+    rng = np.random.RandomState(4)
+    yy, xx = np.mgrid[0:90, 0:117]
+    image = (120 + 60 * np.sin(xx / 8.0) * np.cos(yy / 11.0) + rng.normal(0, 10, (90, 117))).clip(0, 255).astype(np.uint8)
+    blurred = native_ops.gaussian_blur(image, 1.5)
+    mask, _ = native_ops.auto_threshold(blurred, "Otsu")
+    return blurred, mask
+
+
+def _decode(data: bytes) -> np.ndarray:
+    return np.array(Image.open(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("output_format", ["png", "webp", "npy"])
+def test_lossless_formats_round_trip(blurred_and_mask, output_format):
+    blurred, _ = blurred_and_mask
+    data, info = encoders.encode(blurred, encoders.output_settings({"output": {"format": output_format}}))
+    decoded = np.load(io.BytesIO(data)) if output_format == "npy" else _decode(data)
+    if output_format == "webp":
+        decoded = decoded[..., 0]  # WebP stores grayscale as RGB
+    np.testing.assert_array_equal(decoded, blurred)
+    assert info["format"] == output_format and info["bytes"] == len(data) and info["encode_seconds"] >= 0
+
+
+def test_mask_1bit_is_packed_and_exact(blurred_and_mask):
+    _, mask = blurred_and_mask
+    packed, packed_info = encoders.encode(mask, encoders.output_settings(None, "mask_1bit"))
+    eight_bit, _ = encoders.encode(mask, encoders.output_settings(None, "png"))
+    assert Image.open(io.BytesIO(packed)).mode == "1"
+    np.testing.assert_array_equal(_decode(packed), mask)
+    np.testing.assert_array_equal(_decode(eight_bit), mask.astype(np.uint8) * 255)
+    # The streamed encoder packs memory-mapped (tiled) masks the same way
+    np.testing.assert_array_equal(_decode(image_io.encode_png_stream(mask, bool_bit_depth=1, rows_per_chunk=16)), mask)
+    assert packed_info["raw_bytes"] == mask.nbytes
+
+
+def test_unsupported_encodings_are_rejected():
+    with pytest.raises(ValueError):
+        encoders.output_settings(None, "jpeg")
+    with pytest.raises(ValueError):
+        encoders.encode(np.zeros((4, 4), dtype=np.uint16), encoders.output_settings(None, "webp"))
+
+
+def test_processor_reports_encoding_and_honours_override(blurred_and_mask):
+    blurred, mask = blurred_and_mask
+    buffer = io.BytesIO()
+    Image.fromarray(blurred).save(buffer, format="PNG")
+    config = {"output": {"format": "mask_1bit"}}
+
+    result = auto_threshold_processor.run(None, buffer.getvalue(), AutoThresholdParams(method="Otsu"), config=config)
+    assert result["output_format"] == "mask_1bit" and result["summary"]["encoding"]["format"] == "mask_1bit"
+    np.testing.assert_array_equal(_decode(result["processed_image_bytes"]), mask)
+
+    result = auto_threshold_processor.run(
+        None, buffer.getvalue(), AutoThresholdParams(method="Otsu", output_format="npy"), config=config
+    )
+    assert encoders.file_type(result["output_format"]) == ("npy", "application/octet-stream")
+    np.testing.assert_array_equal(np.load(io.BytesIO(result["processed_image_bytes"])), mask)
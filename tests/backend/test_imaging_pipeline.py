@@ -0,0 +1,133 @@
+# tests/backend/test_imaging_pipeline.py
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+from pydantic import ValidationError
+
+from app.utils.benchtop.biology.imaging import native_ops, pipeline
+from app.utils.benchtop.biology.imaging.filters import gaussian_blur_processor
+from app.schemas.benchtop.biology.imaging.filters.gaussian_blur_schema import GaussianBlurParams
+from app.schemas.benchtop.biology.imaging.pipeline_schema import ImagingPipelineParams
+
+
+@pytest.fixture
+def image_bytes():
+    rng = np.random.RandomState(9)
+    yy, xx = np.mgrid[0:80, 0:96]
+    image = (110 + 70 * np.sin(xx / 7.0) * np.cos(yy / 10.0) + rng.normal(0, 20, (80, 96))).clip(0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG")
+    return image, buffer.getvalue()
+
+
+def _blur_then_threshold(save_blur: bool = False) -> ImagingPipelineParams:
+    return ImagingPipelineParams(steps=[
+        {"op": "gaussian_blur", "parameters": {"sigma": 2.0}, "save_output": save_blur},
+        {"op": "auto_threshold", "parameters": {"method": "Li"}},
+    ])
+
+
+def test_chain_runs_on_unrounded_intermediate(image_bytes):
+    """Thresholding sees the float blur, not an 8-bit re-decoded copy of it."""
+    image, data = image_bytes
+    result = pipeline.run(None, data, _blur_then_threshold(save_blur=True))
+
+    blurred = native_ops.gaussian_blur(image.astype(np.float32), 2.0)
+    expected_mask, _ = native_ops.auto_threshold(blurred, "Li")
+    decoded = np.array(Image.open(io.BytesIO(result["processed_image_bytes"])))
+    np.testing.assert_array_equal(decoded, expected_mask.astype(np.uint8) * 255)
+
+    (intermediate,) = result["intermediates"]
+    assert (intermediate["step"], intermediate["op"], intermediate["output_format"]) == (0, "gaussian_blur", "npy")
+    np.testing.assert_array_equal(np.load(io.BytesIO(intermediate["bytes"])), blurred)
+    assert [t["op"] for t in result["summary"]["step_timings"]] == ["gaussian_blur", "auto_threshold"]
+
+
+def test_single_step_matches_tool(image_bytes):
+    """A one-op pipeline returns what the tool itself returns, at the input bit depth."""
+    _, data = image_bytes
+    result = pipeline.run(None, data, ImagingPipelineParams(steps=[{"op": "gaussian_blur", "parameters": {"sigma": 1.2}}]))
+    tool = gaussian_blur_processor.run(None, data, GaussianBlurParams(sigma=1.2))
+    np.testing.assert_array_equal(np.array(Image.open(io.BytesIO(result["processed_image_bytes"]))),
+                                  np.array(Image.open(io.BytesIO(tool["processed_image_bytes"]))))
+    assert result["intermediates"] == []
+
+
+def test_pipeline_validation(image_bytes):
+    with pytest.raises(ValidationError):
+        ImagingPipelineParams(steps=[])
+    with pytest.raises(ValidationError):
+        ImagingPipelineParams(steps=[{"op": "gaussian_blur", "parameters": {"sigma": 0}}])
+    with pytest.raises(ValidationError):
+        ImagingPipelineParams(steps=[{"op": "deconvolve"}])
+    _, data = image_bytes
+    with pytest.raises(ValueError):
+        pipeline.run(None, data, ImagingPipelineParams(steps=[{"op": "gaussian_blur", "parameters": {"sigma": 1}}],
+                                                       output_format="mask_1bit"))
+
+
+def test_tiff_stack_runs_chain_per_plane():
+    tifffile = pytest.importorskip("tifffile")
+    rng = np.random.RandomState(3)
+    stack = rng.randint(0, 60000, size=(2, 40, 50)).astype(np.uint16)
+    buffer = io.BytesIO()
+    tifffile.imwrite(buffer, stack, metadata={"axes": "ZYX"})
+    result = pipeline.run(None, buffer.getvalue(), _blur_then_threshold())
+    masks = tifffile.imread(io.BytesIO(result["processed_image_bytes"]))
+    for z in range(2):
+        expected, _ = native_ops.auto_threshold(native_ops.gaussian_blur(stack[z].astype(np.float32), 2.0), "Li")
+        np.testing.assert_array_equal(masks[z] == 255, expected)
+
+
+def test_tiled_chain_matches_whole_image(image_bytes, tmp_path):
+    """Above min_tiled_pixels every step runs tile by tile in scratch buffers, with the same result."""
+    image, data = image_bytes
+    tiled_config = {"engine": {"tile_size": 32, "min_tiled_pixels": 1000, "max_workers": 3, "scratch_dir": str(tmp_path)}}
+    chains = [
+        _blur_then_threshold(save_blur=True),
+        ImagingPipelineParams(steps=[{"op": "gaussian_blur", "parameters": {"sigma": 1.0}},
+                                     {"op": "gaussian_blur", "parameters": {"sigma": 2.5}}]),
+    ]
+    for params in chains:
+        whole = pipeline.run(None, data, params)
+        tiled = pipeline.run(None, data, params, config=tiled_config)
+        assert tiled["summary"]["tiled"] and not whole["summary"]["tiled"]
+        np.testing.assert_array_equal(np.array(Image.open(io.BytesIO(tiled["processed_image_bytes"]))),
+                                      np.array(Image.open(io.BytesIO(whole["processed_image_bytes"]))))
+        for tiled_step, whole_step in zip(tiled["intermediates"], whole["intermediates"]):
+            with tiled_step["file"] as intermediate_file:
+                intermediate_file.seek(0)
+                np.testing.assert_array_equal(np.load(intermediate_file), np.load(io.BytesIO(whole_step["bytes"])))
+    assert list(tmp_path.iterdir()) == []
+
+    with pytest.raises(ValueError, match="max_decoded_pixels|exceeds"):
+        pipeline.run(None, data, chains[0], config={"engine": {"max_decoded_pixels": 1000}})
+
+
+def test_tiled_tiff_stack_matches_whole_planes():
+    tifffile = pytest.importorskip("tifffile")
+    rng = np.random.RandomState(4)
+    stack = rng.randint(0, 60000, size=(2, 70, 90)).astype(np.uint16)
+    buffer = io.BytesIO()
+    tifffile.imwrite(buffer, stack, metadata={"axes": "ZYX"})
+    tiled_config = {"engine": {"tile_size": 32, "min_tiled_pixels": 1000, "max_workers": 2}}
+    for params in (_blur_then_threshold(), ImagingPipelineParams(steps=[{"op": "gaussian_blur", "parameters": {"sigma": 1.5}}])):
+        whole = tifffile.imread(io.BytesIO(pipeline.run(None, buffer.getvalue(), params)["processed_image_bytes"]))
+        tiled = tifffile.imread(io.BytesIO(pipeline.run(None, buffer.getvalue(), params, config=tiled_config)["processed_image_bytes"]))
+        np.testing.assert_array_equal(tiled, whole)
+
+    with pytest.raises(ValueError, match="exceeds"):
+        pipeline.run(None, buffer.getvalue(), _blur_then_threshold(), config={"engine": {"max_image_pixels": 1000}})
+
+
+def test_tiff_stack_reports_one_stage_per_plane():
+    tifffile = pytest.importorskip("tifffile")
+    stack = np.random.RandomState(5).randint(0, 255, size=(4, 20, 24)).astype(np.uint8)
+    buffer = io.BytesIO()
+    tifffile.imwrite(buffer, stack, metadata={"axes": "ZYX"})
+    calls = []
+    pipeline.run(None, buffer.getvalue(), _blur_then_threshold(), checkpoint=lambda *args: calls.append(args))
+    assert calls == [("processing_planes", index, 4) for index in range(4)]
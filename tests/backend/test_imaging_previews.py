@@ -0,0 +1,111 @@
+# tests/backend/test_imaging_previews.py
+
+import io
+import math
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.utils.benchtop.biology.imaging import previews
+
+SETTINGS = previews.preview_settings({"preview": {"enabled": True, "min_pyramid_dimension": 512, "tile_format": "png"}})
+
+
+def _decode(data: bytes) -> np.ndarray:
+    return np.array(Image.open(io.BytesIO(data)))
+
+
+@pytest.fixture
+def large_image():
+    yy, xx = np.mgrid[0:700, 0:1030]
+    return ((xx * 7 + yy * 3) % 256).astype(np.uint8)
+
+
+def test_dzi_pyramid_geometry(large_image):
+    built = previews.build_previews(large_image, SETTINGS)
+    dzi = built["dzi"]
+    assert dzi["levels"] == math.ceil(math.log2(1030)) + 1
+
+    root = ET.fromstring(dzi["descriptor"])
+    assert root.get("TileSize") == "254" and root.get("Overlap") == "1" and root.get("Format") == "png"
+    assert root[0].get("Width") == "1030" and root[0].get("Height") == "700"
+
+    tiles = dict(dzi["tiles"])
+    for level in range(dzi["levels"]):
+        scale = 2 ** (dzi["levels"] - 1 - level)
+        width, height = math.ceil(1030 / scale), math.ceil(700 / scale)
+        cols, rows = math.ceil(width / 254), math.ceil(height / 254)
+        level_tiles = [name for name in tiles if name.startswith(f"{level}/")]
+        assert len(level_tiles) == cols * rows
+        # Last tile of the level: overlap on the left/top only, ending at the level edge
+        last = _decode(tiles[f"{level}/{cols - 1}_{rows - 1}.png"])
+        assert last.shape == (height - (rows - 1) * 254 + (1 if rows > 1 else 0),
+                              width - (cols - 1) * 254 + (1 if cols > 1 else 0))
+
+    # Full-resolution tiles are exact crops; the top-left interior tile includes its overlap
+    np.testing.assert_array_equal(_decode(tiles[f"{dzi['levels'] - 1}/1_1.png"]), large_image[253:509, 253:509])
+
+
+def test_thumbnail_and_small_images(large_image):
+    built = previews.build_previews(large_image, SETTINGS)
+    assert max(built["thumbnail"]["width"], built["thumbnail"]["height"]) == 256
+    assert _decode(built["thumbnail"]["bytes"]).shape == (built["thumbnail"]["height"], built["thumbnail"]["width"])
+
+    small = previews.build_previews(large_image[:100, :120], SETTINGS)
+    assert small["dzi"] is None and (small["thumbnail"]["width"], small["thumbnail"]["height"]) == (120, 100)
+    assert previews.build_previews(large_image, previews.preview_settings(None)) is None
+
+
+def test_memmapped_16bit_and_mask_inputs(tmp_path, large_image):
+    """Tiled results arrive as memmaps; 16-bit data is stretched and masks shown as 0/255."""
+    wide = np.lib.format.open_memmap(str(tmp_path / "out.npy"), mode="w+", dtype=np.uint16, shape=large_image.shape)
+    wide[:] = large_image.astype(np.uint16) * 200 + 1000
+    built = previews.build_previews(wide, SETTINGS)
+    top = dict(built["dzi"]["tiles"])[f"{built['dzi']['levels'] - 1}/0_0.png"]
+    np.testing.assert_array_equal(_decode(top), large_image[:255, :255])
+
+    mask = previews.build_previews(large_image > 127, SETTINGS)
+    assert set(np.unique(_decode(dict(mask["dzi"]["tiles"])[f"{mask['dzi']['levels'] - 1}/0_0.png"]))) <= {0, 255}
+
+
+def test_upload_previews_registers_artifacts(large_image):
+    stored = {}
+
+    def upload(data, object_name, content_type):
+        stored[object_name] = content_type
+        return f"s3://results/{object_name}"
+
+    built = previews.build_previews(large_image, SETTINGS)
+    artifact = previews.upload_previews(built, upload, prefix="runs/1/results", name="filtered_image")
+    assert artifact["thumbnail_s3_path"] == "s3://results/runs/1/results/filtered_image_thumbnail.png"
+    assert artifact["dzi_s3_path"] == "s3://results/runs/1/results/filtered_image.dzi"
+    assert artifact["tile_count"] == len(built["dzi"]["tiles"])
+    assert stored["runs/1/results/filtered_image_files/0/0_0.png"] == "image/png"
+    assert len(stored) == artifact["tile_count"] + 2
+
+
+def test_tiles_are_stored_in_batches_from_memory_mapped_levels(large_image, monkeypatch, tmp_path):
+    """store_tiles gets the same tiles in bounded batches; levels are spilled to scratch files."""
+    monkeypatch.setattr(previews, "TILE_BATCH", 5)
+    monkeypatch.setattr(previews, "_LEVEL_MEMMAP_BYTES", 0)
+    batches = []
+    streamed = previews.build_previews(large_image, SETTINGS, store_tiles=batches.append, scratch_dir=str(tmp_path))
+    in_memory = previews.build_previews(large_image, SETTINGS)
+
+    assert all(len(batch) <= 5 for batch in batches)
+    assert [tile for batch in batches for tile in batch] == in_memory["dzi"]["tiles"]
+    assert streamed["dzi"]["tiles"] is None and streamed["dzi"]["tile_count"] == len(in_memory["dzi"]["tiles"])
+    assert streamed["thumbnail"] == in_memory["thumbnail"]
+    assert list(tmp_path.iterdir()) == []  # Scratch levels are removed
+
+    stored = {}
+
+    def upload(data, object_name, content_type):
+        stored[object_name] = content_type
+        return f"s3://results/{object_name}"
+    previews.tile_store(upload, "runs/1/results", "filtered_image")(batches[0])
+    artifact = previews.upload_previews(streamed, upload, prefix="runs/1/results", name="filtered_image")
+    assert stored["runs/1/results/filtered_image_files/" + batches[0][0][0]] == "image/png"
+    assert artifact["tile_count"] == streamed["dzi"]["tile_count"] and len(stored) == 5 + 2
@@ -0,0 +1,116 @@
+# tests/backend/test_imaging_tiff.py
+
+import io
+import tempfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+tifffile = pytest.importorskip("tifffile")
+
+from app.utils.benchtop.biology.imaging import native_ops
+from app.utils.benchtop.biology.imaging.filters import gaussian_blur_processor
+from app.utils.benchtop.biology.imaging.segmentation import auto_threshold_processor
+from app.schemas.benchtop.biology.imaging.filters.gaussian_blur_schema import GaussianBlurParams
+from app.schemas.benchtop.biology.imaging.segmentation.auto_threshold_schema import AutoThresholdParams
+
+
+@pytest.fixture
+def zstack_16bit():
+    """A 3-plane 16-bit z-stack with values well above the 8-bit range."""
+    rng = np.random.RandomState(5)
+    yy, xx = np.mgrid[0:64, 0:80]
+    planes = [20000 + 15000 * np.sin((xx + 7 * z) / 6.0) * np.cos(yy / 9.0) + rng.normal(0, 800, (64, 80))
+              for z in range(3)]
+    return np.stack(planes).clip(0, 65535).astype(np.uint16)
+
+
+def _tiff_bytes(array: np.ndarray, axes: str, **kwargs) -> bytes:
+    buffer = io.BytesIO()
+    tifffile.imwrite(buffer, array, metadata={"axes": axes}, **kwargs)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_gaussian_blur_keeps_16bit_stack(zstack_16bit, compression):
+    """Every plane is blurred at 16 bits; uncompressed input is memory-mapped in place."""
+    result = gaussian_blur_processor.run(
+        None, _tiff_bytes(zstack_16bit, "ZYX", compression=compression), GaussianBlurParams(sigma=1.5)
+    )
+    assert result["output_format"] == "tiff"
+    assert result["summary"]["stack"]["planes"] == 3
+    assert result["summary"]["stack"]["memory_mapped"] is (compression is None)
+
+    output = tifffile.imread(io.BytesIO(result["processed_image_bytes"]))
+    assert output.dtype == np.uint16 and output.shape == zstack_16bit.shape
+    for z in range(3):
+        np.testing.assert_array_equal(output[z], native_ops.gaussian_blur(zstack_16bit[z], 1.5))
+
+
+def test_tiled_planes_in_stack_match(zstack_16bit):
+    config = {"engine": {"tile_size": 24, "min_tiled_pixels": 100, "max_workers": 2}}
+    tiled = gaussian_blur_processor.run(None, _tiff_bytes(zstack_16bit, "ZYX"), GaussianBlurParams(sigma=2.0), config=config)
+    whole = gaussian_blur_processor.run(None, _tiff_bytes(zstack_16bit, "ZYX"), GaussianBlurParams(sigma=2.0))
+    np.testing.assert_array_equal(tifffile.imread(io.BytesIO(tiled["processed_image_bytes"])),
+                                  tifffile.imread(io.BytesIO(whole["processed_image_bytes"])))
+
+
+def test_stack_is_written_to_output_file(zstack_16bit, tmp_path):
+    """The stack is written to the caller's file (never held as bytes) from a path input."""
+    input_path = tmp_path / "input.tif"
+    input_path.write_bytes(_tiff_bytes(zstack_16bit, "ZYX"))
+    expected = gaussian_blur_processor.run(None, input_path.read_bytes(), GaussianBlurParams(sigma=1.5))
+    with tempfile.TemporaryFile() as output_file:
+        result = gaussian_blur_processor.run(None, str(input_path), GaussianBlurParams(sigma=1.5), output_file=output_file)
+        assert result["processed_image_bytes"] is None
+        assert output_file.tell() == 0
+        written = output_file.read()
+    assert len(written) == result["summary"]["stack"]["output_bytes"]
+    assert written == expected["processed_image_bytes"]
+
+
+def test_tiled_threshold_planes_in_stack_match(zstack_16bit):
+    """Tiled planes share disk-backed buffers, which must not leak one plane into the next."""
+    config = {"engine": {"tile_size": 24, "min_tiled_pixels": 100, "max_workers": 2}}
+    params = AutoThresholdParams(method="Otsu", backend="native")
+    tiled = auto_threshold_processor.run(None, _tiff_bytes(zstack_16bit, "ZYX"), params, config=config)
+    whole = auto_threshold_processor.run(None, _tiff_bytes(zstack_16bit, "ZYX"), params)
+    np.testing.assert_array_equal(tifffile.imread(io.BytesIO(tiled["processed_image_bytes"])),
+                                  tifffile.imread(io.BytesIO(whole["processed_image_bytes"])))
+
+
+def test_stack_above_pixel_cap_is_rejected(zstack_16bit):
+    config = {"engine": {"max_image_pixels": 64 * 80 - 1}}
+    with pytest.raises(ValueError, match="exceeds the limit"):
+        gaussian_blur_processor.run(None, _tiff_bytes(zstack_16bit, "ZYX"), GaussianBlurParams(sigma=1.0), config=config)
+
+
+def test_auto_threshold_stack_uses_full_bit_depth(zstack_16bit):
+    """Each plane is thresholded on its own 16-bit histogram (no 8-bit truncation)."""
+    stack = np.stack([zstack_16bit, zstack_16bit // 2])  # T x Z x Y x X
+    result = auto_threshold_processor.run(None, _tiff_bytes(stack, "TZYX"), AutoThresholdParams(method="Otsu"))
+    masks = tifffile.imread(io.BytesIO(result["processed_image_bytes"]))
+    assert masks.shape == stack.shape and masks.dtype == np.uint8
+    for t in range(2):
+        for z in range(3):
+            expected, _ = native_ops.auto_threshold(stack[t, z], "Otsu")
+            np.testing.assert_array_equal(masks[t, z] == 255, expected)
+
+
+def test_rgb_tiff_threshold_drops_samples():
+    rng = np.random.RandomState(2)
+    rgb = rng.randint(0, 255, size=(2, 32, 32, 3)).astype(np.uint8)
+    result = auto_threshold_processor.run(
+        None, _tiff_bytes(rgb, "ZYXS", photometric="rgb"), AutoThresholdParams(method="Mean")
+    )
+    masks = tifffile.imread(io.BytesIO(result["processed_image_bytes"]))
+    assert masks.shape == (2, 32, 32)
+
+
+def test_16bit_png_is_not_truncated(zstack_16bit):
+    buffer = io.BytesIO()
+    Image.fromarray(zstack_16bit[0]).save(buffer, format="PNG")
+    result = gaussian_blur_processor.run(None, buffer.getvalue(), GaussianBlurParams(sigma=1.0))
+    output = np.array(Image.open(io.BytesIO(result["processed_image_bytes"])))
+    np.testing.assert_array_equal(output, native_ops.gaussian_blur(zstack_16bit[0], 1.0))
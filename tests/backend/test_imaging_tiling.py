@@ -0,0 +1,114 @@
+# tests/backend/test_imaging_tiling.py
+
+import io
+import tempfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.utils.benchtop.biology.imaging import image_io, native_ops, tiling
+from app.utils.benchtop.biology.imaging.filters import gaussian_blur_processor
+from app.utils.benchtop.biology.imaging.segmentation import auto_threshold_processor
+from app.schemas.benchtop.biology.imaging.filters.gaussian_blur_schema import GaussianBlurParams
+from app.schemas.benchtop.biology.imaging.segmentation.auto_threshold_schema import AutoThresholdParams
+
+# Small tiles and a low tiling cutoff so a modest test image exercises edges, corners and halos.
+SMALL_TILES = {"engine": {"tile_size": 48, "min_tiled_pixels": 1000, "max_workers": 3}}
+
+
+@pytest.fixture
+def textured_image():
+    """An 8-bit image with structure at several scales and a size that is not a multiple of the tile."""
+    rng = np.random.RandomState(7)
+    yy, xx = np.mgrid[0:157, 0:203]
+    values = 120 + 60 * np.sin(xx / 9.0) * np.cos(yy / 13.0) + rng.normal(0, 12, (157, 203))
+    return values.clip(0, 255).astype(np.uint8)
+
+
+def _png_bytes(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_tile_grid_covers_image_once():
+    """Write regions partition the image, and crops line up with the haloed reads."""
+    covered = np.zeros((157, 203), dtype=int)
+    for read, write, crop in tiling.tile_grid((157, 203), 48, halo=7):
+        covered[write] += 1
+        assert read[0].start + crop[0].start == write[0].start
+        assert read[1].start + crop[1].start == write[1].start
+    assert (covered == 1).all()
+
+
+def test_tiled_gaussian_matches_whole_image(textured_image):
+    """With a halo of the kernel radius, tiled blurring is exact, in 2D and with channels."""
+    for image in (textured_image, np.dstack([textured_image, textured_image[::-1], 255 - textured_image])):
+        for sigma in (0.8, 3.0):
+            expected = native_ops.gaussian_blur(image, sigma)
+            out = np.empty_like(image)
+            tiling.apply_tiled(image, lambda tile: native_ops.gaussian_blur(tile, sigma), out,
+                               tile_size=48, halo=native_ops.gauss_kernel_radius(sigma), max_workers=3)
+            np.testing.assert_array_equal(out, expected)
+
+
+def test_tiled_histogram_matches_whole_image(textured_image):
+    counts, minimum, bin_width = tiling.tiled_histogram(textured_image, tile_size=48, max_workers=3)
+    expected_counts, expected_minimum, expected_width = native_ops.histogram(textured_image)
+    np.testing.assert_array_equal(counts, expected_counts)
+    assert (minimum, bin_width) == (expected_minimum, expected_width)
+
+
+def test_tiled_processors_match_untiled(textured_image):
+    """The processors' tiled path (memmap output, streamed PNG) produces the same images."""
+    blur_params = GaussianBlurParams(sigma=2.0, backend="native")
+    tiled = gaussian_blur_processor.run(None, _png_bytes(textured_image), blur_params, config=SMALL_TILES)
+    whole = gaussian_blur_processor.run(None, _png_bytes(textured_image), blur_params)
+    assert tiled["summary"]["tiled"] and not whole["summary"]["tiled"]
+    np.testing.assert_array_equal(np.array(Image.open(io.BytesIO(tiled["processed_image_bytes"]))),
+                                  np.array(Image.open(io.BytesIO(whole["processed_image_bytes"]))))
+
+    threshold_params = AutoThresholdParams(method="Li", backend="native")
+    tiled = auto_threshold_processor.run(None, _png_bytes(textured_image), threshold_params, config=SMALL_TILES)
+    whole = auto_threshold_processor.run(None, _png_bytes(textured_image), threshold_params)
+    assert tiled["summary"]["tiled"]
+    np.testing.assert_array_equal(np.array(Image.open(io.BytesIO(tiled["processed_image_bytes"]))),
+                                  np.array(Image.open(io.BytesIO(whole["processed_image_bytes"]))))
+
+
+def test_processors_write_to_output_file(textured_image, tmp_path):
+    """With output_file, the encoded image goes to the file instead of the result dict."""
+    input_path = tmp_path / "input.png"
+    input_path.write_bytes(_png_bytes(textured_image))
+    cases = [(gaussian_blur_processor, GaussianBlurParams(sigma=2.0, backend="native")),
+             (auto_threshold_processor, AutoThresholdParams(method="Li", backend="native"))]
+    for processor, params in cases:
+        for config in (None, SMALL_TILES):
+            expected = processor.run(None, _png_bytes(textured_image), params, config=config)
+            with tempfile.TemporaryFile() as output_file:
+                result = processor.run(None, str(input_path), params, config=config, output_file=output_file)
+                output_file.seek(0)
+                written = output_file.read()
+            assert result["processed_image_bytes"] is None
+            assert result["summary"]["encoding"]["bytes"] == len(written)
+            assert written == expected["processed_image_bytes"]
+
+
+def test_decoded_input_above_pixel_cap_is_rejected(textured_image):
+    """Whole-decoded formats are capped by config; PIL's global limit is left alone."""
+    config = {"engine": {"max_decoded_pixels": 157 * 203 - 1}}
+    with pytest.raises(ValueError, match="supplied as TIFF"):
+        gaussian_blur_processor.run(None, _png_bytes(textured_image), GaussianBlurParams(sigma=1.0), config=config)
+    with pytest.raises(ValueError, match="supplied as TIFF"):
+        auto_threshold_processor.run(None, _png_bytes(textured_image), AutoThresholdParams(method="Li"), config=config)
+    assert Image.MAX_IMAGE_PIXELS == image_io.DEFAULT_MAX_DECODED_PIXELS == int(1024 * 1024 * 1024 // 4 // 3)
+
+
+@pytest.mark.parametrize("shape,dtype", [((37, 41), np.uint8), ((37, 41, 3), np.uint8),
+                                         ((37, 41, 4), np.uint8), ((37, 41), np.uint16)])
+def test_streamed_png_round_trips(shape, dtype):
+    rng = np.random.RandomState(3)
+    array = rng.randint(0, np.iinfo(dtype).max, size=shape).astype(dtype)
+    decoded = np.array(Image.open(io.BytesIO(image_io.encode_png_stream(array, rows_per_chunk=8))))
+    np.testing.assert_array_equal(decoded, array)
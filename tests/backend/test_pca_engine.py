@@ -0,0 +1,176 @@
+# tests/backend/test_pca_engine.py
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import pca_artifact, pca_engine, pca_processor
+from app.schemas.benchtop.biology.omics.transcriptomics.bulk_rna_seq.pca_schema import PCAParams
+
+
+@pytest.fixture
+def wide_matrix():
+    """
+    A (samples x genes) matrix with a few strong latent factors, wide enough
+    that 'auto' picks a truncated solver.
+    """
+    rng = np.random.RandomState(42)
+    factors = rng.normal(size=(60, 4)) * np.array([10.0, 6.0, 3.0, 1.5])
+    loadings = rng.normal(size=(4, 2000))
+    return (factors @ loadings + rng.normal(scale=0.1, size=(60, 2000))).astype(np.float32)
+
+
+def test_auto_solver_selection():
+    """
+    Small matrices or near-full spectra use the exact SVD; wide matrices with
+    few components use randomized SVD.
+    """
+    assert pca_engine.choose_solver(20, 300, 10) == "full"
+    assert pca_engine.choose_solver(500, 30000, 450) == "full"
+    assert pca_engine.choose_solver(500, 30000, 10) == "randomized"
+    assert pca_engine.choose_solver(500, 30000, 10, requested="arpack") == "arpack"
+    assert pca_engine.choose_solver(5, 30000, 5, requested="arpack") == "full"
+
+
+@pytest.mark.parametrize("solver", ["full", "randomized", "arpack"])
+def test_fit_pca_matches_sklearn(wide_matrix, solver):
+    """
+    Every solver should reproduce sklearn's scaled PCA on the leading components.
+    """
+    expected = PCA(n_components=3).fit(StandardScaler().fit_transform(wide_matrix.astype(np.float64)))
+    expected_scores = expected.transform(StandardScaler().fit_transform(wide_matrix.astype(np.float64)))
+
+    result = pca_engine.fit_pca(wide_matrix.copy(), n_components=3, scale=True, solver=solver)
+
+    assert result["solver"] == solver
+    np.testing.assert_allclose(result["explained_variance_ratio"], expected.explained_variance_ratio_, rtol=1e-3)
+    # Components are only defined up to sign
+    for i in range(3):
+        corr = np.corrcoef(result["scores"][:, i], expected_scores[:, i])[0, 1]
+        assert abs(corr) > 0.999
+
+
+def test_processor_reports_solver():
+    """
+    The processor output records which solver ran and stays JSON-serializable.
+    """
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame(rng.poisson(20, size=(50, 6)), columns=[f"ctrl_{i}" for i in range(3)] + [f"trt_{i}" for i in range(3)])
+    df.insert(0, "Gene", [f"g{i}" for i in range(50)])
+    df.loc[3, "ctrl_1"] = np.nan
+    buffer = io.BytesIO(df.to_csv(index=False).encode())
+
+    result = pca_processor.run(buffer, "counts.csv", PCAParams(n_components=3), config={})
+
+    assert result["summary_stats"]["pca_solver"] == "full"
+    assert len(result["plot_data"]) == 6
+    assert isinstance(result["plot_data"][0]["PC1"], float)
+
+
+def test_incremental_matches_in_memory(wide_matrix, tmp_path):
+    """
+    The streamed IncrementalPCA path (memmap input with missing values) should agree
+    with the in-memory engine on the leading components.
+    """
+    data = wide_matrix.copy()
+    data[5, 10] = np.nan
+    data[:, 20] = np.nan  # gene with no values at all is dropped
+
+    mm = np.memmap(tmp_path / "input.f32", dtype=np.float32, mode="w+", shape=data.shape)
+    mm[:] = data
+    result = pca_engine.fit_incremental_pca(mm, n_components=3, scale=True, batch_size=16)
+
+    imputed, kept = pca_processor.impute_gene_means(data.copy())
+    expected = pca_engine.fit_pca(imputed, n_components=3, scale=True, solver="full")
+
+    assert result["solver"] == "incremental"
+    assert result["kept_genes"].sum() == kept.sum() == data.shape[1] - 1
+    # IncrementalPCA truncates per batch, so it is close but not bit-identical
+    np.testing.assert_allclose(result["explained_variance_ratio"], expected["explained_variance_ratio"], rtol=1e-2)
+    for i in range(3):
+        corr = np.corrcoef(result["scores"][:, i], expected["scores"][:, i])[0, 1]
+        assert abs(corr) > 0.99
+
+
+def test_processor_incremental_output_contract():
+    """
+    Forcing the incremental solver yields the same output structure as the default path.
+    """
+    rng = np.random.RandomState(1)
+    df = pd.DataFrame(rng.poisson(20, size=(80, 8)), columns=[f"a_{i}" for i in range(4)] + [f"b_{i}" for i in range(4)])
+    df.insert(0, "Gene", [f"g{i}" for i in range(80)])
+    csv = df.to_csv(index=False).encode()
+
+    default = pca_processor.run(io.BytesIO(csv), "counts.csv", PCAParams(n_components=3), config={})
+    streamed = pca_processor.run(io.BytesIO(csv), "counts.csv", PCAParams(n_components=3, svd_solver="incremental"),
+                                 config={"engine": {"incremental_batch_size": 3}})
+
+    assert streamed["summary_stats"]["pca_solver"] == "incremental"
+    assert streamed["plot_data"][0].keys() == default["plot_data"][0].keys()
+    np.testing.assert_allclose(streamed["summary_stats"]["explained_variance_ratio"],
+                               default["summary_stats"]["explained_variance_ratio"], rtol=1e-2)
+
+
+def test_decomposition_artifact_round_trip():
+    """
+    The stored decomposition reproduces the processor's plotted PCs and serves
+    other PC pairs and top loadings without recomputing.
+    """
+    rng = np.random.RandomState(2)
+    df = pd.DataFrame(rng.poisson(20, size=(40, 6)), columns=[f"ctrl_{i}" for i in range(3)] + [f"trt_{i}" for i in range(3)])
+    df.insert(0, "Gene", [f"g{i}" for i in range(40)])
+    artifact = io.BytesIO()
+
+    result = pca_processor.run(io.BytesIO(df.to_csv(index=False).encode()), "counts.csv",
+                               PCAParams(n_components=4), config={}, decomposition_out=artifact)
+    artifact.seek(0)
+    decomposition = pca_artifact.load_decomposition(artifact)
+
+    payload = pca_artifact.select_components(decomposition, 1, 2)
+    assert payload["x_axis_label"] == result["default_plot_config"]["x_axis_label"]
+    assert [p["PC1"] for p in payload["plot_data"]] == pytest.approx([p["PC1"] for p in result["plot_data"]], rel=1e-5)
+    assert pca_artifact.select_components(decomposition, 3, 4)["plot_data"][0].keys() == {"sample", "PC3", "PC4", "group"}
+
+    genes = pca_artifact.top_loading_genes(decomposition, 1, top_n=5)
+    loadings = np.abs(decomposition["components"][0])
+    assert [g["gene"] for g in genes] == [f"g{i}" for i in np.argsort(loadings)[::-1][:5]]
+    with pytest.raises(ValueError):
+        pca_artifact.select_components(decomposition, 1, 5)
+
+
+def test_variance_prefilter():
+    """
+    Constant, all-zero and all-missing genes are dropped; top_k keeps the most variable.
+    """
+    data = np.array([
+        [0, 5, 1, np.nan, 10, 1],
+        [0, 5, 2, np.nan, 20, 1],
+        [0, 5, 3, np.nan, 30, 2],
+    ], dtype=np.float32)
+    stats = pca_engine.accumulate_gene_stats(data)
+
+    assert pca_engine.variance_prefilter(stats, remove_constant=False).tolist() == [True, True, True, False, True, True]
+    assert pca_engine.variance_prefilter(stats).tolist() == [False, False, True, False, True, True]
+    assert pca_engine.variance_prefilter(stats, top_k=1).tolist() == [False, False, False, False, True, False]
+
+
+def test_processor_records_prefilter_counts():
+    """
+    summary_stats reports how many genes survived the prefilter.
+    """
+    rng = np.random.RandomState(3)
+    df = pd.DataFrame(rng.poisson(20, size=(30, 6)).astype(float), columns=[f"s{i}_rep{i}" for i in range(6)])
+    df.iloc[:10] = 0.0
+    df.insert(0, "Gene", [f"g{i}" for i in range(30)])
+    csv = df.to_csv(index=False).encode()
+
+    result = pca_processor.run(io.BytesIO(csv), "counts.csv", PCAParams(n_components=3), config={})
+    assert result["summary_stats"]["genes_input"] == 30
+    assert result["summary_stats"]["genes_kept"] == 20
+
+    result = pca_processor.run(io.BytesIO(csv), "counts.csv", PCAParams(n_components=3, top_variable_genes=5), config={})
+    assert result["summary_stats"]["genes_kept"] == 5
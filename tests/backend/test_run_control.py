@@ -0,0 +1,113 @@
+# tests/backend/test_run_control.py
+
+import uuid
+
+import pytest
+
+pytest.importorskip("redis")
+
+from app.services import progress, run_control
+from app.utils.benchtop.biology.imaging import batch
+
+
+def test_checkpoint_raises_once_cancel_is_requested(monkeypatch):
+    cancelled = set()
+    monkeypatch.setattr(run_control, "is_cancel_requested", lambda run_id: run_id in cancelled)
+    checkpoint = run_control.checkpoint("run-1")
+
+    checkpoint("loaded")
+    cancelled.add("run-1")
+    with pytest.raises(run_control.RunCancelled, match="genes_selected"):
+        checkpoint("genes_selected")
+    # Without a run id (e.g. a processor called outside a task) there is nothing to cancel
+    run_control.checkpoint(None)("loaded")
+
+
+def test_batch_stops_admitting_images_after_cancel():
+    fetched = []
+
+    def checkpoint(stage, done=None, total=None):
+        if stage == "processing_images" and done == 3:
+            raise run_control.RunCancelled(stage)
+
+    def fetch(item):
+        fetched.append(item["s3_path"])
+        return b""
+
+    items = [{"s3_path": f"s3://datasets/plate/{i}.png"} for i in range(10)]
+    with pytest.raises(run_control.RunCancelled):
+        batch.run_pipeline(items, fetch, lambda data: {"processed_image_bytes": b"x"},
+                           lambda index, item, result: {}, max_workers=1, prefetch_per_worker=1,
+                           checkpoint=checkpoint)
+    assert len(fetched) == 3
+
+
+def test_progress_reporter_rate_limits_and_times_stages(monkeypatch):
+    published = []
+    monkeypatch.setattr(progress.ProgressReporter, "_publish", lambda self, snapshot: published.append(snapshot))
+    reporter = progress.ProgressReporter("run-1", min_interval=3600)
+    checkpoint = run_control.checkpoint(None, progress=reporter)
+
+    checkpoint("loading")
+    for done in range(100):
+        checkpoint("processing_images", done, 100)
+    # Stage changes always go out; loop updates within the interval do not
+    assert [snapshot["stage"] for snapshot in published] == ["loading", "processing_images"]
+    assert published[-1]["done"] == 0 and published[-1]["fraction"] == 0.0
+
+    stages = reporter.finish("completed")
+    assert published[-1]["state"] == "completed"
+    assert [stage["stage"] for stage in stages] == ["loading", "processing_images"]
+    assert all(stage["seconds"] is not None and stage["seconds"] >= 0 for stage in stages)
+
+
+def test_progress_reporter_merges_reentered_stages(monkeypatch):
+    """Stages that alternate (e.g. per-plane steps) keep one entry each and publish on first entry only."""
+    published = []
+    monkeypatch.setattr(progress.ProgressReporter, "_publish", lambda self, snapshot: published.append(snapshot))
+    reporter = progress.ProgressReporter("run-1", min_interval=3600)
+    for _ in range(300):
+        for step in ("step_00_gaussian_blur", "step_01_auto_threshold", "step_02_gaussian_blur"):
+            reporter.update(step)
+
+    assert len(published) == 3 and published[-1]["stage"] == "step_02_gaussian_blur"
+    stages = reporter.finish("completed")
+    assert [stage["stage"] for stage in stages] == ["step_00_gaussian_blur", "step_01_auto_threshold", "step_02_gaussian_blur"]
+    assert all(stage["entries"] == 300 and stage["seconds"] >= 0 for stage in stages)
+    assert published[-1]["stage"] == "step_02_gaussian_blur"
+
+
+def test_cancel_wins_over_a_task_that_finishes_after_it(tmp_path, monkeypatch):
+    sqlalchemy = pytest.importorskip("sqlalchemy")
+    from sqlalchemy.orm import sessionmaker
+    from app import crud
+    from app.db.base_class import Base
+    from app.models.analysis_run import AnalysisRun, AnalysisStatus
+
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'runs.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    api_db, worker_db = Session(), Session()
+    run = AnalysisRun(tool_id="volcano_plot_v1", project_id=uuid.uuid4(), created_by_user_id=uuid.uuid4())
+    api_db.add(run)
+    api_db.commit()
+
+    # The worker loads the run, then the cancel endpoint writes CANCELLED from its own session
+    worker_run = worker_db.get(AnalysisRun, run.id)
+    crud.update_analysis_run_status(api_db, db_run=run, status=AnalysisStatus.CANCELLED, error_message="Cancelled by user.")
+
+    # Late writes from the worker (RUNNING after "queued", COMPLETED after uploading) keep CANCELLED
+    crud.update_analysis_run_status(worker_db, db_run=worker_run, status=AnalysisStatus.RUNNING)
+    crud.update_analysis_run_internal(worker_db, db_run=worker_run, run_in={
+        "status": AnalysisStatus.COMPLETED, "error_message": None, "output_artifacts": {"stage_timings": []},
+    })
+    api_db.refresh(run)
+    assert run.status == AnalysisStatus.CANCELLED and run.error_message == "Cancelled by user."
+    assert run.output_artifacts == {"stage_timings": []}
+
+    # The task's finally block sees the flag even past its last checkpoint, and clears it
+    flags = {str(run.id)}
+    monkeypatch.setattr(run_control, "is_cancel_requested", lambda run_id: run_id in flags)
+    monkeypatch.setattr(run_control, "clear", flags.discard)
+    assert run_control.finish(str(run.id)) is True
+    assert not flags and run_control.finish(str(run.id)) is False
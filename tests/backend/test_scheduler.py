@@ -0,0 +1,135 @@
+# tests/backend/test_scheduler.py
+
+import pytest
+
+pytest.importorskip("redis")
+
+from app.services import scheduler
+from app.tasks import dispatch
+
+WORKLOAD = dispatch.TASK_WORKLOADS[dispatch.HEATMAP_TASK]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """
+    The scheduler against an in-process Redis. Dispatch limits start at zero so submitted
+    runs stay waiting; tests raise them where they need runs to go out.
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # redis-py locks are released with a Lua script
+    client = fakeredis.FakeRedis(decode_responses=True)
+    sent = []
+    monkeypatch.setattr(scheduler, "get_redis_client", lambda: client)
+    monkeypatch.setattr(scheduler.settings, "SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(scheduler.settings, "SCHEDULER_MAX_INFLIGHT_PER_WORKLOAD", 0)
+    monkeypatch.setattr(scheduler.settings, "SCHEDULER_MAX_RUNNING_PER_PROJECT", 4)
+    monkeypatch.setattr(dispatch, "enqueue_analysis", lambda task_name, analysis_run_id, **kwargs: sent.append(analysis_run_id))
+    client.sent = sent
+    return client
+
+
+def _submit(run_id: str, project_id: str, priority: str = "batch"):
+    return scheduler.submit(dispatch.HEATMAP_TASK, analysis_run_id=run_id, project_id=project_id,
+                            dataset_s3_path="s3://b/k.csv", parameters={}, priority=priority)
+
+
+def test_choose_next_shares_slots_between_projects():
+    """
+    The project with the fewest runs in flight goes next, so a project with a long
+    backlog cannot crowd out one that has nothing running; capped projects wait.
+    """
+    candidates = [
+        {"project_id": "big", "running": 3, "enqueued_at": 1.0},
+        {"project_id": "small", "running": 0, "enqueued_at": 9.0},
+        {"project_id": "other", "running": 0, "enqueued_at": 5.0},
+    ]
+    assert scheduler.choose_next(candidates, max_running_per_project=4)["project_id"] == "other"
+    assert scheduler.choose_next(candidates[:1], max_running_per_project=3) is None
+
+
+def test_estimate_position_counts_higher_priority_and_round_robin():
+    # Third in its own list, two interactive runs waiting, two other batch projects
+    assert scheduler.estimate_position(2, 2, [10, 1]) == 2 + 2 + (2 + 1) + 1
+    assert scheduler.estimate_position(0, 0, [5]) == 1
+
+
+def test_submit_bypasses_queue_when_disabled(monkeypatch):
+    sent = []
+    monkeypatch.setattr(scheduler.settings, "SCHEDULER_ENABLED", False)
+    monkeypatch.setattr(dispatch, "enqueue_analysis", lambda task_name, **kwargs: sent.append((task_name, kwargs)))
+    position = scheduler.submit(dispatch.HEATMAP_TASK, analysis_run_id="run-1", project_id="p1",
+                                dataset_s3_path="s3://b/k.csv", parameters={})
+    assert position is None and sent[0][0] == dispatch.HEATMAP_TASK
+
+    with pytest.raises(ValueError):
+        scheduler.submit(dispatch.HEATMAP_TASK, analysis_run_id="run-2", project_id="p1",
+                         dataset_s3_path=None, parameters={}, priority="urgent")
+
+
+def test_next_job_prefers_interactive_then_the_least_busy_project(fake_redis, monkeypatch):
+    for run_id, project_id, priority in [("a1", "a", "batch"), ("a2", "a", "batch"),
+                                         ("b1", "b", "batch"), ("c1", "c", "interactive")]:
+        _submit(run_id, project_id, priority)
+    # Project "b" already has a run in flight, so "a" goes first within the batch priority
+    fake_redis.zadd(scheduler._project_inflight_key("b"), {"b0": 1.0})
+    order = []
+    while (job := scheduler._next_job(fake_redis, WORKLOAD)) is not None:
+        order.append(job["analysis_run_id"])
+    assert order == ["c1", "a1", "a2", "b1"]
+    assert not fake_redis.smembers(scheduler._projects_key(WORKLOAD, "batch"))
+
+    # A project at its concurrency cap is skipped
+    monkeypatch.setattr(scheduler.settings, "SCHEDULER_MAX_RUNNING_PER_PROJECT", 1)
+    _submit("b2", "b", "batch")
+    assert scheduler._next_job(fake_redis, WORKLOAD) is None
+
+
+def test_failed_dispatch_puts_the_run_back_at_the_head(fake_redis, monkeypatch):
+    _submit("r1", "p1")
+    _submit("r2", "p1")
+    job = scheduler._next_job(fake_redis, WORKLOAD)
+
+    def broker_down(*args, **kwargs):
+        raise ConnectionError("broker unavailable")
+    monkeypatch.setattr(dispatch, "enqueue_analysis", broker_down)
+    with pytest.raises(ConnectionError):
+        scheduler._dispatch(fake_redis, job, now=1.0)
+
+    assert fake_redis.lrange(scheduler._pending_key(WORKLOAD, "batch", "p1"), 0, -1) == ["r1", "r2"]
+    assert fake_redis.zcard(scheduler._inflight_key(WORKLOAD)) == 0
+    assert fake_redis.zcard(scheduler._project_inflight_key("p1")) == 0
+    assert scheduler.queue_position("r1") == 1
+
+
+def test_remove_drops_only_waiting_runs(fake_redis, monkeypatch):
+    _submit("r1", "p1")
+    assert scheduler.remove("r1")
+    assert scheduler.queue_position("r1") is None and not fake_redis.hexists(scheduler.JOBS_KEY, "r1")
+
+    monkeypatch.setattr(scheduler.settings, "SCHEDULER_MAX_INFLIGHT_PER_WORKLOAD", 1)
+    assert _submit("r2", "p1") is None and fake_redis.sent == ["r2"]
+    assert not scheduler.remove("r2")
+
+
+def test_complete_frees_the_slot_and_dispatches_the_next_run(fake_redis, monkeypatch):
+    monkeypatch.setattr(scheduler.settings, "SCHEDULER_MAX_INFLIGHT_PER_WORKLOAD", 1)
+    _submit("r1", "p1")
+    assert _submit("r2", "p2") == 1
+    scheduler.complete("r1")
+    assert fake_redis.sent == ["r1", "r2"]
+    assert fake_redis.zrange(scheduler._inflight_key(WORKLOAD), 0, -1) == ["r2"]
+    assert not fake_redis.hexists(scheduler.JOBS_KEY, "r1")
+
+
+def test_retry_keeps_the_scheduler_slot(fake_redis, monkeypatch):
+    """task_postrun also fires for self.retry(); the re-queued attempt must keep the slot."""
+    from app.tasks import worker_lifecycle
+
+    monkeypatch.setattr(scheduler.settings, "SCHEDULER_MAX_INFLIGHT_PER_WORKLOAD", 1)
+    _submit("r1", "p1")
+    _submit("r2", "p1")
+    worker_lifecycle.release_scheduler_slot(task_id="r1", state="RETRY")
+    assert fake_redis.sent == ["r1"]
+    worker_lifecycle.release_scheduler_slot(task_id="r1", state="SUCCESS")
+    assert fake_redis.sent == ["r1", "r2"]
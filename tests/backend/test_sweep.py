@@ -0,0 +1,75 @@
+# tests/backend/test_sweep.py
+
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+pytest.importorskip("redis")
+
+from app.api.endpoints.tools import sweep as sweep_api
+from app.api.endpoints.tools.bulk_rna_seq.heatmap_router import HeatmapSubmit, HeatmapSweep
+from app.models.analysis_run import AnalysisStatus
+from app.services import progress, run_control
+from app.tasks import sweep
+
+
+def _heatmap_sweep(grid):
+    return HeatmapSweep(project_id=uuid.uuid4(), primary_input_dataset_id=uuid.uuid4(), sweep=grid)
+
+
+def test_expand_sweep_builds_every_combination():
+    combinations = sweep_api.expand_sweep(
+        _heatmap_sweep({"clustering_method": ["average", "ward"], "distance_metric": ["euclidean", "correlation", "cityblock"]}),
+        HeatmapSubmit,
+    )
+    assert len(combinations) == 6
+    assert combinations[1]["varied"] == {"clustering_method": "average", "distance_metric": "correlation"}
+    assert all(isinstance(c["submission"], HeatmapSubmit) for c in combinations)
+    assert combinations[-1]["submission"].clustering_method == "ward"
+
+    with pytest.raises(HTTPException, match="not a sweepable"):
+        sweep_api.expand_sweep(_heatmap_sweep({"project_id": [uuid.uuid4()]}), HeatmapSubmit)
+    with pytest.raises(HTTPException, match="at most"):
+        sweep_api.expand_sweep(_heatmap_sweep({"top_n_genes": list(range(1, 1000))}), HeatmapSubmit)
+    with pytest.raises(HTTPException) as excinfo:
+        sweep_api.expand_sweep(_heatmap_sweep({"top_n_genes": ["many"]}), HeatmapSubmit)
+    assert excinfo.value.status_code == 422
+
+
+def test_run_sweep_loads_once_and_isolates_runs(monkeypatch):
+    run_ids = [str(uuid.uuid4()) for _ in range(4)]
+    db_runs = {run_id: SimpleNamespace(id=run_id, status=AnalysisStatus.PENDING) for run_id in run_ids}
+    final = {}
+
+    monkeypatch.setattr(sweep, "SessionLocal", lambda: SimpleNamespace(close=lambda: None))
+    monkeypatch.setattr(sweep.crud, "get_analysis_run", lambda db, analysis_run_id: db_runs[str(analysis_run_id)])
+    monkeypatch.setattr(sweep.crud, "update_analysis_run_status", lambda db, db_run, status: None)
+    monkeypatch.setattr(sweep.crud, "update_analysis_run_internal",
+                        lambda db, db_run, run_in: final.__setitem__(db_run.id, run_in))
+    monkeypatch.setattr(progress.ProgressReporter, "_publish", lambda self, snapshot: None)
+    monkeypatch.setattr(run_control, "is_cancel_requested", lambda run_id: run_id == run_ids[0])
+    monkeypatch.setattr(run_control, "clear", lambda run_id: None)
+
+    loads = []
+
+    def load_dataset():
+        loads.append(1)
+        return {"rows": 3}
+
+    def evaluate(run_id, dataset, parameters, checkpoint):
+        checkpoint("computing")
+        if parameters["k"] == 2:
+            raise RuntimeError("bad combination")
+        return {"k": parameters["k"], "rows": dataset["rows"]}
+
+    runs = [{"analysis_run_id": run_id, "parameters": {"k": k}} for k, run_id in enumerate(run_ids)]
+    counts = sweep.run_sweep("TEST", runs, load_dataset, evaluate)
+
+    assert len(loads) == 1
+    assert counts == {"cancelled": 1, "completed": 2, "failed": 1}
+    assert final[run_ids[0]]["status"] == AnalysisStatus.CANCELLED
+    assert final[run_ids[2]]["status"] == AnalysisStatus.FAILED
+    assert final[run_ids[3]]["output_artifacts"]["k"] == 3
+    assert final[run_ids[3]]["output_artifacts"]["stage_timings"]
@@ -0,0 +1,53 @@
+# tests/backend/test_task_dispatch.py
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.celery_worker import celery_app
+from app.tasks import dispatch
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "backend"))
+
+
+def test_dispatch_names_match_registered_tasks():
+    """
+    Every name the API enqueues is registered by a task module the worker includes.
+    """
+    celery_app.loader.import_default_modules()
+    names = [value for key, value in vars(dispatch).items() if key.endswith("_TASK")]
+    assert names and all(name in celery_app.tasks for name in names)
+
+
+def test_api_import_does_not_load_scientific_stack():
+    probe = "import sys, main; print('loaded=' + ','.join(m for m in ('pandas', 'scipy', 'sklearn', 'PIL', 'imagej') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=BACKEND_DIR, capture_output=True, text=True,
+                            env={**os.environ}, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "loaded="
+
+
+def test_every_task_is_routed_to_its_workload_queue():
+    names = [value for key, value in vars(dispatch).items() if key.endswith("_TASK")]
+    assert set(dispatch.TASK_WORKLOADS) == set(names)
+    assert set(dispatch.TASK_WORKLOADS.values()) <= set(dispatch.WORKLOADS)
+
+    router = celery_app.amqp.router
+    assert router.route({}, dispatch.VOLCANO_PLOT_TASK)["queue"].name == "omics_light"
+    assert router.route({}, dispatch.HEATMAP_TASK)["queue"].name == "omics_heavy"
+    assert router.route({}, dispatch.IMAGE_PIPELINE_TASK)["queue"].name == "imaging"
+    assert router.route({}, "some.unrouted.task")["queue"].name == celery_app.conf.task_default_queue
+
+
+def test_worker_argv_uses_pool_settings():
+    from app.tasks.worker_pools import worker_argv
+
+    argv = worker_argv("omics_heavy")
+    assert argv[argv.index("-Q") + 1] == "omics_heavy"
+    assert argv[argv.index("--prefetch-multiplier") + 1] == "1"
+    assert "--max-memory-per-child" in argv
+    # Imaging children keep their JVM: no memory-based recycling by default
+    assert "--max-memory-per-child" not in worker_argv("imaging")
+    with pytest.raises(ValueError):
+        worker_argv("gpu")
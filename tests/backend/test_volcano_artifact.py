@@ -0,0 +1,202 @@
+# tests/backend/test_volcano_artifact.py
+
+import io
+
+import numpy as np
+import pytest
+import pandas as pd
+
+from app.schemas.benchtop.biology.omics.transcriptomics.bulk_rna_seq.volcano import VolcanoParams
+from app.utils.benchtop.biology.omics.transcriptomics.bulk_rna_seq import volcano_artifact, volcano_processor, volcano_streaming
+
+
+def _table(n_genes=500, seed=0):
+    rng = np.random.default_rng(seed)
+    pvalues = rng.uniform(0, 0.2, n_genes)
+    pvalues[:3] = 0.0  # zeros are replaced before classification
+    return pd.DataFrame({
+        "Gene": [f"g{i}" for i in range(n_genes)],
+        "logFC": rng.normal(0, 2, n_genes),
+        "PValue": pvalues,
+    })
+
+
+def test_classify_matches_threshold_rule():
+    log2fc = np.array([2.0, -2.0, 1.0, -1.0, 0.5, 3.0])
+    pvalue = np.array([0.01, 0.01, 0.01, 0.01, 0.001, 0.5])
+    codes = volcano_artifact.classify(log2fc, pvalue, 1.0, 0.05)
+    assert [volcano_artifact.CLASSES[c] for c in codes] == ["up", "down", "up", "down", "neutral", "neutral"]
+    assert volcano_artifact.count_classes(codes) == {"neutral": 2, "up": 2, "down": 2}
+
+
+def test_reclassify_stored_columns_matches_a_fresh_run():
+    data = _table()
+    artifact = io.BytesIO()
+    result = volcano_processor.run(None, VolcanoParams(), {}, data=data, columns_out=artifact)
+    artifact.seek(0)
+    columns = volcano_artifact.load_columns(artifact)
+    assert columns["genes"].tolist() == [point["_gene"] for point in result["plot_data"]]
+
+    # Same thresholds: same counts and labels as the run itself, so nothing changed
+    same = volcano_artifact.reclassify(columns, 1.0, 0.05, label_top_n=10)
+    assert same["changed"] == {"neutral": [], "up": [], "down": []}
+    assert same["top_labels"] == result["top_labels"]
+    assert same["summary_stats"]["upregulated"] == result["summary_stats"]["initial_upregulated"]
+
+    # New thresholds: applying the changes to the run's labels gives a full rerun's labels
+    rerun = volcano_processor.run(None, VolcanoParams(fold_change_threshold=2.5, p_value_threshold=0.01), {}, data=data)
+    changed = volcano_artifact.reclassify(columns, 2.5, 0.01, baseline_thresholds=(1.0, 0.05))
+    labels = [point["_classification"] for point in result["plot_data"]]
+    for label, positions in changed["changed"].items():
+        assert all(labels[i] != label for i in positions)
+        for i in positions:
+            labels[i] = label
+    assert labels == [point["_classification"] for point in rerun["plot_data"]]
+    assert changed["summary_stats"]["neutral"] == rerun["summary_stats"]["initial_neutral"]
+
+
+def test_density_mode_bins_neutral_genes_and_keeps_significant_points():
+    data = _table(n_genes=5000, seed=1)
+    result = volcano_processor.run(None, VolcanoParams(render_mode="density", density_bins=20), {}, data=data)
+    stats = result["summary_stats"]
+
+    assert result["render_mode"] == "density"
+    assert {point["_classification"] for point in result["plot_data"]} <= {"up", "down"}
+    assert len(result["plot_data"]) == stats["initial_upregulated"] + stats["initial_downregulated"]
+    density = result["density"]
+    assert len(density["counts"]) == 20 and len(density["counts"][0]) == 20
+    assert sum(map(sum, density["counts"])) == density["n_points"] == stats["initial_neutral"]
+
+    # "auto" keeps small tables as individual points
+    small = volcano_processor.run(None, VolcanoParams(), {"density": {"auto_threshold_points": 10000}}, data=data)
+    assert small["render_mode"] == "points" and small["density"] is None
+    assert len(small["plot_data"]) == stats["total_genes"]
+
+
+def test_reclassifying_a_density_run_matches_a_density_rerun():
+    data = _table(n_genes=5000, seed=1)
+    artifact = io.BytesIO()
+    volcano_processor.run(None, VolcanoParams(render_mode="density", density_bins=20), {}, data=data, columns_out=artifact)
+    artifact.seek(0)
+    columns = volcano_artifact.load_columns(artifact)
+
+    rerun = volcano_processor.run(None, VolcanoParams(render_mode="density", density_bins=20, fold_change_threshold=2.5,
+                                                      p_value_threshold=0.01, label_top_n=5), {}, data=data)
+    changed = volcano_artifact.reclassify(columns, 2.5, 0.01, label_top_n=5, render_mode="density", density_bins=20)
+    assert changed["render_mode"] == "density"
+    assert changed["density"] == rerun["density"]
+    assert [{k: v for k, v in point.items() if k != "_row"} for point in changed["points"]] == rerun["plot_data"]
+    assert all(columns["genes"][point["_row"]] == point["_gene"] for point in changed["points"])
+    assert changed["top_labels"] == rerun["top_labels"]
+    assert changed["summary_stats"]["points_truncated"] == 0
+
+    # Runs that capped their points keep the best-scoring ones per side
+    capped = volcano_artifact.reclassify(columns, 2.5, 0.01, render_mode="density", density_bins=20, max_points=10)
+    assert len(capped["points"]) == 10
+    assert capped["summary_stats"]["points_truncated"] == len(rerun["plot_data"]) - 10
+    assert [point["_row"] for point in capped["points"]] == sorted(point["_row"] for point in capped["points"])
+
+
+def test_top_labels_are_the_best_scoring_significant_genes():
+    data = _table(n_genes=2000, seed=2)
+    result = volcano_processor.run(None, VolcanoParams(label_top_n=7), {}, data=data)
+    points = result["plot_data"]
+
+    for side in ("up", "down"):
+        labelled = result["top_labels"][side]
+        assert len(labelled) == 7 and all(points[i]["_classification"] == side for i in labelled)
+        scores = sorted((abs(p["_log2fc"]) * p["_minus_log10_pvalue_"] for p in points if p["_classification"] == side),
+                        reverse=True)
+        assert [abs(points[i]["_log2fc"]) * points[i]["_minus_log10_pvalue_"] for i in labelled] == scores[:7]
+
+    # Without an explicit label_top_n the config's auto_label counts apply
+    config = {"auto_label": {"top_n_up": 3, "top_n_down": 0}}
+    configured = volcano_processor.run(None, VolcanoParams(), config, data=data)
+    assert len(configured["top_labels"]["up"]) == 3 and configured["top_labels"]["down"] == []
+
+
+def test_multi_contrast_classifies_every_contrast_in_one_table():
+    singles = {name: _table(n_genes=300, seed=seed) for seed, name in enumerate(["KO_vs_WT", "DKO_vs_WT", "KO_vs_DKO"])}
+    wide = pd.DataFrame({"Gene": singles["KO_vs_WT"]["Gene"]})
+    for name, table in singles.items():
+        wide[f"{name}_logFC"] = table["logFC"]
+        wide[f"{name}.adj.pval"] = table["PValue"]  # suffix and separator variants resolve too
+
+    result = volcano_processor.run(None, VolcanoParams(multi_contrast=True, label_top_n=3), {}, data=wide)
+    assert result["contrasts"] == list(singles)
+
+    for summary in result["contrast_summaries"]:
+        single = volcano_processor.run(None, VolcanoParams(label_top_n=3), {}, data=singles[summary["contrast"]])
+        assert summary["upregulated"] == single["summary_stats"]["initial_upregulated"]
+        assert summary["downregulated"] == single["summary_stats"]["initial_downregulated"]
+        assert summary["top_genes"]["up"] == [single["plot_data"][i]["_gene"] for i in single["top_labels"]["up"]]
+
+    matrix = np.array(result["overlap"]["matrix"])
+    assert (np.diag(matrix) == [s["upregulated"] + s["downregulated"] for s in result["contrast_summaries"]]).all()
+    assert (matrix == matrix.T).all()
+    assert sum(i["genes"] for i in result["intersections"]) == result["summary_stats"]["genes_significant_in_any"]
+
+    only_two = volcano_processor.run(None, VolcanoParams(multi_contrast=True, contrasts=["KO_vs_DKO", "KO_vs_WT"]), {}, data=wide)
+    assert only_two["contrasts"] == ["KO_vs_DKO", "KO_vs_WT"]
+    with pytest.raises(ValueError, match="missing_contrast"):
+        volcano_processor.run(None, VolcanoParams(multi_contrast=True, contrasts=["missing_contrast"]), {}, data=wide)
+
+
+def test_streaming_matches_the_in_memory_run(tmp_path):
+    data = _table(n_genes=5000, seed=3)
+    data["PValue"] = data["PValue"].astype(object)
+    data.loc[10, "PValue"] = "not a number"  # dropped by both engines
+    path = tmp_path / "table.tsv"
+    data.to_csv(path, sep="\t", index=False)
+    params = VolcanoParams(render_mode="density", label_top_n=5)
+    config = {"engine": {"chunk_rows": 700}}
+
+    in_memory_columns, streamed_columns = io.BytesIO(), io.BytesIO()
+    expected = volcano_processor.run(None, params, config, data=pd.read_csv(path, sep="\t"), columns_out=in_memory_columns)
+    streamed = volcano_streaming.run(str(path), params, config, columns_out=streamed_columns)
+
+    assert streamed["plot_data"] == expected["plot_data"]
+    assert streamed["top_labels"] == expected["top_labels"]
+    for key in ("total_genes", "initial_upregulated", "initial_downregulated", "initial_neutral"):
+        assert streamed["summary_stats"][key] == expected["summary_stats"][key]
+    assert sum(map(sum, streamed["density"]["counts"])) == streamed["summary_stats"]["initial_neutral"]
+    in_memory_columns.seek(0), streamed_columns.seek(0)
+    expected_arrays, streamed_arrays = volcano_artifact.load_columns(in_memory_columns), volcano_artifact.load_columns(streamed_columns)
+    for key, values in expected_arrays.items():
+        assert (streamed_arrays[key] == values).all()
+
+    # Points are capped at the best-scoring significant genes
+    capped = volcano_streaming.run(str(path), params, {"engine": {"chunk_rows": 700, "max_points": 40}})
+    assert len(capped["plot_data"]) == 40
+    assert capped["summary_stats"]["points_truncated"] == len(expected["plot_data"]) - 40
+    assert capped["top_labels"]["up"] and all(capped["plot_data"][i]["_classification"] == "up" for i in capped["top_labels"]["up"])
+
+
+def test_api_columns_cache_is_bounded_by_bytes(monkeypatch):
+    """The API keeps parsed columns up to a byte budget and refuses oversized artifacts."""
+    from fastapi import HTTPException
+    from app.api.endpoints.tools.bulk_rna_seq import volcano_plot_router as router
+
+    artifact = io.BytesIO()
+    volcano_processor.run(None, VolcanoParams(), {}, data=_table(n_genes=200), columns_out=artifact)
+    downloads = []
+
+    def download(bucket_name, object_key):
+        downloads.append(object_key)
+        return io.BytesIO(artifact.getvalue())
+    monkeypatch.setattr(router.s3_service, "get_object_size", lambda bucket, key: len(artifact.getvalue()))
+    monkeypatch.setattr(router.s3_service, "download_file_to_buffer", download)
+    monkeypatch.setattr(router, "_columns_cache", type(router._columns_cache)())
+    nbytes = volcano_artifact.columns_nbytes(volcano_artifact.load_columns(io.BytesIO(artifact.getvalue())))
+    monkeypatch.setattr(router, "COLUMNS_CACHE_MAX_BYTES", 2 * nbytes)
+
+    path = f"s3://{router.settings.S3_BUCKET_NAME_RESULTS}/{{}}".format
+    for key in ("a", "b", "a", "c", "b"):
+        router._load_cached_columns(path(key))
+    assert downloads == ["a", "b", "c", "b"]
+    assert list(router._columns_cache) == [path("c"), path("b")]
+
+    monkeypatch.setattr(router, "COLUMNS_MAX_BYTES", len(artifact.getvalue()) - 1)
+    with pytest.raises(HTTPException) as refused:
+        router._load_cached_columns(path("d"))
+    assert refused.value.status_code == 413
@@ -0,0 +1,22 @@
+# tests/backend/test_worker_health.py
+
+import pytest
+
+pytest.importorskip("redis")
+
+from app.api.endpoints.core import health_router
+from app.services import worker_health
+
+
+def test_imaging_health_counts_warm_processes(monkeypatch):
+    """
+    Only processes with an initialized and warmed gateway count as ready.
+    """
+    monkeypatch.setattr(worker_health, "list_imaging_status", lambda: [
+        {"hostname": "w1", "pid": 11, "initialized": True, "warmed_up": True, "init_seconds": 6.2},
+        {"hostname": "w1", "pid": 12, "initialized": True, "warmed_up": False},
+        {"hostname": "w2", "pid": 21, "initialized": False, "warmed_up": False, "error": "no JVM"},
+    ])
+    health = health_router.get_imaging_worker_health()
+    assert health.ready and health.ready_processes == 1 and health.total_processes == 3
+    assert health.processes[2].error == "no JVM"